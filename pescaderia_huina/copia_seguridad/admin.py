@@ -1,13 +1,17 @@
 from django.contrib import admin
-from .models import CopiaSeguridadBD
+from .models import CopiaSeguridadBD, TrabajoCopia
 
 
 @admin.register(CopiaSeguridadBD)
 class CopiaSeguridadBDAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'fecha_creacion', 'fecha_restauracion', 'tamaño_estimado')
-    list_filter = ('fecha_creacion', 'fecha_restauracion')
+    list_display = ('nombre', 'tipo', 'fecha_creacion', 'fecha_restauracion', 'formato', 'total_registros', 'tamaño_bytes')
+    list_filter = ('tipo', 'fecha_creacion', 'fecha_restauracion', 'formato')
     search_fields = ('nombre', 'descripcion')
-    readonly_fields = ('fecha_creacion', 'fecha_restauracion', 'datos_backup')
+    readonly_fields = (
+        'fecha_creacion', 'fecha_restauracion', 'datos_backup',
+        'formato', 'modelos', 'total_registros', 'tamaño_bytes', 'sha256',
+        'tipo', 'base', 'marca_agua',
+    )
     fieldsets = (
         ('Información General', {
             'fields': ('nombre', 'descripcion', 'tamaño_estimado')
@@ -15,8 +19,21 @@ class CopiaSeguridadBDAdmin(admin.ModelAdmin):
         ('Fechas', {
             'fields': ('fecha_creacion', 'fecha_restauracion')
         }),
+        ('Contenido', {
+            'fields': ('tipo', 'base', 'marca_agua', 'formato', 'total_registros', 'tamaño_bytes', 'sha256', 'modelos')
+        }),
         ('Datos', {
             'fields': ('datos_backup',),
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(TrabajoCopia)
+class TrabajoCopiaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'operacion', 'copia', 'usuario', 'estado', 'registros_procesados', 'fecha_creacion', 'fecha_fin')
+    list_filter = ('estado', 'operacion')
+    readonly_fields = (
+        'fecha_creacion', 'fecha_inicio', 'fecha_fin', 'error', 'etapa',
+        'registros_procesados', 'registros_totales',
+    )
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CopiaSeguridadConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'copia_seguridad'
+
+    def ready(self):
+        from . import diario
+        diario.conectar_senales()
@@ -0,0 +1,108 @@
+"""
+Diario de cambios para las copias incrementales y diferenciales.
+
+De los modelos respaldados solo Venta y PerfilUsuario tienen una fecha de
+modificación real (auto_now); Pedido.fecha y Proveedor.fecha_registro son
+de creación y ninguno registra los borrados. Por eso cada post_save y
+post_delete de los modelos respaldados (menos los derivados, que se
+reconstruyen al restaurar) anota en CambioRegistro el modelo, el id y la
+hora: una fila por registro, que se actualiza en cada cambio.
+
+La anotación va en la misma transacción que el cambio: si este se revierte,
+la anotación también, y si se confirma, ninguna copia posterior la pierde.
+La hora es la del save(), no la del commit; MARGEN cubre las transacciones
+que confirman después de que una copia empezó a leer.
+
+SET_NULL lo resuelve la BD sin señales, así que antes de eliminar un registro
+se anotan también los que quedarán apuntando a NULL.
+"""
+from datetime import timedelta
+
+from django.db.models import SET_NULL
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.utils import timezone
+
+from .models import CambioRegistro
+
+
+# Holgura al leer el diario: cambios anotados hasta este tiempo antes de la
+# marca de agua de la copia base entran de nuevo en la siguiente
+MARGEN = timedelta(minutes=5)
+
+
+def anotar(modelo, ids):
+    """Marca como cambiados ahora los registros `ids` de `modelo` (un solo upsert)."""
+    ahora = timezone.now()
+    etiqueta = modelo._meta.label
+    CambioRegistro.objects.bulk_create(
+        [CambioRegistro(modelo=etiqueta, objeto_id=str(objeto_id), fecha=ahora) for objeto_id in set(ids)],
+        update_conflicts=True,
+        unique_fields=['modelo', 'objeto_id'],
+        update_fields=['fecha'],
+    )
+
+
+def ids_cambiados(modelo, desde):
+    """Ids de `modelo` anotados desde `desde`, en el tipo de su pk."""
+    pk = modelo._meta.pk
+    consulta = CambioRegistro.objects.filter(
+        modelo=modelo._meta.label, fecha__gte=desde
+    ).values_list('objeto_id', flat=True)
+    return sorted(pk.to_python(objeto_id) for objeto_id in consulta.iterator())
+
+
+# Fila del diario (no es un modelo) que guarda hasta dónde se podó
+PODA = '__poda__'
+
+
+def horizonte():
+    """Instante hasta el que se podó el diario (None si nunca se podó)."""
+    return CambioRegistro.objects.filter(modelo=PODA).values_list('fecha', flat=True).first()
+
+
+def podar(hasta):
+    """
+    Elimina las anotaciones anteriores a `hasta` y guarda el nuevo
+    horizonte: una copia con marca de agua anterior a él ya no sirve de base.
+    """
+    actual = horizonte()
+    if actual is not None and actual >= hasta:
+        return 0
+    eliminadas, _ = CambioRegistro.objects.filter(fecha__lt=hasta).exclude(modelo=PODA).delete()
+    CambioRegistro.objects.update_or_create(modelo=PODA, objeto_id='', defaults={'fecha': hasta})
+    return eliminadas
+
+
+def _al_guardar(sender, instance, **kwargs):
+    anotar(sender, [instance.pk])
+
+
+def _al_eliminar(sender, instance, **kwargs):
+    anotar(sender, [instance.pk])
+
+
+def _antes_de_eliminar(sender, instance, diarios, **kwargs):
+    for relacion in sender._meta.related_objects:
+        if relacion.on_delete is not SET_NULL or relacion.related_model not in diarios:
+            continue
+        ids = list(
+            relacion.related_model._default_manager
+            .filter(**{relacion.field.name: instance}).values_list('pk', flat=True)
+        )
+        if ids:
+            anotar(relacion.related_model, ids)
+
+
+def conectar_senales():
+    """Conecta las señales de los modelos con diario (desde CopiaSeguridadConfig.ready)."""
+    from .motor import modelos_incrementales
+
+    diarios = set(modelos_incrementales())
+    for modelo in diarios:
+        etiqueta = modelo._meta.label
+        post_save.connect(_al_guardar, sender=modelo, dispatch_uid=f'diario:{etiqueta}:save')
+        post_delete.connect(_al_eliminar, sender=modelo, dispatch_uid=f'diario:{etiqueta}:delete')
+        pre_delete.connect(
+            lambda sender, diarios=diarios, **kwargs: _antes_de_eliminar(sender, diarios=diarios, **kwargs),
+            sender=modelo, weak=False, dispatch_uid=f'diario:{etiqueta}:pre_delete',
+        )
@@ -0,0 +1,152 @@
+"""
+Benchmark del motor de copias de seguridad (copia_seguridad.motor).
+Crea ventas de prueba en dos tamaños dentro de una transacción que se
+revierte al final y mide, para cada tamaño, el tiempo y el pico de memoria
+de Python (tracemalloc) de una copia. Con el motor por streaming el pico no
+debe crecer con la cantidad de ventas; como referencia se mide también el
+método anterior (serialize + json.loads de cada modelo completo).
+Después restaura cada copia (motor.restaurar, por lotes) y, en el tamaño
+chico, la restaura también fila por fila con save() como antes.
+Al final hace una copia completa, registra un día de cambios (--delta
+ventas nuevas y algunas eliminadas) y mide la copia incremental.
+"""
+import json
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.core.serializers import deserialize, serialize
+from django.db import connection, transaction
+
+from copia_seguridad import motor
+from productos.models import Producto
+from proveedores.models import Proveedor
+from copia_seguridad.models import CopiaSeguridadBD
+from ventas.models import Venta, VentaItem
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y memoria de una copia de seguridad (los datos de prueba se revierten)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventas', type=int, default=100_000, help='Ventas de prueba en la medición grande (100000 por defecto)')
+        parser.add_argument('--sin-anterior', action='store_true', help='No medir el método anterior')
+        parser.add_argument('--delta', type=int, default=100, help='Ventas nuevas entre la copia completa y la incremental (100 por defecto)')
+
+    def handle(self, *args, **options):
+        grande = options['ventas']
+        tamaños = [grande // 10, grande]
+        resultados = []
+
+        with transaction.atomic():
+            producto = self._producto()
+            sembradas = 0
+            for total in tamaños:
+                self.stdout.write(f'Creando ventas de prueba hasta {total}...')
+                self._sembrar(producto, total - sembradas)
+                sembradas = total
+
+                copia, segundos, pico = self._medir(lambda: motor.crear_copia(f'Benchmark {total}'))
+                anterior = None if options['sin_anterior'] else self._medir(self._metodo_anterior)[1:]
+                restauracion = motor.restaurar(copia)
+                restauracion_anterior = None
+                if not options['sin_anterior'] and total == tamaños[0]:
+                    inicio = time.perf_counter()
+                    self._restaurar_anterior(copia)
+                    restauracion_anterior = time.perf_counter() - inicio
+                resultados.append((total, copia, segundos, pico, anterior, restauracion, restauracion_anterior))
+
+            self.stdout.write(f'Copia completa y {options["delta"]} ventas nuevas para la incremental...')
+            completa, segundos_completa, _ = self._medir(lambda: motor.crear_copia('Benchmark base'))
+            self._dia_de_cambios(producto, options['delta'])
+            incremental, segundos_incremental, pico_incremental = self._medir(
+                lambda: motor.crear_copia('Benchmark incremental', tipo=CopiaSeguridadBD.INCREMENTAL)
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(f'\n=== COPIA DE SEGURIDAD ({connection.vendor}) ==='))
+        for total, copia, segundos, pico, anterior, restauracion, restauracion_anterior in resultados:
+            linea = (
+                f'{total:>8} ventas: {copia.total_registros} registros en {segundos:.1f} s '
+                f'({copia.total_registros / segundos:,.0f} reg/s), {copia.tamaño_bytes / 1024 / 1024:.1f} MB comprimido, '
+                f'pico de memoria {pico / 1024 / 1024:.1f} MB'
+            )
+            if anterior:
+                linea += f' | anterior: {anterior[0]:.1f} s, pico {anterior[1] / 1024 / 1024:.1f} MB'
+            self.stdout.write(linea)
+            linea = (
+                f'{"":>8}  restauración: {restauracion.segundos:.1f} s '
+                f'({restauracion.registros / restauracion.segundos:,.0f} reg/s)'
+            )
+            if restauracion_anterior:
+                linea += (
+                    f' | fila por fila: {restauracion_anterior:.1f} s '
+                    f'({copia.total_registros / restauracion_anterior:,.0f} reg/s)'
+                )
+            self.stdout.write(linea)
+        self.stdout.write(
+            f'incremental: {incremental.total_registros} registros en {segundos_incremental:.2f} s, '
+            f'{incremental.tamaño_bytes / 1024:.1f} KB, pico {pico_incremental / 1024 / 1024:.1f} MB '
+            f'| completa: {completa.total_registros} registros en {segundos_completa:.1f} s, '
+            f'{completa.tamaño_bytes / 1024 / 1024:.1f} MB'
+        )
+
+    def _dia_de_cambios(self, producto, cantidad):
+        """Ventas creadas y eliminadas con save()/delete(), como desde las vistas (pasan por el diario)."""
+        for i in range(cantidad):
+            venta = Venta.objects.create(estado='COMPLETADA', nombre_cliente=f'Cliente del día {i}')
+            VentaItem.objects.create(venta=venta, producto=producto, cantidad=Decimal('1.00'), precio_unitario=Decimal('10000.00'))
+        for venta in Venta.objects.order_by('pk')[:max(cantidad // 10, 1)]:
+            venta.delete()
+
+    def _medir(self, funcion):
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        try:
+            resultado = funcion()
+            segundos = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return resultado, segundos, pico
+
+    def _metodo_anterior(self):
+        datos = {}
+        for modelo in motor.modelos_respaldo():
+            datos[modelo._meta.label] = json.loads(serialize('json', modelo.objects.all()))
+        return len(json.dumps(datos))
+
+    def _restaurar_anterior(self, copia):
+        for registro in motor.registros(copia):
+            for objeto in deserialize('python', [registro]):
+                objeto.save()
+
+    def _producto(self):
+        proveedor = Proveedor.objects.create(
+            nit='9999999996',
+            nombre_contacto='Proveedor Benchmark Copias',
+            correo='copias@example.com',
+            telefono='3000000000',
+            ciudad='Bogotá',
+        )
+        return Producto.objects.create(
+            proveedor=proveedor,
+            tipo_producto='PE',
+            nombre='Producto Benchmark Copias',
+            precio=Decimal('10000.00'),
+            tipo_presentacion='LIB',
+        )
+
+    def _sembrar(self, producto, cantidad):
+        for inicio in range(0, cantidad, 5000):
+            ventas = Venta.objects.bulk_create([
+                Venta(estado='COMPLETADA', subtotal=Decimal('10000.00'), total=Decimal('11900.00'),
+                      nombre_cliente=f'Cliente {inicio + i}')
+                for i in range(min(5000, cantidad - inicio))
+            ])
+            VentaItem.objects.bulk_create([
+                VentaItem(venta=venta, producto=producto, cantidad=Decimal('1.50'),
+                          precio_unitario=Decimal('10000.00'), subtotal=Decimal('15000.00'))
+                for venta in ventas
+            ])
@@ -0,0 +1,73 @@
+"""
+Crea una copia de seguridad desde la línea de comandos, por la misma cola
+que la interfaz (copia_seguridad.trabajos). Pensado para cron:
+
+    # Completa los domingos, incremental el resto de las noches
+    0 2 * * 0   python manage.py crear_copia --tipo completa
+    0 2 * * 1-6 python manage.py crear_copia --tipo incremental
+
+El comando encola un TrabajoCopia y lo ejecuta él mismo. Si hay otra copia
+o restauración en proceso, espera a que termine (o a que el trabajador tome
+la suya). Si no hay copia base para una incremental o diferencial, con
+--completa-si-falta se hace una completa en su lugar. Termina con código
+distinto de cero si la copia falla, para que cron lo reporte.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from copia_seguridad import motor, trabajos
+from copia_seguridad.models import TrabajoCopia
+
+
+class Command(BaseCommand):
+    help = 'Crea una copia de seguridad (completa, incremental o diferencial)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo', choices=['completa', 'incremental', 'diferencial'], default='completa',
+            help='Tipo de copia (completa por defecto)'
+        )
+        parser.add_argument('--nombre', default='', help='Nombre de la copia (por defecto, el tipo y la fecha)')
+        parser.add_argument('--descripcion', default='', help='Descripción de la copia')
+        parser.add_argument('--completa-si-falta', action='store_true', help='Hace una copia completa si no hay base para la incremental')
+        parser.add_argument('--verificar', action='store_true', help='Relee la copia terminada y compara conteos y SHA-256')
+        parser.add_argument('--intervalo', type=float, default=5.0, help='Segundos entre intentos si hay otro trabajo en proceso')
+
+    def handle(self, *args, **options):
+        self._ultimo_aviso = 0.0
+        trabajo = trabajos.encolar(
+            TrabajoCopia.CREAR,
+            nombre=options['nombre'],
+            descripcion=options['descripcion'],
+            tipo=options['tipo'].upper(),
+            completa_si_falta=options['completa_si_falta'],
+        )
+        while trabajo.estado in (TrabajoCopia.PENDIENTE, TrabajoCopia.PROCESANDO):
+            if trabajos.ejecutar(trabajo, progreso=self._progreso) is None:
+                time.sleep(options['intervalo'])
+            trabajo.refresh_from_db()
+
+        if trabajo.estado == TrabajoCopia.ERROR:
+            raise CommandError(trabajo.error)
+        copia = trabajo.copia
+        segundos = (trabajo.fecha_fin - trabajo.fecha_inicio).total_seconds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Copia {copia.get_tipo_display().lower()} "{copia.nombre}" (#{copia.pk}): '
+            f'{copia.total_registros} registros en {segundos:.1f} s '
+            f'({copia.total_registros / max(segundos, 0.001):,.0f} reg/s), {copia.tamaño_bytes / 1024:,.1f} KB'
+        ))
+
+        if options['verificar']:
+            problemas = motor.verificar(copia)
+            if problemas:
+                raise CommandError('La copia no pasó la verificación: ' + '; '.join(problemas))
+            self.stdout.write(self.style.SUCCESS('Verificación correcta'))
+
+    def _progreso(self, procesados, total, etapa):
+        # Una línea cada 5 segundos como máximo, para no llenar el log de cron
+        if time.monotonic() - self._ultimo_aviso < 5:
+            return
+        self._ultimo_aviso = time.monotonic()
+        porcentaje = f' ({procesados * 100 // total}%)' if total else ''
+        self.stdout.write(f'  {etapa}: {procesados}{f" / {total}" if total else ""} registros{porcentaje}')
@@ -0,0 +1,58 @@
+"""
+Trabajador de las copias de seguridad en segundo plano (copia_seguridad.trabajos).
+
+    python manage.py procesar_copias
+
+Toma de la BD las copias y restauraciones pendientes, de a una, y las
+ejecuta con prioridad baja (nice) para no quitarle CPU a los servidores web
+que atienden el punto de venta. Las copias se procesan de a una: basta un
+proceso.
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+LIMPIEZA_CADA_SEGUNDOS = 5 * 60
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta en segundo plano las copias de seguridad y restauraciones pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando no hay trabajos')
+        parser.add_argument('--prioridad', type=int, default=10, help='Incremento de nice del proceso (0 = sin cambio)')
+        parser.add_argument('--una-vez', action='store_true', help='Procesa lo pendiente y termina')
+
+    def handle(self, *args, **options):
+        from copia_seguridad import trabajos
+
+        intervalo = options['intervalo']
+        if options['prioridad'] and hasattr(os, 'nice'):
+            os.nice(options['prioridad'])
+
+        eliminados = trabajos.limpiar_trabajos()
+        if eliminados:
+            self.stdout.write(f'Trabajos antiguos eliminados: {eliminados}')
+
+        if options['una_vez']:
+            procesados = trabajos.procesar_pendientes()
+            self.stdout.write(self.style.SUCCESS(f'Trabajos procesados: {procesados}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Trabajador de copias iniciado'))
+        ultima_limpieza = time.monotonic()
+        try:
+            while True:
+                if not trabajos.procesar_pendientes():
+                    if time.monotonic() - ultima_limpieza > LIMPIEZA_CADA_SEGUNDOS:
+                        trabajos.limpiar_trabajos()
+                        ultima_limpieza = time.monotonic()
+                    time.sleep(intervalo)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connections.close_all()
+        self.stdout.write(self.style.SUCCESS('Trabajador de copias detenido'))
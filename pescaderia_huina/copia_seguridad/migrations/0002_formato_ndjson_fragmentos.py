@@ -0,0 +1,54 @@
+# Generated migration - Copias en NDJSON comprimido por fragmentos (copia_seguridad.motor)
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copia_seguridad', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='copiaseguridadbd',
+            name='formato',
+            field=models.CharField(choices=[('JSON', 'JSON en la fila'), ('NDJSON_GZ', 'NDJSON comprimido por fragmentos')], default='JSON', max_length=20, verbose_name='Formato'),
+        ),
+        migrations.AddField(
+            model_name='copiaseguridadbd',
+            name='modelos',
+            field=models.JSONField(blank=True, default=dict, help_text='{"app.Modelo": {"registros": N, "sha256": "..."}}', verbose_name='Registros por Modelo'),
+        ),
+        migrations.AddField(
+            model_name='copiaseguridadbd',
+            name='total_registros',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Total de Registros'),
+        ),
+        migrations.AddField(
+            model_name='copiaseguridadbd',
+            name='tamaño_bytes',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Tamaño Comprimido (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='copiaseguridadbd',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64, verbose_name='SHA-256 del Archivo'),
+        ),
+        migrations.CreateModel(
+            name='FragmentoCopia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveIntegerField(verbose_name='Número')),
+                ('datos', models.BinaryField(verbose_name='Datos')),
+                ('copia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fragmentos', to='copia_seguridad.copiaseguridadbd', verbose_name='Copia')),
+            ],
+            options={
+                'verbose_name': 'Fragmento de Copia',
+                'verbose_name_plural': 'Fragmentos de Copia',
+                'ordering': ['copia', 'numero'],
+                'constraints': [models.UniqueConstraint(fields=('copia', 'numero'), name='copia_fragmento_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated migration - Copias incrementales y diferenciales con diario de cambios
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copia_seguridad', '0002_formato_ndjson_fragmentos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='copiaseguridadbd',
+            name='tipo',
+            field=models.CharField(choices=[('COMPLETA', 'Completa'), ('INCREMENTAL', 'Incremental'), ('DIFERENCIAL', 'Diferencial')], default='COMPLETA', max_length=20, verbose_name='Tipo de Copia'),
+        ),
+        migrations.AddField(
+            model_name='copiaseguridadbd',
+            name='base',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='dependientes', to='copia_seguridad.copiaseguridadbd', verbose_name='Copia Base'),
+        ),
+        migrations.AddField(
+            model_name='copiaseguridadbd',
+            name='marca_agua',
+            field=models.DateTimeField(blank=True, help_text='Instante en que empezó la lectura; la siguiente copia incremental parte de aquí', null=True, verbose_name='Datos hasta'),
+        ),
+        migrations.CreateModel(
+            name='CambioRegistro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('objeto_id', models.CharField(max_length=64, verbose_name='ID del Registro')),
+                ('fecha', models.DateTimeField(db_index=True, verbose_name='Último Cambio')),
+            ],
+            options={
+                'verbose_name': 'Cambio de Registro',
+                'verbose_name_plural': 'Cambios de Registros',
+                'indexes': [models.Index(fields=['modelo', 'fecha'], name='cambio_modelo_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('modelo', 'objeto_id'), name='cambio_registro_unico')],
+            },
+        ),
+    ]
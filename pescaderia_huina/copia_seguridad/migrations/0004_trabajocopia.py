@@ -0,0 +1,40 @@
+# Generated migration - Trabajos de copia y restauración en segundo plano
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('copia_seguridad', '0003_copias_incrementales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoCopia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operacion', models.CharField(choices=[('CREAR', 'Crear copia'), ('RESTAURAR', 'Restaurar copia')], max_length=20, verbose_name='Operación')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('LISTO', 'Listo'), ('ERROR', 'Error')], default='PENDIENTE', max_length=20)),
+                ('etapa', models.CharField(blank=True, max_length=100, verbose_name='Etapa Actual')),
+                ('registros_procesados', models.PositiveIntegerField(default=0, verbose_name='Registros Procesados')),
+                ('registros_totales', models.PositiveIntegerField(default=0, verbose_name='Registros Totales')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Solicitud')),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('copia', models.ForeignKey(blank=True, help_text='La copia a restaurar, o la creada cuando el trabajo termina', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos', to='copia_seguridad.copiaseguridadbd', verbose_name='Copia')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_copia', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Copia',
+                'verbose_name_plural': 'Trabajos de Copia',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='copia_trabajo_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated migration - Conteo y tamaño de las copias antiguas en JSON
+
+import json
+
+from django.db import migrations
+
+
+def calcular_metadatos(apps, schema_editor):
+    """
+    Las copias en JSON se crearon sin total_registros ni tamaño_bytes: la
+    lista tendría que leer datos_backup para mostrarlos. Se calculan una
+    vez, leyendo las copias de a una.
+    """
+    CopiaSeguridadBD = apps.get_model('copia_seguridad', 'CopiaSeguridadBD')
+    pendientes = CopiaSeguridadBD.objects.filter(formato='JSON', tamaño_bytes=0).values_list('pk', flat=True)
+    for pk in list(pendientes):
+        datos = CopiaSeguridadBD.objects.filter(pk=pk).values_list('datos_backup', flat=True).first() or {}
+        modelos = {
+            clave: {'registros': len(lista)}
+            for clave, lista in datos.items()
+            if 'error' not in clave and isinstance(lista, list)
+        }
+        CopiaSeguridadBD.objects.filter(pk=pk).update(
+            modelos=modelos,
+            total_registros=sum(valor['registros'] for valor in modelos.values()),
+            tamaño_bytes=len(json.dumps(datos).encode('utf-8')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copia_seguridad', '0004_trabajocopia'),
+    ]
+
+    operations = [
+        migrations.RunPython(calcular_metadatos, migrations.RunPython.noop),
+    ]
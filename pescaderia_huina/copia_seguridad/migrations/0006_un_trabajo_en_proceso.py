@@ -0,0 +1,35 @@
+# Generated migration - Un solo trabajo de copia en proceso a la vez
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def cerrar_trabajos_duplicados(apps, schema_editor):
+    """Si quedaron varios trabajos en proceso, solo el más reciente puede seguir vivo."""
+    TrabajoCopia = apps.get_model('copia_seguridad', 'TrabajoCopia')
+    en_proceso = TrabajoCopia.objects.filter(estado='PROCESANDO').order_by('-fecha_inicio', '-pk')
+    sobrantes = list(en_proceso.values_list('pk', flat=True)[1:])
+    TrabajoCopia.objects.filter(pk__in=sobrantes).update(
+        estado='ERROR',
+        error='El proceso que ejecutaba el trabajo terminó sin completarlo',
+        fecha_fin=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copia_seguridad', '0005_metadatos_copias_json'),
+    ]
+
+    operations = [
+        migrations.RunPython(cerrar_trabajos_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='trabajocopia',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('estado', 'PROCESANDO')),
+                fields=('estado',),
+                name='copia_un_trabajo_en_proceso',
+            ),
+        ),
+    ]
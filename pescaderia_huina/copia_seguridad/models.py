@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
@@ -34,6 +35,69 @@ class CopiaSeguridadBD(models.Model):
         blank=True,
         verbose_name='Tamaño Estimado'
     )
+    # JSON: copias antiguas, todo en datos_backup.
+    # NDJSON_GZ: registros en FragmentoCopia (copia_seguridad.motor).
+    FORMATO_JSON = 'JSON'
+    FORMATO_NDJSON_GZ = 'NDJSON_GZ'
+    FORMATOS = [
+        (FORMATO_JSON, 'JSON en la fila'),
+        (FORMATO_NDJSON_GZ, 'NDJSON comprimido por fragmentos'),
+    ]
+    formato = models.CharField(
+        max_length=20,
+        choices=FORMATOS,
+        default=FORMATO_JSON,
+        verbose_name='Formato'
+    )
+    modelos = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Registros por Modelo',
+        help_text='{"app.Modelo": {"registros": N, "sha256": "..."}}'
+    )
+    total_registros = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Total de Registros'
+    )
+    tamaño_bytes = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Tamaño Comprimido (bytes)'
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='SHA-256 del Archivo'
+    )
+    # COMPLETA: todos los datos. INCREMENTAL: cambios desde la copia anterior.
+    # DIFERENCIAL: cambios desde la última copia completa.
+    COMPLETA = 'COMPLETA'
+    INCREMENTAL = 'INCREMENTAL'
+    DIFERENCIAL = 'DIFERENCIAL'
+    TIPOS = [
+        (COMPLETA, 'Completa'),
+        (INCREMENTAL, 'Incremental'),
+        (DIFERENCIAL, 'Diferencial'),
+    ]
+    tipo = models.CharField(
+        max_length=20,
+        choices=TIPOS,
+        default=COMPLETA,
+        verbose_name='Tipo de Copia'
+    )
+    base = models.ForeignKey(
+        'self',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='dependientes',
+        verbose_name='Copia Base'
+    )
+    marca_agua = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Datos hasta',
+        help_text='Instante en que empezó la lectura; la siguiente copia incremental parte de aquí'
+    )
     
     class Meta:
         ordering = ['-fecha_creacion']
@@ -42,3 +106,145 @@ class CopiaSeguridadBD(models.Model):
     
     def __str__(self):
         return f"{self.nombre} - {self.fecha_creacion.strftime('%Y-%m-%d %H:%M')}"
+
+
+class FragmentoCopia(models.Model):
+    """
+    Trozo del archivo NDJSON comprimido de una copia. El archivo se escribe
+    y se lee de a un fragmento: ni la copia ni la restauración necesitan
+    tenerlo entero en memoria.
+    """
+    copia = models.ForeignKey(
+        CopiaSeguridadBD,
+        on_delete=models.CASCADE,
+        related_name='fragmentos',
+        verbose_name='Copia'
+    )
+    numero = models.PositiveIntegerField(verbose_name='Número')
+    datos = models.BinaryField(verbose_name='Datos')
+
+    class Meta:
+        ordering = ['copia', 'numero']
+        verbose_name = 'Fragmento de Copia'
+        verbose_name_plural = 'Fragmentos de Copia'
+        constraints = [
+            models.UniqueConstraint(fields=['copia', 'numero'], name='copia_fragmento_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.copia_id} #{self.numero}"
+
+
+class CambioRegistro(models.Model):
+    """
+    Diario de cambios para las copias incrementales: última vez que se
+    guardó o eliminó cada registro de los modelos respaldados. Una copia
+    incremental toma los registros anotados después de la marca de agua de
+    su base; los que ya no existen van como borrados.
+    """
+    modelo = models.CharField(max_length=100, verbose_name='Modelo')
+    objeto_id = models.CharField(max_length=64, verbose_name='ID del Registro')
+    fecha = models.DateTimeField(db_index=True, verbose_name='Último Cambio')
+
+    class Meta:
+        verbose_name = 'Cambio de Registro'
+        verbose_name_plural = 'Cambios de Registros'
+        constraints = [
+            models.UniqueConstraint(fields=['modelo', 'objeto_id'], name='cambio_registro_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['modelo', 'fecha'], name='cambio_modelo_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id}"
+
+
+class TrabajoCopia(models.Model):
+    """
+    Creación o restauración de una copia en segundo plano.
+    La vista solo encola el trabajo; el comando `procesar_copias` lo toma,
+    ejecuta el motor y va dejando el avance para que la lista lo consulte.
+    """
+    CREAR = 'CREAR'
+    RESTAURAR = 'RESTAURAR'
+    OPERACIONES = [
+        (CREAR, 'Crear copia'),
+        (RESTAURAR, 'Restaurar copia'),
+    ]
+
+    PENDIENTE = 'PENDIENTE'
+    PROCESANDO = 'PROCESANDO'
+    LISTO = 'LISTO'
+    ERROR = 'ERROR'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (LISTO, 'Listo'),
+        (ERROR, 'Error'),
+    ]
+
+    operacion = models.CharField(max_length=20, choices=OPERACIONES, verbose_name='Operación')
+    # CREAR: {"nombre", "descripcion", "tipo"}
+    parametros = models.JSONField(default=dict, blank=True, verbose_name='Parámetros')
+    copia = models.ForeignKey(
+        CopiaSeguridadBD,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='trabajos',
+        verbose_name='Copia',
+        help_text='La copia a restaurar, o la creada cuando el trabajo termina'
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='trabajos_copia',
+        verbose_name='Solicitado por',
+    )
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    etapa = models.CharField(max_length=100, blank=True, verbose_name='Etapa Actual')
+    registros_procesados = models.PositiveIntegerField(default=0, verbose_name='Registros Procesados')
+    registros_totales = models.PositiveIntegerField(default=0, verbose_name='Registros Totales')
+    error = models.TextField(blank=True, verbose_name='Error')
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Solicitud')
+    fecha_inicio = models.DateTimeField(null=True, blank=True, verbose_name='Inicio')
+    fecha_fin = models.DateTimeField(null=True, blank=True, verbose_name='Fin')
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name = 'Trabajo de Copia'
+        verbose_name_plural = 'Trabajos de Copia'
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='copia_trabajo_estado_idx'),
+        ]
+        constraints = [
+            # Un solo trabajo en proceso a la vez (copia_seguridad.trabajos)
+            models.UniqueConstraint(
+                fields=['estado'],
+                condition=models.Q(estado='PROCESANDO'),
+                name='copia_un_trabajo_en_proceso',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_operacion_display()} #{self.pk} ({self.estado})"
+
+    @property
+    def progreso(self):
+        """Porcentaje de avance (0-100)."""
+        if self.estado == self.LISTO:
+            return 100
+        if not self.registros_totales:
+            return 0
+        return min(99, int(self.registros_procesados * 100 / self.registros_totales))
+
+    @property
+    def registros_por_segundo(self):
+        if not self.fecha_inicio or not self.registros_procesados:
+            return 0
+        fin = self.fecha_fin or timezone.now()
+        segundos = max((fin - self.fecha_inicio).total_seconds(), 0.001)
+        return round(self.registros_procesados / segundos)
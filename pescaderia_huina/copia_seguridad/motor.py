@@ -0,0 +1,647 @@
+"""
+Motor de copias de seguridad: NDJSON comprimido, escrito y leído en streaming.
+
+Antes, una copia serializaba cada modelo a un string JSON, lo volvía a
+cargar con json.loads y guardaba todo en una sola fila (datos_backup): tres
+copias de la BD en memoria y una escritura gigante. Ahora:
+
+- Cada modelo se recorre con .iterator() en lotes de FILAS_POR_LOTE y cada
+  registro se escribe como una línea JSON (formato del serializador
+  'python' de Django: {"model", "pk", "fields"}).
+- Las líneas pasan por gzip y el resultado se corta en fragmentos de
+  TAMAÑO_FRAGMENTO que se guardan en FragmentoCopia a medida que se llenan.
+- En CopiaSeguridadBD quedan, por modelo, la cantidad de registros y el
+  SHA-256 de sus líneas, más el total, el tamaño comprimido y el SHA-256
+  del archivo completo. `verificar(copia)` los vuelve a calcular.
+
+La memoria usada depende del tamaño del lote y del fragmento, no de cuántas
+ventas haya. La lectura (`registros(copia)`) también va de a un fragmento y
+entiende las copias antiguas en formato JSON.
+
+En PostgreSQL .iterator() usa cursores del lado del servidor; la copia se
+hace dentro de una transacción, así que funcionan también detrás del pooler.
+
+`restaurar(copia)` carga los registros en orden de dependencias, por lotes
+(un INSERT ... ON CONFLICT DO UPDATE por lote en vez de un save() por fila) y en una sola transacción: o se restaura
+toda la copia o nada. La carga por lotes no dispara señales, así que al final se
+reconstruye lo que ellas mantienen (libro de stock, resumen de ventas,
+versiones de datos, índices y caches en memoria).
+
+Copias incrementales y diferenciales: en vez de todas las filas guardan las
+que el diario de cambios (`diario`) anotó desde la marca de agua de su
+base (la última copia, o la última completa en las diferenciales), más una
+línea {"model", "pk", "borrado": true} por cada registro eliminado. Los
+borrados van primero, en orden inverso de dependencias. Los modelos
+derivados (MODELOS_DERIVADOS) no entran: se reconstruyen al restaurar.
+`restaurar` aplica la cadena completa, de la copia completa hasta la
+pedida, en una sola transacción.
+
+`crear_copia` y `restaurar` aceptan `progreso(procesados, total, etapa)`,
+que se llama al empezar cada modelo y cada FILAS_POR_LOTE registros; lo
+usan los trabajos en segundo plano (`trabajos`) y el comando `crear_copia`.
+"""
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import time
+from collections import namedtuple
+from itertools import groupby, islice
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from . import diario
+from .models import CopiaSeguridadBD, FragmentoCopia
+
+
+# Apps respaldadas (se excluyen las del sistema de Django)
+APPS_RESPALDO = ['usuarios', 'productos', 'proveedores', 'ventas', 'pedidos']
+
+FILAS_POR_LOTE = 2000
+
+TAMAÑO_FRAGMENTO = 1024 * 1024
+
+NIVEL_COMPRESION = 6
+
+FORMATO_ARCHIVO = 'pescaderia-ndjson'
+VERSION_ARCHIVO = 1
+
+# Se recalculan a partir de los demás al restaurar; las incrementales no los llevan
+MODELOS_DERIVADOS = ['productos.StockProducto', 'ventas.ResumenVentaDiaria', 'ventas.ResumenProductoDiario']
+
+
+class ErrorCopia(Exception):
+    """La copia no se pudo crear (p. ej. una incremental sin copia base)."""
+
+
+def tamaño_base_datos():
+    """Tamaño de la base de datos según PostgreSQL, como texto legible."""
+    if connection.vendor != 'postgresql':
+        return "Desconocido (SQLite)"
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_size_pretty(pg_database_size(current_database()))")
+            result = cursor.fetchone()
+            return result[0] if result else "Desconocido"
+    except DatabaseError:
+        return "Desconocido"
+
+
+def ordenar_por_dependencias(modelos):
+    """
+    Ordena los modelos para que cada uno vaya después de aquellos a los que
+    apunta con ForeignKey/OneToOne (dentro del mismo conjunto). Si hubiera un
+    ciclo, los modelos del ciclo quedan al final en su orden original.
+    """
+    pendientes = list(modelos)
+    incluidos = set(pendientes)
+    dependencias = {
+        modelo: {
+            campo.related_model._meta.concrete_model
+            for campo in modelo._meta.concrete_fields
+            if campo.is_relation and campo.related_model is not None
+            and campo.related_model._meta.concrete_model in incluidos
+            and campo.related_model._meta.concrete_model is not modelo
+        }
+        for modelo in pendientes
+    }
+    ordenados = []
+    colocados = set()
+    while pendientes:
+        listos = [modelo for modelo in pendientes if dependencias[modelo] <= colocados]
+        if not listos:
+            ordenados.extend(pendientes)
+            break
+        for modelo in listos:
+            ordenados.append(modelo)
+            colocados.add(modelo)
+        pendientes = [modelo for modelo in pendientes if modelo not in colocados]
+    return ordenados
+
+
+def modelos_respaldo():
+    """Modelos de APPS_RESPALDO con tabla propia, en orden de dependencias."""
+    modelos = [
+        modelo
+        for app in APPS_RESPALDO
+        for modelo in apps.get_app_config(app).get_models()
+        if modelo._meta.managed and not modelo._meta.proxy
+    ]
+    return ordenar_por_dependencias(modelos)
+
+
+def modelos_incrementales():
+    """Modelos que llevan diario de cambios y entran en las copias incrementales."""
+    return [modelo for modelo in modelos_respaldo() if modelo._meta.label not in MODELOS_DERIVADOS]
+
+
+def cadena(copia):
+    """Copias a aplicar para restaurar `copia`: la completa y luego cada eslabón hasta ella."""
+    eslabones = [copia]
+    while eslabones[-1].base_id:
+        eslabones.append(eslabones[-1].base)
+    return eslabones[::-1]
+
+
+def copia_base(tipo):
+    """
+    Base de una copia nueva: la última copia (incremental) o la última
+    completa (diferencial). Solo sirven las que tienen marca de agua y cuyos
+    cambios posteriores siguen en el diario (no anteriores a lo podado).
+    """
+    copias = CopiaSeguridadBD.objects.filter(
+        formato=CopiaSeguridadBD.FORMATO_NDJSON_GZ, marca_agua__isnull=False
+    )
+    podado = diario.horizonte()
+    if podado is not None:
+        copias = copias.filter(marca_agua__gte=podado + diario.MARGEN)
+    if tipo == CopiaSeguridadBD.DIFERENCIAL:
+        copias = copias.filter(tipo=CopiaSeguridadBD.COMPLETA)
+    return copias.order_by('-marca_agua').first()
+
+
+# ==================== ESCRITURA ====================
+
+class _EscritorFragmentos(io.RawIOBase):
+    """Archivo de solo escritura que guarda lo recibido en FragmentoCopia."""
+
+    def __init__(self, copia):
+        self.copia = copia
+        self.numero = 0
+        self.tamaño = 0
+        self.sha256 = hashlib.sha256()
+        self._pendiente = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._pendiente += datos
+        self.sha256.update(datos)
+        self.tamaño += len(datos)
+        while len(self._pendiente) >= TAMAÑO_FRAGMENTO:
+            self._guardar(bytes(self._pendiente[:TAMAÑO_FRAGMENTO]))
+            del self._pendiente[:TAMAÑO_FRAGMENTO]
+        return len(datos)
+
+    def _guardar(self, datos):
+        FragmentoCopia.objects.create(copia=self.copia, numero=self.numero, datos=datos)
+        self.numero += 1
+
+    def close(self):
+        if not self.closed and self._pendiente:
+            self._guardar(bytes(self._pendiente))
+            self._pendiente.clear()
+        super().close()
+
+
+class _Codificador(DjangoJSONEncoder):
+    """DjangoJSONEncoder recorta fechas y horas a milisegundos; la copia las guarda completas."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _linea(registro):
+    return (json.dumps(registro, cls=_Codificador, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def _lineas_modelo(modelo):
+    """Líneas NDJSON de un modelo, en orden de pk, serializadas por lotes."""
+    serializador = serializers.get_serializer('python')()
+    filas = modelo._default_manager.order_by('pk').iterator(chunk_size=FILAS_POR_LOTE)
+    while True:
+        lote = list(islice(filas, FILAS_POR_LOTE))
+        if not lote:
+            return
+        for registro in serializador.serialize(lote):
+            yield _linea(registro)
+
+
+def _lineas_cambios(modelo, ids):
+    """Líneas NDJSON de los registros `ids` de un modelo que todavía existen."""
+    serializador = serializers.get_serializer('python')()
+    for inicio in range(0, len(ids), FILAS_POR_LOTE):
+        lote = modelo._default_manager.filter(pk__in=ids[inicio:inicio + FILAS_POR_LOTE]).order_by('pk')
+        for registro in serializador.serialize(lote):
+            yield _linea(registro)
+
+
+def _borrados(modelo, ids):
+    """Los `ids` que ya no existen en la tabla del modelo."""
+    existentes = set()
+    for inicio in range(0, len(ids), FILAS_POR_LOTE):
+        existentes.update(
+            modelo._default_manager.filter(pk__in=ids[inicio:inicio + FILAS_POR_LOTE]).values_list('pk', flat=True)
+        )
+    return [objeto_id for objeto_id in ids if objeto_id not in existentes]
+
+
+def _aislar_lectura():
+    """
+    En PostgreSQL la copia lee con REPEATABLE READ: todas las consultas ven
+    la misma foto de la BD. Debe ser lo primero de la transacción.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+
+
+def crear_copia(nombre, descripcion='', tipo=CopiaSeguridadBD.COMPLETA, progreso=None):
+    """
+    Crea una copia de APPS_RESPALDO del `tipo` pedido. Retorna la
+    CopiaSeguridadBD. Con `progreso` se cuentan antes los registros de cada
+    modelo para poder dar el total. Las incrementales y diferenciales lanzan ErrorCopia si
+    no hay copia base o si se restauró algo después de ella (la restauración
+    no pasa por el diario).
+    """
+    base = None
+    if tipo != CopiaSeguridadBD.COMPLETA:
+        base = copia_base(tipo)
+        if base is None:
+            raise ErrorCopia(
+                'No hay una copia completa reciente en la cual basar la copia '
+                '(o su historial de cambios ya se podó); cree primero una completa'
+            )
+        if CopiaSeguridadBD.objects.filter(fecha_restauracion__gte=base.marca_agua).exists():
+            raise ErrorCopia(f'Se restauró una copia después de "{base.nombre}"; cree primero una copia completa')
+        modelos = modelos_incrementales()
+        desde = base.marca_agua - diario.MARGEN
+    else:
+        modelos = modelos_respaldo()
+
+    transaccion_propia = not connection.in_atomic_block
+    with transaction.atomic():
+        if transaccion_propia:
+            _aislar_lectura()
+        marca_agua = timezone.now()
+        copia = CopiaSeguridadBD.objects.create(
+            nombre=nombre,
+            descripcion=descripcion,
+            formato=CopiaSeguridadBD.FORMATO_NDJSON_GZ,
+            tipo=tipo,
+            base=base,
+            marca_agua=marca_agua,
+            tamaño_estimado=tamaño_base_datos(),
+        )
+        resumen = {modelo._meta.label: {'registros': 0, 'sha256': hashlib.sha256()} for modelo in modelos}
+        escritor = _EscritorFragmentos(copia)
+        with gzip.GzipFile(fileobj=escritor, mode='wb', compresslevel=NIVEL_COMPRESION, mtime=0) as archivo:
+            archivo.write(_linea({
+                'formato': FORMATO_ARCHIVO,
+                'version': VERSION_ARCHIVO,
+                'tipo': tipo,
+                'base': base.sha256 if base else None,
+                'modelos': [modelo._meta.label_lower for modelo in modelos],
+            }))
+            if base is None:
+                lineas = ((modelo, _lineas_modelo(modelo)) for modelo in modelos)
+                total = sum(modelo._default_manager.count() for modelo in modelos) if progreso else 0
+            else:
+                cambiados = {modelo: diario.ids_cambiados(modelo, desde) for modelo in modelos}
+                total = sum(len(ids) for ids in cambiados.values())
+                for modelo in reversed(modelos):
+                    datos = resumen[modelo._meta.label]
+                    borrados = _borrados(modelo, cambiados[modelo])
+                    for objeto_id in borrados:
+                        linea = _linea({'model': modelo._meta.label_lower, 'pk': objeto_id, 'borrado': True})
+                        archivo.write(linea)
+                        datos['sha256'].update(linea)
+                    datos['borrados'] = len(borrados)
+                lineas = ((modelo, _lineas_cambios(modelo, ids)) for modelo, ids in cambiados.items())
+            procesados = 0
+            for modelo, generador in lineas:
+                datos = resumen[modelo._meta.label]
+                if progreso:
+                    progreso(procesados, total, modelo._meta.label)
+                for linea in generador:
+                    archivo.write(linea)
+                    datos['sha256'].update(linea)
+                    datos['registros'] += 1
+                    procesados += 1
+                    if progreso and procesados % FILAS_POR_LOTE == 0:
+                        progreso(procesados, total, modelo._meta.label)
+        escritor.close()
+
+        for datos in resumen.values():
+            datos['sha256'] = datos['sha256'].hexdigest()
+        copia.modelos = resumen
+        copia.total_registros = sum(datos['registros'] + datos.get('borrados', 0) for datos in resumen.values())
+        copia.tamaño_bytes = escritor.tamaño
+        copia.sha256 = escritor.sha256.hexdigest()
+        copia.save(update_fields=['modelos', 'total_registros', 'tamaño_bytes', 'sha256'])
+
+    # Cualquier copia que quede puede volver a ser base (p. ej. si se elimina
+    # la última completa): se poda solo hasta la más antigua
+    mas_antigua = CopiaSeguridadBD.objects.filter(
+        formato=CopiaSeguridadBD.FORMATO_NDJSON_GZ, marca_agua__isnull=False
+    ).order_by('marca_agua').values_list('marca_agua', flat=True).first()
+    if mas_antigua is not None:
+        diario.podar(mas_antigua - diario.MARGEN)
+    return copia
+
+
+def eliminar(copia):
+    """
+    Elimina una copia y su archivo. FragmentoCopia no tiene señales ni
+    relaciones que lo referencien, así que Django borra los fragmentos con un
+    solo DELETE, sin cargarlos en memoria.
+    """
+    with transaction.atomic():
+        FragmentoCopia.objects.filter(copia_id=copia.pk).delete()
+        copia.delete()
+
+
+# ==================== LECTURA ====================
+
+class _LectorFragmentos(io.RawIOBase):
+    """Archivo de solo lectura que trae de la BD un fragmento a la vez."""
+
+    def __init__(self, copia):
+        self.copia_id = copia.pk
+        self.numero = 0
+        self._actual = b''
+        self._posicion = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while self._posicion >= len(self._actual):
+            datos = FragmentoCopia.objects.filter(
+                copia_id=self.copia_id, numero=self.numero
+            ).values_list('datos', flat=True).first()
+            if datos is None:
+                return 0
+            self._actual = bytes(datos)
+            self._posicion = 0
+            self.numero += 1
+        cantidad = min(len(destino), len(self._actual) - self._posicion)
+        destino[:cantidad] = self._actual[self._posicion:self._posicion + cantidad]
+        self._posicion += cantidad
+        return cantidad
+
+
+def _lineas_archivo(copia):
+    """Líneas (bytes) del archivo de una copia NDJSON, sin la cabecera."""
+    lector = io.BufferedReader(_LectorFragmentos(copia), buffer_size=TAMAÑO_FRAGMENTO)
+    with gzip.GzipFile(fileobj=lector, mode='rb') as archivo:
+        cabecera = json.loads(archivo.readline() or b'{}')
+        if cabecera.get('formato') != FORMATO_ARCHIVO:
+            raise ValueError('El archivo de la copia no tiene el formato esperado')
+        yield from archivo
+
+
+def registros(copia):
+    """
+    Registros de una copia en el formato del serializador 'python'
+    ({"model", "pk", "fields"}), uno a la vez y en orden de dependencias.
+    """
+    for registro, _ in _leer(copia):
+        yield registro
+
+
+def _leer(copia):
+    """(registro, línea) de una copia; la línea es None en las copias JSON."""
+    if copia.formato == CopiaSeguridadBD.FORMATO_JSON:
+        # Las copias antiguas guardaban los modelos en cualquier orden
+        orden = {modelo._meta.label: posicion for posicion, modelo in enumerate(modelos_respaldo())}
+        claves = sorted(
+            (clave for clave, lista in copia.datos_backup.items()
+             if 'error' not in clave and isinstance(lista, list)),
+            key=lambda clave: orden.get(clave, len(orden)),
+        )
+        for clave in claves:
+            for registro in copia.datos_backup[clave]:
+                yield registro, None
+        return
+    for linea in _lineas_archivo(copia):
+        yield json.loads(linea), linea
+
+
+def fragmentos(copia):
+    """Bytes del archivo comprimido de una copia NDJSON, un fragmento a la vez (para descargarlo)."""
+    consulta = FragmentoCopia.objects.filter(copia_id=copia.pk).order_by('numero').values_list('datos', flat=True)
+    for datos in consulta.iterator(chunk_size=1):
+        yield bytes(datos)
+
+
+def archivo_json(copia):
+    """Contenido de una copia antigua (JSON) como un archivo, de a un modelo."""
+    copia = CopiaSeguridadBD.objects.only('datos_backup').get(pk=copia.pk)
+    yield b'{'
+    for posicion, (clave, valor) in enumerate(copia.datos_backup.items()):
+        separador = ',' if posicion else ''
+        yield f'{separador}{json.dumps(clave)}:{json.dumps(valor, cls=_Codificador, ensure_ascii=False)}'.encode('utf-8')
+    yield b'}'
+
+
+def verificar(copia):
+    """
+    Relee el archivo y compara registros y SHA-256 por modelo y del archivo
+    completo con los guardados. Retorna la lista de diferencias (vacía si
+    la copia está íntegra).
+    """
+    if copia.formato != CopiaSeguridadBD.FORMATO_NDJSON_GZ:
+        return []
+    problemas = []
+
+    sha256 = hashlib.sha256()
+    for datos in fragmentos(copia):
+        sha256.update(datos)
+    if sha256.hexdigest() != copia.sha256:
+        problemas.append('El SHA-256 del archivo no coincide')
+        return problemas
+
+    calculado = {}
+    for linea in _lineas_archivo(copia):
+        registro = json.loads(linea)
+        etiqueta = apps.get_model(registro['model'])._meta.label
+        datos = calculado.setdefault(etiqueta, {'registros': 0, 'borrados': 0, 'sha256': hashlib.sha256()})
+        datos['borrados' if registro.get('borrado') else 'registros'] += 1
+        datos['sha256'].update(linea)
+    for etiqueta, esperado in copia.modelos.items():
+        datos = calculado.get(etiqueta, {'registros': 0, 'borrados': 0, 'sha256': hashlib.sha256()})
+        if datos['registros'] != esperado['registros']:
+            problemas.append(f"{etiqueta}: {datos['registros']} registros, se esperaban {esperado['registros']}")
+        elif datos['borrados'] != esperado.get('borrados', 0):
+            problemas.append(f"{etiqueta}: {datos['borrados']} borrados, se esperaban {esperado.get('borrados', 0)}")
+        elif datos['sha256'].hexdigest() != esperado['sha256']:
+            problemas.append(f"{etiqueta}: el SHA-256 no coincide")
+    return problemas
+
+
+# ==================== RESTAURACIÓN ====================
+
+ResultadoRestauracion = namedtuple('ResultadoRestauracion', ['registros', 'segundos', 'por_modelo'])
+
+
+class ErrorRestauracion(Exception):
+    """La copia no se pudo restaurar; no se cambió nada."""
+
+
+def _cargar_lote(modelo, registros):
+    """
+    INSERT ... ON CONFLICT (pk) DO UPDATE de un lote de registros de un
+    modelo. Es lo que hace bulk_create(update_conflicts=True), pero en modo
+    raw como loaddata: los auto_now/auto_now_add conservan las fechas de la
+    copia en vez de tomar la hora de la restauración.
+    """
+    objetos = [
+        deserializado.object
+        for deserializado in serializers.deserialize('python', registros, ignorenonexistent=True)
+    ]
+    opciones = modelo._meta
+    campos = list(opciones.concrete_fields)
+    actualizar = [campo for campo in campos if not campo.primary_key]
+    manager = modelo._default_manager
+    tamaño = max(connection.ops.bulk_batch_size(campos, objetos), 1)
+    for inicio in range(0, len(objetos), tamaño):
+        manager._insert(
+            objetos[inicio:inicio + tamaño],
+            fields=campos,
+            on_conflict=OnConflict.UPDATE if actualizar else OnConflict.IGNORE,
+            update_fields=actualizar or None,
+            unique_fields=[opciones.pk] if actualizar else None,
+            raw=True,
+        )
+    return len(objetos)
+
+
+def _reiniciar_secuencias(modelos):
+    """Lleva los autoincrementales de PostgreSQL más allá de los ids restaurados."""
+    sentencias = connection.ops.sequence_reset_sql(no_style(), modelos)
+    if sentencias:
+        with connection.cursor() as cursor:
+            for sentencia in sentencias:
+                cursor.execute(sentencia)
+
+
+def _reconstruir_derivados():
+    """Rehace lo que mantienen las señales que la carga por lotes no dispara."""
+    from core import busqueda, cache_compartido, versiones
+    from productos import catalogo, stock
+    from ventas import resumen
+
+    stock.sincronizar_stock()
+    stock.invalidar_cache_stock()
+    resumen.reconstruir_resumen()
+    # La nueva versión hace que los demás procesos descarten índices y catálogo
+    versiones.registrar_cambio(*versiones.MODELOS_POR_GRUPO)
+
+    def limpiar_este_proceso():
+        busqueda.limpiar_indices()
+        catalogo.limpiar()
+        cache_compartido.limpiar_local()
+    transaction.on_commit(limpiar_este_proceso)
+
+
+def _aplicar(copia, por_modelo, modelos, progreso=None):
+    """
+    Aplica una copia (un eslabón de la cadena): elimina sus borrados y carga
+    sus registros por lotes, comprobando conteos y SHA-256 por modelo.
+    Acumula en `por_modelo` los registros cargados. Retorna cuántas líneas
+    aplicó. `progreso(aplicadas, etapa)` se llama después de cada lote.
+    """
+    cargados = {}
+    borrados = {}
+    sumas = {}
+    clave = lambda par: (par[0]['model'], bool(par[0].get('borrado')))
+    for (etiqueta, es_borrado), grupo in groupby(_leer(copia), key=clave):
+        modelo = apps.get_model(etiqueta)
+        if modelo not in modelos:
+            modelos.append(modelo)
+        sha256 = sumas.setdefault(modelo._meta.label, hashlib.sha256())
+        contador = borrados if es_borrado else cargados
+        while True:
+            lote = list(islice(grupo, FILAS_POR_LOTE))
+            if not lote:
+                break
+            for _, linea in lote:
+                if linea is not None:
+                    sha256.update(linea)
+            if es_borrado:
+                # delete() y no un DELETE directo: así caen también sus dependientes en cascada
+                modelo._default_manager.filter(pk__in=[registro['pk'] for registro, _ in lote]).delete()
+                cantidad = len(lote)
+            else:
+                cantidad = _cargar_lote(modelo, [registro for registro, _ in lote])
+            contador[modelo._meta.label] = contador.get(modelo._meta.label, 0) + cantidad
+            if progreso:
+                progreso(sum(cargados.values()) + sum(borrados.values()), modelo._meta.label)
+
+    if copia.formato == CopiaSeguridadBD.FORMATO_NDJSON_GZ:
+        for etiqueta, esperado in copia.modelos.items():
+            if cargados.get(etiqueta, 0) != esperado['registros']:
+                raise ErrorRestauracion(
+                    f"{copia.nombre} - {etiqueta}: {cargados.get(etiqueta, 0)} registros, se esperaban {esperado['registros']}"
+                )
+            if borrados.get(etiqueta, 0) != esperado.get('borrados', 0):
+                raise ErrorRestauracion(
+                    f"{copia.nombre} - {etiqueta}: {borrados.get(etiqueta, 0)} borrados, se esperaban {esperado.get('borrados', 0)}"
+                )
+            if (esperado['registros'] or esperado.get('borrados')) and sumas[etiqueta].hexdigest() != esperado['sha256']:
+                raise ErrorRestauracion(f"{copia.nombre} - {etiqueta}: el SHA-256 no coincide")
+
+    for etiqueta, cantidad in cargados.items():
+        por_modelo[etiqueta] = por_modelo.get(etiqueta, 0) + cantidad
+    return sum(cargados.values()) + sum(borrados.values())
+
+
+def _total_lineas(copia):
+    if copia.formato == CopiaSeguridadBD.FORMATO_NDJSON_GZ:
+        return copia.total_registros
+    return sum(
+        len(lista) for clave, lista in copia.datos_backup.items()
+        if 'error' not in clave and isinstance(lista, list)
+    )
+
+
+def restaurar(copia, progreso=None):
+    """
+    Restaura una copia (de cualquier formato y tipo) en una sola
+    transacción; las incrementales y diferenciales aplican antes su cadena
+    desde la copia completa. Los registros existentes con el mismo id se
+    sobrescriben; los que no están en la copia se conservan, salvo los que
+    la cadena marca como borrados. Si algo falla, o los conteos y SHA-256
+    por modelo no coinciden con los de la copia, lanza ErrorRestauracion.
+    """
+    inicio = time.perf_counter()
+    por_modelo = {}
+    modelos = []
+    total = 0
+
+    try:
+        with transaction.atomic():
+            eslabones = cadena(copia)
+            total_lineas = sum(_total_lineas(eslabon) for eslabon in eslabones) if progreso else 0
+            for eslabon in eslabones:
+                avance = None
+                if progreso:
+                    avance = lambda aplicadas, etapa, previas=total: progreso(previas + aplicadas, total_lineas, etapa)
+                total += _aplicar(eslabon, por_modelo, modelos, avance)
+
+            if progreso:
+                progreso(total, total_lineas, 'Reconstruyendo stock y resúmenes')
+
+            _reiniciar_secuencias(modelos)
+            _reconstruir_derivados()
+
+            # Marca la restauración: las incrementales no pueden basarse en copias anteriores a ella
+            copia.fecha_restauracion = timezone.now()
+            copia.save(update_fields=['fecha_restauracion'])
+    except ErrorRestauracion:
+        raise
+    except Exception as e:
+        raise ErrorRestauracion(str(e) or e.__class__.__name__) from e
+
+    return ResultadoRestauracion(total, time.perf_counter() - inicio, por_modelo)
@@ -1,3 +1,573 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from pedidos.models import DetallePedido, Pedido
+from productos.models import Producto, StockProducto
+from proveedores.models import Proveedor
+from ventas.models import Venta, VentaItem
+
+from . import motor, trabajos
+from .models import CambioRegistro, CopiaSeguridadBD, FragmentoCopia, TrabajoCopia
+
+
+class MotorCopiasTests(TestCase):
+    """Motor de copias: NDJSON comprimido por fragmentos, con conteos y SHA-256"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='admin', password='Clave12345')
+        self.proveedor = Proveedor.objects.create(
+            nit='5555555555',
+            nombre_contacto='Proveedor Copias',
+            correo='copias@example.com',
+            telefono='3005555555',
+            ciudad='Bogotá',
+        )
+        self.producto = Producto.objects.create(
+            proveedor=self.proveedor,
+            tipo_producto='PE',
+            nombre='Róbalo',
+            precio=30000,
+            tipo_presentacion='LIB',
+        )
+        pedido = Pedido.objects.create(proveedor=self.proveedor)
+        DetallePedido.objects.create(pedido=pedido, producto=self.producto, cantidad=Decimal('8'), precio_unitario=1000)
+        for _ in range(3):
+            venta = Venta.objects.create(estado='COMPLETADA')
+            VentaItem.objects.create(venta=venta, producto=self.producto, cantidad=Decimal('1.5'), precio_unitario=30000)
+
+    def test_orden_de_dependencias(self):
+        orden = [modelo.__name__ for modelo in motor.modelos_respaldo()]
+        self.assertLess(orden.index('Proveedor'), orden.index('Producto'))
+        self.assertLess(orden.index('Producto'), orden.index('StockProducto'))
+        self.assertLess(orden.index('Venta'), orden.index('VentaItem'))
+        self.assertLess(orden.index('Producto'), orden.index('VentaItem'))
+        self.assertLess(orden.index('Pedido'), orden.index('DetallePedido'))
+
+    def test_copia_registra_conteos_y_se_relee(self):
+        copia = motor.crear_copia('Prueba')
+
+        self.assertEqual(copia.formato, CopiaSeguridadBD.FORMATO_NDJSON_GZ)
+        self.assertEqual(copia.datos_backup, {})
+        self.assertEqual(copia.modelos['ventas.Venta']['registros'], 3)
+        self.assertEqual(copia.modelos['ventas.VentaItem']['registros'], 3)
+        self.assertEqual(copia.modelos['productos.StockProducto']['registros'], StockProducto.objects.count())
+        self.assertEqual(copia.total_registros, sum(d['registros'] for d in copia.modelos.values()))
+        self.assertGreater(copia.tamaño_bytes, 0)
+        self.assertEqual(motor.verificar(copia), [])
+
+        leidos = list(motor.registros(copia))
+        self.assertEqual(len(leidos), copia.total_registros)
+        producto = next(r for r in leidos if r['model'] == 'productos.producto')
+        self.assertEqual(producto['fields']['nombre'], 'Róbalo')
+        self.assertEqual(producto['fields']['proveedor'], self.proveedor.pk)
+
+    def test_varios_fragmentos(self):
+        with mock.patch.object(motor, 'TAMAÑO_FRAGMENTO', 64), mock.patch.object(motor, 'FILAS_POR_LOTE', 2):
+            copia = motor.crear_copia('Fragmentada')
+            self.assertGreater(FragmentoCopia.objects.filter(copia=copia).count(), 3)
+            self.assertEqual(len(list(motor.registros(copia))), copia.total_registros)
+            self.assertEqual(motor.verificar(copia), [])
+
+    def test_verificar_detecta_alteraciones(self):
+        copia = motor.crear_copia('Alterada')
+        fragmento = FragmentoCopia.objects.get(copia=copia, numero=0)
+        datos = bytearray(fragmento.datos)
+        datos[-10] ^= 0xFF
+        fragmento.datos = bytes(datos)
+        fragmento.save()
+        self.assertEqual(motor.verificar(copia), ['El SHA-256 del archivo no coincide'])
+
+    def test_copias_antiguas_en_json(self):
+        copia = CopiaSeguridadBD.objects.create(
+            nombre='Antigua',
+            datos_backup={
+                'proveedores.Proveedor': [{'model': 'proveedores.proveedor', 'pk': 1, 'fields': {}}],
+                'ventas_error': 'sin tabla',
+            },
+        )
+        self.assertEqual([r['pk'] for r in motor.registros(copia)], [1])
+
+    def test_crear_y_restaurar_desde_las_vistas(self):
+        self.client.login(username='admin', password='Clave12345')
+        response = self.client.post(reverse('copia_seguridad:crear'), {'nombre': 'Desde la vista'})
+        self.assertRedirects(response, reverse('copia_seguridad:lista'), fetch_redirect_response=False)
+        trabajos.procesar_pendientes()
+        copia = CopiaSeguridadBD.objects.get(nombre='Desde la vista')
+
+        Proveedor.objects.filter(pk=self.proveedor.pk).update(nombre_contacto='Cambiado')
+        self.client.post(reverse('copia_seguridad:restaurar', args=[copia.pk]))
+        trabajos.procesar_pendientes()
+        self.proveedor.refresh_from_db()
+        self.assertEqual(self.proveedor.nombre_contacto, 'Proveedor Copias')
+        copia.refresh_from_db()
+        self.assertIsNotNone(copia.fecha_restauracion)
+
+    def test_restaurar_por_lotes_conserva_fechas_y_derivados(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from productos import stock
+        from ventas import resumen
+
+        copia = motor.crear_copia('Antes del cambio')
+        venta = Venta.objects.order_by('pk').first()
+        venta_id, fecha_modificacion = venta.pk, venta.fecha_modificacion
+        Proveedor.objects.filter(pk=self.proveedor.pk).update(nombre_contacto='Cambiado')
+        venta.delete()
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as consultas:
+            resultado = motor.restaurar(copia)
+
+        self.assertEqual(resultado.registros, copia.total_registros)
+        self.assertEqual(resultado.por_modelo['ventas.VentaItem'], 3)
+        # Un lote por modelo, no una consulta por registro
+        inserciones = [q for q in consultas.captured_queries if q['sql'].startswith('INSERT INTO "ventas_venta')]
+        self.assertLessEqual(len(inserciones), 2)
+
+        self.proveedor.refresh_from_db()
+        self.assertEqual(self.proveedor.nombre_contacto, 'Proveedor Copias')
+        self.assertEqual(Venta.objects.get(pk=venta_id).fecha_modificacion, fecha_modificacion)
+        self.assertEqual(VentaItem.objects.filter(venta_id=venta_id).count(), 1)
+        self.assertEqual(stock.verificar_stock(), [])
+        self.assertEqual(resumen.verificar_resumen(), [])
+
+    def test_restaurar_copia_json_en_cualquier_orden(self):
+        from django.core.serializers import serialize
+
+        datos = {
+            modelo._meta.label: json.loads(serialize('json', modelo.objects.all()))
+            for modelo in reversed(motor.modelos_respaldo())
+        }
+        copia = CopiaSeguridadBD.objects.create(nombre='Antigua', datos_backup=datos)
+        VentaItem.objects.all().delete()
+        Venta.objects.all().delete()
+
+        resultado = motor.restaurar(copia)
+        self.assertEqual(VentaItem.objects.count(), 3)
+        self.assertEqual(resultado.por_modelo['ventas.Venta'], 3)
+
+    def test_restauracion_fallida_no_cambia_nada(self):
+        copia = motor.crear_copia('Incompleta')
+        copia.modelos['ventas.Venta']['registros'] = 99
+        copia.save(update_fields=['modelos'])
+        Proveedor.objects.filter(pk=self.proveedor.pk).update(nombre_contacto='Cambiado')
+
+        with self.assertRaises(motor.ErrorRestauracion):
+            motor.restaurar(copia)
+        self.proveedor.refresh_from_db()
+        self.assertEqual(self.proveedor.nombre_contacto, 'Cambiado')
+
+
+class CopiasIncrementalesTests(TestCase):
+    """Copias incrementales y diferenciales sobre el diario de cambios"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='admin', password='Clave12345')
+        self.proveedor = Proveedor.objects.create(
+            nit='6666666666',
+            nombre_contacto='Proveedor Diario',
+            correo='diario@example.com',
+            telefono='3006666666',
+            ciudad='Cali',
+        )
+        self.producto = Producto.objects.create(
+            proveedor=self.proveedor,
+            tipo_producto='PE',
+            nombre='Corvina',
+            precio=25000,
+            tipo_presentacion='LIB',
+        )
+        self.ventas = []
+        for _ in range(3):
+            venta = Venta.objects.create(estado='COMPLETADA')
+            VentaItem.objects.create(venta=venta, producto=self.producto, cantidad=Decimal('1'), precio_unitario=25000)
+            self.ventas.append(venta)
+
+    def test_diario_anota_guardados_borrados_y_set_null(self):
+        self.assertTrue(CambioRegistro.objects.filter(modelo='proveedores.Proveedor', objeto_id=str(self.proveedor.pk)).exists())
+        self.assertEqual(CambioRegistro.objects.filter(modelo='ventas.VentaItem').count(), 3)
+        # Los derivados no llevan diario
+        self.assertFalse(CambioRegistro.objects.filter(modelo='productos.StockProducto').exists())
+
+        CambioRegistro.objects.all().delete()
+        self.proveedor.delete()
+        anotados = set(CambioRegistro.objects.values_list('modelo', flat=True))
+        self.assertEqual(anotados, {'proveedores.Proveedor', 'productos.Producto'})
+
+    def test_incremental_lleva_solo_cambios_y_borrados(self):
+        completa = motor.crear_copia('Completa')
+        CambioRegistro.objects.update(fecha=completa.marca_agua - motor.diario.MARGEN * 2)
+
+        self.producto.precio = 27000
+        self.producto.save()
+        venta_borrada = self.ventas[0].pk
+        self.ventas[0].delete()
+
+        incremental = motor.crear_copia('Incremental', tipo=CopiaSeguridadBD.INCREMENTAL)
+        self.assertEqual(incremental.base, completa)
+        self.assertEqual(incremental.modelos['productos.Producto']['registros'], 1)
+        self.assertEqual(incremental.modelos['ventas.Venta'], {
+            'registros': 0, 'borrados': 1, 'sha256': incremental.modelos['ventas.Venta']['sha256'],
+        })
+        self.assertEqual(incremental.modelos['ventas.VentaItem']['borrados'], 1)
+        self.assertEqual(incremental.modelos['proveedores.Proveedor']['registros'], 0)
+        self.assertNotIn('productos.StockProducto', incremental.modelos)
+        self.assertEqual(incremental.total_registros, 3)
+        self.assertEqual(motor.verificar(incremental), [])
+
+        borrados = [r for r in motor.registros(incremental) if r.get('borrado')]
+        # Los borrados van primero y en orden inverso de dependencias
+        self.assertEqual([r['model'] for r in borrados], ['ventas.ventaitem', 'ventas.venta'])
+        self.assertEqual(borrados[1]['pk'], venta_borrada)
+
+    def test_restaurar_cadena(self):
+        from productos import stock
+        from ventas import resumen
+
+        completa = motor.crear_copia('Completa')
+        CambioRegistro.objects.update(fecha=completa.marca_agua - motor.diario.MARGEN * 2)
+        self.producto.precio = 27000
+        self.producto.save()
+        venta_borrada = self.ventas[0].pk
+        self.ventas[0].delete()
+        motor.crear_copia('Incremental 1', tipo=CopiaSeguridadBD.INCREMENTAL)
+        nueva = Venta.objects.create(estado='COMPLETADA')
+        VentaItem.objects.create(venta=nueva, producto=self.producto, cantidad=Decimal('2'), precio_unitario=27000)
+        segunda = motor.crear_copia('Incremental 2', tipo=CopiaSeguridadBD.INCREMENTAL)
+        self.assertEqual(motor.cadena(segunda)[0], completa)
+        self.assertEqual(len(motor.cadena(segunda)), 3)
+
+        # Se pierde todo lo posterior a la completa
+        VentaItem.objects.all().delete()
+        Venta.objects.all().delete()
+        Producto.objects.filter(pk=self.producto.pk).update(precio=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            motor.restaurar(segunda)
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.precio, 27000)
+        self.assertFalse(Venta.objects.filter(pk=venta_borrada).exists())
+        self.assertEqual(Venta.objects.count(), 3)
+        self.assertTrue(VentaItem.objects.filter(venta_id=nueva.pk, cantidad=Decimal('2')).exists())
+        self.assertEqual(stock.verificar_stock(), [])
+        self.assertEqual(resumen.verificar_resumen(), [])
+        segunda.refresh_from_db()
+        self.assertIsNotNone(segunda.fecha_restauracion)
+
+    def test_diferencial_se_basa_en_la_ultima_completa(self):
+        completa = motor.crear_copia('Completa')
+        incremental = motor.crear_copia('Incremental', tipo=CopiaSeguridadBD.INCREMENTAL)
+        diferencial = motor.crear_copia('Diferencial', tipo=CopiaSeguridadBD.DIFERENCIAL)
+        self.assertEqual(incremental.base, completa)
+        self.assertEqual(diferencial.base, completa)
+
+    def test_incremental_sin_base_o_despues_de_restaurar(self):
+        with self.assertRaises(motor.ErrorCopia):
+            motor.crear_copia('Sin base', tipo=CopiaSeguridadBD.INCREMENTAL)
+
+        completa = motor.crear_copia('Completa')
+        motor.restaurar(completa)
+        with self.assertRaises(motor.ErrorCopia):
+            motor.crear_copia('Después de restaurar', tipo=CopiaSeguridadBD.INCREMENTAL)
+
+    def _hace(self, **tiempo):
+        """Ejecuta lo que sigue como si fuera `tiempo` antes de ahora."""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        return mock.patch('django.utils.timezone.now', return_value=timezone.now() - timedelta(**tiempo))
+
+    def test_poda_del_diario(self):
+        with self._hace(hours=2):
+            primera = motor.crear_copia('Primera')
+        with self._hace(hours=1):
+            self.proveedor.save()
+        motor.crear_copia('Segunda')
+        # Mientras exista la primera, los cambios posteriores a ella se conservan
+        self.assertTrue(CambioRegistro.objects.filter(modelo='proveedores.Proveedor').exists())
+
+        motor.eliminar(primera)
+        motor.crear_copia('Tercera')
+        self.assertFalse(CambioRegistro.objects.filter(modelo='proveedores.Proveedor').exists())
+
+    def test_eliminar_la_ultima_completa_no_pierde_cambios(self):
+        with self._hace(hours=1):
+            completa_a = motor.crear_copia('Completa A')
+        with self._hace(minutes=30):
+            self.proveedor.nombre_contacto = 'Editado'
+            self.proveedor.save()
+        completa_b = motor.crear_copia('Completa B')
+
+        self.client.login(username='admin', password='Clave12345')
+        self.client.post(reverse('copia_seguridad:eliminar', args=[completa_b.pk]))
+        self.assertFalse(CopiaSeguridadBD.objects.filter(pk=completa_b.pk).exists())
+
+        diferencial = motor.crear_copia('Diferencial', tipo=CopiaSeguridadBD.DIFERENCIAL)
+        self.assertEqual(diferencial.base_id, completa_a.pk)
+        self.assertEqual(diferencial.modelos['proveedores.Proveedor']['registros'], 1)
+
+        Proveedor.objects.filter(pk=self.proveedor.pk).update(nombre_contacto='Perdido')
+        motor.restaurar(diferencial)
+        self.proveedor.refresh_from_db()
+        self.assertEqual(self.proveedor.nombre_contacto, 'Editado')
+
+    def test_base_anterior_a_la_poda_no_sirve(self):
+        from datetime import timedelta
+
+        completa = motor.crear_copia('Completa')
+        motor.diario.podar(completa.marca_agua + timedelta(minutes=1))
+        with self.assertRaises(motor.ErrorCopia):
+            motor.crear_copia('Diferencial', tipo=CopiaSeguridadBD.DIFERENCIAL)
+
+    def test_vistas(self):
+        self.client.login(username='admin', password='Clave12345')
+        self.client.post(reverse('copia_seguridad:crear'), {'nombre': 'Base'})
+        self.client.post(reverse('copia_seguridad:crear'), {'nombre': 'Delta', 'tipo': 'INCREMENTAL'})
+        trabajos.procesar_pendientes()
+        base = CopiaSeguridadBD.objects.get(nombre='Base')
+        delta = CopiaSeguridadBD.objects.get(nombre='Delta')
+        self.assertEqual(delta.base, base)
+
+        response = self.client.get(reverse('copia_seguridad:lista'))
+        self.assertContains(response, 'Incremental')
+
+        # La base no se puede eliminar mientras tenga copias que dependan de ella
+        self.client.post(reverse('copia_seguridad:eliminar', args=[base.pk]))
+        self.assertTrue(CopiaSeguridadBD.objects.filter(pk=base.pk).exists())
+        self.client.post(reverse('copia_seguridad:eliminar', args=[delta.pk]))
+        self.client.post(reverse('copia_seguridad:eliminar', args=[base.pk]))
+        self.assertFalse(CopiaSeguridadBD.objects.exists())
+
+
+class TrabajosCopiaTests(TestCase):
+    """Copias y restauraciones en segundo plano con avance"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='admin', password='Clave12345')
+        self.proveedor = Proveedor.objects.create(
+            nit='7777777777',
+            nombre_contacto='Proveedor Trabajos',
+            correo='trabajos@example.com',
+            telefono='3007777777',
+            ciudad='Medellín',
+        )
+        self.client.login(username='admin', password='Clave12345')
+
+    def test_la_vista_solo_encola(self):
+        response = self.client.post(reverse('copia_seguridad:crear'), {'nombre': 'En cola'})
+        self.assertRedirects(response, reverse('copia_seguridad:lista'), fetch_redirect_response=False)
+        trabajo = TrabajoCopia.objects.get()
+        self.assertEqual(trabajo.estado, TrabajoCopia.PENDIENTE)
+        self.assertEqual(trabajo.usuario, self.usuario)
+        self.assertFalse(CopiaSeguridadBD.objects.exists())
+
+        self.assertEqual(trabajos.procesar_pendientes(), 1)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoCopia.LISTO)
+        self.assertEqual(trabajo.copia.nombre, 'En cola')
+        self.assertEqual(trabajo.progreso, 100)
+        self.assertEqual(trabajo.registros_procesados, trabajo.copia.total_registros)
+
+    def test_restauracion_en_segundo_plano(self):
+        copia = motor.crear_copia('Base')
+        Proveedor.objects.filter(pk=self.proveedor.pk).update(nombre_contacto='Cambiado')
+        self.client.post(reverse('copia_seguridad:restaurar', args=[copia.pk]))
+        self.proveedor.refresh_from_db()
+        self.assertEqual(self.proveedor.nombre_contacto, 'Cambiado')
+
+        trabajos.procesar_pendientes()
+        self.proveedor.refresh_from_db()
+        self.assertEqual(self.proveedor.nombre_contacto, 'Proveedor Trabajos')
+        self.assertEqual(TrabajoCopia.objects.get().estado, TrabajoCopia.LISTO)
+
+    def test_error_queda_en_el_trabajo(self):
+        trabajo = trabajos.encolar(TrabajoCopia.CREAR, nombre='Sin base', tipo=CopiaSeguridadBD.INCREMENTAL)
+        trabajos.procesar_pendientes()
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoCopia.ERROR)
+        self.assertIn('copia completa', trabajo.error)
+
+    def test_un_trabajo_a_la_vez(self):
+        from django.db import IntegrityError, transaction
+
+        TrabajoCopia.objects.create(operacion=TrabajoCopia.CREAR, estado=TrabajoCopia.PROCESANDO)
+        trabajo = trabajos.encolar(TrabajoCopia.CREAR, nombre='Espera')
+        self.assertIsNone(trabajos.tomar_trabajo())
+        self.assertIsNone(trabajos.ejecutar(trabajo))
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoCopia.PENDIENTE)
+
+        # Aunque dos procesos reclamen a la vez, la BD rechaza el segundo
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TrabajoCopia.objects.filter(pk=trabajo.pk).update(estado=TrabajoCopia.PROCESANDO)
+
+    def test_limpiar_sin_candado_usa_el_tiempo(self):
+        """En SQLite no hay candado de sesión: solo un trabajo viejo se da por abandonado"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        trabajo = TrabajoCopia.objects.create(
+            operacion=TrabajoCopia.CREAR, estado=TrabajoCopia.PROCESANDO, fecha_inicio=timezone.now(),
+        )
+        trabajos.limpiar_trabajos()
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoCopia.PROCESANDO)
+
+        TrabajoCopia.objects.filter(pk=trabajo.pk).update(
+            fecha_inicio=timezone.now() - timedelta(minutes=trabajos.TIEMPO_MAXIMO_MINUTOS + 1)
+        )
+        trabajos.limpiar_trabajos()
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoCopia.ERROR)
+
+    def test_endpoint_de_estado(self):
+        trabajo = trabajos.encolar(TrabajoCopia.CREAR, nombre='Consultada')
+        TrabajoCopia.objects.filter(pk=trabajo.pk).update(
+            estado=TrabajoCopia.PROCESANDO, registros_procesados=50, registros_totales=200, etapa='ventas.Venta',
+        )
+        datos = self.client.get(reverse('copia_seguridad:estado_trabajos')).json()['trabajos'][0]
+        self.assertEqual(datos['id'], trabajo.pk)
+        self.assertTrue(datos['activo'])
+        self.assertEqual(datos['progreso'], 25)
+        self.assertEqual(datos['copia'], 'Consultada')
+        self.assertEqual(datos['etapa'], 'ventas.Venta')
+
+        response = self.client.get(reverse('copia_seguridad:lista'))
+        self.assertContains(response, 'data-trabajo-id="%d"' % trabajo.pk)
+
+    @override_settings(COPIAS_SEGUNDO_PLANO=False)
+    def test_sin_segundo_plano_se_ejecuta_en_la_peticion(self):
+        self.client.post(reverse('copia_seguridad:crear'), {'nombre': 'Inmediata'})
+        self.assertEqual(TrabajoCopia.objects.get().estado, TrabajoCopia.LISTO)
+        self.assertTrue(CopiaSeguridadBD.objects.filter(nombre='Inmediata').exists())
+
+    def test_motor_reporta_avance(self):
+        avance = []
+        with mock.patch.object(motor, 'FILAS_POR_LOTE', 1):
+            copia = motor.crear_copia('Con avance', progreso=lambda *args: avance.append(args))
+            motor.restaurar(copia, progreso=lambda *args: avance.append(args))
+        self.assertIn((copia.total_registros, copia.total_registros, 'Reconstruyendo stock y resúmenes'), avance)
+        procesados = [registro[0] for registro in avance]
+        self.assertEqual(max(procesados), copia.total_registros)
+
+    def test_comando_para_cron(self):
+        from django.core.management.base import CommandError
+
+        with self.assertRaisesMessage(CommandError, 'copia completa'):
+            call_command('crear_copia', '--tipo', 'incremental', stdout=io.StringIO())
+        TrabajoCopia.objects.all().delete()
+
+        salida = io.StringIO()
+        call_command('crear_copia', '--tipo', 'incremental', '--completa-si-falta', '--verificar', stdout=salida)
+        copia = CopiaSeguridadBD.objects.get()
+        self.assertEqual(copia.tipo, CopiaSeguridadBD.COMPLETA)
+        self.assertIn('Verificación correcta', salida.getvalue())
+
+        call_command('crear_copia', '--tipo', 'incremental', stdout=io.StringIO())
+        self.assertEqual(CopiaSeguridadBD.objects.latest('marca_agua').base, copia)
+
+        # Pasa por la cola como las copias de la interfaz
+        self.assertEqual(
+            list(TrabajoCopia.objects.order_by('pk').values_list('estado', 'copia__tipo')),
+            [(TrabajoCopia.LISTO, CopiaSeguridadBD.COMPLETA), (TrabajoCopia.LISTO, CopiaSeguridadBD.INCREMENTAL)],
+        )
+
+
+class ListaCopiasTests(TestCase):
+    """La lista no lee el contenido de las copias"""
+
+    def setUp(self):
+        User.objects.create_user(username='admin', password='Clave12345')
+        self.client.login(username='admin', password='Clave12345')
+
+    def _consultas_de_la_lista(self, **parametros):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('copia_seguridad:lista'), parametros)
+        sql = [q['sql'] for q in consultas.captured_queries if 'copia_seguridad_copiaseguridadbd' in q['sql']]
+        return response, sql
+
+    def test_no_carga_el_contenido_y_pagina(self):
+        for numero in range(25):
+            CopiaSeguridadBD.objects.create(
+                nombre=f'Copia {numero}', datos_backup={'ventas.Venta': [{'pk': numero}] * 50},
+                total_registros=50, tamaño_bytes=1000,
+            )
+
+        response, sql = self._consultas_de_la_lista()
+        self.assertEqual(len(response.context['copias']), 20)
+        self.assertEqual(response.context['total_copias'], 25)
+        self.assertContains(response, 'Copia 24')
+        self.assertNotContains(response, 'Copia 4<')
+        self.assertFalse([consulta for consulta in sql if 'datos_backup' in consulta or '"modelos"' in consulta])
+        # Un COUNT acotado del paginador y la página; sin otro COUNT
+        self.assertEqual(len([consulta for consulta in sql if 'COUNT' in consulta]), 1)
+
+        response, _ = self._consultas_de_la_lista(page=2)
+        self.assertEqual(len(response.context['copias']), 5)
+
+    def test_eliminar_no_carga_el_contenido(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        copia = motor.crear_copia('Para eliminar')
+        with CaptureQueriesContext(connection) as consultas, \
+                mock.patch.object(FragmentoCopia, 'from_db', wraps=FragmentoCopia.from_db) as fragmentos_leidos:
+            self.client.post(reverse('copia_seguridad:eliminar', args=[copia.pk]))
+        self.assertFalse(CopiaSeguridadBD.objects.exists())
+        self.assertFalse(FragmentoCopia.objects.exists())
+        self.assertFalse(fragmentos_leidos.called)
+        leidas = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertFalse([sql for sql in leidas if 'datos_backup' in sql and f'= {copia.pk}' in sql])
+        # Borrado rápido: un DELETE directo, sin SELECT previo de los fragmentos
+        tabla = FragmentoCopia._meta.db_table
+        self.assertFalse([sql for sql in leidas if tabla in sql])
+
+    def test_cantidad_de_consultas_constante(self):
+        CopiaSeguridadBD.objects.create(nombre='Una')
+        _, pocas = self._consultas_de_la_lista()
+        for numero in range(10):
+            CopiaSeguridadBD.objects.create(nombre=f'Otra {numero}')
+        _, muchas = self._consultas_de_la_lista()
+        self.assertEqual(len(pocas), len(muchas))
+
+    def test_descargar(self):
+        Proveedor.objects.create(
+            nit='8888888888', nombre_contacto='Proveedor Descarga', correo='descarga@example.com',
+            telefono='3008888888', ciudad='Pasto',
+        )
+        copia = motor.crear_copia('Para descargar')
+        response = self.client.get(reverse('copia_seguridad:descargar', args=[copia.pk]))
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        contenido = b''.join(response.streaming_content)
+        self.assertEqual(len(contenido), copia.tamaño_bytes)
+        self.assertIn('Proveedor Descarga', gzip.decompress(contenido).decode('utf-8'))
+
+        antigua = CopiaSeguridadBD.objects.create(nombre='Antigua', datos_backup={'proveedores.Proveedor': [{'pk': 1}]})
+        response = self.client.get(reverse('copia_seguridad:descargar', args=[antigua.pk]))
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), antigua.datos_backup)
+
+    def test_metadatos_de_copias_antiguas(self):
+        from importlib import import_module
+        from django.apps import apps as registro
+
+        migracion = import_module('copia_seguridad.migrations.0005_metadatos_copias_json')
+        antigua = CopiaSeguridadBD.objects.create(
+            nombre='Antigua',
+            datos_backup={'ventas.Venta': [{'pk': 1}, {'pk': 2}], 'ventas_error': 'sin tabla'},
+        )
+        migracion.calcular_metadatos(registro, None)
+        antigua.refresh_from_db()
+        self.assertEqual(antigua.total_registros, 2)
+        self.assertEqual(antigua.modelos, {'ventas.Venta': {'registros': 2}})
+        self.assertGreater(antigua.tamaño_bytes, 0)
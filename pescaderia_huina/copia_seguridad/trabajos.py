@@ -0,0 +1,287 @@
+"""
+Copias y restauraciones en segundo plano.
+
+Una copia completa o una restauración grande tarda más que el tiempo de
+espera del worker web. Las vistas ya no las ejecutan en la petición:
+encolan un TrabajoCopia y vuelven a la lista, que consulta el avance. El
+comando `manage.py procesar_copias` toma los trabajos pendientes (la cola es
+la propia BD, como en core.reportes) y ejecuta el motor.
+
+Con COPIAS_SEGUNDO_PLANO=False (desarrollo sin trabajador) `encolar` lo
+ejecuta enseguida, en la petición; el comando `crear_copia` (cron) encola y
+ejecuta su trabajo con `ejecutar`. Todo pasa por la cola.
+
+Se procesa un trabajo a la vez: una restauración mientras se hace una copia
+dejaría en la copia una mezcla de datos viejos y nuevos. Lo garantizan la
+restricción única sobre estado = PROCESANDO y, en PostgreSQL, un candado de
+sesión que tiene el proceso mientras trabaja.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, IntegrityError, connections, transaction
+from django.utils import timezone
+
+from . import motor
+from .models import CopiaSeguridadBD, TrabajoCopia
+
+
+logger = logging.getLogger(__name__)
+
+# Clave del candado de sesión de PostgreSQL (pg_advisory_lock) que tiene el
+# proceso que ejecuta trabajos de copia
+CANDADO = 720_024
+
+# Sin PostgreSQL (desarrollo) un trabajo que lleva más de esto "procesando"
+# se considera abandonado y se marca con error.
+TIEMPO_MAXIMO_MINUTOS = getattr(settings, 'COPIAS_TIEMPO_MAXIMO_MINUTOS', 120)
+
+# Días que se conservan los trabajos terminados
+HISTORIAL_DIAS = getattr(settings, 'COPIAS_HISTORIAL_DIAS', 7)
+
+# Segundos mínimos entre dos escrituras del avance de un trabajo
+INTERVALO_PROGRESO = 1.0
+
+
+def encolar(operacion, usuario=None, copia=None, **parametros):
+    """Crea un trabajo pendiente (y lo ejecuta, sin segundo plano). Retorna el TrabajoCopia."""
+    trabajo = TrabajoCopia.objects.create(
+        operacion=operacion,
+        usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+        copia=copia,
+        parametros=parametros,
+    )
+    if not getattr(settings, 'COPIAS_SEGUNDO_PLANO', True):
+        ejecutar(trabajo)
+        trabajo.refresh_from_db()
+    return trabajo
+
+
+def recientes(horas=1, limite=10):
+    """Trabajos pendientes o en proceso, más los terminados en las últimas `horas`."""
+    desde = timezone.now() - timedelta(hours=horas)
+    activos = TrabajoCopia.objects.filter(estado__in=[TrabajoCopia.PENDIENTE, TrabajoCopia.PROCESANDO])
+    terminados = TrabajoCopia.objects.filter(fecha_fin__gte=desde)
+    consulta = (activos | terminados).select_related('copia').defer('copia__datos_backup', 'copia__modelos')
+    return list(consulta.order_by('-fecha_creacion')[:limite])
+
+
+# ==================== TRABAJADOR ====================
+
+class _Sesion:
+    """
+    Conexión aparte del proceso que ejecuta trabajos, en autocommit. Solo en
+    PostgreSQL: en SQLite quedaría bloqueada por la transacción que el motor
+    mantiene abierta.
+
+    Mientras el proceso trabaja, la sesión tiene el candado de los trabajos
+    (pg_try_advisory_lock). PostgreSQL lo suelta al cerrar la conexión o si
+    el proceso muere, así que limpiar_trabajos sabe si un trabajo en proceso
+    sigue vivo sin adivinarlo por el tiempo que lleva.
+
+    También escribe el avance que reporta el motor, como máximo una vez por
+    INTERVALO_PROGRESO: los cambios de la transacción del motor nadie los ve
+    hasta el final. En SQLite solo se ven el inicio y el final.
+    """
+
+    def __init__(self):
+        self.trabajo_id = None
+        self.ultima = 0.0
+        self.conexion = None
+        if connections[DEFAULT_DB_ALIAS].vendor == 'postgresql':
+            self.conexion = connections.create_connection(DEFAULT_DB_ALIAS)
+
+    def bloquear(self):
+        """Toma el candado de los trabajos. False si lo tiene otro proceso."""
+        if self.conexion is None:
+            return True
+        with self.conexion.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [CANDADO])
+            return cursor.fetchone()[0]
+
+    def progreso(self, procesados, total, etapa):
+        ahora = time.monotonic()
+        if self.conexion is None or ahora - self.ultima < INTERVALO_PROGRESO:
+            return
+        self.ultima = ahora
+        tabla = self.conexion.ops.quote_name(TrabajoCopia._meta.db_table)
+        try:
+            with self.conexion.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {tabla} SET registros_procesados = %s, registros_totales = %s, etapa = %s WHERE id = %s',
+                    [procesados, total, etapa[:100], self.trabajo_id],
+                )
+        except DatabaseError:
+            # El avance es informativo: no detiene la copia
+            logger.warning('No se pudo guardar el avance del trabajo de copia %s', self.trabajo_id, exc_info=True)
+
+    def cerrar(self):
+        # Cerrar la sesión suelta el candado
+        if self.conexion is not None:
+            self.conexion.close()
+
+
+def tomar_trabajo(pk=None):
+    """
+    Reclama el trabajo pendiente más antiguo (o el trabajo `pk`). El cambio
+    de estado es un UPDATE condicional (... WHERE estado = 'PENDIENTE'): si
+    dos procesos eligen el mismo, solo uno lo consigue. La restricción única
+    copia_un_trabajo_en_proceso hace fallar el UPDATE si ya hay otro trabajo
+    en proceso, aunque los dos lleguen a la vez.
+    """
+    pendientes = TrabajoCopia.objects.filter(estado=TrabajoCopia.PENDIENTE)
+    if pk is not None:
+        pendientes = pendientes.filter(pk=pk)
+    while True:
+        elegido = pendientes.order_by('fecha_creacion', 'pk').values_list('pk', flat=True).first()
+        if elegido is None:
+            return None
+        try:
+            with transaction.atomic():
+                reclamado = TrabajoCopia.objects.filter(
+                    pk=elegido, estado=TrabajoCopia.PENDIENTE
+                ).update(estado=TrabajoCopia.PROCESANDO, fecha_inicio=timezone.now())
+        except IntegrityError:
+            return None
+        if reclamado:
+            return TrabajoCopia.objects.select_related('copia').get(pk=elegido)
+
+
+def _marcar_error(trabajo, error):
+    TrabajoCopia.objects.filter(pk=trabajo.pk).update(
+        estado=TrabajoCopia.ERROR,
+        error=str(error) or error.__class__.__name__,
+        etapa='',
+        fecha_fin=timezone.now(),
+    )
+
+
+def _nombre_copia(tipo):
+    return f'{dict(CopiaSeguridadBD.TIPOS)[tipo]} {timezone.localtime():%Y-%m-%d %H:%M}'
+
+
+def _crear_copia(parametros, progreso):
+    tipo = parametros.get('tipo', CopiaSeguridadBD.COMPLETA)
+    descripcion = parametros.get('descripcion', '')
+    try:
+        return motor.crear_copia(
+            parametros.get('nombre') or _nombre_copia(tipo), descripcion, tipo, progreso=progreso
+        )
+    except motor.ErrorCopia as e:
+        if tipo == CopiaSeguridadBD.COMPLETA or not parametros.get('completa_si_falta'):
+            raise
+        logger.warning('%s. Se hará una copia completa.', e)
+        return motor.crear_copia(
+            parametros.get('nombre') or _nombre_copia(CopiaSeguridadBD.COMPLETA),
+            descripcion, CopiaSeguridadBD.COMPLETA, progreso=progreso,
+        )
+
+
+def procesar_trabajo(trabajo, sesion, progreso=None):
+    """
+    Ejecuta un trabajo ya reclamado por un proceso que tiene el candado
+    (`sesion`). `progreso`, si se da, recibe también el avance del motor.
+    Retorna True si terminó bien.
+    """
+    sesion.trabajo_id = trabajo.pk
+
+    def avance(procesados, total, etapa):
+        sesion.progreso(procesados, total, etapa)
+        if progreso is not None:
+            progreso(procesados, total, etapa)
+
+    try:
+        if trabajo.operacion == TrabajoCopia.CREAR:
+            copia = _crear_copia(trabajo.parametros, avance)
+            procesados = copia.total_registros
+        else:
+            copia = trabajo.copia
+            if copia is None:
+                raise motor.ErrorRestauracion('La copia ya no existe')
+            procesados = motor.restaurar(copia, progreso=avance).registros
+    except motor.ErrorCopia as e:
+        # Falta de copia base y similares: no es una falla del programa
+        logger.warning('No se pudo crear la copia del trabajo %s: %s', trabajo.pk, e)
+        _marcar_error(trabajo, e)
+        return False
+    except Exception as e:
+        logger.exception('Falló el trabajo de copia %s', trabajo.pk)
+        _marcar_error(trabajo, e)
+        return False
+
+    TrabajoCopia.objects.filter(pk=trabajo.pk).update(
+        estado=TrabajoCopia.LISTO,
+        copia=copia,
+        registros_procesados=procesados,
+        registros_totales=procesados,
+        etapa='',
+        fecha_fin=timezone.now(),
+    )
+    return True
+
+
+def ejecutar(trabajo, progreso=None):
+    """
+    Ejecuta ya un trabajo pendiente, por el mismo camino que el trabajador
+    (candado y reclamo). Retorna None si no pudo tomarlo porque hay otro
+    trabajo en proceso o porque el trabajador ya lo tomó; si no, lo mismo
+    que procesar_trabajo.
+    """
+    sesion = _Sesion()
+    try:
+        if not sesion.bloquear():
+            return None
+        reclamado = tomar_trabajo(trabajo.pk)
+        if reclamado is None:
+            return None
+        return procesar_trabajo(reclamado, sesion, progreso)
+    finally:
+        sesion.cerrar()
+
+
+def procesar_pendientes(limite=None):
+    """Procesa trabajos hasta vaciar la cola (o hasta `limite`). Retorna cuántos procesó."""
+    if not TrabajoCopia.objects.filter(estado=TrabajoCopia.PENDIENTE).exists():
+        return 0
+    procesados = 0
+    sesion = _Sesion()
+    try:
+        if not sesion.bloquear():
+            return 0
+        while limite is None or procesados < limite:
+            trabajo = tomar_trabajo()
+            if trabajo is None:
+                break
+            procesar_trabajo(trabajo, sesion)
+            procesados += 1
+    finally:
+        sesion.cerrar()
+    return procesados
+
+
+def limpiar_trabajos():
+    """Marca con error los trabajos abandonados y borra los terminados hace más de HISTORIAL_DIAS."""
+    ahora = timezone.now()
+    abandonados = TrabajoCopia.objects.filter(estado=TrabajoCopia.PROCESANDO)
+    sesion = _Sesion()
+    try:
+        if sesion.conexion is not None:
+            # Con el candado libre ningún proceso está trabajando: lo que
+            # figure en proceso quedó de un proceso que murió. Si está tomado,
+            # el trabajo sigue vivo, lleve lo que lleve.
+            if not sesion.bloquear():
+                abandonados = abandonados.none()
+        else:
+            # Sin PostgreSQL no hay candado de sesión: solo queda el tiempo
+            abandonados = abandonados.filter(fecha_inicio__lt=ahora - timedelta(minutes=TIEMPO_MAXIMO_MINUTOS))
+        abandonados.update(
+            estado=TrabajoCopia.ERROR,
+            error='El proceso que ejecutaba el trabajo terminó sin completarlo',
+            fecha_fin=ahora,
+        )
+    finally:
+        sesion.cerrar()
+    eliminados, _ = TrabajoCopia.objects.filter(fecha_fin__lt=ahora - timedelta(days=HISTORIAL_DIAS)).delete()
+    return eliminados
@@ -8,4 +8,6 @@ urlpatterns = [
     path('crear/', views.crear_copia_seguridad, name='crear'),
     path('restaurar/<int:copia_id>/', views.restaurar_copia_seguridad, name='restaurar'),
     path('eliminar/<int:copia_id>/', views.eliminar_copia_seguridad, name='eliminar'),
+    path('descargar/<int:copia_id>/', views.descargar_copia_seguridad, name='descargar'),
+    path('trabajos/estado/', views.estado_trabajos, name='estado_trabajos'),
 ]
@@ -1,157 +1,101 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
-from django.db import connection
-from django.core.serializers import serialize, deserialize
-from django.apps import apps
-import json
-from datetime import datetime
-import sys
-from .models import CopiaSeguridadBD
+from django.utils import timezone
+from core.paginacion import paginar
+from . import motor, trabajos
+from .models import CopiaSeguridadBD, TrabajoCopia
 
 
-def get_database_size():
-    """Obtiene el tamaño estimado de la base de datos en bytes"""
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT pg_size_pretty(pg_database_size(current_database())) as size
-            """)
-            result = cursor.fetchone()
-            return result[0] if result else "Desconocido"
-    except:
-        return "Desconocido (SQLite)"
-
-
-def backup_all_data():
-    """Crea un backup de todos los datos de la aplicación"""
-    backup_data = {}
-    
-    # Apps a respaldar (excluir del sistema Django)
-    apps_to_backup = [
-        'usuarios', 'productos', 'proveedores', 'ventas', 'pedidos'
-    ]
-    
-    try:
-        for app_name in apps_to_backup:
-            try:
-                app_config = apps.get_app_config(app_name)
-                # Serializar todos los modelos de la app
-                for model in app_config.get_models():
-                    model_name = model.__name__
-                    queryset = model.objects.all()
-                    
-                    # Serializar con el formato JSON
-                    serialized_data = serialize('json', queryset)
-                    backup_data[f"{app_name}.{model_name}"] = json.loads(serialized_data)
-            except Exception as e:
-                backup_data[f"{app_name}_error"] = str(e)
-    except Exception as e:
-        backup_data["general_error"] = str(e)
-    
-    return backup_data
-
-
-def restore_data(backup_data):
-    """Restaura datos desde un backup"""
-    errors = []
-    restored_count = 0
-    
-    try:
-        for model_path, objects_data in backup_data.items():
-            if 'error' in model_path or not isinstance(objects_data, list):
-                continue
-            
-            try:
-                # Convertir de vuelta al formato JSON que Django espera deserializar
-                json_str = json.dumps(objects_data)
-                
-                # Deserializar y guardar
-                for obj in deserialize('json', json_str):
-                    obj.save()
-                    restored_count += 1
-                    
-            except Exception as e:
-                errors.append(f"{model_path}: {str(e)}")
-    except Exception as e:
-        errors.append(f"Error general: {str(e)}")
-    
-    return restored_count, errors
+# Columnas que muestra la lista: nunca el contenido (datos_backup, modelos)
+CAMPOS_LISTA = (
+    'id', 'nombre', 'descripcion', 'fecha_creacion', 'fecha_restauracion',
+    'tamaño_estimado', 'formato', 'tipo', 'total_registros', 'tamaño_bytes',
+    'sha256', 'base__id', 'base__nombre',
+)
 
 
 @login_required
 def lista_copias_seguridad(request):
-    """Vista para listar las copias de seguridad"""
-    copias = CopiaSeguridadBD.objects.all()
+    """Vista para listar las copias de seguridad (sin cargar su contenido)"""
+    copias = CopiaSeguridadBD.objects.select_related('base').only(*CAMPOS_LISTA)
+    copias = paginar(request, copias, 20, ('-fecha_creacion', '-id'))
     context = {
         'copias': copias,
-        'total_copias': copias.count(),
+        # El paginador ya contó (o estimó) el total: sin otro COUNT
+        'total_copias': copias.total_aproximado if copias.por_cursor else copias.paginator.count,
+        'trabajos': [_estado_trabajo(trabajo) for trabajo in trabajos.recientes()],
     }
     return render(request, 'copia_seguridad/lista_copias.html', context)
 
 
+def _estado_trabajo(trabajo):
+    return {
+        'id': trabajo.pk,
+        'operacion': trabajo.operacion,
+        'descripcion': trabajo.get_operacion_display(),
+        'copia': trabajo.copia.nombre if trabajo.copia else trabajo.parametros.get('nombre', ''),
+        'estado': trabajo.estado,
+        'activo': trabajo.estado in (TrabajoCopia.PENDIENTE, TrabajoCopia.PROCESANDO),
+        'progreso': trabajo.progreso,
+        'registros_procesados': trabajo.registros_procesados,
+        'registros_totales': trabajo.registros_totales,
+        'registros_por_segundo': trabajo.registros_por_segundo,
+        'etapa': trabajo.etapa,
+        'error': trabajo.error,
+    }
+
+
+def _avisar_trabajo(request, trabajo):
+    """Mensaje después de encolar un trabajo (o de ejecutarlo, sin segundo plano)."""
+    nombre = _estado_trabajo(trabajo)['copia']
+    if trabajo.estado == TrabajoCopia.LISTO:
+        messages.success(
+            request,
+            f'✓ {trabajo.get_operacion_display()} "{nombre}": {trabajo.registros_procesados} registros '
+            f'({trabajo.registros_por_segundo:,} registros/s)'
+        )
+    elif trabajo.estado == TrabajoCopia.ERROR:
+        messages.error(request, f'✗ {trabajo.get_operacion_display()} "{nombre}": {trabajo.error}')
+    else:
+        messages.info(request, f'⏳ {trabajo.get_operacion_display()} "{nombre}" en proceso; el avance se muestra en esta página')
+
+
 @login_required
 @require_http_methods(["POST"])
 def crear_copia_seguridad(request):
-    """Crea una nueva copia de seguridad"""
-    try:
-        nombre = request.POST.get('nombre', f'Backup {datetime.now().strftime("%Y-%m-%d %H:%M")}')
-        descripcion = request.POST.get('descripcion', '')
-        
-        # Crear backup
-        datos_backup = backup_all_data()
-        tamaño = get_database_size()
-        
-        # Guardar en BD
-        copia = CopiaSeguridadBD.objects.create(
-            nombre=nombre,
-            descripcion=descripcion,
-            datos_backup=datos_backup,
-            tamaño_estimado=tamaño
-        )
-        
-        messages.success(request, f'✓ Copia de seguridad "{nombre}" creada exitosamente')
-        return redirect('copia_seguridad:lista')
-        
-    except Exception as e:
-        messages.error(request, f'✗ Error al crear la copia: {str(e)}')
+    """Encola la creación de una copia de seguridad"""
+    nombre = request.POST.get('nombre', '').strip() or f'Backup {timezone.localtime():%Y-%m-%d %H:%M}'
+    descripcion = request.POST.get('descripcion', '')
+    tipo = request.POST.get('tipo', CopiaSeguridadBD.COMPLETA)
+    if tipo not in dict(CopiaSeguridadBD.TIPOS):
+        messages.error(request, '✗ Tipo de copia no válido')
         return redirect('copia_seguridad:lista')
+    
+    # La copia la hace el trabajador (manage.py procesar_copias)
+    trabajo = trabajos.encolar(
+        TrabajoCopia.CREAR, request.user, nombre=nombre, descripcion=descripcion, tipo=tipo
+    )
+    _avisar_trabajo(request, trabajo)
+    return redirect('copia_seguridad:lista')
 
 
 @login_required
 @require_http_methods(["POST"])
 def restaurar_copia_seguridad(request, copia_id):
-    """Restaura una copia de seguridad"""
-    try:
-        copia = get_object_or_404(CopiaSeguridadBD, id=copia_id)
-        
-        # Restaurar datos
-        restored_count, errors = restore_data(copia.datos_backup)
-        
-        # Actualizar fecha de restauración
-        copia.fecha_restauracion = datetime.now()
-        copia.save()
-        
-        if errors:
-            messages.warning(
-                request, 
-                f'⚠ Restauración completada con información. '
-                f'{restored_count} registros restaurados.'
-            )
-        else:
-            messages.success(
-                request, 
-                f'✓ Copia "{copia.nombre}" restaurada exitosamente. '
-                f'{restored_count} registros restaurados'
-            )
-        
-        return redirect('copia_seguridad:lista')
-        
-    except Exception as e:
-        messages.error(request, f'✗ Error al restaurar la copia: {str(e)}')
-        return redirect('copia_seguridad:lista')
+    """Encola la restauración de una copia de seguridad"""
+    copia = get_object_or_404(CopiaSeguridadBD.objects.only('id', 'nombre'), id=copia_id)
+    trabajo = trabajos.encolar(TrabajoCopia.RESTAURAR, request.user, copia=copia)
+    _avisar_trabajo(request, trabajo)
+    return redirect('copia_seguridad:lista')
+
+
+@login_required
+def estado_trabajos(request):
+    """Endpoint consultado periódicamente por la lista mientras hay trabajos en curso."""
+    return JsonResponse({'trabajos': [_estado_trabajo(trabajo) for trabajo in trabajos.recientes()]})
 
 
 @login_required
@@ -159,12 +103,33 @@ def restaurar_copia_seguridad(request, copia_id):
 def eliminar_copia_seguridad(request, copia_id):
     """Elimina una copia de seguridad"""
     try:
-        copia = get_object_or_404(CopiaSeguridadBD, id=copia_id)
+        copia = get_object_or_404(CopiaSeguridadBD.objects.only('id', 'nombre'), id=copia_id)
         nombre = copia.nombre
-        copia.delete()
+        if copia.dependientes.exists():
+            messages.error(
+                request,
+                f'✗ La copia "{nombre}" es la base de otras copias incrementales o diferenciales; elimínelas primero'
+            )
+            return redirect('copia_seguridad:lista')
+        motor.eliminar(copia)
         messages.success(request, f'✓ Copia de seguridad "{nombre}" eliminada')
         return redirect('copia_seguridad:lista')
         
     except Exception as e:
         messages.error(request, f'✗ Error al eliminar la copia: {str(e)}')
         return redirect('copia_seguridad:lista')
+
+
+@login_required
+def descargar_copia_seguridad(request, copia_id):
+    """Descarga el archivo de una copia, leído de a un fragmento"""
+    copia = get_object_or_404(CopiaSeguridadBD.objects.defer('datos_backup'), id=copia_id)
+    if copia.formato == CopiaSeguridadBD.FORMATO_NDJSON_GZ:
+        contenido, tipo, extension = motor.fragmentos(copia), 'application/gzip', 'ndjson.gz'
+    else:
+        contenido, tipo, extension = motor.archivo_json(copia), 'application/json', 'json'
+    response = StreamingHttpResponse(contenido, content_type=tipo)
+    response['Content-Disposition'] = f'attachment; filename="copia-{copia.pk}-{copia.fecha_creacion:%Y%m%d-%H%M}.{extension}"'
+    if copia.tamaño_bytes and copia.formato == CopiaSeguridadBD.FORMATO_NDJSON_GZ:
+        response['Content-Length'] = copia.tamaño_bytes
+    return response
@@ -1,3 +1,27 @@
 from django.contrib import admin
+from .models import ArchivoReporte, CorreoSaliente, TrabajoReporte
 
-# Register your models here.
+
+@admin.register(TrabajoReporte)
+class TrabajoReporteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'usuario', 'estado', 'fecha_creacion', 'fecha_fin', 'expira')
+    list_filter = ('estado', 'tipo')
+    readonly_fields = ('fecha_creacion', 'fecha_inicio', 'fecha_fin', 'error', 'clave')
+
+
+@admin.register(ArchivoReporte)
+class ArchivoReporteAdmin(admin.ModelAdmin):
+    list_display = ('nombre_archivo', 'tipo', 'tamaño', 'fecha_creacion', 'expira')
+    list_filter = ('tipo',)
+    exclude = ('archivo',)
+    readonly_fields = ('clave', 'tipo', 'nombre_archivo', 'content_type', 'tamaño', 'fecha_creacion', 'expira')
+
+
+@admin.register(CorreoSaliente)
+class CorreoSalienteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'asunto', 'estado', 'intentos', 'proximo_intento', 'fecha_creacion', 'fecha_envio')
+    list_filter = ('estado',)
+    search_fields = ('asunto',)
+    # El HTML puede traer códigos de recuperación: no se muestra
+    exclude = ('html', 'cuerpo')
+    readonly_fields = ('fecha_creacion', 'fecha_envio', 'intentos', 'error', 'lote')
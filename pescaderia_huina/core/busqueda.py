@@ -0,0 +1,241 @@
+"""
+Búsqueda de texto de las cajas de búsqueda (productos, clientes, pedidos,
+proveedores, usuarios).
+
+`filtrar(queryset, texto, campos)` deja las filas en que alguno de los
+campos contiene el texto, sin distinguir mayúsculas ni tildes ("salmon"
+encuentra "Salmón"). Un `icontains` con comodín inicial obliga a la BD a
+recorrer la tabla; aquí:
+
+- PostgreSQL: se compara f_unaccent(lower(campo)) LIKE '%texto%'. Esa misma
+  expresión tiene un índice GIN con gin_trgm_ops (extensiones pg_trgm y
+  unaccent, migración core 0003 y migraciones de cada app), que resuelve el
+  LIKE sin recorrer la tabla.
+- Otras BD (SQLite en desarrollo y pruebas): índice de trigramas en memoria
+  por proceso. Se reconstruye cuando cambia la versión de los datos del
+  modelo (core.versiones, compartida entre procesos) o cuando este mismo
+  proceso guarda o elimina una fila.
+
+Los campos pueden cruzar relaciones ('items__producto__nombre'). Si alguna
+relación es múltiple, esa parte del filtro va en un EXISTS correlacionado en
+lugar de JOIN + DISTINCT.
+"""
+import heapq
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Case, Exists, Func, IntegerField, OuterRef, Q, TextField, Value, When
+from django.db.models.functions import Length, Lower
+from django.db.models.lookups import Contains, StartsWith
+from django.db.models.signals import post_delete, post_save
+
+from . import versiones
+
+
+LONGITUD_NGRAMA = 3
+
+# {(modelo, campo): (versión de los datos, IndiceNgramas)}
+_indices = {}
+_bloqueo = threading.Lock()
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Salmón ' -> 'salmon '."""
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower())
+    return ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+
+
+class SinTildes(Func):
+    """f_unaccent(texto): unaccent() inmutable que crea la migración core 0003 (solo PostgreSQL)."""
+    function = 'f_unaccent'
+    output_field = TextField()
+
+
+def _ngramas(texto):
+    return {texto[i:i + LONGITUD_NGRAMA] for i in range(len(texto) - LONGITUD_NGRAMA + 1)}
+
+
+class IndiceNgramas:
+    """Trigrama -> pks que lo contienen, más el texto normalizado de cada pk."""
+
+    def __init__(self, filas):
+        self.textos = {}
+        self.ngramas = defaultdict(set)
+        for pk, valor in filas:
+            texto = normalizar(valor)
+            self.textos[pk] = texto
+            for ngrama in _ngramas(texto):
+                self.ngramas[ngrama].add(pk)
+
+    def buscar(self, texto):
+        """pks cuyo texto contiene `texto` (ya normalizado)."""
+        if len(texto) < LONGITUD_NGRAMA:
+            return [pk for pk, valor in self.textos.items() if texto in valor]
+        conjuntos = sorted((self.ngramas.get(ngrama, set()) for ngrama in _ngramas(texto)), key=len)
+        candidatos = conjuntos[0].intersection(*conjuntos[1:])
+        # Los trigramas pueden estar en otro orden: se confirma la subcadena
+        return [pk for pk in candidatos if texto in self.textos[pk]]
+
+    def mejores(self, pks, texto, cantidad):
+        """Los `cantidad` primeros: los que empiezan por `texto`, luego los más cortos."""
+        return heapq.nsmallest(
+            cantidad, pks, key=lambda pk: (not self.textos[pk].startswith(texto), len(self.textos[pk]), pk)
+        )
+
+
+def _indice_en_memoria(modelo, campo, version):
+    clave = (modelo._meta.label, campo)
+    actual = _indices.get(clave)
+    if actual is not None and actual[0] == version:
+        return actual[1]
+    with _bloqueo:
+        actual = _indices.get(clave)
+        if actual is None or actual[0] != version:
+            filas = modelo._base_manager.values_list('pk', campo).order_by().iterator(chunk_size=2000)
+            actual = (version, IndiceNgramas(filas))
+            _indices[clave] = actual
+            _vigilar(modelo)
+    return actual[1]
+
+
+def limpiar_indices(modelo=None):
+    """Descarta los índices en memoria (todos, o los de un modelo)."""
+    with _bloqueo:
+        for clave in list(_indices):
+            if modelo is None or clave[0] == modelo._meta.label:
+                del _indices[clave]
+
+
+def _resolver(modelo, ruta_campo):
+    """'proveedor__nombre_contacto' -> (Proveedor, 'nombre_contacto')."""
+    *relaciones, campo = ruta_campo.split('__')
+    for nombre in relaciones:
+        modelo = modelo._meta.get_field(nombre).related_model
+    return modelo, campo
+
+
+def _filtro_inverso(relacion):
+    """Filtro que, desde el modelo relacionado, vuelve al modelo de origen."""
+    if relacion.auto_created:
+        # Relación inversa (ForeignKey o ManyToMany declarado en el otro modelo)
+        return relacion.field.name
+    return relacion.related_query_name()
+
+
+def _condicion_campo(modelo, ruta_campo, texto, version_grupos):
+    """
+    Q sobre `modelo` para un campo. Si la ruta cruza una relación múltiple
+    ('items__producto__nombre'), esa parte va en un EXISTS correlacionado:
+    la consulta principal sigue teniendo una fila por registro, sin JOIN que
+    multiplique filas (ni DISTINCT ni sumas infladas).
+    """
+    *relaciones, campo = ruta_campo.split('__')
+    actual = modelo
+    for i, nombre in enumerate(relaciones):
+        relacion = actual._meta.get_field(nombre)
+        if relacion.one_to_many or relacion.many_to_many:
+            externa = '__'.join(relaciones[:i] + ['pk'])
+            relacionados = relacion.related_model._base_manager.filter(
+                **{_filtro_inverso(relacion): OuterRef(externa)}
+            )
+            resto = '__'.join(relaciones[i + 1:] + [campo])
+            condicion = _condicion_campo(relacion.related_model, resto, texto, version_grupos)
+            return Q(Exists(relacionados.filter(condicion)))
+        actual = relacion.related_model
+
+    if connection.vendor == 'postgresql':
+        # Misma expresión que el índice GIN: f_unaccent(lower(campo)) LIKE '%texto%'
+        return Q(Contains(SinTildes(Lower(ruta_campo)), texto))
+    version = version_grupos.get(versiones.grupo_de(actual))
+    pks = _indice_en_memoria(actual, campo, version).buscar(texto)
+    ruta = '__'.join(relaciones)
+    return Q(**{f'{ruta or "pk"}__in': pks})
+
+
+def condicion(modelo, texto, campos):
+    """
+    Q de las filas de `modelo` en que alguno de `campos` contiene `texto`,
+    sin distinguir mayúsculas ni tildes; None si no hay texto. Sirve para
+    combinarla con otras condiciones (p. ej. el número de pedido).
+    """
+    texto = ' '.join(normalizar(texto).split())
+    if not texto:
+        return None
+
+    version_grupos = {}
+    if connection.vendor != 'postgresql':
+        grupos = {versiones.grupo_de(_resolver(modelo, ruta)[0]) for ruta in campos} - {None}
+        version_grupos = versiones.versiones(grupos)
+
+    resultado = Q()
+    for ruta_campo in campos:
+        resultado |= _condicion_campo(modelo, ruta_campo, texto, version_grupos)
+    return resultado
+
+
+def filtrar(queryset, texto, campos):
+    """
+    Filas de `queryset` en que alguno de `campos` contiene `texto`, sin
+    distinguir mayúsculas ni tildes. Sin texto retorna el queryset igual.
+    """
+    filtro = condicion(queryset.model, texto, campos)
+    return queryset if filtro is None else queryset.filter(filtro)
+
+
+def autocompletar(queryset, texto, campo, limite=20):
+    """
+    Hasta `limite` filas de `queryset` cuyo `campo` contiene `texto`, primero
+    las que empiezan por él y luego las más cortas (autocompletado del POS).
+    En memoria solo se consultan a la BD los mejores candidatos, por tandas,
+    en lugar de mandar miles de pks para quedarse con `limite`.
+    """
+    texto = ' '.join(normalizar(texto).split())
+    if not texto:
+        return list(queryset[:limite])
+
+    if connection.vendor == 'postgresql':
+        coincidencias = filtrar(queryset, texto, [campo]).alias(
+            _empieza=Case(
+                When(StartsWith(SinTildes(Lower(campo)), texto), then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+            _longitud=Length(campo),
+        )
+        return list(coincidencias.order_by('_empieza', '_longitud', 'pk')[:limite])
+
+    modelo, nombre_campo = _resolver(queryset.model, campo)
+    grupo = versiones.grupo_de(modelo)
+    version = versiones.versiones([grupo]).get(grupo) if grupo else None
+    indice = _indice_en_memoria(modelo, nombre_campo, version)
+    coincidencias = indice.buscar(texto)
+
+    # Casi siempre basta la primera tanda; el orden completo solo hace falta
+    # si los filtros del queryset (activos, tipo...) descartan muchos candidatos
+    tanda = max(limite * 5, 100)
+    resultado = []
+    for inicio in range(0, len(coincidencias), tanda):
+        pks = indice.mejores(coincidencias, texto, inicio + tanda)[inicio:]
+        encontrados = {fila.pk: fila for fila in queryset.filter(pk__in=pks)}
+        resultado.extend(encontrados[pk] for pk in pks if pk in encontrados)
+        if len(resultado) >= limite:
+            break
+    return resultado[:limite]
+
+
+def _descartar_indice(sender, **kwargs):
+    limpiar_indices(sender)
+
+
+def _vigilar(modelo):
+    """
+    Descarta los índices en memoria de `modelo` cuando este proceso guarda o
+    elimina una fila. Solo se conecta para los modelos que tienen índice: una
+    señal post_delete sin sender le quitaría a todos los modelos el borrado
+    rápido de Django (DELETE directo, sin cargar las filas).
+    """
+    etiqueta = modelo._meta.label
+    post_save.connect(_descartar_indice, sender=modelo, weak=False, dispatch_uid=f'busqueda:{etiqueta}:save')
+    post_delete.connect(_descartar_indice, sender=modelo, weak=False, dispatch_uid=f'busqueda:{etiqueta}:delete')
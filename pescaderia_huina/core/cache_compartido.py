@@ -0,0 +1,84 @@
+"""
+Cache compartido entre procesos (settings.CACHES['default']).
+
+Con varios workers de gunicorn, un LocMemCache da a cada proceso su propio
+cache: los contadores de intentos de login se multiplican por el número de
+workers y todo se pierde al reiniciar. El backend se elige en settings con
+CACHE_BACKEND (python-decouple):
+
+- redis: servidor Redis en REDIS_URL (producción; incr y add son atómicos).
+- db:    tabla core_cache en la BD de la aplicación (sin servicios extra).
+- file:  archivos en CACHE_DIR (desarrollo y pruebas; compartido por los
+         procesos de la misma máquina).
+- locmem: un solo proceso.
+
+Además de `django.core.cache.cache`, este módulo ofrece
+`obtener(clave, calcular, segundos)`: lectura en dos niveles para claves
+calientes. Primero un dict del proceso (L1, vida corta), luego el cache
+compartido (L2) y, si tampoco está, `calcular()`. Usar solo con claves cuyo
+valor no cambia (p. ej. las que incluyen una versión): L1 no se entera de
+escrituras hechas en otros procesos.
+
+Los límites de intentos (login, recuperación) no usan contadores del cache:
+ver core.limite_intentos.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Vida en L1 de cada clave, en segundos
+SEGUNDOS_L1 = getattr(settings, 'CACHE_L1_SEGUNDOS', 30)
+
+# Claves en L1; al pasar el límite se descartan las que vencen primero
+MAXIMO_L1 = 500
+
+_local = {}
+_bloqueo = threading.Lock()
+
+
+def _leer_local(clave):
+    entrada = _local.get(clave)
+    if entrada is None:
+        return None
+    vence, valor = entrada
+    if vence < time.monotonic():
+        _local.pop(clave, None)
+        return None
+    return valor
+
+
+def _guardar_local(clave, valor, segundos):
+    with _bloqueo:
+        if len(_local) >= MAXIMO_L1:
+            for vieja, _ in sorted(_local.items(), key=lambda item: item[1][0])[:MAXIMO_L1 // 4]:
+                _local.pop(vieja, None)
+        _local[clave] = (time.monotonic() + segundos, valor)
+
+
+def obtener(clave, calcular, segundos, segundos_local=None):
+    """
+    Valor de `clave` desde L1, L2 o `calcular()` (en ese orden). Lo que se
+    calcula se guarda `segundos` en L2 y `segundos_local` (SEGUNDOS_L1 por
+    defecto, nunca más que `segundos`) en L1. `calcular` no debe retornar None.
+    """
+    valor = _leer_local(clave)
+    if valor is not None:
+        return valor
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, segundos)
+    vida_local = SEGUNDOS_L1 if segundos_local is None else segundos_local
+    if segundos is not None:
+        vida_local = min(vida_local, segundos)
+    _guardar_local(clave, valor, vida_local)
+    return valor
+
+
+def limpiar_local():
+    """Vacía L1 de este proceso (pruebas, o tras restaurar datos)."""
+    with _bloqueo:
+        _local.clear()
@@ -0,0 +1,97 @@
+"""
+Conexiones a la BD remota (Supabase) y su chequeo de salud.
+
+Django 4.2 no trae pool de conexiones propio: cada hilo de un worker
+mantiene su conexión abierta (CONN_MAX_AGE) y, con CONN_HEALTH_CHECKS, la
+verifica al inicio de cada petición antes de reutilizarla. Una conexión que
+el pooler o la red cerraron se descarta y se abre otra, en lugar de fallar
+a mitad de la petición.
+
+Este módulo cuenta, por proceso, cuántas conexiones se abrieron y cuántas
+peticiones reutilizaron una ya abierta (si se abren muchas, CONN_MAX_AGE es
+corto o el pooler las está cortando). `estado()` lo reporta junto con una
+consulta de prueba; lo usa la vista `core:salud`.
+"""
+import os
+import threading
+import time
+
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.backends.signals import connection_created
+
+
+_bloqueo = threading.Lock()
+_contadores = {'creadas': 0, 'reutilizadas': 0, 'peticiones': 0}
+_ultima_creacion = {'instante': None}
+_hilo = threading.local()
+
+
+def _al_crear_conexion(sender, connection, **kwargs):
+    if connection.alias != DEFAULT_DB_ALIAS:
+        return
+    with _bloqueo:
+        _contadores['creadas'] += 1
+        _ultima_creacion['instante'] = time.time()
+    _hilo.creada = time.monotonic()
+
+
+def _al_iniciar_peticion(sender, **kwargs):
+    # Se registra después del cierre de conexiones vencidas/caídas de Django:
+    # si la conexión sigue abierta aquí, esta petición la reutiliza
+    reutilizada = connections[DEFAULT_DB_ALIAS].connection is not None
+    with _bloqueo:
+        _contadores['peticiones'] += 1
+        if reutilizada:
+            _contadores['reutilizadas'] += 1
+
+
+def conectar_senales():
+    connection_created.connect(_al_crear_conexion, dispatch_uid='core_conexiones_creada')
+    request_started.connect(_al_iniciar_peticion, dispatch_uid='core_conexiones_peticion')
+
+
+def estadisticas():
+    """Contadores de conexiones de este proceso y configuración vigente."""
+    conexion = connections[DEFAULT_DB_ALIAS]
+    ajustes = conexion.settings_dict
+    with _bloqueo:
+        contadores = dict(_contadores)
+        ultima = _ultima_creacion['instante']
+    abierta = conexion.connection is not None
+    creada = getattr(_hilo, 'creada', None)
+    return {
+        'proceso': os.getpid(),
+        'motor': conexion.vendor,
+        'conexiones_creadas': contadores['creadas'],
+        'peticiones': contadores['peticiones'],
+        'peticiones_con_conexion_reutilizada': contadores['reutilizadas'],
+        'ultima_conexion_creada': ultima,
+        'conexion_abierta': abierta,
+        'edad_conexion_segundos': round(time.monotonic() - creada, 1) if abierta and creada else None,
+        'conn_max_age': ajustes.get('CONN_MAX_AGE'),
+        'conn_health_checks': ajustes.get('CONN_HEALTH_CHECKS'),
+        'server_side_binding': bool(ajustes.get('OPTIONS', {}).get('server_side_binding')),
+        'prepare_threshold': ajustes.get('OPTIONS', {}).get('prepare_threshold'),
+        'cursores_de_servidor': not ajustes.get('DISABLE_SERVER_SIDE_CURSORS', False),
+    }
+
+
+def estado():
+    """
+    (ok, datos): ejecuta SELECT 1 y mide cuánto tardó. ok es False si la BD
+    no responde; el error se reporta por su tipo, sin detalles de conexión.
+    """
+    datos = {}
+    inicio = time.perf_counter()
+    try:
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        ok = True
+    except DatabaseError as e:
+        ok = False
+        datos['error'] = e.__class__.__name__
+    datos['latencia_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    datos.update(estadisticas())
+    return ok, datos
@@ -1,55 +1,83 @@
 from decimal import Decimal
 
-from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum, Value
-from django.db.models.functions import Coalesce
+from productos.models import StockProducto
+from productos.stock import version_stock
 
-from productos.models import Producto
+from . import cache_compartido
 
 
 LOW_STOCK_THRESHOLD = Decimal('10')
 
+# Red de seguridad: aunque la versión de stock no cambie, recalcular cada 10 min
+LOW_STOCK_CACHE_TIMEOUT = 10 * 60
+
 
 def _unidad_stock(tipo_presentacion):
     return 'Libras' if tipo_presentacion == 'LIB' else 'Unidades'
 
 
-def low_stock_notifications(request):
-    """Context processor para notificaciones de stock bajo o agotado."""
-    productos = Producto.objects.filter(estado=True).annotate(
-        recibido=Coalesce(
-            Sum('detallepedido__cantidad', filter=Q(detallepedido__pedido__estado='REC')),
-            Value(0),
-            output_field=DecimalField(max_digits=12, decimal_places=2),
-        ),
-        vendido=Coalesce(
-            Sum('ventaitem__cantidad', filter=Q(ventaitem__venta__estado='COMPLETADA')),
-            Value(0),
-            output_field=DecimalField(max_digits=12, decimal_places=2),
-        ),
-    ).annotate(
-        stock_calc=ExpressionWrapper(
-            F('recibido') - F('vendido'),
-            output_field=DecimalField(max_digits=12, decimal_places=2),
-        )
-    ).select_related('proveedor').order_by('nombre')
+def _calcular_notificaciones_stock():
+    """Lee del libro de stock los productos activos en o bajo el umbral."""
+    filas = StockProducto.objects.filter(
+        producto__estado=True,
+        disponible__lte=LOW_STOCK_THRESHOLD,
+    ).order_by('producto__nombre').values(
+        'producto_id', 'producto__nombre', 'producto__tipo_presentacion', 'disponible'
+    )
 
     low_stock_critical = []
     low_stock_warning = []
 
-    for producto in productos:
-        stock_actual = producto.stock_calc or Decimal('0')
-        producto.stock_notif = int(round(float(stock_actual)))
-        producto.unidad_stock = _unidad_stock(producto.tipo_presentacion)
+    for fila in filas:
+        stock_actual = fila['disponible'] or Decimal('0')
+        producto = {
+            'id': fila['producto_id'],
+            'nombre': fila['producto__nombre'],
+            'stock_notif': int(round(float(stock_actual))),
+            'unidad_stock': _unidad_stock(fila['producto__tipo_presentacion']),
+        }
 
         if stock_actual <= 0:
             low_stock_critical.append(producto)
-        elif stock_actual <= LOW_STOCK_THRESHOLD:
+        else:
             low_stock_warning.append(producto)
 
     return {
         'low_stock_critical': low_stock_critical,
         'low_stock_warning': low_stock_warning,
-        'low_stock_count': len(low_stock_critical) + len(low_stock_warning),
+    }
+
+
+def obtener_notificaciones_stock():
+    """
+    Notificaciones cacheadas bajo la versión actual del stock.
+    Cualquier movimiento de stock o cambio de producto cambia la versión
+    (productos.stock.invalidar_cache_stock), así que el cache nunca queda viejo.
+    """
+    # La clave incluye la versión: su valor no cambia y puede quedarse en la
+    # memoria del proceso (L1) además del cache compartido (L2)
+    cache_key = f'low_stock:{version_stock()}'
+    return cache_compartido.obtener(cache_key, _calcular_notificaciones_stock, LOW_STOCK_CACHE_TIMEOUT)
+
+
+def low_stock_notifications(request):
+    """
+    Context processor para notificaciones de stock bajo o agotado.
+
+    Los valores son perezosos: las plantillas que no usan `low_stock_*`
+    (login, 404...) no consultan ni el cache ni la base de datos.
+    """
+    datos = {}
+
+    def cargar():
+        if not datos:
+            datos.update(obtener_notificaciones_stock())
+        return datos
+
+    return {
+        'low_stock_critical': lambda: cargar()['low_stock_critical'],
+        'low_stock_warning': lambda: cargar()['low_stock_warning'],
+        'low_stock_count': lambda: len(cargar()['low_stock_critical']) + len(cargar()['low_stock_warning']),
         'low_stock_threshold': int(LOW_STOCK_THRESHOLD),
-        'low_stock_products': low_stock_critical + low_stock_warning,
-    }
\ No newline at end of file
+        'low_stock_products': lambda: cargar()['low_stock_critical'] + cargar()['low_stock_warning'],
+    }
@@ -0,0 +1,209 @@
+"""
+Bandeja de salida de correos (recuperación de contraseña y otros avisos).
+
+Enviar por SMTP dentro de la petición la deja esperando varios segundos al
+servidor de correo, y un servidor lento ocupa los workers. Las vistas
+encolan el mensaje (`encolar(mensaje)`, una fila CorreoSaliente) y responden
+de inmediato. El comando `manage.py procesar_correos` toma los pendientes
+(la cola es la propia BD, como la de reportes) y los envía:
+
+- En lotes de hasta TAMAÑO_LOTE sobre una sola conexión SMTP: una sola
+  negociación TLS y login por lote, no una por correo.
+- Un correo que falla vuelve a PENDIENTE con una espera que se duplica en
+  cada intento (desde ESPERA_BASE_SEGUNDOS, con algo de azar) hasta
+  MAXIMO_INTENTOS; luego queda en ERROR.
+- Si no se puede abrir la conexión, todo el lote se reintenta igual.
+
+Con CORREOS_SEGUNDO_PLANO=False (desarrollo sin trabajador) `encolar` envía
+en la misma petición, pasando igualmente por la bandeja.
+
+Un correo con `expira` lleva algo que vence (el código de recuperación): al
+quedar ENVIADO o en ERROR se le borra el texto y el HTML, para que el código
+no quede guardado en claro los CONSERVAR_DIAS que se conserva la fila.
+"""
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+from .models import CorreoSaliente
+
+
+TAMAÑO_LOTE = getattr(settings, 'CORREOS_TAMAÑO_LOTE', 20)
+
+MAXIMO_INTENTOS = getattr(settings, 'CORREOS_MAXIMO_INTENTOS', 6)
+
+ESPERA_BASE_SEGUNDOS = 30
+
+ESPERA_MAXIMA_SEGUNDOS = 60 * 60
+
+# Un correo que lleva más de esto "enviando" se considera abandonado (el
+# trabajador murió a mitad de lote) y vuelve a la cola
+TIEMPO_MAXIMO_MINUTOS = 10
+
+# Días que se conservan los correos enviados o fallidos
+CONSERVAR_DIAS = 7
+
+
+def encolar(mensaje, expira=None):
+    """
+    Guarda un EmailMessage/EmailMultiAlternatives en la bandeja de salida.
+    `expira` (timedelta): pasado ese tiempo ya no se envía.
+    """
+    html = next(
+        (contenido for contenido, tipo in getattr(mensaje, 'alternatives', []) if tipo == 'text/html'),
+        '',
+    )
+    correo = CorreoSaliente.objects.create(
+        asunto=mensaje.subject,
+        remitente=mensaje.from_email or '',
+        destinatarios=list(mensaje.to),
+        copia=list(mensaje.cc),
+        copia_oculta=list(mensaje.bcc),
+        cuerpo=mensaje.body,
+        html=html,
+        expira=timezone.now() + expira if expira else None,
+    )
+    if not getattr(settings, 'CORREOS_SEGUNDO_PLANO', True):
+        enviar_lote(tomar_lote(ids=[correo.pk]))
+    return correo
+
+
+def _mensaje(correo, conexion):
+    mensaje = EmailMultiAlternatives(
+        subject=correo.asunto,
+        body=correo.cuerpo,
+        from_email=correo.remitente or None,
+        to=correo.destinatarios,
+        cc=correo.copia,
+        bcc=correo.copia_oculta,
+        connection=conexion,
+    )
+    if correo.html:
+        mensaje.attach_alternative(correo.html, 'text/html')
+    return mensaje
+
+
+def _espera(intentos):
+    segundos = min(ESPERA_BASE_SEGUNDOS * 2 ** (intentos - 1), ESPERA_MAXIMA_SEGUNDOS)
+    # Azar: los correos que fallaron juntos no se reintentan todos a la vez
+    return timedelta(seconds=segundos * random.uniform(0.8, 1.2))
+
+
+def _contenido_resuelto(correo):
+    """Campos a vaciar cuando el correo queda ENVIADO o en ERROR."""
+    return {'cuerpo': '', 'html': ''} if correo.expira else {}
+
+
+def _fallo(correo, error, ahora):
+    intentos = correo.intentos + 1
+    cambios = {'intentos': intentos, 'error': str(error) or error.__class__.__name__, 'lote': ''}
+    if intentos >= MAXIMO_INTENTOS:
+        cambios.update(estado=CorreoSaliente.ERROR, **_contenido_resuelto(correo))
+    else:
+        cambios.update(estado=CorreoSaliente.PENDIENTE, proximo_intento=ahora + _espera(intentos))
+    CorreoSaliente.objects.filter(pk=correo.pk).update(**cambios)
+
+
+# ==================== TRABAJADOR ====================
+
+def tomar_lote(tamaño=TAMAÑO_LOTE, ids=None):
+    """
+    Reclama hasta `tamaño` correos pendientes cuyo próximo intento ya llegó.
+    El UPDATE condicional (... WHERE estado = 'PENDIENTE') marca el lote con
+    una clave propia: si dos trabajadores eligen los mismos correos, cada
+    uno se queda solo con los que logró marcar.
+    """
+    ahora = timezone.now()
+    pendientes = CorreoSaliente.objects.filter(estado=CorreoSaliente.PENDIENTE, proximo_intento__lte=ahora)
+    if ids is not None:
+        pendientes = pendientes.filter(pk__in=ids)
+    pks = list(pendientes.order_by('proximo_intento', 'pk').values_list('pk', flat=True)[:tamaño])
+    if not pks:
+        return []
+    lote = uuid.uuid4().hex
+    CorreoSaliente.objects.filter(pk__in=pks, estado=CorreoSaliente.PENDIENTE).update(
+        estado=CorreoSaliente.ENVIANDO, lote=lote, proximo_intento=ahora,
+    )
+    return list(CorreoSaliente.objects.filter(lote=lote).order_by('pk'))
+
+
+def enviar_lote(correos):
+    """Envía un lote reclamado sobre una sola conexión. Retorna cuántos se enviaron."""
+    if not correos:
+        return 0
+    ahora = timezone.now()
+    vigentes = []
+    for correo in correos:
+        if correo.expira and correo.expira < ahora:
+            CorreoSaliente.objects.filter(pk=correo.pk).update(
+                estado=CorreoSaliente.ERROR, error='Expiró antes de poder enviarse', lote='',
+                **_contenido_resuelto(correo),
+            )
+        else:
+            vigentes.append(correo)
+    if not vigentes:
+        return 0
+
+    conexion = get_connection(fail_silently=False)
+    try:
+        conexion.open()
+    except Exception as e:
+        for correo in vigentes:
+            _fallo(correo, e, ahora)
+        return 0
+
+    enviados = 0
+    try:
+        for correo in vigentes:
+            try:
+                conexion.send_messages([_mensaje(correo, conexion)])
+            except Exception as e:
+                _fallo(correo, e, timezone.now())
+                continue
+            CorreoSaliente.objects.filter(pk=correo.pk).update(
+                estado=CorreoSaliente.ENVIADO, intentos=correo.intentos + 1,
+                fecha_envio=timezone.now(), error='', lote='',
+                **_contenido_resuelto(correo),
+            )
+            enviados += 1
+    finally:
+        try:
+            conexion.close()
+        except Exception:
+            pass
+    return enviados
+
+
+def procesar_pendientes(tamaño=TAMAÑO_LOTE):
+    """Envía lotes hasta vaciar los pendientes que ya tocan. Retorna cuántos procesó."""
+    procesados = 0
+    while True:
+        lote = tomar_lote(tamaño)
+        if not lote:
+            return procesados
+        enviar_lote(lote)
+        procesados += len(lote)
+
+
+def limpiar_correos():
+    """
+    Devuelve a la cola los correos abandonados, vacía los resueltos que
+    vencían y borra los viejos ya resueltos.
+    """
+    ahora = timezone.now()
+    CorreoSaliente.objects.filter(
+        estado=CorreoSaliente.ENVIANDO,
+        proximo_intento__lt=ahora - timedelta(minutes=TIEMPO_MAXIMO_MINUTOS),
+    ).update(estado=CorreoSaliente.PENDIENTE, lote='', proximo_intento=ahora)
+    resueltos = CorreoSaliente.objects.filter(estado__in=[CorreoSaliente.ENVIADO, CorreoSaliente.ERROR])
+    # Los que quedaron con contenido de antes de vaciarse al resolverse
+    resueltos.filter(expira__isnull=False).exclude(cuerpo='', html='').update(cuerpo='', html='')
+    eliminados, _ = CorreoSaliente.objects.filter(
+        estado__in=[CorreoSaliente.ENVIADO, CorreoSaliente.ERROR],
+        fecha_creacion__lt=ahora - timedelta(days=CONSERVAR_DIAS),
+    ).delete()
+    return eliminados
@@ -0,0 +1,141 @@
+"""
+Motor compartido de exportación a Excel.
+
+Usa el modo write-only de openpyxl: cada fila se escribe a disco en cuanto se
+agrega, así que la memoria no crece con el número de registros. Los estilos
+se registran una sola vez como NamedStyle y las celdas solo los referencian
+por nombre (en lugar de crear Font/PatternFill por celda).
+
+Uso:
+    excel = ExportadorExcel('Ventas', 'ventas.xlsx')
+    excel.estilo('encabezado', fuente=Font(bold=True), fondo='0A3D62')
+    excel.anchos([10, 25])
+    excel.fila(['#', 'Cliente'], 'encabezado')
+    for venta in Venta.objects.iterator(chunk_size=CHUNK_SIZE):
+        excel.fila([venta.id, venta.nombre_cliente])
+    return excel.respuesta()
+"""
+import tempfile
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Registros por consulta al iterar querysets grandes
+CHUNK_SIZE = 2000
+
+# Paleta compartida por los reportes
+AZUL_OSCURO = "0A3D62"
+VERDE = "198754"
+GRIS_CLARO = "F2F2F2"
+
+ALINEACION_CENTRO = Alignment(horizontal='center', vertical='center', wrap_text=True)
+ALINEACION_IZQUIERDA = Alignment(horizontal='left', vertical='center', wrap_text=True)
+ALINEACION_DERECHA = Alignment(horizontal='right', vertical='center')
+
+BORDE_GRIS = Border(
+    left=Side(style='thin', color='CCCCCC'),
+    right=Side(style='thin', color='CCCCCC'),
+    top=Side(style='thin', color='CCCCCC'),
+    bottom=Side(style='thin', color='CCCCCC'),
+)
+
+
+def relleno(color):
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+class ExportadorExcel:
+    """Hoja de Excel en modo streaming con estilos con nombre."""
+
+    def __init__(self, titulo_hoja, nombre_archivo):
+        self.nombre_archivo = nombre_archivo
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(titulo_hoja)
+        self.filas_escritas = 0
+
+    def estilo(self, nombre, fuente=None, fondo=None, alineacion=None, borde=None, formato=None):
+        """Registra un NamedStyle reutilizable por todas las celdas de la hoja."""
+        estilo = NamedStyle(name=nombre)
+        if fuente is not None:
+            estilo.font = fuente
+        if fondo is not None:
+            estilo.fill = relleno(fondo) if isinstance(fondo, str) else fondo
+        if alineacion is not None:
+            estilo.alignment = alineacion
+        if borde is not None:
+            estilo.border = borde
+        if formato is not None:
+            estilo.number_format = formato
+        self.wb.add_named_style(estilo)
+
+    def anchos(self, anchos):
+        """Anchos de columna; deben definirse antes de escribir filas."""
+        for col, ancho in enumerate(anchos, 1):
+            self.ws.column_dimensions[get_column_letter(col)].width = ancho
+
+    def congelar(self, celda):
+        self.ws.freeze_panes = celda
+
+    def fila(self, valores, estilos=None, alto=None, combinar=None):
+        """
+        Escribe una fila.
+        `estilos` es un nombre para toda la fila o una lista (uno por celda,
+        None para dejar la celda sin estilo). `combinar` es uno o varios rangos
+        de columnas como 'A:I' que se combinan en esta fila.
+        """
+        self.filas_escritas += 1
+        numero = self.filas_escritas
+        if alto is not None:
+            self.ws.row_dimensions[numero].height = alto
+        if isinstance(combinar, str):
+            combinar = [combinar]
+        for rango in combinar or []:
+            inicio, fin = rango.split(':')
+            self.ws.merged_cells.add(f'{inicio}{numero}:{fin}{numero}')
+
+        if isinstance(estilos, str) or estilos is None:
+            estilos = [estilos] * len(valores)
+
+        celdas = []
+        for valor, nombre_estilo in zip(valores, estilos):
+            celda = WriteOnlyCell(self.ws, value=valor)
+            if nombre_estilo:
+                celda.style = nombre_estilo
+            celdas.append(celda)
+        self.ws.append(celdas)
+        return numero
+
+    def fila_vacia(self):
+        self.filas_escritas += 1
+        self.ws.append([])
+
+    def guardar(self, destino):
+        """Guarda el libro en `destino` (ruta o archivo binario abierto)."""
+        self.wb.save(destino)
+
+    def temporal(self):
+        """El libro guardado en un temporal (en memoria hasta 1 MB, luego en disco), al inicio."""
+        archivo = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        self.guardar(archivo)
+        archivo.seek(0)
+        return archivo
+
+    def archivo(self):
+        """(temporal, nombre_archivo, content_type) para guardar en el cache de reportes."""
+        return self.temporal(), self.nombre_archivo, CONTENT_TYPE_XLSX
+
+    def respuesta(self):
+        """Respuesta en streaming: FileResponse envía el temporal por bloques."""
+        archivo = self.temporal()
+        return FileResponse(
+            archivo,
+            as_attachment=True,
+            filename=self.nombre_archivo,
+            content_type=CONTENT_TYPE_XLSX,
+        )
@@ -0,0 +1,46 @@
+"""
+Filtros por rango de días sobre campos DateTimeField.
+
+`fecha_venta__date__gte=dia` se traduce a una función sobre la columna
+(DATE(...) con conversión de zona horaria), y la BD no puede usar el índice
+de fecha_venta: recorre la tabla. Aquí el día se convierte al rango de
+instantes [inicio del día, inicio del día siguiente) en la zona horaria
+local, que sí se resuelve con el índice.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def _dia(valor):
+    """date a partir de un date o un texto AAAA-MM-DD; None si no es válido."""
+    if isinstance(valor, datetime):
+        return timezone.localdate(valor) if timezone.is_aware(valor) else valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return parse_date(str(valor).strip())
+    except ValueError:
+        return None
+
+
+def inicio_del_dia(dia):
+    """Primer instante del día en la zona horaria local."""
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def filtro_rango_dias(campo, fecha_inicio=None, fecha_fin=None):
+    """
+    kwargs de filter() para `campo` entre dos días, ambos incluidos
+    (None, vacío o inválido = sin límite).
+    Ej.: Venta.objects.filter(**filtro_rango_dias('fecha_venta', '2024-01-01', '2024-01-31'))
+    """
+    filtros = {}
+    inicio = _dia(fecha_inicio) if fecha_inicio else None
+    fin = _dia(fecha_fin) if fecha_fin else None
+    if inicio:
+        filtros[f'{campo}__gte'] = inicio_del_dia(inicio)
+    if fin:
+        filtros[f'{campo}__lt'] = inicio_del_dia(fin + timedelta(days=1))
+    return filtros
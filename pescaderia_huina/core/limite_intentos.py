@@ -0,0 +1,225 @@
+"""
+Límites de intentos (login, recuperación de contraseña) con GCRA.
+
+GCRA (Generic Cell Rate Algorithm) equivale a un token bucket: `intentos`
+por cada `segundos`, que se recuperan de a uno cada segundos / intentos.
+Por clave solo se guarda un número, el instante teórico de la próxima
+llegada (TAT). Un intento se permite si TAT no está más de
+`segundos - intervalo` en el futuro, y entonces TAT avanza un intervalo.
+
+Comprobar y gastar el intento es UNA operación atómica, antes de validar la
+contraseña: diez peticiones en paralelo no pueden leer todas "quedan 4" y
+pasar. Varias claves (usuario+IP, usuario, IP) se comprueban juntas: se
+gasta en todas o en ninguna.
+
+- Redis (CACHES['default'] con RedisCache): un script Lua, un solo viaje.
+- Otro backend: tabla LimiteIntentos, un INSERT ... ON CONFLICT DO UPDATE
+  ... WHERE ... RETURNING por clave (PostgreSQL y SQLite 3.35+).
+
+`limitar(...)` lo aplica a una vista como decorador.
+"""
+import math
+import random
+import time
+from collections import namedtuple
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+
+from .models import LimiteIntentos
+
+
+# Límite por petición: `clave(request)` retorna el valor a limitar
+# (IP, usuario...) o None para no aplicarlo
+Limite = namedtuple('Limite', ['nombre', 'intentos', 'segundos', 'clave'])
+
+# restantes: intentos que quedan en la clave más restringida
+Resultado = namedtuple('Resultado', ['permitido', 'reintentar_en', 'restantes'])
+
+PREFIJO = 'limite'
+
+# Probabilidad de borrar filas vencidas en cada consumo (backend de BD)
+PROBABILIDAD_LIMPIEZA = 0.01
+
+
+def _clave(nombre, valor):
+    return f'{PREFIJO}:{nombre}:{str(valor).strip().lower()[:150]}'
+
+
+def _intervalo(intentos, segundos):
+    return segundos / intentos
+
+
+def _restantes(tat, ahora, intentos, segundos):
+    intervalo = _intervalo(intentos, segundos)
+    return max(0, int((segundos - (tat - ahora)) // intervalo + 1e-9))
+
+
+def _es_redis():
+    return cache.__class__.__name__ == 'RedisCache'
+
+
+# ==================== REDIS ====================
+
+# KEYS: claves; ARGV: intervalo y periodo de cada clave, en el mismo orden
+_LUA_CONSUMIR = """
+local reloj = redis.call('TIME')
+local ahora = tonumber(reloj[1]) + tonumber(reloj[2]) / 1000000
+local nuevos = {}
+local espera = 0
+for i = 1, #KEYS do
+    local intervalo = tonumber(ARGV[2 * i - 1])
+    local periodo = tonumber(ARGV[2 * i])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or '0')
+    if tat < ahora then tat = ahora end
+    local exceso = tat + intervalo - ahora - periodo
+    if exceso > espera then espera = exceso end
+    nuevos[i] = tat + intervalo
+end
+if espera > 0 then
+    return {0, tostring(espera), tostring(ahora)}
+end
+local respuesta = {1, '0', tostring(ahora)}
+for i = 1, #KEYS do
+    redis.call('SET', KEYS[i], string.format('%.6f', nuevos[i]), 'PX', math.ceil((nuevos[i] - ahora) * 1000))
+    respuesta[#respuesta + 1] = string.format('%.6f', nuevos[i])
+end
+return respuesta
+"""
+
+_scripts = {}
+
+
+def _consumir_redis(limites):
+    claves = [cache.make_and_validate_key(clave) for clave, _, _ in limites]
+    cliente = cache._cache.get_client(claves[0], write=True)
+    script = _scripts.get(id(cliente))
+    if script is None:
+        script = _scripts[id(cliente)] = cliente.register_script(_LUA_CONSUMIR)
+    argumentos = []
+    for _, intentos, segundos in limites:
+        argumentos += [_intervalo(intentos, segundos), segundos]
+
+    permitido, espera, ahora, *nuevos = script(keys=claves, args=argumentos)
+    if not int(permitido):
+        return Resultado(False, float(espera), 0)
+    restantes = min(
+        _restantes(float(tat), float(ahora), intentos, segundos)
+        for tat, (_, intentos, segundos) in zip(nuevos, limites)
+    )
+    return Resultado(True, 0, restantes)
+
+
+# ==================== BASE DE DATOS ====================
+
+class _Rechazado(Exception):
+    def __init__(self, espera):
+        self.espera = espera
+
+
+def _consumir_clave_bd(cursor, tabla, clave, intentos, segundos, ahora):
+    """Gasta un intento de `clave` con un solo UPSERT condicional; retorna el nuevo TAT."""
+    intervalo = _intervalo(intentos, segundos)
+    cursor.execute(
+        f'INSERT INTO {tabla} (clave, tat) VALUES (%s, %s) '
+        f'ON CONFLICT (clave) DO UPDATE SET '
+        f'tat = (CASE WHEN {tabla}.tat > %s THEN {tabla}.tat ELSE %s END) + %s '
+        f'WHERE {tabla}.tat <= %s '
+        f'RETURNING tat',
+        [clave, ahora + intervalo, ahora, ahora, intervalo, ahora + segundos - intervalo],
+    )
+    fila = cursor.fetchone()
+    if fila is not None:
+        return fila[0]
+    # Sin fila: la condición no se cumplió, el límite está agotado
+    cursor.execute(f'SELECT tat FROM {tabla} WHERE clave = %s', [clave])
+    tat = cursor.fetchone()[0]
+    raise _Rechazado(tat + intervalo - ahora - segundos)
+
+
+def _consumir_bd(limites):
+    ahora = time.time()
+    tabla = connection.ops.quote_name(LimiteIntentos._meta.db_table)
+    nuevos = []
+    try:
+        # Todo o nada: si una clave está agotada no se gasta en las demás
+        with transaction.atomic(), connection.cursor() as cursor:
+            for clave, intentos, segundos in limites:
+                nuevos.append(_consumir_clave_bd(cursor, tabla, clave, intentos, segundos, ahora))
+    except _Rechazado as rechazo:
+        return Resultado(False, max(rechazo.espera, 0), 0)
+
+    if random.random() < PROBABILIDAD_LIMPIEZA:
+        LimiteIntentos.objects.filter(tat__lt=ahora).delete()
+    restantes = min(
+        _restantes(tat, ahora, intentos, segundos)
+        for tat, (_, intentos, segundos) in zip(nuevos, limites)
+    )
+    return Resultado(True, 0, restantes)
+
+
+# ==================== API ====================
+
+def consumir(*limites):
+    """
+    Gasta un intento en cada (clave, intentos, segundos), de forma atómica:
+    en todas o, si alguna está agotada, en ninguna.
+    """
+    # Orden fijo de claves: dos peticiones no se bloquean en cruz
+    limites = sorted(set(limites))
+    if not limites:
+        return Resultado(True, 0, math.inf)
+    if _es_redis():
+        return _consumir_redis(limites)
+    return _consumir_bd(limites)
+
+
+def claves_de(request, limites):
+    """[(clave, intentos, segundos)] de los límites que aplican a la petición."""
+    resultado = []
+    for limite in limites:
+        valor = limite.clave(request)
+        if valor:
+            resultado.append((_clave(limite.nombre, valor), limite.intentos, limite.segundos))
+    return resultado
+
+
+def reiniciar(request, *limites):
+    """Devuelve todos los intentos de los límites de la petición (p. ej. tras un login correcto)."""
+    claves = [clave for clave, _, _ in claves_de(request, limites)]
+    if _es_redis():
+        cache.delete_many(list(claves))
+    else:
+        LimiteIntentos.objects.filter(clave__in=claves).delete()
+
+
+def respuesta_limitada(request, resultado):
+    """Respuesta por defecto de `limitar`: 429 con Retry-After."""
+    segundos = max(1, math.ceil(resultado.reintentar_en))
+    respuesta = HttpResponse(
+        f'Demasiados intentos. Intenta de nuevo en {math.ceil(segundos / 60)} minuto(s).',
+        status=429,
+        content_type='text/plain; charset=utf-8',
+    )
+    respuesta['Retry-After'] = str(segundos)
+    return respuesta
+
+
+def limitar(*limites, metodos=('POST',), al_limitar=respuesta_limitada):
+    """
+    Decorador: cada petición con método en `metodos` gasta un intento de
+    cada Limite; si alguno está agotado responde `al_limitar(request,
+    resultado)` sin ejecutar la vista.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method in metodos:
+                resultado = consumir(*claves_de(request, limites))
+                if not resultado.permitido:
+                    return al_limitar(request, resultado)
+            return vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
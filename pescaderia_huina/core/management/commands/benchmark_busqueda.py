@@ -0,0 +1,100 @@
+"""
+Benchmark del autocompletado de productos del punto de venta.
+Crea N productos de prueba dentro de una transacción que se revierte al
+final y mide `buscar_productos_api` con términos de distinta longitud
+(con y sin tildes). Objetivo: p95 por debajo de 20 ms con 50.000 productos.
+La primera búsqueda construye el catálogo en memoria; se reporta aparte.
+"""
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from core import busqueda
+from productos import catalogo
+from productos.models import Producto
+from proveedores.models import Proveedor
+from ventas.views import buscar_productos_api
+
+
+ESPECIES = [
+    'Salmón', 'Tilapia', 'Mojarra', 'Bagre', 'Róbalo', 'Pargo', 'Bocachico', 'Trucha',
+    'Corvina', 'Camarón', 'Langostino', 'Calamar', 'Pulpo', 'Atún', 'Sierra', 'Dorado',
+]
+CORTES = ['Entero', 'Filete', 'Posta', 'Lomo', 'Mariposa', 'Desmechado', 'Ahumado', 'Apanado']
+ORIGENES = ['Pacífico', 'Caribe', 'Magdalena', 'Amazonía', 'Importado', 'Criadero']
+
+TERMINOS = ['sa', 'tila', 'salmon', 'SALMÓN filete', 'camaron caribe', 'lomo', 'xyz', 'róbalo ent', 'pargo 12']
+
+OBJETIVO_MS = 20
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia del autocompletado de productos (los datos de prueba se revierten)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=50_000, help='Productos de prueba a crear (50000 por defecto)')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Búsquedas por término')
+
+    def handle(self, *args, **options):
+        total = options['productos']
+        factory = RequestFactory()
+        usuario = User(username='benchmark', is_active=True)
+
+        def buscar(termino):
+            request = factory.get('/ventas/api/buscar-productos/', {'q': termino})
+            request.user = usuario
+            inicio = time.perf_counter()
+            buscar_productos_api(request)
+            return (time.perf_counter() - inicio) * 1000
+
+        with transaction.atomic():
+            self.stdout.write(f'Creando {total} productos de prueba...')
+            self._sembrar(total)
+            # bulk_create no pasa por las señales: se descarta cualquier índice previo
+            busqueda.limpiar_indices()
+            catalogo.limpiar()
+
+            primera = buscar(TERMINOS[0])
+            tiempos = {
+                termino: [buscar(termino) for _ in range(options['repeticiones'])]
+                for termino in TERMINOS
+            }
+            transaction.set_rollback(True)
+
+        todos = sorted(t for lista in tiempos.values() for t in lista)
+        p95 = todos[int(len(todos) * 0.95) - 1]
+        self.stdout.write(self.style.SUCCESS(f'\n=== AUTOCOMPLETADO ({connection.vendor}, {total} productos) ===\n'))
+        self.stdout.write(f'Primera búsqueda (construye el catálogo): {primera:.1f} ms')
+        for termino, lista in tiempos.items():
+            self.stdout.write(f'  {termino!r:18} mediana {statistics.median(lista):6.2f} ms   máx {max(lista):6.2f} ms')
+        resumen = f'\np50 {statistics.median(todos):.2f} ms | p95 {p95:.2f} ms (objetivo < {OBJETIVO_MS} ms)'
+        estilo = self.style.SUCCESS if p95 < OBJETIVO_MS else self.style.WARNING
+        self.stdout.write(estilo(resumen))
+
+    def _sembrar(self, total):
+        proveedor = Proveedor.objects.create(
+            nit='9999999997',
+            nombre_contacto='Proveedor Benchmark Búsqueda',
+            correo='busqueda@example.com',
+            telefono='3000000000',
+            ciudad='Bogotá',
+        )
+        Producto.objects.bulk_create([
+            Producto(
+                proveedor=proveedor,
+                tipo_producto='PE',
+                nombre=(
+                    f'{ESPECIES[i % len(ESPECIES)]} {CORTES[(i // len(ESPECIES)) % len(CORTES)]} '
+                    f'{ORIGENES[i % len(ORIGENES)]} {i}'
+                ),
+                precio=Decimal('10000.00'),
+                tipo_presentacion='LIB',
+                estado=i % 10 != 0,
+            )
+            for i in range(total)
+        ], batch_size=5000)
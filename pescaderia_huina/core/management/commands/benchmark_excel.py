@@ -0,0 +1,113 @@
+"""
+Benchmark de la exportación de ventas a Excel.
+Crea N ventas de prueba dentro de una transacción que se revierte al final,
+llama a la vista de exportación (generación, guardado en el cache de
+reportes y descarga por bloques) y reporta tiempo y memoria pico (RSS).
+"""
+import resource
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from core.models import ArchivoReporte
+from core.reportes import clave_reporte
+from productos.models import Producto
+from proveedores.models import Proveedor
+from ventas.models import Venta, VentaItem
+from ventas.views import exportar_excel
+
+
+def _rss_mb():
+    # En Linux ru_maxrss viene en KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y memoria pico de exportar ventas a Excel (los datos de prueba se revierten)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventas', type=int, default=100_000, help='Ventas de prueba a crear (100000 por defecto)')
+        parser.add_argument('--lote', type=int, default=5000, help='Tamaño de lote para bulk_create')
+
+    def handle(self, *args, **options):
+        total = options['ventas']
+        lote = options['lote']
+
+        with transaction.atomic():
+            self.stdout.write(f'Creando {total} ventas de prueba...')
+            self._sembrar(total, lote)
+
+            request = RequestFactory().get('/ventas/exportar/excel/')
+            request.user = User.objects.create_user(username='benchmark_excel')
+            # Los datos de prueba no cambian la versión hasta el commit: sin
+            # esto la vista podría servir un Excel ya cacheado (la fila borrada
+            # vuelve con el rollback; su archivo no se toca)
+            ArchivoReporte.objects.filter(clave=clave_reporte('ventas_excel', {})).delete()
+
+            rss_inicial = _rss_mb()
+            inicio = time.perf_counter()
+            response = exportar_excel(request)
+            tamano = sum(len(bloque) for bloque in response.streaming_content)
+            duracion = time.perf_counter() - inicio
+            rss_pico = _rss_mb()
+
+            # La fila se revierte con la transacción; el archivo del storage no
+            ArchivoReporte.objects.get(clave=response['ETag'].strip('"')).archivo.delete(save=False)
+            transaction.set_rollback(True)
+        # Como al terminar una petición (cierra el archivo y la conexión)
+        response.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nVentas exportadas: {total}\n'
+            f'Tiempo: {duracion:.2f} s ({total / duracion:,.0f} filas/s)\n'
+            f'Archivo: {tamano / 1024 / 1024:.1f} MB\n'
+            f'RSS pico: {rss_pico:.1f} MB (antes de exportar: {rss_inicial:.1f} MB, '
+            f'incremento: {rss_pico - rss_inicial:.1f} MB)'
+        ))
+
+    def _sembrar(self, total, lote):
+        proveedor = Proveedor.objects.create(
+            nit='9999999999',
+            nombre_contacto='Proveedor Benchmark',
+            correo='benchmark@example.com',
+            telefono='3000000000',
+            ciudad='Bogotá',
+        )
+        producto = Producto.objects.create(
+            proveedor=proveedor,
+            tipo_producto='PE',
+            nombre='Tilapia Benchmark',
+            precio=10000,
+            tipo_presentacion='LIB',
+        )
+
+        precio = Decimal('10000.00')
+        iva = Decimal('1900.00')
+        for desde in range(0, total, lote):
+            cantidad = min(lote, total - desde)
+            ventas = Venta.objects.bulk_create([
+                Venta(
+                    nombre_cliente=f'Cliente {desde + i}',
+                    documento_cliente=str(10_000_000 + desde + i),
+                    subtotal=precio,
+                    iva_monto=iva,
+                    total=precio + iva,
+                    estado='CANCELADA' if (desde + i) % 20 == 0 else 'COMPLETADA',
+                )
+                for i in range(cantidad)
+            ])
+            VentaItem.objects.bulk_create([
+                VentaItem(
+                    venta=venta,
+                    producto=producto,
+                    tipo_presentacion='POR_LIBRA',
+                    cantidad=Decimal('1'),
+                    precio_unitario=precio,
+                    subtotal=precio,
+                )
+                for venta in ventas
+            ])
@@ -0,0 +1,218 @@
+"""
+Benchmark de los índices de ventas y pedidos.
+Crea N ventas (con un ítem cada una) y N/10 pedidos de prueba dentro de una
+transacción que se revierte al final, y mide las consultas más frecuentes
+dos veces:
+
+  antes:   índices anteriores y filtros fecha__date (no aprovechan el índice)
+  después: índices de Meta.indexes y filtros por rango (core.fechas)
+
+Para cada consulta muestra la mediana de latencia y el plan de la BD.
+Los índices se quitan y se crean con SQL directo (no con el schema editor)
+para poder hacerlo dentro de la transacción también en SQLite.
+"""
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core.fechas import filtro_rango_dias
+from pedidos.models import DetallePedido, Pedido
+from productos.models import Producto
+from proveedores.models import Proveedor
+from ventas.models import Venta, VentaItem
+
+
+# Índices que agrega la migración (modelo, nombre en Meta.indexes)
+INDICES_NUEVOS = [
+    (Venta, 'ventas_estado_fecha_idx'),
+    (Venta, 'ventas_completadas_fecha_idx'),
+    (VentaItem, 'ventaitem_producto_venta_idx'),
+    (Pedido, 'pedidos_estado_fecha_idx'),
+    (DetallePedido, 'detallepedido_producto_ped_idx'),
+]
+
+# Índices que esos reemplazaron
+INDICES_ANTERIORES = [
+    (Venta, models.Index(fields=['estado'], name='ventas_estado_idx')),
+    (Pedido, models.Index(fields=['estado'], name='pedidos_estado_idx')),
+]
+
+PRODUCTOS = 50
+DIAS = 3 * 365
+
+
+def _indice(modelo, nombre):
+    return next(indice for indice in modelo._meta.indexes if indice.name == nombre)
+
+
+class Command(BaseCommand):
+    help = 'Compara planes y latencia de las consultas frecuentes con y sin los índices nuevos (los datos se revierten)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventas', type=int, default=1_000_000, help='Ventas de prueba a crear (1000000 por defecto)')
+        parser.add_argument('--lote', type=int, default=10_000, help='Tamaño de lote para bulk_create')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones de cada consulta')
+        parser.add_argument('--planes', action='store_true', help='Muestra el plan completo de cada consulta')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Creando {options['ventas']} ventas de prueba...")
+            producto_id = self._sembrar(options['ventas'], options['lote'])
+
+            nuevos = [(modelo, _indice(modelo, nombre)) for modelo, nombre in INDICES_NUEVOS]
+            self._cambiar_indices(quitar=nuevos, crear=INDICES_ANTERIORES)
+            antes = self._medir(self._consultas(producto_id, sargable=False), options)
+
+            self._cambiar_indices(quitar=INDICES_ANTERIORES, crear=nuevos)
+            despues = self._medir(self._consultas(producto_id, sargable=True), options)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(f"\n=== RESULTADOS ({connection.vendor}, {options['ventas']} ventas) ===\n"))
+        for nombre in antes:
+            ms_antes, plan_antes = antes[nombre]
+            ms_despues, plan_despues = despues[nombre]
+            self.stdout.write(self.style.MIGRATE_HEADING(nombre))
+            self.stdout.write(
+                f'  antes:   {ms_antes:9.2f} ms\n'
+                f'  después: {ms_despues:9.2f} ms  ({ms_antes / max(ms_despues, 0.001):.1f}x)'
+            )
+            if options['planes']:
+                self.stdout.write('  plan antes:\n    ' + plan_antes.replace('\n', '\n    '))
+                self.stdout.write('  plan después:\n    ' + plan_despues.replace('\n', '\n    '))
+            else:
+                self.stdout.write(f'  plan antes:   {plan_antes.splitlines()[0]}')
+                self.stdout.write(f'  plan después: {plan_despues.splitlines()[0]}')
+
+    def _consultas(self, producto_id, sargable):
+        hoy = timezone.localdate()
+        inicio, fin = hoy - timedelta(days=30), hoy
+        if sargable:
+            mes_ventas = filtro_rango_dias('fecha_venta', inicio, fin)
+            mes_pedidos = filtro_rango_dias('fecha', inicio, fin)
+        else:
+            mes_ventas = {'fecha_venta__date__gte': inicio, 'fecha_venta__date__lte': fin}
+            mes_pedidos = {'fecha__date__gte': inicio, 'fecha__date__lte': fin}
+
+        return {
+            'Listado de ventas canceladas (20 más recientes)':
+                Venta.objects.filter(estado='CANCELADA').order_by('-fecha_venta')[:20],
+            'Listado de ventas del último mes (20 más recientes)':
+                Venta.objects.filter(**mes_ventas).order_by('-fecha_venta')[:20],
+            'Ingresos de ventas completadas del último mes':
+                Venta.objects.filter(estado='COMPLETADA', **mes_ventas)
+                .values('estado').annotate(n=Count('id'), total=Sum('total')).order_by(),
+            'Vendido de un producto (ventas completadas)':
+                VentaItem.objects.filter(producto_id=producto_id, venta__estado='COMPLETADA')
+                .values('producto_id').annotate(total=Sum('cantidad')).order_by(),
+            'Listado de pedidos recibidos (20 más recientes)':
+                Pedido.objects.filter(estado='REC').order_by('-fecha')[:20],
+            'Pedidos del último mes (20 más recientes)':
+                Pedido.objects.filter(**mes_pedidos).order_by('-fecha')[:20],
+            'Recibido de un producto (pedidos recibidos)':
+                DetallePedido.objects.filter(producto_id=producto_id, pedido__estado='REC')
+                .values('producto_id').annotate(total=Sum('cantidad')).order_by(),
+        }
+
+    def _medir(self, consultas, options):
+        resultados = {}
+        for nombre, queryset in consultas.items():
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                inicio = time.perf_counter()
+                list(queryset.all())
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[nombre] = (statistics.median(tiempos), queryset.explain())
+        return resultados
+
+    def _cambiar_indices(self, quitar, crear):
+        """Quita y crea índices [(modelo, índice)] y actualiza estadísticas."""
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for modelo, indice in quitar:
+                cursor.execute(str(indice.remove_sql(modelo, editor)))
+            for modelo, indice in crear:
+                cursor.execute(str(indice.create_sql(modelo, editor)))
+            # Estadísticas al día para que el planificador considere los índices
+            cursor.execute('ANALYZE')
+
+    def _sembrar(self, total, lote):
+        proveedor = Proveedor.objects.create(
+            nit='9999999998',
+            nombre_contacto='Proveedor Benchmark Índices',
+            correo='indices@example.com',
+            telefono='3000000000',
+            ciudad='Bogotá',
+        )
+        productos = [
+            Producto.objects.create(
+                proveedor=proveedor,
+                tipo_producto='PE',
+                nombre=f'Producto Benchmark {i}',
+                precio=10000,
+                tipo_presentacion='LIB',
+            ).id
+            for i in range(PRODUCTOS)
+        ]
+
+        # Ventas repartidas en los últimos DIAS días, la más reciente primero
+        ahora = timezone.now()
+        paso = timedelta(days=DIAS) / total
+        precio = Decimal('10000.00')
+        for desde in range(0, total, lote):
+            cantidad = min(lote, total - desde)
+            ventas = Venta.objects.bulk_create([
+                Venta(
+                    nombre_cliente=f'Cliente {desde + i}',
+                    subtotal=precio,
+                    iva_monto=Decimal('1900.00'),
+                    total=Decimal('11900.00'),
+                    fecha_venta=ahora - paso * (desde + i),
+                    estado='CANCELADA' if (desde + i) % 20 == 0 else 'COMPLETADA',
+                )
+                for i in range(cantidad)
+            ])
+            VentaItem.objects.bulk_create([
+                VentaItem(
+                    venta=venta,
+                    producto_id=productos[(desde + i) % PRODUCTOS],
+                    tipo_presentacion='POR_LIBRA',
+                    cantidad=Decimal('1'),
+                    precio_unitario=precio,
+                    subtotal=precio,
+                )
+                for i, venta in enumerate(ventas)
+            ])
+
+        total_pedidos = max(total // 10, 1)
+        paso = timedelta(days=DIAS) / total_pedidos
+        for desde in range(0, total_pedidos, lote):
+            cantidad = min(lote, total_pedidos - desde)
+            pedidos = Pedido.objects.bulk_create([
+                Pedido(
+                    proveedor=proveedor,
+                    estado=('REC', 'PEN', 'CAN')[(desde + i) % 3],
+                    valor_total=precio,
+                )
+                for i in range(cantidad)
+            ])
+            # fecha es auto_now_add: se reparte con un UPDATE por lote
+            for i, pedido in enumerate(pedidos):
+                pedido.fecha = ahora - paso * (desde + i)
+            Pedido.objects.bulk_update(pedidos, ['fecha'], batch_size=lote)
+            DetallePedido.objects.bulk_create([
+                DetallePedido(
+                    pedido=pedido,
+                    producto_id=productos[(desde + i) % PRODUCTOS],
+                    cantidad=Decimal('10'),
+                    precio_unitario=precio,
+                )
+                for i, pedido in enumerate(pedidos)
+            ])
+        return productos[0]
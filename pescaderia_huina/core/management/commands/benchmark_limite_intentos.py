@@ -0,0 +1,81 @@
+"""
+Benchmark del límite de intentos de login (core.limite_intentos).
+Lanza N intentos concurrentes (1.000 por defecto) contra la misma clave con
+un límite de L intentos y verifica que se permiten exactamente L. Como
+comparación repite la prueba con el contador anterior (cache.get + cache.set),
+que pierde incrementos cuando dos peticiones leen el mismo valor.
+Las claves usadas se borran al final.
+"""
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import limite_intentos
+from core.models import LimiteIntentos
+
+
+class Command(BaseCommand):
+    help = 'Verifica que el límite de intentos se cumple bajo intentos concurrentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intentos', type=int, default=1000, help='Intentos concurrentes (1000 por defecto)')
+        parser.add_argument('--hilos', type=int, default=50, help='Hilos que los lanzan')
+        parser.add_argument('--limite', type=int, default=5, help='Intentos permitidos por ventana')
+
+    def handle(self, *args, **options):
+        total = options['intentos']
+        hilos = options['hilos']
+        limite = options['limite']
+        clave = f'limite:benchmark:{uuid.uuid4().hex}'
+        backend = 'redis' if limite_intentos._es_redis() else 'base de datos'
+        inicio_todos = threading.Barrier(hilos)
+
+        def intento_gcra(_):
+            inicio = time.perf_counter()
+            try:
+                resultado = limite_intentos.consumir((clave, limite, 600))
+            finally:
+                close_old_connections()
+            return resultado.permitido, (time.perf_counter() - inicio) * 1000
+
+        def intento_ingenuo(_):
+            # Patrón anterior: leer, comparar y escribir en pasos separados
+            inicio = time.perf_counter()
+            intentos = cache.get(f'{clave}:ingenuo', 0)
+            permitido = intentos < limite
+            if permitido:
+                cache.set(f'{clave}:ingenuo', intentos + 1, 600)
+            return permitido, (time.perf_counter() - inicio) * 1000
+
+        def sincronizar(_):
+            # Los hilos arrancan a la vez para maximizar la contención
+            try:
+                inicio_todos.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+
+        try:
+            for nombre, intento in (('GCRA atómico', intento_gcra), ('get + set', intento_ingenuo)):
+                inicio_todos.reset()
+                with ThreadPoolExecutor(max_workers=hilos) as executor:
+                    list(executor.map(sincronizar, range(hilos)))
+                    resultados = list(executor.map(intento, range(total)))
+                permitidos = sum(1 for permitido, _ in resultados if permitido)
+                tiempos = sorted(ms for _, ms in resultados)
+                p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+                estilo = self.style.SUCCESS if permitidos == limite else self.style.ERROR
+                self.stdout.write(estilo(
+                    f'{nombre:<14} permitidos {permitidos:>4} de {total} (límite {limite})  '
+                    f'p50 {statistics.median(tiempos):6.2f} ms  p95 {p95:6.2f} ms'
+                ))
+        finally:
+            LimiteIntentos.objects.filter(clave=clave).delete()
+            cache.delete_many([clave, f'{clave}:ingenuo'])
+
+        self.stdout.write(f'Backend del límite: {backend}; {hilos} hilos, {total} intentos.')
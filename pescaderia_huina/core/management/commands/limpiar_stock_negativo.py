@@ -3,9 +3,7 @@ Comando para limpiar productos con stock negativo.
 Identifica ventas sin respaldo de pedidos y permite eliminarlas.
 """
 from django.core.management.base import BaseCommand
-from django.db.models import Sum
-from productos.models import Producto
-from pedidos.models import DetallePedido
+from productos.models import StockProducto
 from ventas.models import VentaItem
 
 
@@ -22,30 +20,20 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('\n=== ANÁLISIS DE STOCK NEGATIVO ===\n'))
         
-        productos_negativos = []
-        
-        for producto in Producto.objects.filter(estado=True):
-            stock = producto.stock
-            
-            if stock < 0:
-                # Calcular cantidades
-                recibido = DetallePedido.objects.filter(
-                    producto=producto,
-                    pedido__estado='REC'
-                ).aggregate(total=Sum('cantidad'))['total'] or 0
-                
-                vendido = VentaItem.objects.filter(
-                    producto=producto,
-                    venta__estado='COMPLETADA'
-                ).aggregate(total=Sum('cantidad'))['total'] or 0
-                
-                productos_negativos.append({
-                    'producto': producto,
-                    'stock': stock,
-                    'recibido': recibido,
-                    'vendido': vendido,
-                    'diferencia': abs(stock),
-                })
+        # El libro de stock ya tiene recibido/vendido por producto: una sola consulta.
+        productos_negativos = [
+            {
+                'producto': fila.producto,
+                'stock': fila.disponible,
+                'recibido': fila.recibido,
+                'vendido': fila.vendido,
+                'diferencia': abs(fila.disponible),
+            }
+            for fila in StockProducto.objects.select_related('producto').filter(
+                producto__estado=True,
+                disponible__lt=0,
+            )
+        ]
         
         if not productos_negativos:
             self.stdout.write(self.style.SUCCESS('✓ No hay productos con stock negativo'))
@@ -0,0 +1,56 @@
+"""
+Trabajador de la bandeja de salida de correos (core.correos).
+
+    python manage.py procesar_correos
+
+Envía los correos pendientes en lotes sobre una sola conexión SMTP y
+reintenta los fallidos con espera creciente. Enviar correo es casi todo
+espera de red: un proceso alcanza; se pueden lanzar varios sin riesgo de
+duplicados porque cada uno reclama su propio lote.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+LIMPIEZA_CADA_SEGUNDOS = 5 * 60
+
+
+class Command(BaseCommand):
+    help = 'Envía en segundo plano los correos de la bandeja de salida'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando no hay correos por enviar')
+        parser.add_argument('--lote', type=int, default=None, help='Correos por conexión SMTP (CORREOS_TAMAÑO_LOTE por defecto)')
+        parser.add_argument('--una-vez', action='store_true', help='Envía lo pendiente y termina')
+
+    def handle(self, *args, **options):
+        from core import correos
+
+        intervalo = options['intervalo']
+        tamaño = options['lote'] or correos.TAMAÑO_LOTE
+
+        eliminados = correos.limpiar_correos()
+        if eliminados:
+            self.stdout.write(f'Correos antiguos eliminados: {eliminados}')
+
+        if options['una_vez']:
+            procesados = correos.procesar_pendientes(tamaño)
+            self.stdout.write(self.style.SUCCESS(f'Correos procesados: {procesados}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Trabajador de correos iniciado'))
+        ultima_limpieza = time.monotonic()
+        try:
+            while True:
+                if not correos.procesar_pendientes(tamaño):
+                    if time.monotonic() - ultima_limpieza > LIMPIEZA_CADA_SEGUNDOS:
+                        correos.limpiar_correos()
+                        ultima_limpieza = time.monotonic()
+                    time.sleep(intervalo)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connections.close_all()
+        self.stdout.write(self.style.SUCCESS('Trabajador de correos detenido'))
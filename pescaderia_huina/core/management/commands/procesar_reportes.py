@@ -0,0 +1,94 @@
+"""
+Trabajador de la cola de reportes PDF (core.reportes).
+
+    python manage.py procesar_reportes --procesos 2
+
+Cada proceso toma trabajos pendientes de la BD y genera los PDF con
+prioridad baja (nice), para no quitarle CPU a los servidores web que
+atienden el punto de venta.
+"""
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+LIMPIEZA_CADA_SEGUNDOS = 5 * 60
+
+
+def _trabajador(intervalo, una_vez, prioridad):
+    import django
+    from django.apps import apps
+
+    # Con el método "spawn" (Windows/macOS) el proceso hijo arranca sin Django
+    if not apps.ready:
+        django.setup()
+
+    from core import reportes
+
+    if prioridad and hasattr(os, 'nice'):
+        os.nice(prioridad)
+
+    ultima_limpieza = time.monotonic()
+    try:
+        while True:
+            procesados = reportes.procesar_pendientes()
+            if una_vez:
+                return procesados
+            if not procesados:
+                if time.monotonic() - ultima_limpieza > LIMPIEZA_CADA_SEGUNDOS:
+                    reportes.limpiar_trabajos()
+                    ultima_limpieza = time.monotonic()
+                time.sleep(intervalo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Procesa en segundo plano la cola de reportes PDF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=2, help='Procesos trabajadores (2 por defecto)')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--prioridad', type=int, default=10, help='Incremento de nice para los trabajadores (0 = sin cambio)')
+        parser.add_argument('--una-vez', action='store_true', help='Procesa lo pendiente y termina')
+
+    def handle(self, *args, **options):
+        from core import reportes
+
+        procesos = max(1, options['procesos'])
+        intervalo = options['intervalo']
+        una_vez = options['una_vez']
+        prioridad = options['prioridad']
+
+        eliminados = reportes.limpiar_trabajos()
+        if eliminados:
+            self.stdout.write(f'Reportes expirados eliminados: {eliminados}')
+
+        if procesos == 1:
+            procesados = _trabajador(intervalo, una_vez, prioridad)
+            if una_vez:
+                self.stdout.write(self.style.SUCCESS(f'Reportes procesados: {procesados}'))
+            return
+
+        # Las conexiones abiertas no pueden compartirse con los procesos hijos
+        connections.close_all()
+        hijos = [
+            multiprocessing.Process(target=_trabajador, args=(intervalo, una_vez, prioridad), daemon=True)
+            for _ in range(procesos)
+        ]
+        for hijo in hijos:
+            hijo.start()
+        self.stdout.write(self.style.SUCCESS(f'{procesos} trabajadores de reportes iniciados'))
+
+        try:
+            for hijo in hijos:
+                hijo.join()
+        except KeyboardInterrupt:
+            for hijo in hijos:
+                hijo.terminate()
+        self.stdout.write(self.style.SUCCESS('Trabajadores de reportes detenidos'))
@@ -0,0 +1,46 @@
+"""
+Renovación de la sesión sin escribirla en cada petición.
+
+Con SESSION_SAVE_EVERY_REQUEST = True cada página, y cada llamada AJAX
+(búsqueda de productos, productos del proveedor...), hacía un UPDATE de
+django_session contra la BD remota solo para correr el vencimiento. Ahora
+este middleware solo la vuelve a guardar cuando su última renovación tiene
+más de SESSION_FRACCION_RENOVACION × SESSION_COOKIE_AGE; guardarla corre el
+vencimiento de la cookie y de la fila una hora completa. Sirve con
+SESSION_ENGINE db y con cached_db (el que se usa con cache redis o locmem;
+ver settings).
+
+La sesión sigue siendo deslizante: vence tras SESSION_COOKIE_AGE sin
+actividad, con un margen de a lo sumo esa fracción (6 minutos de una hora
+con 0.1).
+"""
+import time
+
+from django.conf import settings
+
+
+CLAVE_RENOVADA = '_renovada'
+
+
+class RenovarSesionMiddleware:
+    """Va después de SessionMiddleware en MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        fraccion = getattr(settings, 'SESSION_FRACCION_RENOVACION', 0.1)
+        self.segundos = settings.SESSION_COOKIE_AGE * fraccion
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        sesion = getattr(request, 'session', None)
+        # Solo sesiones que la petición ya cargó y que existen (no crea sesiones vacías)
+        if sesion is None or not sesion.accessed or sesion.is_empty():
+            return response
+        if response.status_code == 500:
+            return response
+
+        ahora = int(time.time())
+        if sesion.modified or ahora - sesion.get(CLAVE_RENOVADA, 0) >= self.segundos:
+            # Si ya se iba a guardar, la marca viaja en la misma escritura
+            sesion[CLAVE_RENOVADA] = ahora
+        return response
@@ -0,0 +1,40 @@
+# Generated migration - Cola de reportes PDF en segundo plano
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=30, verbose_name='Tipo de Reporte')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('LISTO', 'Listo'), ('ERROR', 'Error')], default='PENDIENTE', max_length=20)),
+                ('nombre_archivo', models.CharField(blank=True, max_length=255, verbose_name='Nombre del Archivo')),
+                ('archivo', models.BinaryField(blank=True, editable=False, null=True)),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Solicitud')),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Inicio de Generación')),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin de Generación')),
+                ('expira', models.DateTimeField(blank=True, null=True, verbose_name='Expira')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_reporte', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Reporte',
+                'verbose_name_plural': 'Trabajos de Reporte',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='core_trabajo_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated migration - Cache de reportes generados por versión de datos
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionDatos',
+            fields=[
+                ('nombre', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Versión de Datos',
+                'verbose_name_plural': 'Versiones de Datos',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivoReporte',
+            fields=[
+                ('clave', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(max_length=30, verbose_name='Tipo de Reporte')),
+                ('nombre_archivo', models.CharField(max_length=255, verbose_name='Nombre del Archivo')),
+                ('content_type', models.CharField(max_length=100)),
+                ('contenido', models.BinaryField()),
+                ('tamaño', models.PositiveIntegerField(default=0, verbose_name='Tamaño (bytes)')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Generación')),
+                ('expira', models.DateTimeField(db_index=True, verbose_name='Expira')),
+            ],
+            options={
+                'verbose_name': 'Archivo de Reporte',
+                'verbose_name_plural': 'Archivos de Reporte',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+        migrations.RemoveField(
+            model_name='trabajoreporte',
+            name='archivo',
+        ),
+        migrations.AddField(
+            model_name='trabajoreporte',
+            name='clave',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='Clave del Archivo'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated migration - Extensiones de PostgreSQL para la búsqueda por trigramas
+
+from django.db import migrations
+
+
+def crear_extensiones(apps, schema_editor):
+    """pg_trgm, unaccent y f_unaccent(), la versión inmutable de unaccent() que admiten los índices."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+    # unaccent() puede estar en otro esquema (p. ej. "extensions" en Supabase):
+    # la función se califica con él para no depender del search_path
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT n.nspname FROM pg_extension e JOIN pg_namespace n ON n.oid = e.extnamespace "
+            "WHERE e.extname = 'unaccent'"
+        )
+        esquema = cursor.fetchone()[0]
+    schema_editor.execute(
+        'CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text '
+        'LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS '
+        f"$$ SELECT {esquema}.unaccent('{esquema}.unaccent'::regdictionary, $1) $$"
+    )
+
+
+def eliminar_funcion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP FUNCTION IF EXISTS f_unaccent(text)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_versiondatos_archivoreporte'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_extensiones, eliminar_funcion),
+    ]
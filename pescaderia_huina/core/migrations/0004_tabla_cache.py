@@ -0,0 +1,20 @@
+# Generated migration - Tabla del cache compartido (CACHE_BACKEND=db)
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def crear_tabla_cache(apps, schema_editor):
+    """Crea core_cache si settings.CACHES usa DatabaseCache; con otro backend no hace nada."""
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_busqueda_trigramas'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_tabla_cache, migrations.RunPython.noop),
+    ]
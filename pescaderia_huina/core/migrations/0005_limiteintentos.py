@@ -0,0 +1,24 @@
+# Generated migration - Estado de los límites de intentos (GCRA)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_tabla_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LimiteIntentos',
+            fields=[
+                ('clave', models.CharField(max_length=200, primary_key=True, serialize=False)),
+                ('tat', models.FloatField(db_index=True, verbose_name='Próxima llegada (epoch)')),
+            ],
+            options={
+                'verbose_name': 'Límite de Intentos',
+                'verbose_name_plural': 'Límites de Intentos',
+            },
+        ),
+    ]
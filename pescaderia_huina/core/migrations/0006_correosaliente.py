@@ -0,0 +1,41 @@
+# Generated migration - Bandeja de salida de correos (core.correos)
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_limiteintentos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoSaliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asunto', models.CharField(max_length=255, verbose_name='Asunto')),
+                ('remitente', models.CharField(blank=True, max_length=255, verbose_name='Remitente')),
+                ('destinatarios', models.JSONField(default=list, verbose_name='Destinatarios')),
+                ('copia', models.JSONField(blank=True, default=list, verbose_name='CC')),
+                ('copia_oculta', models.JSONField(blank=True, default=list, verbose_name='CCO')),
+                ('cuerpo', models.TextField(blank=True, verbose_name='Texto')),
+                ('html', models.TextField(blank=True, verbose_name='HTML')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIANDO', 'Enviando'), ('ENVIADO', 'Enviado'), ('ERROR', 'Error')], default='PENDIENTE', max_length=20)),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos de Envío')),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próximo Intento')),
+                ('lote', models.CharField(blank=True, db_index=True, max_length=32)),
+                ('error', models.TextField(blank=True, verbose_name='Último Error')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Envío')),
+                ('expira', models.DateTimeField(blank=True, null=True, verbose_name='No enviar después de')),
+            ],
+            options={
+                'verbose_name': 'Correo Saliente',
+                'verbose_name_plural': 'Correos Salientes',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='core_correo_pendiente_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated migration - Los reportes cacheados pasan de la BD al storage
+
+from django.db import migrations, models
+
+
+def vaciar_cache(apps, schema_editor):
+    # Es un cache: se regenera en la próxima solicitud
+    apps.get_model('core', 'ArchivoReporte').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_correosaliente'),
+    ]
+
+    operations = [
+        migrations.RunPython(vaciar_cache, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='archivoreporte',
+            name='contenido',
+        ),
+        migrations.AddField(
+            model_name='archivoreporte',
+            name='archivo',
+            field=models.FileField(default='', max_length=255, upload_to='reportes/'),
+            preserve_default=False,
+        ),
+    ]
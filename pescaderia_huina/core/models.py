@@ -1,3 +1,159 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class TrabajoReporte(models.Model):
+    """
+    Reporte PDF generado en segundo plano.
+    La vista solo encola el trabajo; el comando `procesar_reportes` lo toma,
+    genera el PDF y lo deja en ArchivoReporte bajo la clave del trabajo.
+    """
+    PENDIENTE = 'PENDIENTE'
+    PROCESANDO = 'PROCESANDO'
+    LISTO = 'LISTO'
+    ERROR = 'ERROR'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (LISTO, 'Listo'),
+        (ERROR, 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=30, verbose_name='Tipo de Reporte')
+    parametros = models.JSONField(default=dict, blank=True, verbose_name='Parámetros')
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='trabajos_reporte',
+        verbose_name='Solicitado por',
+    )
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    clave = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='Clave del Archivo')
+    nombre_archivo = models.CharField(max_length=255, blank=True, verbose_name='Nombre del Archivo')
+    error = models.TextField(blank=True, verbose_name='Error')
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Solicitud')
+    fecha_inicio = models.DateTimeField(null=True, blank=True, verbose_name='Inicio de Generación')
+    fecha_fin = models.DateTimeField(null=True, blank=True, verbose_name='Fin de Generación')
+    expira = models.DateTimeField(null=True, blank=True, verbose_name='Expira')
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name = 'Trabajo de Reporte'
+        verbose_name_plural = 'Trabajos de Reporte'
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='core_trabajo_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reporte {self.tipo} #{self.pk} ({self.estado})"
+
+
+class VersionDatos(models.Model):
+    """
+    Contador de cambios por grupo de datos (ventas, pedidos, productos...).
+    Es la marca de agua de los reportes cacheados: si el contador de alguno
+    de los grupos que usa un reporte cambió, el archivo guardado ya no sirve.
+    """
+    nombre = models.CharField(max_length=30, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Versión de Datos'
+        verbose_name_plural = 'Versiones de Datos'
+
+    def __str__(self):
+        return f"{self.nombre} v{self.version}"
+
+
+class ArchivoReporte(models.Model):
+    """
+    Reporte ya generado (PDF o Excel), guardado bajo una clave que resume
+    tipo de reporte + filtros + versión de los datos. Dos solicitudes
+    idénticas sobre los mismos datos reutilizan el mismo archivo. El
+    contenido va en el storage (MEDIA_ROOT/reportes), no en la BD: se
+    escribe y se sirve por bloques.
+    """
+    clave = models.CharField(max_length=64, primary_key=True)
+    tipo = models.CharField(max_length=30, verbose_name='Tipo de Reporte')
+    nombre_archivo = models.CharField(max_length=255, verbose_name='Nombre del Archivo')
+    content_type = models.CharField(max_length=100)
+    archivo = models.FileField(upload_to='reportes/', max_length=255)
+    tamaño = models.PositiveIntegerField(default=0, verbose_name='Tamaño (bytes)')
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Generación')
+    expira = models.DateTimeField(db_index=True, verbose_name='Expira')
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name = 'Archivo de Reporte'
+        verbose_name_plural = 'Archivos de Reporte'
+
+    def __str__(self):
+        return f"{self.nombre_archivo} ({self.clave[:12]})"
+
+
+class LimiteIntentos(models.Model):
+    """
+    Estado de un límite de intentos (core.limite_intentos) cuando el cache
+    compartido no es Redis: el instante teórico de la próxima llegada (GCRA).
+    Una fila con `tat` en el pasado equivale a no tener intentos gastados.
+    """
+    clave = models.CharField(max_length=200, primary_key=True)
+    tat = models.FloatField(db_index=True, verbose_name='Próxima llegada (epoch)')
+
+    class Meta:
+        verbose_name = 'Límite de Intentos'
+        verbose_name_plural = 'Límites de Intentos'
+
+    def __str__(self):
+        return self.clave
+
+
+class CorreoSaliente(models.Model):
+    """
+    Correo en la bandeja de salida. Las vistas lo encolan (core.correos) y
+    responden de inmediato; el comando `procesar_correos` lo envía por SMTP,
+    en lotes sobre una misma conexión, y reintenta los fallidos con espera
+    creciente.
+    """
+    PENDIENTE = 'PENDIENTE'
+    ENVIANDO = 'ENVIANDO'
+    ENVIADO = 'ENVIADO'
+    ERROR = 'ERROR'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (ENVIANDO, 'Enviando'),
+        (ENVIADO, 'Enviado'),
+        (ERROR, 'Error'),
+    ]
+
+    asunto = models.CharField(max_length=255, verbose_name='Asunto')
+    remitente = models.CharField(max_length=255, blank=True, verbose_name='Remitente')
+    destinatarios = models.JSONField(default=list, verbose_name='Destinatarios')
+    copia = models.JSONField(default=list, blank=True, verbose_name='CC')
+    copia_oculta = models.JSONField(default=list, blank=True, verbose_name='CCO')
+    cuerpo = models.TextField(blank=True, verbose_name='Texto')
+    html = models.TextField(blank=True, verbose_name='HTML')
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0, verbose_name='Intentos de Envío')
+    proximo_intento = models.DateTimeField(default=timezone.now, verbose_name='Próximo Intento')
+    # Lote del trabajador que lo reclamó (ver core.correos.tomar_lote)
+    lote = models.CharField(max_length=32, blank=True, db_index=True)
+    error = models.TextField(blank=True, verbose_name='Último Error')
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')
+    fecha_envio = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Envío')
+    # Pasado este momento ya no se envía (p. ej. un código de recuperación vencido)
+    expira = models.DateTimeField(null=True, blank=True, verbose_name='No enviar después de')
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name = 'Correo Saliente'
+        verbose_name_plural = 'Correos Salientes'
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento'], name='core_correo_pendiente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} → {', '.join(self.destinatarios)} ({self.estado})"
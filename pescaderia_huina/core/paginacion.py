@@ -0,0 +1,201 @@
+"""
+Paginación de los listados (ventas, pedidos, productos, inventario).
+
+El Paginator de Django cuenta todas las filas (COUNT(*)) y llega a la
+página N saltando N × tamaño filas (OFFSET): con años de historial, cada
+página profunda recorre casi toda la tabla. `paginar()` elige el modo:
+
+- Pocos resultados (hasta PAGINAS_CON_NUMERO páginas): páginas numeradas,
+  como siempre. Para decidirlo cuenta como máximo hasta ese límite.
+- Más resultados: paginación por cursor (keyset). El enlace "Siguiente"
+  lleva los valores de orden de la última fila (p. ej. fecha_venta e id) y
+  la consulta sigue desde ahí con WHERE (fecha_venta, id) < (...), que el
+  índice resuelve igual en la primera página que en la milésima. El total
+  se muestra aproximado, a partir de las estadísticas de la BD.
+
+El cursor es un token firmado y opaco (?cursor=...). Los campos de orden no
+pueden ser nulos y el último debe ser único (normalmente el id).
+"""
+import json
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+
+
+PAGINAS_CON_NUMERO = 10
+
+SAL_CURSOR = 'core.paginacion'
+
+
+class PaginaCursor:
+    """Una página de la paginación por cursor; se recorre como una lista."""
+
+    por_cursor = True
+
+    def __init__(self, objetos, cursor_siguiente, cursor_anterior, total_aproximado, minimo):
+        self.object_list = objetos
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+        self.total_aproximado = total_aproximado
+        # Sin estadísticas se sabe al menos que hay más de `minimo` resultados
+        self.minimo = minimo
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def conteo_aproximado(queryset):
+    """
+    Filas estimadas por el planificador de PostgreSQL (EXPLAIN, sin ejecutar
+    la consulta). None en otras BD o si no se pudo estimar.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    try:
+        plan = json.loads(queryset.order_by().explain(format='json'))
+    except (DatabaseError, ValueError):
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _campo(orden):
+    return orden.lstrip('-')
+
+
+def _valores(objeto, orden):
+    return [getattr(objeto, _campo(campo)) for campo in orden]
+
+
+def _codificar(valores, orden, hacia_atras):
+    textos = [valor.isoformat() if hasattr(valor, 'isoformat') else str(valor) for valor in valores]
+    return signing.dumps({'v': textos, 'o': list(orden), 'a': hacia_atras}, salt=SAL_CURSOR, compress=True)
+
+
+def _decodificar(token, modelo, orden):
+    """(valores, hacia_atras) de un cursor; None si es inválido o de otro orden."""
+    try:
+        datos = signing.loads(token, salt=SAL_CURSOR)
+        if datos['o'] != list(orden) or len(datos['v']) != len(orden):
+            return None
+        valores = [
+            modelo._meta.get_field(_campo(campo)).to_python(valor)
+            for campo, valor in zip(orden, datos['v'])
+        ]
+        return valores, bool(datos['a'])
+    except (signing.BadSignature, ValidationError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _despues_de(orden, valores):
+    """
+    Q de las filas que van después de `valores` en `orden`:
+    (a < va) OR (a = va AND b < vb) OR ... para orden descendente.
+    """
+    condicion = Q()
+    for i, campo in enumerate(orden):
+        nombre = _campo(campo)
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        paso = Q(**{f'{nombre}__{operador}': valores[i]})
+        for anterior, valor in zip(orden[:i], valores[:i]):
+            paso &= Q(**{_campo(anterior): valor})
+        condicion |= paso
+    return condicion
+
+
+def _invertir(orden):
+    return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden]
+
+
+def _pagina_cursor(queryset, por_pagina, orden, token, minimo):
+    decodificado = _decodificar(token, queryset.model, orden) if token else None
+    hacia_atras = bool(decodificado and decodificado[1])
+
+    filas = queryset.order_by(*(_invertir(orden) if hacia_atras else orden))
+    if decodificado:
+        valores, _ = decodificado
+        filas = filas.filter(_despues_de(_invertir(orden) if hacia_atras else orden, valores))
+    objetos = list(filas[:por_pagina + 1])
+    hay_mas = len(objetos) > por_pagina
+    objetos = objetos[:por_pagina]
+    if hacia_atras:
+        objetos.reverse()
+
+    siguiente = anterior = None
+    if objetos:
+        if hay_mas or hacia_atras:
+            siguiente = _codificar(_valores(objetos[-1], orden), orden, False)
+        if decodificado and (hay_mas or not hacia_atras):
+            anterior = _codificar(_valores(objetos[0], orden), orden, True)
+    return PaginaCursor(objetos, siguiente, anterior, conteo_aproximado(queryset), minimo)
+
+
+def _url(request, **cambios):
+    """Query string actual (filtros incluidos) con otra página o cursor."""
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
+    parametros.pop('cursor', None)
+    for nombre, valor in cambios.items():
+        parametros[nombre] = valor
+    return f'?{parametros.urlencode()}'
+
+
+def _pagina_numerada(request, queryset, por_pagina, cantidad):
+    paginador = Paginator(queryset, por_pagina)
+    paginador.count = cantidad  # ya contado: evita el COUNT(*) del Paginator
+    try:
+        pagina = paginador.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        pagina = paginador.page(1)
+    except EmptyPage:
+        pagina = paginador.page(paginador.num_pages)
+
+    pagina.por_cursor = False
+    pagina.paginas = [(numero, _url(request, page=numero)) for numero in paginador.page_range]
+    pagina.url_anterior = _url(request, page=pagina.previous_page_number()) if pagina.has_previous() else None
+    pagina.url_siguiente = _url(request, page=pagina.next_page_number()) if pagina.has_next() else None
+    return pagina
+
+
+def paginar(request, queryset, por_pagina, orden):
+    """
+    Página de `queryset` según request.GET (?page=N o ?cursor=...).
+    `orden`: campos de orden, el último único; p. ej. ('-fecha_venta', '-id').
+    Retorna un Page de Django (pocos resultados) o una PaginaCursor; ambas
+    traen url_anterior/url_siguiente para core/components/paginacion.html.
+    """
+    queryset = queryset.order_by(*orden)
+    token = request.GET.get('cursor')
+    limite = PAGINAS_CON_NUMERO * por_pagina
+
+    if not token:
+        # COUNT acotado: cuenta como máximo limite + 1 filas
+        cantidad = queryset.order_by()[:limite + 1].count()
+        if cantidad <= limite:
+            return _pagina_numerada(request, queryset, por_pagina, cantidad)
+
+    pagina = _pagina_cursor(queryset, por_pagina, orden, token, limite)
+    pagina.url_anterior = _url(request, cursor=pagina.cursor_anterior) if pagina.has_previous() else None
+    pagina.url_siguiente = _url(request, cursor=pagina.cursor_siguiente) if pagina.has_next() else None
+    # Desde una página intermedia se puede volver al inicio sin cursor
+    pagina.url_inicio = _url(request) if pagina.has_previous() else None
+    return pagina
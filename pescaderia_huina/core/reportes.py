@@ -0,0 +1,334 @@
+"""
+Reportes PDF/Excel: cola en segundo plano y cache de archivos generados.
+
+Generar un PDF con xhtml2pdf puede tardar muchos segundos en rangos grandes.
+Las vistas ya no lo hacen dentro de la petición: encolan un TrabajoReporte y
+redirigen a una página que consulta su estado. El comando
+`manage.py procesar_reportes` toma los trabajos pendientes (la cola es la
+propia BD, no hace falta un broker) y genera el PDF.
+
+Todo archivo generado (PDF o Excel) se guarda en ArchivoReporte bajo una
+clave = hash(tipo, filtros normalizados, versión de los datos que usa, día).
+Mientras los datos no cambien, pedir el mismo reporte devuelve el archivo
+guardado; la clave es además el ETag, así que un navegador que ya lo tiene
+recibe un 304 sin que se lea el archivo. El archivo va al storage
+(MEDIA_ROOT/reportes) y se escribe y se descarga por bloques: ni al generarlo
+ni al servirlo queda entero en memoria.
+
+Cada tipo de reporte PDF apunta a una función `datos(parametros)` que retorna
+(plantilla, contexto, nombre_archivo). Los parámetros son JSON: el trabajador
+reconstruye las consultas a partir de ellos.
+"""
+import hashlib
+import io
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.shortcuts import redirect
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import versiones
+from .models import ArchivoReporte, TrabajoReporte
+
+
+TIPOS_REPORTE = {
+    'ventas': 'ventas.views.datos_pdf_ventas',
+    'pedidos': 'pedidos.views.datos_pdf_pedidos',
+    'pedido': 'pedidos.views.datos_pdf_pedido',
+    'inventario': 'pedidos.views.datos_pdf_inventario',
+    'proveedores': 'proveedores.views.datos_pdf_proveedores',
+}
+
+# Grupos de datos (core.versiones) de los que depende cada reporte
+DEPENDENCIAS = {
+    'ventas': ('ventas', 'productos'),
+    'ventas_excel': ('ventas', 'productos'),
+    'pedidos': ('pedidos', 'proveedores', 'productos'),
+    'pedidos_excel': ('pedidos', 'proveedores', 'productos'),
+    'pedido': ('pedidos', 'proveedores', 'productos'),
+    # El stock sale de ventas y pedidos
+    'inventario': ('ventas', 'pedidos', 'productos', 'proveedores'),
+    'inventario_excel': ('ventas', 'pedidos', 'productos', 'proveedores'),
+    'proveedores': ('proveedores',),
+    'proveedores_excel': ('proveedores',),
+}
+
+CONTENT_TYPE_PDF = 'application/pdf'
+
+# Horas que se conserva un archivo generado antes de borrarlo
+EXPIRACION_HORAS = getattr(settings, 'REPORTES_EXPIRACION_HORAS', 24)
+
+# Un trabajo que lleva más de esto "procesando" se considera abandonado
+# (p. ej. el proceso trabajador murió) y se marca con error.
+TIEMPO_MAXIMO_MINUTOS = getattr(settings, 'REPORTES_TIEMPO_MAXIMO_MINUTOS', 30)
+
+
+class ErrorReporte(Exception):
+    """No se pudo generar el PDF."""
+
+
+# ==================== CACHE DE ARCHIVOS ====================
+
+def normalizar_filtros(filtros):
+    """Quita filtros vacíos y espacios para que ?q=&estado= y sin filtros den la misma clave."""
+    normalizados = {}
+    for nombre, valor in (filtros or {}).items():
+        if isinstance(valor, str):
+            valor = valor.strip()
+        if valor in (None, ''):
+            continue
+        normalizados[nombre] = valor
+    return normalizados
+
+
+def clave_reporte(tipo, filtros):
+    """
+    Clave del archivo: tipo + filtros + versión de los datos + día.
+    El día entra porque los reportes muestran la fecha de generación y el
+    mes en curso; un archivo nunca se reutiliza de un día para otro.
+    """
+    base = json.dumps(
+        [
+            tipo,
+            normalizar_filtros(filtros),
+            versiones.versiones(DEPENDENCIAS[tipo]),
+            timezone.localdate().isoformat(),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()
+
+
+def _etag(clave):
+    return f'"{clave}"'
+
+
+def _coincide_etag(request, clave):
+    etags = request.headers.get('If-None-Match', '')
+    return etags.strip() == '*' or _etag(clave) in [e.strip() for e in etags.split(',')]
+
+
+def obtener_archivo(clave):
+    """El archivo guardado bajo `clave`, si no expiró y sigue en el storage."""
+    archivo = ArchivoReporte.objects.filter(clave=clave, expira__gt=timezone.now()).first()
+    if archivo is None or not archivo.archivo.storage.exists(archivo.archivo.name):
+        return None
+    return archivo
+
+
+def guardar_archivo(clave, tipo, contenido, nombre_archivo, content_type):
+    """
+    Guarda un archivo generado en el storage. `contenido` es un archivo
+    binario abierto (p. ej. el temporal de ExportadorExcel), que se copia por
+    bloques, o bytes.
+    """
+    contenido = ContentFile(contenido) if isinstance(contenido, bytes) else File(contenido)
+    anterior = ArchivoReporte.objects.filter(clave=clave).first()
+    if anterior is not None:
+        anterior.archivo.delete(save=False)
+
+    extension = nombre_archivo.rsplit('.', 1)[-1] if '.' in nombre_archivo else 'bin'
+    archivo = ArchivoReporte(
+        clave=clave,
+        tipo=tipo,
+        tamaño=contenido.size,
+        nombre_archivo=nombre_archivo,
+        content_type=content_type,
+        expira=timezone.now() + timedelta(hours=EXPIRACION_HORAS),
+    )
+    archivo.archivo.save(f'{clave}.{extension}', contenido, save=False)
+    archivo.save()
+    return archivo
+
+
+def respuesta_archivo(archivo):
+    """Descarga de un archivo guardado, por bloques, con su ETag para validar la próxima vez."""
+    response = FileResponse(
+        archivo.archivo.storage.open(archivo.archivo.name, 'rb'),
+        as_attachment=True,
+        filename=archivo.nombre_archivo,
+        content_type=archivo.content_type,
+    )
+    response['ETag'] = _etag(archivo.clave)
+    # El navegador puede guardarlo pero debe revalidar (If-None-Match) cada vez
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _no_modificado(clave):
+    response = HttpResponseNotModified()
+    response['ETag'] = _etag(clave)
+    return response
+
+
+def respuesta_cacheada(request, tipo, filtros, generar):
+    """
+    Respuesta de un reporte que se genera en la petición (los Excel).
+    `generar()` retorna (contenido, nombre_archivo, content_type), con el
+    contenido como archivo binario o bytes, y solo se llama si no hay un
+    archivo guardado para los mismos filtros y datos.
+    """
+    clave = clave_reporte(tipo, filtros)
+    if _coincide_etag(request, clave):
+        return _no_modificado(clave)
+
+    archivo = obtener_archivo(clave)
+    if archivo is None:
+        contenido, nombre_archivo, content_type = generar()
+        archivo = guardar_archivo(clave, tipo, contenido, nombre_archivo, content_type)
+    return respuesta_archivo(archivo)
+
+
+# ==================== GENERACIÓN DE PDF ====================
+
+def generar_pdf(tipo, parametros):
+    """Genera el PDF de un tipo de reporte. Retorna (contenido, nombre_archivo)."""
+    from xhtml2pdf import pisa
+
+    if tipo not in TIPOS_REPORTE:
+        raise ErrorReporte(f'Tipo de reporte desconocido: {tipo}')
+
+    plantilla, contexto, nombre_archivo = import_string(TIPOS_REPORTE[tipo])(parametros)
+    html = get_template(plantilla).render(contexto)
+    destino = io.BytesIO()
+    pisa_status = pisa.CreatePDF(html, dest=destino)
+    if pisa_status.err:
+        raise ErrorReporte('Hubo un error al generar el PDF')
+    return destino.getvalue(), nombre_archivo
+
+
+def respuesta_pdf_sincrona(request, tipo, parametros):
+    """PDF generado en la petición (reportes livianos), igualmente cacheado."""
+    def generar():
+        contenido, nombre_archivo = generar_pdf(tipo, parametros)
+        return contenido, nombre_archivo, CONTENT_TYPE_PDF
+
+    try:
+        return respuesta_cacheada(request, tipo, parametros, generar)
+    except ErrorReporte as e:
+        return HttpResponse(str(e), status=500)
+
+
+def encolar_reporte(tipo, parametros, usuario=None, clave=None):
+    if tipo not in TIPOS_REPORTE:
+        raise ErrorReporte(f'Tipo de reporte desconocido: {tipo}')
+    return TrabajoReporte.objects.create(
+        tipo=tipo,
+        parametros=parametros,
+        clave=clave or clave_reporte(tipo, parametros),
+        usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+    )
+
+
+def respuesta_pdf(request, tipo, parametros):
+    """
+    Respuesta de las vistas `export=pdf`. Si el mismo reporte ya está
+    generado para los datos actuales se descarga de inmediato; si el usuario
+    ya lo tiene en cola se le lleva a ese trabajo; si no, se encola y se
+    redirige a su página de estado. Con REPORTES_PDF_SEGUNDO_PLANO=False
+    (desarrollo sin trabajador) se genera en la misma petición.
+    """
+    if not getattr(settings, 'REPORTES_PDF_SEGUNDO_PLANO', True):
+        return respuesta_pdf_sincrona(request, tipo, parametros)
+
+    clave = clave_reporte(tipo, parametros)
+    if _coincide_etag(request, clave):
+        return _no_modificado(clave)
+
+    archivo = obtener_archivo(clave)
+    if archivo is not None:
+        return respuesta_archivo(archivo)
+
+    trabajo = TrabajoReporte.objects.filter(
+        clave=clave,
+        usuario=request.user,
+        estado__in=[TrabajoReporte.PENDIENTE, TrabajoReporte.PROCESANDO],
+    ).first()
+    if trabajo is None:
+        trabajo = encolar_reporte(tipo, parametros, request.user, clave=clave)
+    return redirect('core:estado_reporte', pk=trabajo.pk)
+
+
+# ==================== TRABAJADOR ====================
+
+def tomar_trabajo():
+    """
+    Reclama el trabajo pendiente más antiguo. El cambio de estado es un
+    UPDATE condicional (... WHERE estado = 'PENDIENTE'): si dos trabajadores
+    eligen el mismo, solo uno lo consigue y el otro prueba con el siguiente.
+    """
+    while True:
+        pk = TrabajoReporte.objects.filter(
+            estado=TrabajoReporte.PENDIENTE
+        ).order_by('fecha_creacion', 'pk').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        reclamado = TrabajoReporte.objects.filter(
+            pk=pk, estado=TrabajoReporte.PENDIENTE
+        ).update(estado=TrabajoReporte.PROCESANDO, fecha_inicio=timezone.now())
+        if reclamado:
+            return TrabajoReporte.objects.get(pk=pk)
+
+
+def procesar_trabajo(trabajo):
+    """Genera el PDF de un trabajo ya reclamado y lo deja en el cache de archivos."""
+    expira = timezone.now() + timedelta(hours=EXPIRACION_HORAS)
+    try:
+        archivo = obtener_archivo(trabajo.clave)
+        if archivo is None:
+            contenido, nombre_archivo = generar_pdf(trabajo.tipo, trabajo.parametros)
+            archivo = guardar_archivo(trabajo.clave, trabajo.tipo, contenido, nombre_archivo, CONTENT_TYPE_PDF)
+    except Exception as e:
+        TrabajoReporte.objects.filter(pk=trabajo.pk).update(
+            estado=TrabajoReporte.ERROR,
+            error=str(e) or e.__class__.__name__,
+            fecha_fin=timezone.now(),
+            expira=expira,
+        )
+        return False
+
+    TrabajoReporte.objects.filter(pk=trabajo.pk).update(
+        estado=TrabajoReporte.LISTO,
+        nombre_archivo=archivo.nombre_archivo,
+        fecha_fin=timezone.now(),
+        expira=archivo.expira,
+    )
+    return True
+
+
+def procesar_pendientes(limite=None):
+    """Procesa trabajos hasta vaciar la cola (o hasta `limite`). Retorna cuántos procesó."""
+    procesados = 0
+    while limite is None or procesados < limite:
+        trabajo = tomar_trabajo()
+        if trabajo is None:
+            break
+        procesar_trabajo(trabajo)
+        procesados += 1
+    return procesados
+
+
+def limpiar_trabajos():
+    """Borra trabajos y archivos expirados y marca con error los trabajos abandonados."""
+    ahora = timezone.now()
+    TrabajoReporte.objects.filter(
+        estado=TrabajoReporte.PROCESANDO,
+        fecha_inicio__lt=ahora - timedelta(minutes=TIEMPO_MAXIMO_MINUTOS),
+    ).update(
+        estado=TrabajoReporte.ERROR,
+        error='El trabajo superó el tiempo máximo de generación',
+        fecha_fin=ahora,
+        expira=ahora + timedelta(hours=EXPIRACION_HORAS),
+    )
+    eliminados, _ = TrabajoReporte.objects.filter(expira__lt=ahora).delete()
+    for archivo in ArchivoReporte.objects.filter(expira__lt=ahora).only('clave', 'archivo').iterator():
+        archivo.archivo.delete(save=False)
+        archivo.delete()
+    return eliminados
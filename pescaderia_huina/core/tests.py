@@ -1,3 +1,705 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from core.context_processors import low_stock_notifications
+from productos.models import Producto
+from proveedores.models import Proveedor
+
+
+class LowStockNotificationsTests(TestCase):
+    """Tests para el context processor de notificaciones de stock"""
+
+    def setUp(self):
+        from core import cache_compartido
+
+        cache.clear()
+        cache_compartido.limpiar_local()
+        self.request = RequestFactory().get('/')
+        self.proveedor = Proveedor.objects.create(
+            nit="1010101010",
+            nombre_contacto="Proveedor Alertas",
+            correo="alertas@example.com",
+            telefono="3001010101",
+            ciudad="Bogotá",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto = Producto.objects.create(
+                proveedor=self.proveedor,
+                tipo_producto='MA',
+                nombre='Camarón',
+                precio=30000,
+                tipo_presentacion='BAN',
+            )
+
+    def _recibir(self, cantidad):
+        from pedidos.models import Pedido, DetallePedido
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido = Pedido.objects.create(proveedor=self.proveedor)
+            DetallePedido.objects.create(
+                pedido=pedido, producto=self.producto, cantidad=cantidad, precio_unitario=1000
+            )
+            pedido.estado = 'REC'
+            pedido.save()
+
+    def test_valores_perezosos_no_consultan_bd(self):
+        """Si la plantilla no usa las notificaciones no hay consultas"""
+        with self.assertNumQueries(0):
+            low_stock_notifications(self.request)
+
+    def test_producto_sin_stock_es_critico(self):
+        """Un producto con stock 0 aparece como crítico"""
+        contexto = low_stock_notifications(self.request)
+        self.assertEqual(contexto['low_stock_count'](), 1)
+        self.assertEqual(contexto['low_stock_critical']()[0]['nombre'], 'Camarón')
+
+    def test_resultado_cacheado_hasta_movimiento_de_stock(self):
+        """El cálculo se reutiliza entre peticiones y se invalida al mover stock"""
+        low_stock_notifications(self.request)['low_stock_count']()
+        with self.assertNumQueries(0):
+            self.assertEqual(low_stock_notifications(self.request)['low_stock_count'](), 1)
+
+        self._recibir(Decimal('5'))
+        contexto = low_stock_notifications(self.request)
+        self.assertEqual(contexto['low_stock_critical'](), [])
+        self.assertEqual(contexto['low_stock_warning']()[0]['stock_notif'], 5)
+
+        self._recibir(Decimal('20'))
+        self.assertEqual(low_stock_notifications(self.request)['low_stock_count'](), 0)
+
+    def test_desactivar_producto_invalida_cache(self):
+        """Los productos inactivos dejan de notificarse"""
+        self.assertEqual(low_stock_notifications(self.request)['low_stock_count'](), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.estado = False
+            self.producto.save()
+        self.assertEqual(low_stock_notifications(self.request)['low_stock_count'](), 0)
+
+
+class ReportesSegundoPlanoTests(TestCase):
+    """Tests para la cola de reportes PDF"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        self.user = User.objects.create_user(username='contador', password='Clave12345')
+        self.otro = User.objects.create_user(username='cajero', password='Clave12345')
+        self.client.login(username='contador', password='Clave12345')
+        Proveedor.objects.create(
+            nit="2020202020",
+            nombre_contacto="Proveedor Reportes",
+            correo="reportes@example.com",
+            telefono="3002020202",
+            ciudad="Bogotá",
+        )
+
+    def test_export_pdf_encola_sin_generar(self):
+        """La vista solo encola el trabajo y redirige a su página de estado"""
+        from unittest import mock
+
+        from django.urls import reverse
+
+        from core.models import TrabajoReporte
+
+        with mock.patch('xhtml2pdf.pisa.CreatePDF') as crear_pdf:
+            response = self.client.get(reverse('pedidos:inventario_pedidos'), {'export': 'pdf'})
+        crear_pdf.assert_not_called()
+
+        trabajo = TrabajoReporte.objects.get()
+        self.assertRedirects(response, reverse('core:estado_reporte', args=[trabajo.pk]))
+        self.assertEqual(trabajo.estado, TrabajoReporte.PENDIENTE)
+        self.assertEqual(trabajo.usuario, self.user)
+
+        estado = self.client.get(reverse('core:estado_reporte_json', args=[trabajo.pk])).json()
+        self.assertFalse(estado['listo'])
+
+    def test_trabajador_genera_y_permite_descargar(self):
+        """El trabajador genera el PDF y solo el dueño puede descargarlo"""
+        from django.urls import reverse
+
+        from core import reportes
+        from core.models import TrabajoReporte
+
+        trabajo = reportes.encolar_reporte('inventario', {}, self.user)
+        self.assertEqual(reportes.procesar_pendientes(), 1)
+        self.assertIsNone(reportes.tomar_trabajo())
+
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoReporte.LISTO)
+        self.assertIsNotNone(trabajo.expira)
+
+        estado = self.client.get(reverse('core:estado_reporte_json', args=[trabajo.pk])).json()
+        self.assertTrue(estado['listo'])
+        response = self.client.get(estado['url_descarga'])
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.getvalue().startswith(b'%PDF'))
+        self.assertIn('Inventario_Pescaderia.pdf', response['Content-Disposition'])
+
+        self.client.login(username='cajero', password='Clave12345')
+        self.assertEqual(self.client.get(estado['url_descarga']).status_code, 404)
+
+    def test_error_y_expiracion(self):
+        """Un reporte que falla queda con error y los expirados se eliminan"""
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from core import reportes
+        from core.models import TrabajoReporte
+
+        trabajo = reportes.encolar_reporte('pedido', {'id': 999}, self.user)
+        reportes.procesar_pendientes()
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoReporte.ERROR)
+        self.assertTrue(trabajo.error)
+
+        TrabajoReporte.objects.filter(pk=trabajo.pk).update(expira=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(reportes.limpiar_trabajos(), 1)
+        self.assertFalse(TrabajoReporte.objects.exists())
+
+
+class ReportesCacheTests(TestCase):
+    """Tests para el cache de archivos de reportes por versión de datos"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        User.objects.create_user(username='gerente', password='Clave12345')
+        self.client.login(username='gerente', password='Clave12345')
+        self.proveedor = Proveedor.objects.create(
+            nit="3030303030",
+            nombre_contacto="Proveedor Cache",
+            correo="cache@example.com",
+            telefono="3003030303",
+            ciudad="Bogotá",
+        )
+
+    def test_excel_reutilizado_hasta_que_cambian_los_datos(self):
+        """El mismo Excel se sirve del cache, con ETag, hasta que cambian los proveedores"""
+        from unittest import mock
+
+        from django.urls import reverse
+
+        from proveedores import views as proveedores_views
+
+        url = reverse('proveedores:export_excel')
+        with mock.patch.object(
+            proveedores_views, 'libro_excel_proveedores', wraps=proveedores_views.libro_excel_proveedores
+        ) as libro:
+            primera = self.client.get(url)
+            segunda = self.client.get(url)
+        self.assertEqual(libro.call_count, 1)
+        self.assertEqual(primera.getvalue(), segunda.getvalue())
+        etag = primera['ETag']
+
+        no_modificado = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(no_modificado.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.proveedor.ciudad = 'Cali'
+            self.proveedor.save()
+        nueva = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(nueva.status_code, 200)
+        self.assertNotEqual(nueva['ETag'], etag)
+
+    def test_excel_guardado_en_storage_y_borrado_al_expirar(self):
+        """El Excel cacheado vive en el storage, se sirve por bloques y se borra al expirar"""
+        from datetime import timedelta
+
+        from django.urls import reverse
+        from django.utils import timezone
+
+        from core import reportes
+        from core.models import ArchivoReporte
+
+        response = self.client.get(reverse('proveedores:export_excel'))
+        self.assertTrue(response.streaming)
+        contenido = response.getvalue()
+
+        archivo = ArchivoReporte.objects.get()
+        storage = archivo.archivo.storage
+        self.assertTrue(storage.exists(archivo.archivo.name))
+        self.assertEqual(archivo.tamaño, len(contenido))
+        self.assertEqual(response['Content-Length'], str(len(contenido)))
+
+        ArchivoReporte.objects.update(expira=timezone.now() - timedelta(minutes=1))
+        reportes.limpiar_trabajos()
+        self.assertFalse(ArchivoReporte.objects.exists())
+        self.assertFalse(storage.exists(archivo.archivo.name))
+
+    def test_filtros_vacios_comparten_clave(self):
+        """Filtros vacíos o con espacios no generan archivos distintos"""
+        from core.reportes import clave_reporte
+
+        self.assertEqual(
+            clave_reporte('ventas', {}),
+            clave_reporte('ventas', {'fecha_inicio': '', 'estado': None, 'fecha_fin': '  '}),
+        )
+        self.assertNotEqual(
+            clave_reporte('ventas', {}),
+            clave_reporte('ventas', {'estado': 'CANCELADA'}),
+        )
+
+    def test_pdf_generado_se_descarga_sin_encolar(self):
+        """Un PDF ya generado para los mismos datos se descarga directo; uno pendiente no se duplica"""
+        from django.urls import reverse
+
+        from core import reportes
+        from core.models import TrabajoReporte
+
+        url = reverse('pedidos:inventario_pedidos')
+        primera = self.client.get(url, {'export': 'pdf'})
+        segunda = self.client.get(url, {'export': 'pdf'})
+        self.assertEqual(primera.url, segunda.url)
+        self.assertEqual(TrabajoReporte.objects.count(), 1)
+
+        reportes.procesar_pendientes()
+        descarga = self.client.get(url, {'export': 'pdf'})
+        self.assertEqual(descarga.status_code, 200)
+        self.assertEqual(descarga['Content-Type'], 'application/pdf')
+        self.assertEqual(TrabajoReporte.objects.count(), 1)
+
+
+class FiltroRangoDiasTests(TestCase):
+    """Los filtros por día usan rangos de instantes locales (aprovechan el índice)"""
+
+    def test_rango_incluye_todo_el_ultimo_dia(self):
+        from datetime import date, datetime, time, timedelta
+
+        from django.utils import timezone
+
+        from core.fechas import filtro_rango_dias
+        from ventas.models import Venta
+
+        dia = date(2024, 3, 10)
+        for hora in (time(0, 0), time(23, 59)):
+            Venta.objects.create(fecha_venta=timezone.make_aware(datetime.combine(dia, hora)))
+        Venta.objects.create(fecha_venta=timezone.make_aware(datetime.combine(dia + timedelta(days=1), time.min)))
+
+        filtros = filtro_rango_dias('fecha_venta', '2024-03-10', dia)
+        self.assertEqual(Venta.objects.filter(**filtros).count(), 2)
+        self.assertEqual(filtro_rango_dias('fecha_venta', '', 'no-es-fecha'), {})
+        self.assertNotIn('__date', str(Venta.objects.filter(**filtros).query))
+
+
+class BusquedaTests(TestCase):
+    """core.busqueda: sin distinguir tildes ni mayúsculas, con índice en memoria en SQLite"""
+
+    def setUp(self):
+        from core import busqueda
+
+        busqueda.limpiar_indices()
+        self.proveedor = Proveedor.objects.create(
+            nit="8888888888",
+            nombre_contacto="Pesquera Ñandú",
+            correo="busqueda@example.com",
+            telefono="3008888888",
+            ciudad="Bogotá",
+        )
+        self.salmon = Producto.objects.create(
+            proveedor=self.proveedor, tipo_producto='PE', nombre='Salmón Rosado',
+            precio=Decimal('50000.00'), tipo_presentacion='LIB',
+        )
+        Producto.objects.create(
+            proveedor=self.proveedor, tipo_producto='PE', nombre='Mojarra Roja',
+            precio=Decimal('15000.00'), tipo_presentacion='LIB',
+        )
+
+    def test_sin_tildes_ni_mayusculas(self):
+        from core import busqueda
+
+        for texto in ('salmon', 'SALMÓN ros', 'món'):
+            resultado = busqueda.filtrar(Producto.objects.all(), texto, ['nombre'])
+            self.assertEqual(list(resultado), [self.salmon], texto)
+        self.assertEqual(busqueda.filtrar(Producto.objects.all(), 'nandu', ['proveedor__nombre_contacto']).count(), 2)
+        self.assertEqual(busqueda.filtrar(Producto.objects.all(), '  ', ['nombre']).count(), 2)
+
+    def test_relacion_multiple_sin_duplicados(self):
+        from core import busqueda
+        from ventas.models import Venta, VentaItem
+
+        venta = Venta.objects.create(nombre_cliente='Cliente')
+        for _ in range(3):
+            VentaItem.objects.create(
+                venta=venta, producto=self.salmon, cantidad=Decimal('1'), precio_unitario=Decimal('50000'),
+            )
+        resultado = busqueda.filtrar(Venta.objects.all(), 'salmon', ['nombre_cliente', 'items__producto__nombre'])
+        self.assertEqual(list(resultado), [venta])
+
+    def test_indice_se_actualiza_al_guardar(self):
+        from core import busqueda
+
+        self.assertFalse(busqueda.filtrar(Producto.objects.all(), 'bagre', ['nombre']).exists())
+        self.salmon.nombre = 'Bagre Rayado'
+        self.salmon.save()
+        self.assertEqual(list(busqueda.filtrar(Producto.objects.all(), 'bagre', ['nombre'])), [self.salmon])
+
+    def test_solo_los_modelos_con_indice_tienen_senales(self):
+        """Los demás modelos conservan el borrado rápido (sin señales post_delete)"""
+        from django.db.models.signals import post_delete
+
+        from core import busqueda
+        from core.models import ArchivoReporte
+
+        busqueda.filtrar(Producto.objects.all(), 'salmon', ['nombre']).exists()
+        receptores = [r for r in post_delete._live_receivers(Producto) if r == busqueda._descartar_indice]
+        self.assertEqual(len(receptores), 1)
+        self.assertFalse(post_delete.has_listeners(ArchivoReporte))
+
+
+class PaginacionTests(TestCase):
+    """core.paginacion: páginas numeradas con pocos resultados, cursor con muchos"""
+
+    def setUp(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from ventas.models import Venta
+
+        # Varias ventas con la misma fecha para probar el desempate por id
+        ahora = timezone.now()
+        Venta.objects.bulk_create([
+            Venta(nombre_cliente=f'Cliente {i}', fecha_venta=ahora - timedelta(hours=i // 3))
+            for i in range(40)
+        ])
+        self.esperado = list(Venta.objects.order_by('-fecha_venta', '-id').values_list('id', flat=True))
+        self.factory = RequestFactory()
+
+    def _pagina(self, por_pagina, url='', **params):
+        from core.paginacion import paginar
+        from ventas.models import Venta
+
+        request = self.factory.get(f'/ventas/{url}', params)
+        return paginar(request, Venta.objects.all(), por_pagina, ('-fecha_venta', '-id'))
+
+    def test_pocos_resultados_con_numeros(self):
+        pagina = self._pagina(10, page='2', estado='COMPLETADA')
+        self.assertFalse(pagina.por_cursor)
+        self.assertEqual(pagina.paginator.num_pages, 4)
+        self.assertEqual([v.id for v in pagina], self.esperado[10:20])
+        self.assertEqual(pagina.url_siguiente, '?estado=COMPLETADA&page=3')
+
+    def test_cursor_recorre_todo_en_orden(self):
+        from urllib.parse import parse_qs
+
+        pagina = self._pagina(3)
+        self.assertTrue(pagina.por_cursor)
+        self.assertFalse(pagina.has_previous())
+
+        vistos, paginas = [], []
+        while True:
+            vistos.extend(v.id for v in pagina)
+            paginas.append(pagina)
+            if not pagina.has_next():
+                break
+            pagina = self._pagina(3, cursor=parse_qs(pagina.url_siguiente[1:])['cursor'][0])
+        self.assertEqual(vistos, self.esperado)
+
+        # Hacia atrás desde la última página se vuelve a la penúltima
+        anterior = self._pagina(3, cursor=pagina.cursor_anterior)
+        self.assertEqual([v.id for v in anterior], [v.id for v in paginas[-2]])
+        self.assertTrue(anterior.has_next())
+
+    def test_cursor_invalido_vuelve_al_inicio(self):
+        pagina = self._pagina(3, cursor='no-es-un-cursor')
+        self.assertEqual([v.id for v in pagina], self.esperado[:3])
+
+
+class CacheCompartidoTests(TestCase):
+    """core.cache_compartido: lectura en dos niveles sobre el cache compartido"""
+
+    def setUp(self):
+        from core import cache_compartido
+
+        cache.clear()
+        cache_compartido.limpiar_local()
+
+    def test_lectura_en_dos_niveles(self):
+        from core import cache_compartido
+
+        llamadas = []
+
+        def calcular():
+            llamadas.append(1)
+            return {'valor': len(llamadas)}
+
+        self.assertEqual(cache_compartido.obtener('caliente:v1', calcular, 60), {'valor': 1})
+        cache.delete('caliente:v1')
+        # Sigue en L1 aunque L2 ya no lo tenga
+        self.assertEqual(cache_compartido.obtener('caliente:v1', calcular, 60), {'valor': 1})
+        cache_compartido.limpiar_local()
+        cache.set('caliente:v1', {'valor': 'L2'}, 60)
+        self.assertEqual(cache_compartido.obtener('caliente:v1', calcular, 60), {'valor': 'L2'})
+        self.assertEqual(len(llamadas), 1)
+
+
+class LimiteIntentosTests(TestCase):
+    """core.limite_intentos: GCRA atómico, todo o nada entre claves, login sin bypass"""
+
+    def test_gcra_y_recuperacion(self):
+        from unittest import mock
+
+        from core import limite_intentos
+
+        limite = ('limite:prueba:ana', 3, 60)
+        with mock.patch('core.limite_intentos.time.time', return_value=1000.0):
+            resultados = [limite_intentos.consumir(limite) for _ in range(4)]
+        self.assertEqual([r.permitido for r in resultados], [True, True, True, False])
+        self.assertEqual([r.restantes for r in resultados[:3]], [2, 1, 0])
+        self.assertAlmostEqual(resultados[3].reintentar_en, 20.0)
+
+        # Cada 20 s (60 / 3) se recupera un intento
+        with mock.patch('core.limite_intentos.time.time', return_value=1020.5):
+            self.assertTrue(limite_intentos.consumir(limite).permitido)
+            self.assertFalse(limite_intentos.consumir(limite).permitido)
+
+    def test_todo_o_nada(self):
+        from core import limite_intentos
+        from core.models import LimiteIntentos
+
+        agotada = ('limite:prueba:agotada', 1, 60)
+        libre = ('limite:prueba:libre', 5, 60)
+        limite_intentos.consumir(agotada)
+        resultado = limite_intentos.consumir(agotada, libre)
+        self.assertFalse(resultado.permitido)
+        self.assertFalse(LimiteIntentos.objects.filter(clave=libre[0]).exists())
+
+    def test_login_bloquea_y_se_reinicia(self):
+        from django.contrib.auth.models import User
+        from django.urls import reverse
+
+        User.objects.create_user(username='cajero', password='Clave12345')
+        url = reverse('usuarios:login')
+        for restantes in (3, 2, 1):
+            response = self.client.post(url, {'username': 'cajero', 'password': 'mala'}, follow=True)
+            self.assertContains(response, f'Te quedan {restantes} intentos')
+        response = self.client.post(url, {'username': 'cajero', 'password': 'mala'})
+        self.assertContains(response, 'se ha bloqueado')
+        # Ni la contraseña correcta entra mientras dure el bloqueo
+        response = self.client.post(url, {'username': 'CAJERO ', 'password': 'Clave12345'})
+        self.assertContains(response, 'Demasiados intentos fallidos', status_code=429)
+        self.assertIn('Retry-After', response)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_limite_por_usuario_rechaza_sin_demorar(self):
+        """Agotado el límite del usuario (desde varias IP) se responde 429 al momento; al recuperarse un intento, el dueño entra"""
+        from unittest import mock
+
+        from django.contrib.auth.models import User
+        from django.urls import reverse
+
+        User.objects.create_user(username='1012345678', password='Clave12345')
+        url = reverse('usuarios:login')
+        correcto = {'username': '1012345678', 'password': 'Clave12345', 'g-recaptcha-response': 'ok'}
+        with mock.patch('core.limite_intentos.time.time', return_value=1000.0):
+            for i in range(10):
+                self.client.post(url, {'username': '1012345678', 'password': 'mala'}, REMOTE_ADDR=f'10.0.0.{i // 4}')
+            response = self.client.post(url, correcto, REMOTE_ADDR='192.168.1.20')
+        self.assertContains(response, 'Demasiados intentos fallidos', status_code=429)
+        self.assertEqual(response['Retry-After'], '180')
+
+        # Se recupera un intento cada 3 minutos (30 / 10)
+        with mock.patch('core.limite_intentos.time.time', return_value=1181.0), \
+                mock.patch('django_recaptcha.fields.ReCaptchaField.validate'):
+            response = self.client.post(url, correcto, REMOTE_ADDR='192.168.1.20')
+        self.assertRedirects(response, reverse('core:dashboard'), fetch_redirect_response=False)
+
+    def test_decorador_recuperacion(self):
+        from django.urls import reverse
+
+        url = reverse('usuarios:recuperar')
+        for _ in range(3):
+            self.assertEqual(self.client.post(url, {'email': 'nadie@example.com'}).status_code, 200)
+        response = self.client.post(url, {'email': 'Nadie@example.com'})
+        self.assertEqual(response.status_code, 429)
+
+
+class BandejaCorreosTests(TestCase):
+    """core.correos: la vista solo encola; el trabajador envía en lotes y reintenta"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        self.usuario = User.objects.create_user(username='ana', email='ana@example.com', password='Clave12345')
+
+    def test_recuperacion_encola_sin_enviar(self):
+        from django.core import mail
+        from django.urls import reverse
+
+        from core import correos
+        from core.models import CorreoSaliente
+
+        response = self.client.post(reverse('usuarios:recuperar'), {'email': 'ana@example.com'})
+        self.assertRedirects(response, reverse('usuarios:verificar_codigo'), fetch_redirect_response=False)
+        self.assertEqual(len(mail.outbox), 0)
+        correo = CorreoSaliente.objects.get()
+        self.assertEqual(correo.estado, CorreoSaliente.PENDIENTE)
+        self.assertIsNotNone(correo.expira)
+
+        self.assertEqual(correos.procesar_pendientes(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['ana@example.com'])
+        self.usuario.perfil.refresh_from_db()
+        self.assertIn(self.usuario.perfil.recovery_code, mail.outbox[0].alternatives[0][0])
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, CorreoSaliente.ENVIADO)
+        # El código no queda guardado en la bandeja
+        self.assertEqual((correo.cuerpo, correo.html), ('', ''))
+
+    def test_lote_usa_una_conexion(self):
+        from unittest import mock
+
+        from django.core import mail
+        from django.core.mail import EmailMessage
+        from django.core.mail.backends.locmem import EmailBackend
+
+        from core import correos
+
+        for i in range(5):
+            correos.encolar(EmailMessage(f'Aviso {i}', 'Texto', to=[f'c{i}@example.com']))
+        with mock.patch.object(EmailBackend, 'open', autospec=True) as abrir:
+            self.assertEqual(correos.procesar_pendientes(tamaño=10), 5)
+        self.assertEqual(abrir.call_count, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_reintento_con_espera_y_error_final(self):
+        from datetime import timedelta
+        from unittest import mock
+
+        from django.core.mail import EmailMessage
+        from django.core.mail.backends.locmem import EmailBackend
+        from django.utils import timezone
+
+        from core import correos
+        from core.models import CorreoSaliente
+
+        correo = correos.encolar(EmailMessage('Aviso', 'Texto', to=['x@example.com']))
+        with mock.patch.object(EmailBackend, 'send_messages', side_effect=OSError('SMTP caído')):
+            correos.procesar_pendientes()
+            correo.refresh_from_db()
+            self.assertEqual((correo.estado, correo.intentos), (CorreoSaliente.PENDIENTE, 1))
+            self.assertGreater(correo.proximo_intento, timezone.now() + timedelta(seconds=20))
+            # No se reintenta antes de tiempo
+            self.assertEqual(correos.procesar_pendientes(), 0)
+
+            for _ in range(correos.MAXIMO_INTENTOS - 1):
+                CorreoSaliente.objects.filter(pk=correo.pk).update(proximo_intento=timezone.now())
+                correos.procesar_pendientes()
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, CorreoSaliente.ERROR)
+        self.assertEqual(correo.error, 'SMTP caído')
+
+    def test_no_envia_expirados(self):
+        from datetime import timedelta
+
+        from django.core import mail
+        from django.core.mail import EmailMessage
+
+        from core import correos
+        from core.models import CorreoSaliente
+
+        correo = correos.encolar(EmailMessage('Código', 'Texto', to=['x@example.com']), expira=timedelta(minutes=-1))
+        correos.procesar_pendientes()
+        self.assertEqual(len(mail.outbox), 0)
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, CorreoSaliente.ERROR)
+        self.assertEqual(correo.cuerpo, '')
+
+    def test_limpiar_vacia_los_que_vencian(self):
+        """Los resueltos con `expira` que aún tienen contenido se vacían; los demás lo conservan"""
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from core import correos
+        from core.models import CorreoSaliente
+
+        datos = {'asunto': 'Aviso', 'destinatarios': ['x@example.com'], 'cuerpo': 'Código 123456', 'html': '<p>123456</p>'}
+        vencia = CorreoSaliente.objects.create(
+            estado=CorreoSaliente.ENVIADO, expira=timezone.now() + timedelta(minutes=10), **datos
+        )
+        pendiente = CorreoSaliente.objects.create(expira=timezone.now() + timedelta(minutes=10), **datos)
+        aviso = CorreoSaliente.objects.create(estado=CorreoSaliente.ENVIADO, **datos)
+
+        correos.limpiar_correos()
+        vencia.refresh_from_db()
+        pendiente.refresh_from_db()
+        aviso.refresh_from_db()
+        self.assertEqual((vencia.cuerpo, vencia.html), ('', ''))
+        self.assertEqual(pendiente.cuerpo, 'Código 123456')
+        self.assertEqual(aviso.cuerpo, 'Código 123456')
+
+
+class RenovarSesionTests(TestCase):
+    """core.middleware.RenovarSesionMiddleware: la sesión no se escribe en cada petición"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        User.objects.create_user(username='cajero', password='Clave12345')
+        from django.urls import reverse
+
+        self.client.login(username='cajero', password='Clave12345')
+        self.url = reverse('ventas:buscar_productos_api')
+
+    def _escrituras_sesion(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url, {'q': 'sal'})
+        self.assertEqual(response.status_code, 200)
+        return [
+            q['sql'] for q in consultas.captured_queries
+            if 'django_session' in q['sql'] and not q['sql'].lstrip().upper().startswith('SELECT')
+        ]
+
+    def test_sin_escritura_mientras_es_reciente(self):
+        # client.login() no pasa por el middleware: la primera petición pone la marca
+        self._escrituras_sesion()
+        self.assertEqual(self._escrituras_sesion(), [])
+        self.assertEqual(self._escrituras_sesion(), [])
+
+    def test_renueva_pasada_la_fraccion(self):
+        import time
+
+        from django.conf import settings
+
+        from core.middleware import CLAVE_RENOVADA
+
+        sesion = self.client.session
+        sesion[CLAVE_RENOVADA] = int(time.time()) - settings.SESSION_COOKIE_AGE // 2
+        sesion.save()
+        self.assertEqual(len(self._escrituras_sesion()), 1)
+        # Recién renovada: la siguiente petición ya no escribe
+        self.assertEqual(self._escrituras_sesion(), [])
+        self.assertGreater(self.client.session[CLAVE_RENOVADA], time.time() - 60)
+
+
+class SaludTests(TestCase):
+    """core:salud reporta la BD y las conexiones del proceso"""
+
+    def test_ok(self):
+        from django.urls import reverse
+
+        response = self.client.get(reverse('core:salud'))
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        self.assertEqual(datos['estado'], 'ok')
+        self.assertIn('latencia_ms', datos)
+        self.assertGreaterEqual(datos['peticiones'], 1)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_bd_caida_responde_503(self):
+        from unittest import mock
+
+        from django.db import OperationalError
+        from django.urls import reverse
+
+        with mock.patch('django.db.backends.utils.CursorWrapper.execute', side_effect=OperationalError('sin red')):
+            response = self.client.get(reverse('core:salud'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error'], 'OperationalError')
@@ -13,4 +13,8 @@ urlpatterns = [
     path('pollos/', views.pagina_pollos, name='pollos'),
     path('inventario/', views.pagina_inventario, name='inventario'),
     path('descargar-manual/', views.descargar_manual_usuario, name='descargar_manual'),
+    path('reportes/<int:pk>/', views.estado_reporte, name='estado_reporte'),
+    path('reportes/<int:pk>/estado/', views.estado_reporte_json, name='estado_reporte_json'),
+    path('reportes/<int:pk>/descargar/', views.descargar_reporte, name='descargar_reporte'),
+    path('salud/', views.salud, name='salud'),
     ]
\ No newline at end of file
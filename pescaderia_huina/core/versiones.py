@@ -0,0 +1,72 @@
+"""
+Versiones de los datos que alimentan los reportes y la búsqueda en memoria.
+
+Cada grupo (ventas, pedidos, productos, proveedores, usuarios) tiene un contador en
+VersionDatos que sube cuando se guarda o elimina cualquiera de sus modelos.
+El contador vive en la BD, así que todos los procesos (web y trabajadores)
+ven la misma versión. Se incrementa al confirmar la transacción, con un
+UPDATE corto aparte, para no bloquear una fila común durante cada venta.
+"""
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+
+from .models import VersionDatos
+
+
+# Modelo -> grupo de datos cuya versión cambia cuando el modelo cambia
+MODELOS_POR_GRUPO = {
+    'ventas': ['ventas.Venta', 'ventas.VentaItem'],
+    'pedidos': ['pedidos.Pedido', 'pedidos.DetallePedido'],
+    'productos': ['productos.Producto'],
+    'proveedores': ['proveedores.Proveedor'],
+    'usuarios': ['auth.User', 'usuarios.PerfilUsuario'],
+}
+
+
+def _incrementar(grupos):
+    for grupo in grupos:
+        if not VersionDatos.objects.filter(nombre=grupo).update(version=F('version') + 1):
+            try:
+                with transaction.atomic():
+                    VersionDatos.objects.create(nombre=grupo, version=1)
+            except IntegrityError:
+                # Otro proceso creó la fila al mismo tiempo
+                VersionDatos.objects.filter(nombre=grupo).update(version=F('version') + 1)
+
+
+def grupo_de(modelo):
+    """Grupo de datos de un modelo (None si no pertenece a ninguno)."""
+    etiqueta = modelo._meta.label
+    return next((grupo for grupo, modelos in MODELOS_POR_GRUPO.items() if etiqueta in modelos), None)
+
+
+def registrar_cambio(*grupos):
+    """
+    Sube la versión de los grupos cuando la transacción actual confirme.
+    robust=True: los datos ya quedaron guardados; si el UPDATE del contador
+    falla (p. ej. BD bloqueada) se registra en el log en vez de hacer creer
+    a quien guardó que su operación falló.
+    """
+    transaction.on_commit(lambda: _incrementar(grupos), robust=True)
+
+
+def versiones(grupos):
+    """{grupo: versión} de los grupos pedidos, en una sola consulta (0 si nunca cambió)."""
+    actuales = dict(
+        VersionDatos.objects.filter(nombre__in=list(grupos)).values_list('nombre', 'version')
+    )
+    return {grupo: actuales.get(grupo, 0) for grupo in sorted(grupos)}
+
+
+def conectar_senales():
+    """Conecta post_save/post_delete de los modelos de MODELOS_POR_GRUPO (desde CoreConfig.ready)."""
+    for grupo, modelos in MODELOS_POR_GRUPO.items():
+        def receptor(sender, grupo=grupo, **kwargs):
+            registrar_cambio(grupo)
+
+        for etiqueta in modelos:
+            modelo = apps.get_model(etiqueta)
+            post_save.connect(receptor, sender=modelo, weak=False, dispatch_uid=f'versiones:{etiqueta}:save')
+            post_delete.connect(receptor, sender=modelo, weak=False, dispatch_uid=f'versiones:{etiqueta}:delete')
@@ -1,10 +1,11 @@
-from django.shortcuts import render
-from django.http import HttpResponse, FileResponse
+from django.shortcuts import render, get_object_or_404
+from django.http import HttpResponse, FileResponse, JsonResponse, Http404
+from django.urls import reverse
 from django.template import loader
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.cache import never_cache
 from django.utils import timezone
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 import os
 from django.conf import settings
 
@@ -28,6 +29,9 @@ def PanelAdmin_base(request):
 from productos.models import Producto
 
 from .forms import BusquedaProductoForm
+from . import busqueda, conexiones, reportes
+from .paginacion import paginar
+from .models import TrabajoReporte
 
 @login_required
 def pagina_inventario(request):
@@ -39,20 +43,12 @@ def pagina_inventario(request):
     if form.is_valid():
         buscar = form.cleaned_data.get('buscar')
         tipo = form.cleaned_data.get('tipo_producto')
-        if buscar:
-            productos = productos.filter(nombre__icontains=buscar)
+        productos = busqueda.filtrar(productos, buscar, ['nombre'])
         if tipo:
             productos = productos.filter(tipo_producto=tipo)
 
-    # OPTIMIZACIÓN: Paginación para cada categoría
-    paginator = Paginator(productos, 50)
-    page = request.GET.get('page', 1)
-    try:
-        productos_page = paginator.page(page)
-    except PageNotAnInteger:
-        productos_page = paginator.page(1)
-    except EmptyPage:
-        productos_page = paginator.page(paginator.num_pages)
+    # OPTIMIZACIÓN: Paginación para cada categoría (por cursor sobre id si hay muchos)
+    productos_page = paginar(request, productos, 50, ('id',))
 
     # Filtrar por categorías desde la página paginada
     pescados = [p for p in productos_page if p.tipo_producto == 'PE']
@@ -121,4 +117,65 @@ def descargar_manual_usuario(request):
     # Servir el archivo como descarga
     response = FileResponse(open(pdf_path, 'rb'), content_type='application/pdf')
     response['Content-Disposition'] = 'attachment; filename="Manual De Usuario Pescaderia Huina.pdf"'
-    return response
\ No newline at end of file
+    return response
+
+# ==========================================
+# REPORTES PDF EN SEGUNDO PLANO
+# ==========================================
+def _trabajo_del_usuario(request, pk):
+    """Cada usuario solo ve sus trabajos (el staff, todos)."""
+    trabajos = TrabajoReporte.objects.all()
+    if not request.user.is_staff:
+        trabajos = trabajos.filter(usuario=request.user)
+    return get_object_or_404(trabajos, pk=pk)
+
+
+def _estado_trabajo(trabajo):
+    datos = {
+        'id': trabajo.pk,
+        'estado': trabajo.estado,
+        'listo': trabajo.estado == TrabajoReporte.LISTO,
+        'error': trabajo.error,
+        'url_descarga': None,
+    }
+    if datos['listo']:
+        datos['url_descarga'] = reverse('core:descargar_reporte', args=[trabajo.pk])
+    return datos
+
+
+@login_required
+def estado_reporte(request, pk):
+    """Página que espera el reporte y ofrece la descarga cuando está listo."""
+    trabajo = _trabajo_del_usuario(request, pk)
+    return render(request, 'core/estado_reporte.html', {
+        'trabajo': trabajo,
+        'estado': _estado_trabajo(trabajo),
+    })
+
+
+@login_required
+def estado_reporte_json(request, pk):
+    """Endpoint consultado periódicamente por la página de estado."""
+    trabajo = _trabajo_del_usuario(request, pk)
+    return JsonResponse(_estado_trabajo(trabajo))
+
+
+@login_required
+def descargar_reporte(request, pk):
+    trabajo = _trabajo_del_usuario(request, pk)
+    archivo = reportes.obtener_archivo(trabajo.clave) if trabajo.estado == TrabajoReporte.LISTO else None
+    if archivo is None:
+        raise Http404('El reporte no está disponible')
+    return reportes.respuesta_archivo(archivo)
+
+
+@never_cache
+def salud(request):
+    """
+    Chequeo de salud para el balanceador o el orquestador (sin login):
+    200 si la BD responde, 503 si no, con la latencia y las estadísticas de
+    conexiones del proceso que atendió.
+    """
+    ok, datos = conexiones.estado()
+    datos['estado'] = 'ok' if ok else 'error'
+    return JsonResponse(datos, status=200 if ok else 503)
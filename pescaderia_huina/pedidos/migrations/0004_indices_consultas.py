@@ -0,0 +1,40 @@
+# Generated migration - Índices compuestos para listados y stock
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0003_alter_detallepedido_producto'),
+    ]
+
+    operations = [
+        # Reemplazado por (estado, -fecha), que también sirve para filtrar solo por estado
+        migrations.RemoveIndex(
+            model_name='pedido',
+            name='pedidos_estado_idx',
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(
+                fields=['estado', '-fecha'],
+                name='pedidos_estado_fecha_idx',
+            ),
+        ),
+        # Nombre anterior superaba los 30 caracteres que admite Django
+        migrations.RenameIndex(
+            model_name='detallepedido',
+            new_name='detallepedido_ped_prod_idx',
+            old_name='detallepedido_pedido_producto_idx',
+        ),
+        # Índice para el stock por producto (JOIN con pedido.estado y suma de cantidad)
+        migrations.AddIndex(
+            model_name='detallepedido',
+            index=models.Index(
+                fields=['producto', 'pedido'],
+                include=('cantidad',),
+                name='detallepedido_producto_ped_idx',
+            ),
+        ),
+    ]
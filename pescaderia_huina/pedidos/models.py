@@ -1,6 +1,12 @@
 from django.db import models
 from proveedores.models import Proveedor  
 from productos.models import Producto
+from productos import stock
+from productos.stock import ESTADO_PEDIDO_RECIBIDO
+from django.db.models import Sum
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from decimal import Decimal
 
 
 class Pedido(models.Model):
@@ -29,6 +35,13 @@ class Pedido(models.Model):
     class Meta:
         verbose_name = "Pedido"
         verbose_name_plural = "Pedidos"
+        indexes = [
+            models.Index(fields=['proveedor', 'estado'], name='pedidos_proveedor_estado_idx'),
+            # Listado (siempre por -fecha) y filtros por rango de días
+            models.Index(fields=['-fecha'], name='pedidos_fecha_desc_idx'),
+            # Filtro por estado con el mismo orden del listado
+            models.Index(fields=['estado', '-fecha'], name='pedidos_estado_fecha_idx'),
+        ]
 
 
 class DetallePedido(models.Model):
@@ -41,9 +54,83 @@ class DetallePedido(models.Model):
         help_text="Precio de compra al proveedor"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['pedido', 'producto'], name='detallepedido_ped_prod_idx'),
+            # Stock por producto (JOIN con pedido.estado): cubre la suma de cantidad en PostgreSQL
+            models.Index(fields=['producto', 'pedido'], include=['cantidad'], name='detallepedido_producto_ped_idx'),
+        ]
+
     @property
     def subtotal(self):
         return self.cantidad * self.precio_unitario
 
     def __str__(self):
-        return f"{self.producto.nombre} (x{self.cantidad})"
\ No newline at end of file
+        return f"{self.producto.nombre} (x{self.cantidad})"
+
+
+# ==================== LIBRO DE STOCK ====================
+# Mantiene productos.StockProducto al día cuando cambian los pedidos.
+
+def _estado_pedido_en_bd(pedido_id):
+    return Pedido.objects.filter(pk=pedido_id).values_list('estado', flat=True).first()
+
+
+@receiver(pre_save, sender=Pedido)
+def guardar_estado_previo_pedido(sender, instance, raw=False, **kwargs):
+    instance._estado_previo = None if raw or not instance.pk else _estado_pedido_en_bd(instance.pk)
+
+
+@receiver(post_save, sender=Pedido)
+def actualizar_stock_por_estado_pedido(sender, instance, created, raw=False, **kwargs):
+    """Al entrar o salir de REC, suma o resta los detalles del pedido."""
+    if raw or created:
+        return
+    era_recibido = getattr(instance, '_estado_previo', None) == ESTADO_PEDIDO_RECIBIDO
+    es_recibido = instance.estado == ESTADO_PEDIDO_RECIBIDO
+    if era_recibido == es_recibido:
+        return
+
+    signo = 1 if es_recibido else -1
+    cantidades = {
+        fila['producto_id']: signo * fila['total']
+        for fila in instance.detalles.values('producto_id').annotate(total=Sum('cantidad')).order_by()
+    }
+    stock.aplicar_movimientos(cantidades, 'recibido')
+
+
+@receiver(pre_save, sender=DetallePedido)
+def guardar_detalle_previo(sender, instance, raw=False, **kwargs):
+    instance._detalle_previo = None
+    if raw or not instance.pk:
+        return
+    instance._detalle_previo = DetallePedido.objects.filter(pk=instance.pk).values(
+        'producto_id', 'cantidad', 'pedido__estado'
+    ).first()
+
+
+@receiver(post_save, sender=DetallePedido)
+def actualizar_stock_por_detalle(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cantidades = {}
+    previo = getattr(instance, '_detalle_previo', None)
+    if previo and previo['pedido__estado'] == ESTADO_PEDIDO_RECIBIDO:
+        cantidades[previo['producto_id']] = -Decimal(str(previo['cantidad']))
+    if _estado_pedido_en_bd(instance.pedido_id) == ESTADO_PEDIDO_RECIBIDO:
+        cantidades[instance.producto_id] = (
+            cantidades.get(instance.producto_id, Decimal('0')) + Decimal(str(instance.cantidad))
+        )
+    stock.aplicar_movimientos(cantidades, 'recibido')
+
+
+@receiver(pre_delete, sender=DetallePedido)
+def guardar_estado_detalle_eliminado(sender, instance, **kwargs):
+    # En un borrado en cascada el pedido todavía existe en pre_delete, no en post_delete.
+    instance._estado_pedido = _estado_pedido_en_bd(instance.pedido_id)
+
+
+@receiver(post_delete, sender=DetallePedido)
+def actualizar_stock_por_detalle_eliminado(sender, instance, **kwargs):
+    if getattr(instance, '_estado_pedido', None) == ESTADO_PEDIDO_RECIBIDO:
+        stock.aplicar_movimiento(instance.producto_id, recibido=-Decimal(str(instance.cantidad)))
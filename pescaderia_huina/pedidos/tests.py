@@ -227,3 +227,87 @@ class PedidoURLTest(PedidoTestBase):
         """Verifica otro mapeo dinámico de URL."""
         url = reverse('pedidos:detalle_pedido', args=[5])
         self.assertEqual(url, '/pedidos/detalle/5/')
+
+
+# ==========================================
+# TEST 6: Inventario en una sola consulta
+# ==========================================
+class InventarioPedidosTest(PedidoTestBase):
+    """Pruebas del inventario agrupado por categoría."""
+
+    def test_inventario_agrupado_en_una_consulta(self):
+        """El inventario de todas las categorías se arma con UNA consulta."""
+        from .views import _inventario_por_categoria
+
+        marisco = Producto.objects.create(
+            nombre='Camarón', precio=Decimal('30000.00'),
+            tipo_producto='MA', tipo_presentacion='BAN', proveedor=self.proveedor,
+        )
+        pedido = Pedido.objects.create(proveedor=self.proveedor)
+        DetallePedido.objects.create(
+            pedido=pedido, producto=marisco, cantidad=Decimal('7'), precio_unitario=Decimal('1000')
+        )
+        pedido.estado = 'REC'
+        pedido.save()
+
+        with self.assertNumQueries(1):
+            categorias = _inventario_por_categoria()
+            proveedores = [str(p.proveedor) for p in categorias['MA']]
+
+        self.assertEqual([p.nombre for p in categorias['PE']], ['Pez Fresco'])
+        self.assertEqual(categorias['MA'][0].stock_disponible, Decimal('7'))
+        self.assertEqual(proveedores, [str(self.proveedor)])
+        self.assertEqual(categorias['PO'], [])
+
+    def test_vista_inventario_y_excel(self):
+        """La vista HTML y la exportación a Excel responden correctamente."""
+        self.client.login(username='testuser', password='password123')
+        url = reverse('pedidos:inventario_pedidos')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.get(url, {'export': 'excel'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('spreadsheetml', response['Content-Type'])
+
+
+# ==========================================
+# TEST: Búsqueda en la lista con EXISTS
+# ==========================================
+class PedidoBusquedaTest(PedidoTestBase):
+    """La búsqueda por producto no multiplica filas ni infla la cantidad total."""
+
+    def setUp(self):
+        super().setUp()
+        otro = Producto.objects.create(
+            nombre='Pez Espada', precio=Decimal('30000.00'), tipo_producto='PE', tipo_presentacion='LIB',
+        )
+        self.pedido = Pedido.objects.create(proveedor=self.proveedor, valor_total=Decimal('0'))
+        # Dos detalles coinciden con "pez": con JOIN la fila y la suma saldrían dobles
+        DetallePedido.objects.create(pedido=self.pedido, producto=self.producto, cantidad=Decimal('4'), precio_unitario=Decimal('1'))
+        DetallePedido.objects.create(pedido=self.pedido, producto=otro, cantidad=Decimal('6'), precio_unitario=Decimal('1'))
+        Pedido.objects.create(proveedor=self.proveedor, valor_total=Decimal('0'))
+
+    def test_busqueda_por_producto_una_fila_con_total_correcto(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .views import _filtrar_pedidos
+
+        list(_filtrar_pedidos('pez', None, None))  # construye los índices en memoria
+        with CaptureQueriesContext(connection) as consultas:
+            pedidos = list(_filtrar_pedidos('pez', None, None))
+        self.assertEqual([p.id for p in pedidos], [self.pedido.id])
+        self.assertEqual(pedidos[0].cantidad_total_calculada, Decimal('10'))
+
+        # Versión de los datos + una consulta, con EXISTS y sin DISTINCT ni GROUP BY
+        sql = consultas.captured_queries[-1]['sql'].upper()
+        self.assertEqual(len(consultas), 2)
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+        self.assertNotIn('GROUP BY "PEDIDOS_PEDIDO"', sql)
+
+    def test_busqueda_por_numero_de_pedido(self):
+        from .views import _filtrar_pedidos
+
+        pedidos = list(_filtrar_pedidos(f'#{self.pedido.id}', None, None))
+        self.assertEqual([p.id for p in pedidos], [self.pedido.id])
+        self.assertEqual(_filtrar_pedidos(None, None, None).count(), 2)
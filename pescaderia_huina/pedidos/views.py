@@ -1,23 +1,28 @@
 import json
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.styles import Font, Alignment
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.forms import inlineformset_factory
-from django.db.models import Sum, Q, F, Prefetch
-from django.template.loader import get_template
-from django.http import HttpResponse, JsonResponse
+from django.db.models import Sum, Q, F, Prefetch, OuterRef, Subquery
+from django.http import JsonResponse
 from django.utils import timezone
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from xhtml2pdf import pisa
+from django.db import transaction
 from decimal import Decimal
 
 from .models import Pedido, DetallePedido
 from .forms import PedidoForm, DetallePedidoForm
 from ventas.models import Venta
 from productos.models import Producto
+from productos import stock
+from core import busqueda, reportes
+from core.fechas import filtro_rango_dias
+from core.paginacion import paginar
+from core.excel import (
+    ExportadorExcel, CHUNK_SIZE, AZUL_OSCURO, VERDE, GRIS_CLARO,
+    ALINEACION_CENTRO, ALINEACION_IZQUIERDA, ALINEACION_DERECHA, BORDE_GRIS,
+)
 from proveedores.models import Proveedor
 
 # Fábrica de formularios. Permite crear múltiples Detalles vinculados a 1 Pedido
@@ -49,148 +54,143 @@ def _asignar_productos_por_proveedor(formset, proveedor_id):
 # ==========================================
 # 1. LISTA DE PEDIDOS
 # ==========================================
-@login_required
-def lista_pedidos(request):
-    # OPTIMIZACIÓN: select_related() para evitar N+1 queries en proveedor
+def _filtrar_pedidos(query, fecha_inicio, fecha_fin):
+    """Pedidos con los filtros de la lista; los comparten la vista y los reportes."""
+    # OPTIMIZACIÓN: select_related() para evitar N+1 queries en proveedor.
+    # La cantidad total va en una subconsulta por pedido: sin JOIN + GROUP BY
+    # sobre detalles, la consulta principal tiene una fila por pedido.
+    cantidades = DetallePedido.objects.filter(pedido=OuterRef('pk')).values('pedido').annotate(
+        total=Sum('cantidad')
+    ).values('total')
     pedidos = Pedido.objects.select_related('proveedor').annotate(
-        cantidad_total_calculada=Sum('detalles__cantidad') 
+        cantidad_total_calculada=Subquery(cantidades)
     ).order_by('-fecha')
 
+    if query:
+        # Detalles por EXISTS: no multiplica filas ni altera la cantidad total
+        condicion = busqueda.condicion(
+            Pedido, query, ['proveedor__nombre_contacto', 'proveedor__nit', 'detalles__producto__nombre']
+        ) or Q()
+        # Un número también puede ser el # del pedido
+        numero = query.strip().lstrip('#')
+        if numero.isdigit():
+            condicion |= Q(id=int(numero))
+        pedidos = pedidos.filter(condicion)
+
+    pedidos = pedidos.filter(**filtro_rango_dias('fecha', fecha_inicio, fecha_fin))
+    return pedidos
+
+
+@login_required
+def lista_pedidos(request):
     query = request.GET.get('q')
     fecha_inicio = request.GET.get('fecha_inicio')
     fecha_fin = request.GET.get('fecha_fin')
 
-    if query:
-        pedidos = pedidos.filter(
-            Q(id__icontains=query) | 
-            Q(proveedor__nombre_contacto__icontains=query) | 
-            Q(proveedor__nit__icontains=query) |
-            Q(detalles__producto__nombre__icontains=query)
-        ).distinct()
-
-    if fecha_inicio:
-        pedidos = pedidos.filter(fecha__date__gte=fecha_inicio) 
-    if fecha_fin:
-        pedidos = pedidos.filter(fecha__date__lte=fecha_fin)     
-        
-    # --- EXPORTAR REPORTE A PDF ---
+    pedidos = _filtrar_pedidos(query, fecha_inicio, fecha_fin)
+
+    # --- EXPORTAR REPORTE A PDF (se genera en segundo plano) ---
     if request.GET.get('export') == 'pdf':
-        if fecha_inicio and fecha_fin: texto_rango = f"Del {fecha_inicio} al {fecha_fin}"
-        elif fecha_inicio: texto_rango = f"Desde el {fecha_inicio}"
-        elif fecha_fin: texto_rango = f"Hasta el {fecha_fin}"
-        else:
-            meses = ['', 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
-            texto_rango = f"{meses[timezone.now().month]} {timezone.now().year}"
-        
-        context = {
-            'pedidos': pedidos,
-            'fecha_generacion': timezone.now(),
-            'mes_reporte': texto_rango,                   
-            'total_pedidos': pedidos.count(),               
-            'ordenes_confirmadas': pedidos.filter(estado__in=['REC', 'recibido']).count(),   
-            'ordenes_pendientes': pedidos.filter(estado__in=['PEN', 'pendiente']).count(),     
-            'ordenes_canceladas': pedidos.filter(estado__in=['CAN', 'cancelado']).count(),     
-            'suma_total': pedidos.aggregate(total=Sum('valor_total'))['total'] or 0                      
-        }
-        
-        template = get_template('reporte_mensual_pdf.html') 
-        html = template.render(context)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="Reporte_Pedidos_Pescaderia.pdf"'
-        pisa_status = pisa.CreatePDF(html, dest=response)
-        if pisa_status.err: return HttpResponse('Error al generar PDF', status=500)
-        return response
+        parametros = {'q': query, 'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin}
+        return reportes.respuesta_pdf(request, 'pedidos', parametros)
 
     # --- EXPORTAR REPORTE A EXCEL (DISEÑO PROFESIONAL) ---
     elif request.GET.get('export') == 'excel':
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Reporte de Pedidos"
-
-        # Paleta de colores compartida
-        azul_oscuro = "0A3D62"
-        verde = "198754"
-        gris_claro = "F2F2F2"
-
-        header_font = Font(bold=True, color="FFFFFF", size=10)
-        header_fill = PatternFill(start_color=azul_oscuro, end_color=azul_oscuro, fill_type="solid")
-        center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        right_align = Alignment(horizontal='right', vertical='center')
-        thin_border = Border(left=Side(style='thin', color='CCCCCC'), right=Side(style='thin', color='CCCCCC'), top=Side(style='thin', color='CCCCCC'), bottom=Side(style='thin', color='CCCCCC'))
-
-        # Encabezado Principal
-        ws.merge_cells('A1:G1')
-        ws['A1'] = 'REPORTE DE ÓRDENES DE PEDIDO — PESCADERÍA HUINA'
-        ws['A1'].font = Font(bold=True, color="FFFFFF", size=13)
-        ws['A1'].fill = header_fill
-        ws['A1'].alignment = center_align
-        ws.row_dimensions[1].height = 28
-
-        # Estadísticas (Sin decimales)
-        inversion_total = pedidos.aggregate(t=Sum('valor_total'))['t'] or Decimal('0')
-        ws.merge_cells('A2:C2')
-        ws['A2'] = f'Total Pedidos: {pedidos.count()}'
-        ws.merge_cells('D2:G2')
-        ws['D2'] = f'Inversión Total: ${float(inversion_total):,.0f}'
-        for cell in [ws['A2'], ws['D2']]:
-            cell.font = Font(bold=True, size=10)
-            cell.fill = PatternFill(start_color="E8F4F8", end_color="E8F4F8", fill_type="solid")
-            cell.alignment = center_align
-        ws.row_dimensions[2].height = 20
-
-        # Cabecera de Tabla
-        headers = ['# ID', 'Fecha', 'Proveedor', 'NIT', 'Uds.', 'Estado', 'Valor Total']
-        col_widths = [10, 15, 30, 18, 10, 15, 18]
-        for col, (header, width) in enumerate(zip(headers, col_widths), 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_align
-            cell.border = thin_border
-            ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = width
-        ws.row_dimensions[3].height = 18
-
-        # Datos
-        for row_num, p in enumerate(pedidos, 4):
-            estado_texto = "Recibido" if p.estado in ['REC', 'recibido'] else "Pendiente" if p.estado in ['PEN', 'pendiente'] else "Cancelado"
-            row_data = [
-                f"#{p.id}", p.fecha.strftime("%d/%m/%Y") if p.fecha else "N/A", p.proveedor.nombre_contacto if p.proveedor else "N/A",
-                p.proveedor.nit if p.proveedor else "N/A", p.cantidad_total_calculada or 0, estado_texto.upper(), float(p.valor_total or 0)
-            ]
-
-            bg = PatternFill(start_color="FFE0E0", end_color="FFE0E0", fill_type="solid") if estado_texto == "Cancelado" else (PatternFill(start_color=gris_claro, end_color=gris_claro, fill_type="solid") if row_num % 2 == 0 else None)
-
-            for col, val in enumerate(row_data, 1):
-                cell = ws.cell(row=row_num, column=col, value=val)
-                cell.border = thin_border
-                if bg: cell.fill = bg
-                if col in [1, 2, 4, 5, 6]: cell.alignment = center_align
-                if col == 7:
-                    cell.alignment = right_align
-                    cell.number_format = '$#,##0' # Formato modificado para no tener decimales
-                if col == 6:
-                    if estado_texto == "Cancelado": cell.font = Font(bold=True, color="DC2626")
-                    elif estado_texto == "Recibido": cell.font = Font(bold=True, color=verde)
-
-        ws.freeze_panes = 'A4'
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="Reporte_Pedidos_Pescaderia.xlsx"'
-        wb.save(response)
-        return response
-
-    # OPTIMIZACIÓN: Paginación para evitar cargar todos los pedidos
-    paginator = Paginator(pedidos, 20)
-    page = request.GET.get('page', 1)
-    try:
-        pedidos = paginator.page(page)
-    except PageNotAnInteger:
-        pedidos = paginator.page(1)
-    except EmptyPage:
-        pedidos = paginator.page(paginator.num_pages)
+        parametros = {'q': query, 'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin}
+        return reportes.respuesta_cacheada(
+            request, 'pedidos_excel', parametros, lambda: libro_excel_pedidos(pedidos).archivo()
+        )
+
+    # OPTIMIZACIÓN: Paginación por cursor sobre (fecha, id) cuando hay muchos pedidos
+    pedidos = paginar(request, pedidos, 20, ('-fecha', '-id'))
 
     return render(request, 'lista_pedidos.html', {'pedidos': pedidos})
 
 
+def libro_excel_pedidos(pedidos):
+    """Arma el Excel de pedidos (DISEÑO PROFESIONAL) a partir de la lista filtrada."""
+    excel = ExportadorExcel('Reporte de Pedidos', 'Reporte_Pedidos_Pescaderia.xlsx')
+
+    excel.estilo('titulo', fuente=Font(bold=True, color="FFFFFF", size=13), fondo=AZUL_OSCURO,
+                 alineacion=ALINEACION_CENTRO)
+    excel.estilo('resumen', fuente=Font(bold=True, size=10), fondo="E8F4F8", alineacion=ALINEACION_CENTRO)
+    excel.estilo('encabezado', fuente=Font(bold=True, color="FFFFFF", size=10), fondo=AZUL_OSCURO,
+                 alineacion=ALINEACION_CENTRO, borde=BORDE_GRIS)
+    fuentes_estado = {
+        'Cancelado': Font(bold=True, color="DC2626"),
+        'Recibido': Font(bold=True, color=VERDE),
+    }
+    for sufijo, fondo in {'': None, 'gris': GRIS_CLARO, 'cancelado': "FFE0E0"}.items():
+        excel.estilo(f'celda{sufijo}', fondo=fondo, borde=BORDE_GRIS)
+        excel.estilo(f'centro{sufijo}', fondo=fondo, alineacion=ALINEACION_CENTRO, borde=BORDE_GRIS)
+        excel.estilo(f'moneda{sufijo}', fondo=fondo, alineacion=ALINEACION_DERECHA, borde=BORDE_GRIS,
+                     formato='$#,##0')  # Sin decimales
+        for estado_texto, fuente in fuentes_estado.items():
+            excel.estilo(f'estado_{estado_texto}{sufijo}', fuente=fuente, fondo=fondo,
+                         alineacion=ALINEACION_CENTRO, borde=BORDE_GRIS)
+
+    excel.anchos([10, 15, 30, 18, 10, 15, 18])
+    excel.congelar('A4')
+
+    # Encabezado Principal
+    excel.fila(['REPORTE DE ÓRDENES DE PEDIDO — PESCADERÍA HUINA'], 'titulo', alto=28, combinar='A:G')
+
+    # Estadísticas (Sin decimales)
+    inversion_total = pedidos.aggregate(t=Sum('valor_total'))['t'] or Decimal('0')
+    excel.fila(
+        [f'Total Pedidos: {pedidos.count()}', None, None,
+         f'Inversión Total: ${float(inversion_total):,.0f}', None, None, None],
+        'resumen', alto=20, combinar=['A:C', 'D:G'],
+    )
+
+    # Cabecera de Tabla
+    headers = ['# ID', 'Fecha', 'Proveedor', 'NIT', 'Uds.', 'Estado', 'Valor Total']
+    excel.fila(headers, 'encabezado', alto=18)
+
+    # Datos
+    for p in pedidos.iterator(chunk_size=CHUNK_SIZE):
+        estado_texto = "Recibido" if p.estado in ['REC', 'recibido'] else "Pendiente" if p.estado in ['PEN', 'pendiente'] else "Cancelado"
+        row_data = [
+            f"#{p.id}", p.fecha.strftime("%d/%m/%Y") if p.fecha else "N/A", p.proveedor.nombre_contacto if p.proveedor else "N/A",
+            p.proveedor.nit if p.proveedor else "N/A", p.cantidad_total_calculada or 0, estado_texto.upper(), float(p.valor_total or 0)
+        ]
+
+        row_num = excel.filas_escritas + 1
+        sufijo = 'cancelado' if estado_texto == "Cancelado" else ('gris' if row_num % 2 == 0 else '')
+        estilo_estado = f'estado_{estado_texto}' if estado_texto in fuentes_estado else 'centro'
+        excel.fila(row_data, [f'{nombre}{sufijo}' for nombre in (
+            'centro', 'centro', 'celda', 'centro', 'centro', estilo_estado, 'moneda',
+        )])
+
+    return excel
+
+
+def datos_pdf_pedidos(parametros):
+    """Plantilla, contexto y nombre del reporte PDF de pedidos (lo genera core.reportes)."""
+    fecha_inicio = parametros.get('fecha_inicio')
+    fecha_fin = parametros.get('fecha_fin')
+    pedidos = _filtrar_pedidos(parametros.get('q'), fecha_inicio, fecha_fin)
+
+    if fecha_inicio and fecha_fin: texto_rango = f"Del {fecha_inicio} al {fecha_fin}"
+    elif fecha_inicio: texto_rango = f"Desde el {fecha_inicio}"
+    elif fecha_fin: texto_rango = f"Hasta el {fecha_fin}"
+    else:
+        meses = ['', 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+        texto_rango = f"{meses[timezone.now().month]} {timezone.now().year}"
+
+    context = {
+        'pedidos': pedidos,
+        'fecha_generacion': timezone.now(),
+        'mes_reporte': texto_rango,                   
+        'total_pedidos': pedidos.count(),               
+        'ordenes_confirmadas': pedidos.filter(estado__in=['REC', 'recibido']).count(),   
+        'ordenes_pendientes': pedidos.filter(estado__in=['PEN', 'pendiente']).count(),     
+        'ordenes_canceladas': pedidos.filter(estado__in=['CAN', 'cancelado']).count(),     
+        'suma_total': pedidos.aggregate(total=Sum('valor_total'))['total'] or 0                      
+    }
+    return 'reporte_mensual_pdf.html', context, 'Reporte_Pedidos_Pescaderia.pdf'
+
+
 # ==========================================
 # 2. CREAR, EDITAR, ELIMINAR PEDIDOS
 # ==========================================
@@ -248,16 +248,18 @@ def editar_pedido(request, id):
         _asignar_productos_por_proveedor(formset, proveedor_id)
 
         if form_pedido.is_valid() and formset.is_valid():
-            pedido_obj = form_pedido.save(commit=False)
-            formset.save()
-            
-            total_recalculado = 0
-            for d in pedido_obj.detalles.all():
-                factor = 0.5 if d.presentacion in ['libras', 'Lib', 'libra'] else 1
-                total_recalculado += float(d.cantidad or 0) * float(d.precio_unitario or 0) * factor
-                
-            pedido_obj.valor_total = total_recalculado
-            pedido_obj.save()
+            # Atómico: los detalles de un pedido REC mueven el libro de stock
+            with transaction.atomic():
+                pedido_obj = form_pedido.save(commit=False)
+                formset.save()
+
+                total_recalculado = 0
+                for d in pedido_obj.detalles.all():
+                    factor = 0.5 if d.presentacion in ['libras', 'Lib', 'libra'] else 1
+                    total_recalculado += float(d.cantidad or 0) * float(d.precio_unitario or 0) * factor
+
+                pedido_obj.valor_total = total_recalculado
+                pedido_obj.save()
             
             messages.info(request, f"Pedido #{pedido.id} actualizado correctamente.")
             return redirect('pedidos:lista_pedidos')
@@ -281,33 +283,37 @@ def eliminar_pedido(request, id):
 # ==========================================
 # 3. DETALLE Y UTILIDADES AJAX
 # ==========================================
-@login_required
-def detalle_pedido(request, id):
+def _pedido_con_detalles(id):
     # OPTIMIZACIÓN: prefetch_related para evitar N+1 queries en detalles
     detalle_prefetch = Prefetch('detalles', DetallePedido.objects.select_related('producto'))
-    pedido = get_object_or_404(
+    return get_object_or_404(
         Pedido.objects.select_related('proveedor').prefetch_related(detalle_prefetch),
         id=id
     )
+
+
+@login_required
+def detalle_pedido(request, id):
+    pedido = _pedido_con_detalles(id)
     if request.GET.get('export') == 'pdf':
-        detalles_con_subtotal = []
-        for d in pedido.detalles.all():
-            cant = float(d.cantidad or 0)
-            prec = float(d.precio_unitario or 0)
-            factor = 0.5 if d.presentacion in ['libras', 'Lib', 'libra'] else 1
-            d.subtotal_calculado = cant * prec * factor
-            detalles_con_subtotal.append(d)
-            
-        template = get_template('pdf_pedido.html')
-        html = template.render({'pedido': pedido, 'detalles': detalles_con_subtotal})
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="Pedido_{pedido.id}.pdf"'
-        pisa_status = pisa.CreatePDF(html, dest=response)
-        if pisa_status.err: return HttpResponse('Error al generar PDF', status=500)
-        return response
+        return reportes.respuesta_pdf(request, 'pedido', {'id': pedido.id})
 
     return render(request, 'detalle_pedido.html', {'pedido': pedido})
 
+
+def datos_pdf_pedido(parametros):
+    """Plantilla, contexto y nombre del PDF de un pedido (lo genera core.reportes)."""
+    pedido = _pedido_con_detalles(parametros['id'])
+    detalles_con_subtotal = []
+    for d in pedido.detalles.all():
+        cant = float(d.cantidad or 0)
+        prec = float(d.precio_unitario or 0)
+        factor = 0.5 if d.presentacion in ['libras', 'Lib', 'libra'] else 1
+        d.subtotal_calculado = cant * prec * factor
+        detalles_con_subtotal.append(d)
+
+    return 'pdf_pedido.html', {'pedido': pedido, 'detalles': detalles_con_subtotal}, f'Pedido_{pedido.id}.pdf'
+
 @login_required
 def cargar_productos_proveedor(request):
     proveedor_id = request.GET.get('proveedor_id')
@@ -337,8 +343,9 @@ def cambiar_estado_pedido(request, pedido_id):
         estado_normalizado = mapeo_estados.get(nuevo_estado)
         
         if estado_normalizado:
-            pedido.estado = estado_normalizado
-            pedido.save()
+            with transaction.atomic():
+                pedido.estado = estado_normalizado
+                pedido.save()
             return JsonResponse({'success': True, 'estado': estado_normalizado})
         else:
             return JsonResponse({'success': False, 'error': 'Estado no válido'})
@@ -349,154 +356,124 @@ def cambiar_estado_pedido(request, pedido_id):
 # ==========================================
 # 4. INVENTARIO DE PEDIDOS
 # ==========================================
+def _inventario_por_categoria():
+    """
+    Productos activos con su stock, agrupados por tipo, en UNA sola consulta
+    (libro de stock + proveedor). Lo comparten la vista HTML, el PDF y el Excel.
+    """
+    categorias = {'PE': [], 'MA': [], 'PO': []}
+    productos = stock.anotar_stock(
+        Producto.objects.filter(estado=True)
+    ).select_related('proveedor').order_by('id')
+    for p in productos:
+        categorias.setdefault(p.tipo_producto, []).append(p)
+    return categorias
+
+
 @login_required
 def inventario_pedidos(request):
-    productos = Producto.objects.filter(estado=True)
-    
-    def calcular_stock_y_pedidos(queryset):
-        for p in queryset:
-            # Usar la propiedad stock del modelo que calcula: 
-            # stock = recibido (estado REC) - vendido (estado COMPLETADA o PENDIENTE)
-            p.stock_disponible = p.stock
-        return queryset
-    
-    pescados = calcular_stock_y_pedidos(productos.filter(tipo_producto='PE'))
-    mariscos = calcular_stock_y_pedidos(productos.filter(tipo_producto='MA'))
-    pollos = calcular_stock_y_pedidos(productos.filter(tipo_producto='PO'))
-    
-    # --- EXPORTAR INVENTARIO PDF ---
+    # --- EXPORTAR INVENTARIO PDF (se genera en segundo plano) ---
     if request.GET.get('export') == 'pdf':
-        template = get_template('inventario_pdf.html')
-        context = {
-            'pescados': pescados, 'mariscos': mariscos, 'pollos': pollos, 'fecha_generacion': timezone.now(),
-        }
-        html = template.render(context)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="Inventario_Pescaderia.pdf"'
-        pisa_status = pisa.CreatePDF(html, dest=response)
-        if pisa_status.err: return HttpResponse('Hubo un error al generar el PDF', status=500)
-        return response
-    
+        return reportes.respuesta_pdf(request, 'inventario', {})
+
     # --- EXPORTAR INVENTARIO EXCEL (DISEÑO UNIFICADO) ---
-    elif request.GET.get('export') == 'excel':
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="Inventario_Pescaderia.xlsx"'
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Inventario"
-        
-        # Colores y estilos del Excel de ventas
-        azul_oscuro = "0A3D62"
-        verde = "198754"
-        gris_claro = "F2F2F2"
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        header_fill = PatternFill(start_color=azul_oscuro, end_color=azul_oscuro, fill_type="solid")
-        category_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-        category_font = Font(bold=True, color="0F3976", size=10)
-        center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        left_align = Alignment(horizontal='left', vertical='center', wrap_text=True)
-        thin_border = Border(
-            left=Side(style='thin', color='CCCCCC'),
-            right=Side(style='thin', color='CCCCCC'),
-            top=Side(style='thin', color='CCCCCC'),
-            bottom=Side(style='thin', color='CCCCCC'),
+    if request.GET.get('export') == 'excel':
+        return reportes.respuesta_cacheada(
+            request, 'inventario_excel', {}, lambda: libro_excel_inventario(_inventario_por_categoria()).archivo()
         )
 
-        # Título
-        ws.merge_cells('A1:D1')
-        ws['A1'].value = 'INVENTARIO DE PRODUCTOS — PESCADERÍA HUINA'
-        ws['A1'].font = Font(bold=True, color="FFFFFF", size=13)
-        ws['A1'].fill = PatternFill(start_color=azul_oscuro, end_color=azul_oscuro, fill_type="solid")
-        ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-        ws.row_dimensions[1].height = 28
-
-        # Información de generación
-        ws.merge_cells('A2:D2')
-        ws['A2'] = f'Generado: {timezone.now().strftime("%d/%m/%Y %H:%M")}'
-        ws['A2'].font = Font(italic=True, size=10)
-        ws['A2'].fill = PatternFill(start_color="E8F4F8", end_color="E8F4F8", fill_type="solid")
-        ws['A2'].alignment = center_align
-        ws.row_dimensions[2].height = 18
-
-        # Encabezados de tabla
-        headers = ['Nombre Producto', 'Proveedor', 'Stock Disponible', 'Presentación']
-        col_widths = [35, 25, 18, 20]
-        for col, (header, width) in enumerate(zip(headers, col_widths), 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_align
-            cell.border = thin_border
-            ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = width
-        ws.row_dimensions[3].height = 18
-
-        # Función para agregar sección
-        def agregar_categoria(titulo, productos_list, start_row):
-            # Fila de categoría
-            ws.merge_cells(f'A{start_row}:D{start_row}')
-            cat_cell = ws[f'A{start_row}']
-            cat_cell.value = titulo
-            cat_cell.font = category_font
-            cat_cell.fill = category_fill
-            cat_cell.alignment = center_align
-            cat_cell.border = thin_border
-            ws.row_dimensions[start_row].height = 16
-            
-            row_num = start_row + 1
-            
-            # Datos
-            for p in productos_list:
-                unidad_texto = 'Libras' if p.tipo_presentacion == 'LIB' else 'Unidades'
-                ws[f'A{row_num}'] = p.nombre
-                ws[f'B{row_num}'] = p.proveedor.nombre_contacto if p.proveedor else "N/A"
-                ws[f'C{row_num}'] = int(round(float(p.stock_disponible or 0)))
-                ws[f'D{row_num}'] = unidad_texto
-                
-                # Determinación de color para stock
-                if p.stock_disponible <= 0:
-                    stock_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-                    stock_font = Font(bold=True, color="9C0006")
-                elif p.stock_disponible <= 10:
-                    stock_fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-                    stock_font = Font(bold=True, color="9C6500")
-                else:
-                    stock_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                    stock_font = Font(bold=True, color="006100")
-                
-                for col in range(1, 5):
-                    cell = ws.cell(row=row_num, column=col)
-                    cell.border = thin_border
-                    if col == 3:  # Stock
-                        cell.fill = stock_fill
-                        cell.font = stock_font
-                        cell.alignment = center_align
-                        cell.number_format = '0'
-                    elif col == 1:
-                        cell.alignment = left_align
-                    else:
-                        cell.alignment = center_align
-                    
-                    # Alternancia de color de fondo
-                    if row_num % 2 == 0 and col != 3:
-                        cell.fill = PatternFill(start_color=gris_claro, end_color=gris_claro, fill_type="solid")
-                
-                ws.row_dimensions[row_num].height = 15
-                row_num += 1
-            
-            return row_num
-
-        # Agregar todas las categorías
-        fila_actual = 4
-        fila_actual = agregar_categoria("🐟 PESCADOS", pescados, fila_actual)
-        fila_actual += 1
-        fila_actual = agregar_categoria("🦐 MARISCOS", mariscos, fila_actual)
-        fila_actual += 1
-        fila_actual = agregar_categoria("🐔 POLLOS", pollos, fila_actual)
-        
-        ws.freeze_panes = 'A4'
-        wb.save(response)
-        return response
+    categorias = _inventario_por_categoria()
+    pescados = categorias['PE']
+    mariscos = categorias['MA']
+    pollos = categorias['PO']
     
     context = {'pescados': pescados, 'mariscos': mariscos, 'pollos': pollos}
-    return render(request, 'inventario_pedidos.html', context)
\ No newline at end of file
+    return render(request, 'inventario_pedidos.html', context)
+
+
+def libro_excel_inventario(categorias):
+    """Arma el Excel de inventario con las categorías de _inventario_por_categoria()."""
+    pescados = categorias['PE']
+    mariscos = categorias['MA']
+    pollos = categorias['PO']
+
+    excel = ExportadorExcel('Inventario', 'Inventario_Pescaderia.xlsx')
+
+    # Colores y estilos del Excel de ventas
+    excel.estilo('titulo', fuente=Font(bold=True, color="FFFFFF", size=13), fondo=AZUL_OSCURO,
+                 alineacion=Alignment(horizontal='center', vertical='center'))
+    excel.estilo('generado', fuente=Font(italic=True, size=10), fondo="E8F4F8", alineacion=ALINEACION_CENTRO)
+    excel.estilo('encabezado', fuente=Font(bold=True, color="FFFFFF", size=11), fondo=AZUL_OSCURO,
+                 alineacion=ALINEACION_CENTRO, borde=BORDE_GRIS)
+    excel.estilo('categoria', fuente=Font(bold=True, color="0F3976", size=10), fondo="D9E1F2",
+                 alineacion=ALINEACION_CENTRO, borde=BORDE_GRIS)
+    for sufijo, fondo in {'': None, 'gris': GRIS_CLARO}.items():
+        excel.estilo(f'izquierda{sufijo}', fondo=fondo, alineacion=ALINEACION_IZQUIERDA, borde=BORDE_GRIS)
+        excel.estilo(f'centro{sufijo}', fondo=fondo, alineacion=ALINEACION_CENTRO, borde=BORDE_GRIS)
+    # Determinación de color para stock
+    for nivel, (fondo, color) in {
+        'agotado': ("FFC7CE", "9C0006"),
+        'bajo': ("FFEB9C", "9C6500"),
+        'normal': ("C6EFCE", "006100"),
+    }.items():
+        excel.estilo(f'stock_{nivel}', fuente=Font(bold=True, color=color), fondo=fondo,
+                     alineacion=ALINEACION_CENTRO, borde=BORDE_GRIS, formato='0')
+
+    excel.anchos([35, 25, 18, 20])
+    excel.congelar('A4')
+
+    # Título
+    excel.fila(['INVENTARIO DE PRODUCTOS — PESCADERÍA HUINA'], 'titulo', alto=28, combinar='A:D')
+
+    # Información de generación
+    excel.fila([f'Generado: {timezone.now().strftime("%d/%m/%Y %H:%M")}'], 'generado', alto=18,
+               combinar='A:D')
+
+    # Encabezados de tabla
+    headers = ['Nombre Producto', 'Proveedor', 'Stock Disponible', 'Presentación']
+    excel.fila(headers, 'encabezado', alto=18)
+
+    # Función para agregar sección
+    def agregar_categoria(titulo, productos_list):
+        excel.fila([titulo, None, None, None], 'categoria', alto=16, combinar='A:D')
+
+        for p in productos_list:
+            unidad_texto = 'Libras' if p.tipo_presentacion == 'LIB' else 'Unidades'
+            if p.stock_disponible <= 0:
+                estilo_stock = 'stock_agotado'
+            elif p.stock_disponible <= 10:
+                estilo_stock = 'stock_bajo'
+            else:
+                estilo_stock = 'stock_normal'
+
+            # Alternancia de color de fondo
+            sufijo = 'gris' if (excel.filas_escritas + 1) % 2 == 0 else ''
+            excel.fila(
+                [
+                    p.nombre,
+                    p.proveedor.nombre_contacto if p.proveedor else "N/A",
+                    int(round(float(p.stock_disponible or 0))),
+                    unidad_texto,
+                ],
+                [f'izquierda{sufijo}', f'centro{sufijo}', estilo_stock, f'centro{sufijo}'],
+                alto=15,
+            )
+
+    # Agregar todas las categorías
+    agregar_categoria("🐟 PESCADOS", pescados)
+    excel.fila_vacia()
+    agregar_categoria("🦐 MARISCOS", mariscos)
+    excel.fila_vacia()
+    agregar_categoria("🐔 POLLOS", pollos)
+
+    return excel
+
+
+def datos_pdf_inventario(parametros):
+    """Plantilla, contexto y nombre del PDF de inventario (lo genera core.reportes)."""
+    categorias = _inventario_por_categoria()
+    context = {
+        'pescados': categorias['PE'], 'mariscos': categorias['MA'], 'pollos': categorias['PO'],
+        'fecha_generacion': timezone.now(),
+    }
+    return 'inventario_pdf.html', context, 'Inventario_Pescaderia.pdf'
\ No newline at end of file
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import sys
+import tempfile
 from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -56,6 +57,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # Renueva el vencimiento de la sesión solo de vez en cuando (core/middleware.py)
+    'core.middleware.RenovarSesionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -100,8 +103,13 @@ if 'test' in sys.argv:
             'NAME': ':memory:',
         }
     }
+    # SQLite ignora las columnas INCLUDE de los índices cubrientes (solo aplican en PostgreSQL)
+    SILENCED_SYSTEM_CHECKS = ['models.W040']
 else:
     # PostgreSQL - Supabase (producción) - OPTIMIZACIÓN: Variables de entorno
+    # Puerto 5432 del pooler = modo sesión; 6543 = modo transacción
+    DB_PORT = config('DB_PORT', default='5432')
+    MODO_TRANSACCION = DB_PORT == '6543'
     DATABASES = {
         'default': {
             'ENGINE': config('DB_ENGINE', default='django.db.backends.postgresql'),
@@ -109,12 +117,35 @@ else:
             'USER': config('DB_USER', default='postgres.rmkckjjemybpxtombvjk'),
             'PASSWORD': config('DB_PASSWORD', default='pescaderiahuina123*'),
             'HOST': config('DB_HOST', default='aws-1-sa-east-1.pooler.supabase.com'),
-            'PORT': config('DB_PORT', default='5432'),
-            # OPTIMIZACIÓN: Connection pooling para mejor performance
-            'CONN_MAX_AGE': 60,
+            'PORT': DB_PORT,
+            # Conexiones persistentes por hilo (Django 4.2 no trae pool propio): la
+            # BD está al otro lado de una WAN y abrir una conexión cuesta varios RTT
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+            # Antes de reutilizar una conexión se verifica; si el pooler la cerró se abre otra
+            'CONN_HEALTH_CHECKS': True,
             'OPTIONS': {
                 'connect_timeout': 10,
-            }
+                'application_name': 'pescaderia_huina',
+                # Keepalives TCP: detectan conexiones muertas por la red sin esperar al timeout del SO
+                'keepalives': 1,
+                'keepalives_idle': 30,
+                'keepalives_interval': 10,
+                'keepalives_count': 3,
+                # Parámetros enviados aparte de la consulta (ServerBindingCursor). Sin
+                # esto Django 4.2 usa ClientCursor, que incrusta los valores en el SQL,
+                # y prepare_threshold no tiene efecto. El pooler en modo transacción
+                # (puerto 6543) no admite sentencias preparadas: ahí se desactiva.
+                'server_side_binding': config('DB_SERVER_SIDE_BINDING', default=not MODO_TRANSACCION, cast=bool),
+                # Sentencias preparadas en el servidor tras N ejecuciones (con server_side_binding)
+                'prepare_threshold': config(
+                    'DB_PREPARE_THRESHOLD',
+                    default='' if MODO_TRANSACCION else '5',
+                    cast=lambda valor: int(valor) if valor else None,
+                ),
+            },
+            # En modo transacción el pooler puede cambiar de conexión entre dos
+            # transacciones: un cursor con nombre (.iterator()) no sobreviviría
+            'DISABLE_SERVER_SIDE_CURSORS': MODO_TRANSACCION,
         }
     }
 
@@ -172,6 +203,9 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # Archivos subidos por usuarios (ej. fotos de perfil)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+if 'test' in sys.argv:
+    # Los reportes cacheados de las pruebas no quedan en media/
+    MEDIA_ROOT = Path(tempfile.mkdtemp(prefix='pescaderia_huina_media_'))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -209,11 +243,19 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='jkod fdnz jrie qszl
 
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Los correos se encolan (core.correos) y los envía `manage.py procesar_correos`.
+# En desarrollo sin trabajador: CORREOS_SEGUNDO_PLANO=False los envía en la petición.
+CORREOS_SEGUNDO_PLANO = config('CORREOS_SEGUNDO_PLANO', default=True, cast=bool)
+
 
 
 # Configuración de sesiones
 SESSION_COOKIE_AGE = 3600  # 1 hora en segundos
-SESSION_SAVE_EVERY_REQUEST = True  # Actualiza la sesión en cada request
+# SESSION_ENGINE depende de CACHE_BACKEND: se define junto a CACHES
+# No se guarda en cada request: RenovarSesionMiddleware corre el vencimiento
+# cuando pasó esta fracción de SESSION_COOKIE_AGE desde la última renovación
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_FRACCION_RENOVACION = config('SESSION_FRACCION_RENOVACION', default=0.1, cast=float)
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False  # La sesión persiste al cerrar navegador
 
 # Configuración de seguridad de contraseñas
@@ -236,13 +278,72 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 # Configuración de Cache - SEGURIDAD: Rate limiting para login
-# Usa cache en memoria (LocMemCache) para rate limiting de intentos de login
-CACHES = {
-    'default': {
+# Cache compartido por todos los workers (core.cache_compartido):
+#   CACHE_BACKEND=redis  -> REDIS_URL (p. ej. redis://localhost:6379/0)
+#   CACHE_BACKEND=db     -> tabla core_cache en la BD (la crea la migración core 0004)
+#   CACHE_BACKEND=file   -> archivos en CACHE_DIR (desarrollo/pruebas, una sola máquina)
+#   CACHE_BACKEND=locmem -> memoria de un solo proceso
+# Sin CACHE_BACKEND: redis si hay REDIS_URL; si no, db (file en pruebas).
+REDIS_URL = config('REDIS_URL', default='')
+CACHE_BACKEND = config(
+    'CACHE_BACKEND',
+    default='redis' if REDIS_URL else ('file' if 'test' in sys.argv else 'db'),
+)
+CACHE_DIR = config('CACHE_DIR', default=str(Path(tempfile.gettempdir()) / 'pescaderia_huina_cache'))
+if 'test' in sys.argv and CACHE_BACKEND == 'file':
+    # Cada corrida de pruebas con su propio directorio
+    CACHE_DIR = tempfile.mkdtemp(prefix='pescaderia_huina_cache_')
+
+_CACHES_POR_BACKEND = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'core_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000
-        }
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+CACHES = {
+    'default': {
+        **_CACHES_POR_BACKEND[CACHE_BACKEND],
+        'KEY_PREFIX': config('CACHE_KEY_PREFIX', default='huina'),
     }
 }
+# Sesiones: cached_db (cache con copia en la BD) solo ahorra consultas si el
+# cache no está en la BD. Con CACHE_BACKEND=db cada lectura iría igual a la
+# BD (a core_cache) y cada escritura, dos veces; con file, a un disco que no
+# se comparte entre máquinas. En esos casos se leen de la BD y
+# RenovarSesionMiddleware evita la escritura en cada petición.
+if CACHE_BACKEND in ('redis', 'locmem'):
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Segundos que una clave caliente vive en la memoria del proceso (L1) antes de releer el cache compartido
+CACHE_L1_SEGUNDOS = config('CACHE_L1_SEGUNDOS', default=30, cast=int)
+
+# Reportes PDF en segundo plano (core.reportes)
+# Las vistas encolan el reporte y `python manage.py procesar_reportes` lo genera.
+# En desarrollo sin trabajador puede desactivarse para generar el PDF en la petición.
+REPORTES_PDF_SEGUNDO_PLANO = config('REPORTES_PDF_SEGUNDO_PLANO', default=True, cast=bool)
+REPORTES_EXPIRACION_HORAS = config('REPORTES_EXPIRACION_HORAS', default=24, cast=int)
+REPORTES_TIEMPO_MAXIMO_MINUTOS = config('REPORTES_TIEMPO_MAXIMO_MINUTOS', default=30, cast=int)
+
+# Copias de seguridad en segundo plano (copia_seguridad.trabajos)
+# Las vistas encolan la copia o la restauración y `python manage.py procesar_copias` la ejecuta.
+# En desarrollo sin trabajador puede desactivarse para ejecutarlas en la petición.
+COPIAS_SEGUNDO_PLANO = config('COPIAS_SEGUNDO_PLANO', default=True, cast=bool)
+# Solo sin PostgreSQL: ahí un trabajo abandonado se detecta por el candado de sesión
+COPIAS_TIEMPO_MAXIMO_MINUTOS = config('COPIAS_TIEMPO_MAXIMO_MINUTOS', default=120, cast=int)
+COPIAS_HISTORIAL_DIAS = config('COPIAS_HISTORIAL_DIAS', default=7, cast=int)
@@ -0,0 +1,118 @@
+"""
+Catálogo de productos en memoria para el punto de venta.
+
+El autocompletado y la consulta de precio del formulario de ventas se
+llaman en cada tecla; en lugar de ir a la BD cada vez, cada proceso guarda
+una foto del catálogo (id, nombre, tipo, precio, presentación, activo) con:
+
+- la lista ordenada por nombre normalizado, para encontrar los que empiezan
+  por el texto con búsqueda binaria,
+- el índice de trigramas de core.busqueda, para los que lo contienen.
+
+La foto se identifica con la versión del grupo 'productos' de core.versiones
+(compartida entre procesos, sube al guardar o eliminar un Producto) y se
+descarta también en cuanto este proceso guarda o elimina un producto.
+`catalogo_productos_api` entrega la foto completa con ETag para que el
+navegador la guarde y busque localmente.
+"""
+import bisect
+import hashlib
+import heapq
+import json
+import threading
+from collections import namedtuple
+
+from core import versiones
+from core.busqueda import IndiceNgramas, normalizar
+
+from .models import Producto
+
+
+GRUPO = 'productos'
+
+CAMPOS = ('id', 'nombre', 'tipo_producto', 'precio', 'tipo_presentacion', 'estado')
+
+ProductoCatalogo = namedtuple('ProductoCatalogo', ['id', 'nombre', 'tipo', 'precio', 'presentacion', 'activo'])
+
+_actual = None
+_bloqueo = threading.Lock()
+
+
+class Catalogo:
+    """Foto inmutable del catálogo de una versión de los datos."""
+
+    def __init__(self, version, filas):
+        self.version = version
+        self.por_id = {fila[0]: ProductoCatalogo(*fila) for fila in filas}
+        self.textos = {pk: normalizar(producto.nombre) for pk, producto in self.por_id.items()}
+        self.ordenados = sorted((texto, pk) for pk, texto in self.textos.items())
+        self.indice = IndiceNgramas((pk, producto.nombre) for pk, producto in self.por_id.items())
+
+        activos = [
+            [p.id, p.nombre, p.tipo, str(p.precio), p.presentacion]
+            for p in sorted(self.por_id.values()) if p.activo
+        ]
+        self.json = json.dumps(
+            {'campos': ['id', 'nombre', 'tipo', 'precio', 'presentacion'], 'productos': activos},
+            ensure_ascii=False, separators=(',', ':'),
+        ).encode()
+        # Por contenido: una BD restaurada con la misma versión no reutiliza el ETag
+        self.etag = hashlib.sha1(self.json).hexdigest()[:20]
+
+    def obtener(self, producto_id, solo_activos=True):
+        producto = self.por_id.get(producto_id)
+        if producto is None or (solo_activos and not producto.activo):
+            return None
+        return producto
+
+    def _empiezan_por(self, texto):
+        inicio = bisect.bisect_left(self.ordenados, (texto,))
+        for nombre, pk in self.ordenados[inicio:]:
+            if not nombre.startswith(texto):
+                break
+            yield pk
+
+    def buscar(self, texto, tipo=None, limite=20):
+        """
+        Productos activos (de `tipo`, si se indica) cuyo nombre contiene
+        `texto`: primero los que empiezan por él y luego los más cortos,
+        el mismo orden que core.busqueda.autocompletar.
+        """
+        def valido(pk):
+            producto = self.por_id[pk]
+            return producto.activo and (not tipo or producto.tipo == tipo)
+
+        texto = ' '.join(normalizar(texto).split())
+        if not texto:
+            return [self.por_id[pk] for pk in sorted(self.por_id) if valido(pk)][:limite]
+
+        orden = lambda pk: (len(self.textos[pk]), pk)
+        mejores = heapq.nsmallest(limite, filter(valido, self._empiezan_por(texto)), key=orden)
+        if len(mejores) < limite:
+            contienen = (
+                pk for pk in self.indice.buscar(texto)
+                if not self.textos[pk].startswith(texto) and valido(pk)
+            )
+            mejores += heapq.nsmallest(limite - len(mejores), contienen, key=orden)
+        return [self.por_id[pk] for pk in mejores]
+
+
+def obtener_catalogo():
+    """Catálogo de la versión actual; lo reconstruye si los productos cambiaron."""
+    global _actual
+    version = versiones.versiones([GRUPO])[GRUPO]
+    catalogo = _actual
+    if catalogo is not None and catalogo.version == version:
+        return catalogo
+    with _bloqueo:
+        if _actual is None or _actual.version != version:
+            filas = Producto._base_manager.values_list(*CAMPOS).order_by('pk').iterator(chunk_size=2000)
+            _actual = Catalogo(version, list(filas))
+        return _actual
+
+
+def limpiar():
+    """Descarta el catálogo de este proceso (p. ej. después de un bulk_create)."""
+    global _actual
+    with _bloqueo:
+        _actual = None
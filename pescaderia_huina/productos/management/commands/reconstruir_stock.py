@@ -0,0 +1,46 @@
+"""
+Comando para reconstruir el libro de stock (StockProducto) desde cero.
+Compara el libro con el histórico de pedidos y ventas y corrige diferencias.
+"""
+from django.core.management.base import BaseCommand
+
+from productos import stock
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el libro de stock desde pedidos recibidos y ventas completadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo compara el libro con el histórico, sin escribir cambios.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('\n=== LIBRO DE STOCK ===\n'))
+
+        diferencias = stock.verificar_stock()
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('✓ El libro de stock coincide con el histórico'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'⚠️  {len(diferencias)} productos con diferencias:\n'))
+        for dif in diferencias:
+            recibido, vendido, disponible = dif['esperado']
+            actual = dif['actual']
+            self.stdout.write(
+                f"  • Producto #{dif['producto_id']}: "
+                f"libro={actual[2] if actual else 'sin fila'} | "
+                f"histórico={disponible} (recibido {recibido} − vendido {vendido})"
+            )
+
+        if options['verificar']:
+            self.stdout.write(self.style.WARNING(
+                '\n💡 Para corregirlas, ejecuta:\n'
+                '   python manage.py reconstruir_stock\n'
+            ))
+            return
+
+        escritas = stock.sincronizar_stock()
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Libro reconstruido ({escritas} filas actualizadas)'))
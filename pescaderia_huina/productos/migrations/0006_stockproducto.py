@@ -0,0 +1,64 @@
+# Generated migration - Libro de stock materializado por producto
+
+from decimal import Decimal
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def poblar_stock(apps, schema_editor):
+    """Materializa el stock actual desde pedidos REC y ventas COMPLETADA."""
+    Producto = apps.get_model('productos', 'Producto')
+    StockProducto = apps.get_model('productos', 'StockProducto')
+    DetallePedido = apps.get_model('pedidos', 'DetallePedido')
+    VentaItem = apps.get_model('ventas', 'VentaItem')
+
+    recibidos = {
+        fila['producto_id']: fila['total'] or Decimal('0')
+        for fila in DetallePedido.objects.filter(pedido__estado='REC')
+        .values('producto_id').annotate(total=models.Sum('cantidad')).order_by()
+    }
+    vendidos = {
+        fila['producto_id']: fila['total'] or Decimal('0')
+        for fila in VentaItem.objects.filter(venta__estado='COMPLETADA')
+        .values('producto_id').annotate(total=models.Sum('cantidad')).order_by()
+    }
+
+    filas = []
+    for producto_id in Producto.objects.values_list('id', flat=True):
+        recibido = recibidos.get(producto_id, Decimal('0'))
+        vendido = vendidos.get(producto_id, Decimal('0'))
+        filas.append(StockProducto(
+            producto_id=producto_id,
+            recibido=recibido,
+            vendido=vendido,
+            disponible=recibido - vendido,
+        ))
+    StockProducto.objects.bulk_create(filas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0005_add_indexes'),
+        ('pedidos', '0003_alter_detallepedido_producto'),
+        ('ventas', '0006_alter_ventaitem_producto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockProducto',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_actual', serialize=False, to='productos.producto', verbose_name='Producto')),
+                ('recibido', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Recibido')),
+                ('vendido', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Vendido')),
+                ('disponible', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Disponible')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Versión')),
+            ],
+            options={
+                'verbose_name': 'Stock de Producto',
+                'verbose_name_plural': 'Stock de Productos',
+            },
+        ),
+        migrations.RunPython(poblar_stock, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.db.models import Sum, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 # Asegúrate de que la importación apunte correctamente a tu app de proveedores
 from proveedores.models import Proveedor 
 
@@ -79,23 +81,79 @@ class Producto(models.Model):
         """
         Stock = cantidad recibida en pedidos (estado REC)
                 − cantidad vendida en ventas COMPLETADA
+
+        Se lee del libro materializado (StockProducto), una búsqueda por
+        clave primaria. Solo si el producto aún no tiene fila en el libro
+        se recalcula desde el histórico de pedidos y ventas.
         """
         from django.db.models import Sum
-        from django.db import DatabaseError, InterfaceError
-
-        try:
-            # Total recibido en pedidos con estado REC
-            recibido = self.detallepedido_set.filter(
-                pedido__estado='REC'
-            ).aggregate(total=Sum('cantidad'))['total'] or 0
-
-            # Total vendido solo en ventas completadas
-            vendido = self.ventaitem_set.filter(
-                venta__estado='COMPLETADA'
-            ).aggregate(total=Sum('cantidad'))['total'] or 0
-
-            return recibido - vendido
-        except (DatabaseError, InterfaceError):
-            # Si la conexión está cerrada o hay error temporal de BD,
-            # devolvemos 0 para no romper el render de páginas críticas.
-            return 0
\ No newline at end of file
+
+        # Un error de BD se propaga: un stock de 0 inventado es peor que un 500
+        # (las conexiones caídas las descarta CONN_HEALTH_CHECKS antes de usarlas)
+        disponible = StockProducto.objects.filter(
+            producto_id=self.pk
+        ).values_list('disponible', flat=True).first()
+        if disponible is not None:
+            return disponible
+
+        # Total recibido en pedidos con estado REC
+        recibido = self.detallepedido_set.filter(
+            pedido__estado='REC'
+        ).aggregate(total=Sum('cantidad'))['total'] or 0
+
+        # Total vendido solo en ventas completadas
+        vendido = self.ventaitem_set.filter(
+            venta__estado='COMPLETADA'
+        ).aggregate(total=Sum('cantidad'))['total'] or 0
+
+        return recibido - vendido
+
+
+class StockProducto(models.Model):
+    """
+    Libro de stock materializado: una fila por producto.
+
+    Se mantiene al día desde las señales de ventas y pedidos (ver
+    productos/stock.py) y se puede reconstruir con
+    `python manage.py reconstruir_stock`.
+    """
+    producto = models.OneToOneField(
+        Producto,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stock_actual',
+        verbose_name="Producto"
+    )
+    recibido = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Recibido")
+    vendido = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Vendido")
+    disponible = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Disponible")
+    version = models.PositiveIntegerField(default=0, verbose_name="Versión")
+
+    class Meta:
+        verbose_name = "Stock de Producto"
+        verbose_name_plural = "Stock de Productos"
+
+    def __str__(self):
+        return f"{self.producto_id}: {self.disponible}"
+
+
+@receiver(post_save, sender=Producto)
+def crear_stock_producto(sender, instance, created, raw=False, **kwargs):
+    """Crea la fila del libro de stock al registrar un producto nuevo."""
+    from . import catalogo
+    from .stock import invalidar_cache_stock
+
+    if created and not raw:
+        StockProducto.objects.get_or_create(producto=instance)
+    # Activar/desactivar o renombrar un producto cambia las notificaciones de stock
+    invalidar_cache_stock()
+    catalogo.limpiar()
+
+
+@receiver(post_delete, sender=Producto)
+def invalidar_stock_producto_eliminado(sender, instance, **kwargs):
+    from . import catalogo
+    from .stock import invalidar_cache_stock
+
+    invalidar_cache_stock()
+    catalogo.limpiar()
@@ -0,0 +1,256 @@
+"""
+Libro de stock materializado por producto.
+
+Cada producto tiene una fila en StockProducto con lo recibido (pedidos REC),
+lo vendido (ventas COMPLETADA) y el disponible. Las señales de ventas y
+pedidos llaman a estas funciones dentro de la misma transacción que origina
+el movimiento, de modo que leer el stock es una búsqueda por clave primaria.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Producto, StockProducto
+
+
+ESTADO_PEDIDO_RECIBIDO = 'REC'
+ESTADO_VENTA_COMPLETADA = 'COMPLETADA'
+
+CERO = Decimal('0')
+
+# Versión de los datos de stock. Cualquier cache derivado del stock
+# (notificaciones, reportes...) incluye esta versión en su clave.
+CLAVE_VERSION_STOCK = 'stock:version'
+
+# Activo dentro de control_estricto(): las ventas no pueden dejar stock negativo
+_control_estricto = ContextVar('control_estricto_stock', default=False)
+
+
+class StockInsuficiente(Exception):
+    """Se intentó consumir más stock del disponible dentro de control_estricto()."""
+
+    def __init__(self, producto_id, solicitado):
+        self.producto_id = producto_id
+        self.solicitado = solicitado
+        super().__init__(f'Stock insuficiente para el producto #{producto_id} (solicitado: {solicitado})')
+
+
+@contextmanager
+def control_estricto():
+    """
+    Dentro de este bloque cada consumo de stock es un UPDATE condicional
+    (... WHERE disponible >= cantidad): la BD serializa las actualizaciones de
+    la misma fila, así que dos cajeros simultáneos nunca venden el mismo stock.
+    Si no alcanza se lanza StockInsuficiente; usar dentro de transaction.atomic
+    para que la venta completa se revierta.
+    """
+    token = _control_estricto.set(True)
+    try:
+        yield
+    finally:
+        _control_estricto.reset(token)
+
+
+def _decimal(valor):
+    return Decimal(str(valor or 0))
+
+
+def version_stock():
+    """Versión actual del stock; se inicializa con la hora para no reutilizar claves viejas."""
+    version = cache.get(CLAVE_VERSION_STOCK)
+    if version is None:
+        version = int(time.time() * 1000)
+        cache.add(CLAVE_VERSION_STOCK, version, None)
+        version = cache.get(CLAVE_VERSION_STOCK, version)
+    return version
+
+
+def _incrementar_version_stock():
+    try:
+        cache.incr(CLAVE_VERSION_STOCK)
+    except ValueError:
+        # La clave expiró o nunca existió: version_stock() la recrea.
+        version_stock()
+
+
+def invalidar_cache_stock():
+    """Invalida los caches derivados del stock cuando la transacción actual confirme."""
+    transaction.on_commit(_incrementar_version_stock)
+
+
+def aplicar_movimiento(producto_id, recibido=0, vendido=0):
+    """
+    Suma (o resta, si es negativo) cantidades recibidas/vendidas a un producto.
+    La actualización es atómica en la BD (UPDATE ... SET x = x + n).
+    """
+    recibido = _decimal(recibido)
+    vendido = _decimal(vendido)
+    if not recibido and not vendido:
+        return
+
+    filas = StockProducto.objects.filter(producto_id=producto_id)
+    consumo = vendido - recibido
+    estricto = _control_estricto.get() and consumo > 0
+    if estricto:
+        filas = filas.filter(disponible__gte=consumo)
+
+    actualizados = filas.update(
+        recibido=F('recibido') + recibido,
+        vendido=F('vendido') + vendido,
+        disponible=F('disponible') - consumo,
+        version=F('version') + 1,
+    )
+    if not actualizados and estricto:
+        if StockProducto.objects.filter(producto_id=producto_id).exists():
+            raise StockInsuficiente(producto_id, consumo)
+        sincronizar_stock([producto_id])
+        if StockProducto.objects.filter(producto_id=producto_id, disponible__lt=0).exists():
+            raise StockInsuficiente(producto_id, consumo)
+    elif not actualizados:
+        # Producto sin fila en el libro (p. ej. creado con bulk_create):
+        # se materializa desde el histórico, que ya incluye este movimiento.
+        sincronizar_stock([producto_id])
+    invalidar_cache_stock()
+
+
+def aplicar_movimientos(movimientos, campo):
+    """Aplica un dict {producto_id: cantidad} sobre 'recibido' o 'vendido'."""
+    for producto_id, cantidad in sorted(movimientos.items()):
+        aplicar_movimiento(producto_id, **{campo: cantidad})
+
+
+def obtener_stock_productos(producto_ids, bloquear=False):
+    """
+    Resuelve el stock de varios productos activos en una sola consulta.
+
+    Retorna {producto_id: StockProducto} con `producto` ya cargado. Los ids
+    inexistentes o de productos inactivos no aparecen en el resultado.
+    Con `bloquear=True` las filas se leen con SELECT ... FOR UPDATE (debe
+    llamarse dentro de transaction.atomic), en orden de id para evitar
+    bloqueos cruzados entre cajeros.
+    """
+    producto_ids = sorted(set(producto_ids))
+    if not producto_ids:
+        return {}
+
+    def consultar(ids):
+        filas = StockProducto.objects.select_related('producto').filter(
+            producto_id__in=ids,
+            producto__estado=True,
+        ).order_by('producto_id')
+        if bloquear:
+            filas = filas.select_for_update(of=('self',))
+        return {fila.producto_id: fila for fila in filas}
+
+    resultado = consultar(producto_ids)
+    faltantes = [pk for pk in producto_ids if pk not in resultado]
+    if faltantes and Producto.objects.filter(id__in=faltantes, estado=True).exists():
+        # Productos activos sin fila en el libro: se materializan y se releen.
+        sincronizar_stock(faltantes)
+        resultado.update(consultar(faltantes))
+    return resultado
+
+
+def anotar_stock(queryset):
+    """
+    Anota `stock_disponible` en un queryset de Producto con un LEFT JOIN al
+    libro de stock (0 si el producto aún no tiene fila). Una sola consulta
+    para cualquier número de productos.
+    """
+    return queryset.annotate(
+        stock_disponible=Coalesce(
+            F('stock_actual__disponible'),
+            Value(0),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
+
+
+def calcular_stock_historico(producto_ids=None):
+    """
+    Calcula {producto_id: (recibido, vendido)} desde DetallePedido y VentaItem
+    con dos consultas agrupadas.
+    """
+    from pedidos.models import DetallePedido
+    from ventas.models import VentaItem
+
+    recibidos = DetallePedido.objects.filter(pedido__estado=ESTADO_PEDIDO_RECIBIDO)
+    vendidos = VentaItem.objects.filter(venta__estado=ESTADO_VENTA_COMPLETADA)
+    productos = Producto.objects.all()
+    if producto_ids is not None:
+        recibidos = recibidos.filter(producto_id__in=producto_ids)
+        vendidos = vendidos.filter(producto_id__in=producto_ids)
+        productos = productos.filter(id__in=producto_ids)
+
+    resultado = {pk: (CERO, CERO) for pk in productos.values_list('id', flat=True)}
+    for fila in recibidos.values('producto_id').annotate(total=Sum('cantidad')).order_by():
+        resultado[fila['producto_id']] = (_decimal(fila['total']), CERO)
+    for fila in vendidos.values('producto_id').annotate(total=Sum('cantidad')).order_by():
+        recibido, _ = resultado.get(fila['producto_id'], (CERO, CERO))
+        resultado[fila['producto_id']] = (recibido, _decimal(fila['total']))
+    return resultado
+
+
+@transaction.atomic
+def sincronizar_stock(producto_ids=None):
+    """
+    Reconstruye las filas del libro desde el histórico.
+    Sin `producto_ids` reconstruye el libro completo. Retorna las filas escritas.
+    """
+    historico = calcular_stock_historico(producto_ids)
+    existentes = {
+        s.producto_id: s
+        for s in StockProducto.objects.select_for_update().filter(producto_id__in=list(historico))
+    }
+
+    nuevos, modificados = [], []
+    for producto_id, (recibido, vendido) in historico.items():
+        disponible = recibido - vendido
+        fila = existentes.get(producto_id)
+        if fila is None:
+            nuevos.append(StockProducto(
+                producto_id=producto_id, recibido=recibido,
+                vendido=vendido, disponible=disponible,
+            ))
+        elif (fila.recibido, fila.vendido, fila.disponible) != (recibido, vendido, disponible):
+            fila.recibido, fila.vendido, fila.disponible = recibido, vendido, disponible
+            fila.version += 1
+            modificados.append(fila)
+
+    StockProducto.objects.bulk_create(nuevos, batch_size=500)
+    StockProducto.objects.bulk_update(
+        modificados, ['recibido', 'vendido', 'disponible', 'version'], batch_size=500
+    )
+    if nuevos or modificados:
+        invalidar_cache_stock()
+    return len(nuevos) + len(modificados)
+
+
+def verificar_stock():
+    """
+    Compara el libro con el histórico.
+    Retorna una lista de dicts con las diferencias encontradas.
+    """
+    historico = calcular_stock_historico()
+    libro = {
+        s.producto_id: s for s in StockProducto.objects.all()
+    }
+
+    diferencias = []
+    for producto_id, (recibido, vendido) in historico.items():
+        fila = libro.get(producto_id)
+        esperado = (recibido, vendido, recibido - vendido)
+        actual = (fila.recibido, fila.vendido, fila.disponible) if fila else None
+        if actual != esperado:
+            diferencias.append({
+                'producto_id': producto_id,
+                'esperado': esperado,
+                'actual': actual,
+            })
+    return diferencias
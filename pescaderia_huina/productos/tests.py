@@ -4,6 +4,7 @@ from django.contrib.auth.models import User
 from productos.models import Producto
 from proveedores.models import Proveedor
 import sys
+from decimal import Decimal
 class ProductoModelTests(TestCase):
     """Tests para el modelo Producto"""
 
@@ -124,3 +125,118 @@ class ProductoModelTests(TestCase):
         self.assertIsInstance(float(producto.precio), float)
 
 
+
+class StockProductoTests(TestCase):
+    """Tests para el libro de stock materializado (StockProducto)"""
+
+    def setUp(self):
+        from pedidos.models import Pedido, DetallePedido
+        from ventas.models import Venta, VentaItem
+
+        self.Pedido, self.DetallePedido = Pedido, DetallePedido
+        self.Venta, self.VentaItem = Venta, VentaItem
+        self.proveedor = Proveedor.objects.create(
+            nit="7777777777",
+            nombre_contacto="Proveedor Stock",
+            correo="stock@example.com",
+            telefono="3007777777",
+            ciudad="Bogotá",
+        )
+        self.producto = Producto.objects.create(
+            proveedor=self.proveedor,
+            tipo_producto='PE',
+            nombre='Bagre',
+            precio=20000,
+            tipo_presentacion='LIB',
+        )
+
+    def _recibir(self, cantidad):
+        pedido = self.Pedido.objects.create(proveedor=self.proveedor)
+        self.DetallePedido.objects.create(
+            pedido=pedido, producto=self.producto, cantidad=cantidad, precio_unitario=1000
+        )
+        pedido.estado = 'REC'
+        pedido.save()
+        return pedido
+
+    def _vender(self, cantidad, estado='COMPLETADA'):
+        venta = self.Venta.objects.create(estado=estado)
+        item = self.VentaItem.objects.create(
+            venta=venta, producto=self.producto, cantidad=cantidad, precio_unitario=20000
+        )
+        return venta, item
+
+    def test_producto_nuevo_crea_fila_de_stock(self):
+        """Al crear un producto se crea su fila en el libro con stock 0"""
+        self.assertEqual(self.producto.stock_actual.disponible, 0)
+        self.assertEqual(self.producto.stock, 0)
+
+    def test_pedido_recibido_y_venta_completada_mueven_stock(self):
+        """Recibir un pedido suma y completar una venta resta"""
+        self._recibir(Decimal('10'))
+        self.assertEqual(self.producto.stock, Decimal('10'))
+
+        venta, item = self._vender(Decimal('3'))
+        self.assertEqual(self.producto.stock, Decimal('7'))
+
+        item.cantidad = Decimal('4')
+        item.save()
+        self.assertEqual(self.producto.stock, Decimal('6'))
+
+        venta.estado = 'CANCELADA'
+        venta.save()
+        self.assertEqual(self.producto.stock, Decimal('10'))
+
+    def test_pedido_que_sale_de_recibido_descuenta_stock(self):
+        """Devolver un pedido a pendiente o eliminarlo descuenta lo recibido"""
+        pedido = self._recibir(Decimal('8'))
+        pedido.estado = 'PEN'
+        pedido.save()
+        self.assertEqual(self.producto.stock, 0)
+
+        pedido.estado = 'REC'
+        pedido.save()
+        pedido.delete()
+        self.assertEqual(self.producto.stock, 0)
+
+    def test_eliminar_venta_devuelve_stock(self):
+        """Eliminar una venta completada (cascada de ítems) devuelve el stock"""
+        self._recibir(Decimal('5'))
+        venta, _ = self._vender(Decimal('2'))
+        venta.delete()
+        self.assertEqual(self.producto.stock, Decimal('5'))
+
+    def test_libro_coincide_con_historico(self):
+        """El libro mantenido por señales coincide con el cálculo desde el histórico"""
+        from productos import stock
+
+        self._recibir(Decimal('12.5'))
+        self._vender(Decimal('2.5'))
+        self._vender(Decimal('1'), estado='PENDIENTE')
+        self.assertEqual(stock.verificar_stock(), [])
+
+    def test_reconstruir_stock_corrige_diferencias(self):
+        """El comando reconstruir_stock recalcula filas desfasadas"""
+        from io import StringIO
+        from django.core.management import call_command
+        from productos import stock
+        from productos.models import StockProducto
+
+        self._recibir(Decimal('9'))
+        StockProducto.objects.filter(producto=self.producto).update(disponible=0, recibido=0)
+        self.assertEqual(len(stock.verificar_stock()), 1)
+
+        call_command('reconstruir_stock', stdout=StringIO())
+        self.assertEqual(stock.verificar_stock(), [])
+        self.assertEqual(self.producto.stock, Decimal('9'))
+
+    def test_error_de_bd_no_se_disfraza_de_stock_cero(self):
+        """Si la consulta falla (p. ej. conexión caída) el error se propaga"""
+        from unittest import mock
+
+        from django.db import OperationalError
+        from productos.models import StockProducto
+
+        with mock.patch.object(StockProducto.objects, 'filter', side_effect=OperationalError('conexión cerrada')):
+            with self.assertRaises(OperationalError):
+                self.producto.stock
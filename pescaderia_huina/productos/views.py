@@ -3,9 +3,9 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models.deletion import ProtectedError
 from django.forms import modelformset_factory
-from django.db.models import Q
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.contrib import messages
+from core import busqueda
+from core.paginacion import paginar
 from .models import Producto
 from .forms import ProductoForm, ProveedorSelectForm, ProductoItemForm
 
@@ -19,11 +19,8 @@ def productos_list(request):
     # .select_related('proveedor') optimiza la consulta para traer el nombre del proveedor de una vez
     productos = Producto.objects.select_related('proveedor').all().order_by('-id')
 
-    if query:
-        productos = productos.filter(
-            Q(nombre__icontains=query) |
-            Q(proveedor__nombre_contacto__icontains=query) # También busca por nombre del proveedor
-        )
+    # También busca por nombre del proveedor
+    productos = busqueda.filtrar(productos, query, ['nombre', 'proveedor__nombre_contacto'])
 
     if tipo_producto:
         productos = productos.filter(tipo_producto=tipo_producto)
@@ -39,15 +36,8 @@ def productos_list(request):
     if presentacion:
         presentacion_label = dict(Producto.TIPO_PRESENTACION).get(presentacion, '')
 
-    # OPTIMIZACIÓN: Paginación para no cargar todos los productos
-    paginator = Paginator(productos, 25)
-    page = request.GET.get('page', 1)
-    try:
-        productos = paginator.page(page)
-    except PageNotAnInteger:
-        productos = paginator.page(1)
-    except EmptyPage:
-        productos = paginator.page(paginator.num_pages)
+    # OPTIMIZACIÓN: Paginación (por cursor sobre id cuando hay muchos productos)
+    productos = paginar(request, productos, 25, ('-id',))
 
     context = {
         'productos': productos,
@@ -0,0 +1,42 @@
+# Generated migration - Índices de trigramas para la búsqueda (solo PostgreSQL)
+
+from django.db import migrations
+
+
+# (nombre del índice, tabla, columna): misma expresión que usa core.busqueda.filtrar
+INDICES = [
+    ('proveedores_nombre_trgm_idx', 'proveedores_proveedor', 'nombre_contacto'),
+    ('proveedores_nit_trgm_idx', 'proveedores_proveedor', 'nit'),
+]
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, tabla, columna in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre} ON {tabla} '
+            f'USING gin (f_unaccent(lower({columna})) gin_trgm_ops)'
+        )
+
+
+def eliminar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, _, _ in INDICES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no bloquea la tabla, pero no puede ir en una transacción
+    atomic = False
+
+    dependencies = [
+        ('core', '0003_busqueda_trigramas'),
+        ('proveedores', '0002_proveedor_departamento'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
@@ -550,7 +550,7 @@ class ExportProveedoresTestCase(TestCase):
         response = self.client.get(self.export_pdf_url)
         
         # Verificar que la respuesta contiene datos esperados
-        self.assertIn(b'Proveedor', response.content)
+        self.assertIn(b'Proveedor', response.getvalue())
     
     def test_export_pdf_tiene_headers_correctos(self):
         """Verificar headers correctos en descarga PDF"""
@@ -1,12 +1,9 @@
-import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Q
-from django.http import HttpResponse
-from django.template.loader import get_template
 from django.utils import timezone
-from xhtml2pdf import pisa
+from core import busqueda, reportes
+from core.excel import ExportadorExcel, CHUNK_SIZE
 from .models import Proveedor
 from .forms import ProveedorForm
 
@@ -22,11 +19,7 @@ def lista_proveedores(request):
 
     # Lógica de Búsqueda
     query = request.GET.get('q')
-    if query:
-        proveedores = proveedores.filter(
-            Q(nombre_contacto__icontains=query) | 
-            Q(nit__icontains=query)
-        )
+    proveedores = busqueda.filtrar(proveedores, query, ['nombre_contacto', 'nit'])
 
     # CORRECCIÓN AQUÍ: Quitamos 'proveedores/' de la ruta
     return render(request, 'lista_proveedores.html', {'proveedores': proveedores})
@@ -72,6 +65,11 @@ def modificar_proveedor(request, id):
 # 6. EXPORTAR PROVEEDORES A PDF
 @login_required
 def export_proveedores_pdf(request):
+    return reportes.respuesta_pdf_sincrona(request, 'proveedores', {})
+
+
+def datos_pdf_proveedores(parametros):
+    """Plantilla, contexto y nombre del PDF de proveedores (lo genera core.reportes)."""
     proveedores = Proveedor.objects.all().order_by('nombre_contacto')
 
     total_proveedores = proveedores.count()
@@ -87,30 +85,24 @@ def export_proveedores_pdf(request):
         'total_inactivos':  total_inactivos,
         'total_juridicas':  total_juridicas,
     }
-
-    template = get_template('reporte_proveedores_pdf.html')
-    html = template.render(context)
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="Reporte_Proveedores_Huina.pdf"'
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    if pisa_status.err:
-        return HttpResponse('Error al generar el PDF del reporte de proveedores.', status=500)
-    return response
+    return 'reporte_proveedores_pdf.html', context, 'Reporte_Proveedores_Huina.pdf'
 
 
 # 7. EXPORTAR PROVEEDORES A EXCEL
 @login_required
 def export_proveedores_excel(request):
+    return reportes.respuesta_cacheada(
+        request, 'proveedores_excel', {}, lambda: libro_excel_proveedores().archivo()
+    )
+
+
+def libro_excel_proveedores():
+    """Arma el Excel de proveedores."""
     proveedores = Proveedor.objects.all().order_by('nombre_contacto')
 
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="Reporte_Proveedores_Huina.xlsx"'
+    total_registros = proveedores.count()
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Proveedores'
+    excel = ExportadorExcel('Proveedores', 'Reporte_Proveedores_Huina.xlsx')
 
     # --- Estilos ---
     borde = Border(
@@ -118,78 +110,58 @@ def export_proveedores_excel(request):
         top=Side(style='thin'),  bottom=Side(style='thin')
     )
     al_centro  = Alignment(horizontal='center', vertical='center')
-    al_derecha = Alignment(horizontal='right',  vertical='center')
     al_izq     = Alignment(horizontal='left',   vertical='center')
 
+    excel.estilo('titulo', fuente=Font(name='Calibri', size=14, bold=True, color='FFFFFF'),
+                 fondo=PatternFill(start_color='0F3976', fill_type='solid'), alineacion=al_centro)
+    excel.estilo('subtitulo', fuente=Font(italic=True, color='6C757D', size=9), alineacion=al_centro)
+    excel.estilo('encabezado', fuente=Font(bold=True, color='FFFFFF', size=10),
+                 fondo=PatternFill(start_color='343A40', fill_type='solid'), alineacion=al_centro, borde=borde)
+    excel.estilo('centro', alineacion=al_centro, borde=borde)
+    excel.estilo('izquierda', alineacion=al_izq, borde=borde)
+    excel.estilo('activo', fuente=Font(color='065F46', bold=True), alineacion=al_centro, borde=borde)
+    excel.estilo('inactivo', fuente=Font(color='991B1B', bold=True), alineacion=al_centro, borde=borde)
+    fondo_total = PatternFill(start_color='E7F1FF', fill_type='solid')
+    excel.estilo('total', fuente=Font(bold=True, color='0F3976'), fondo=fondo_total, borde=borde)
+    excel.estilo('total_centro', fuente=Font(bold=True, color='0F3976'), fondo=fondo_total,
+                 alineacion=al_centro, borde=borde)
+
+    # -- Ancho de columnas --
+    excel.anchos([6, 14, 18, 35, 16, 18, 12, 15])
+
     # -- Fila 1: Título --
-    ws.append(['REPORTE DE PROVEEDORES - PESCADERÍA HUINA'])
-    ws.merge_cells('A1:H1')
-    c = ws['A1']
-    c.font  = Font(name='Calibri', size=14, bold=True, color='FFFFFF')
-    c.fill  = PatternFill(start_color='0F3976', fill_type='solid')
-    c.alignment = al_centro
-    ws.row_dimensions[1].height = 26
+    excel.fila(['REPORTE DE PROVEEDORES - PESCADERÍA HUINA'], 'titulo', alto=26, combinar='A:H')
 
     # -- Fila 2: Subtítulo --
-    ws.append([f'Generado: {timezone.now().strftime("%d/%m/%Y %H:%M")}  |  Total registros: {proveedores.count()}'])
-    ws.merge_cells('A2:H2')
-    ws['A2'].font      = Font(italic=True, color='6C757D', size=9)
-    ws['A2'].alignment = al_centro
-    ws.row_dimensions[2].height = 16
+    excel.fila(
+        [f'Generado: {timezone.now().strftime("%d/%m/%Y %H:%M")}  |  Total registros: {total_registros}'],
+        'subtitulo', alto=16, combinar='A:H',
+    )
 
-    ws.append([])  # Fila 3 vacía
+    excel.fila_vacia()  # Fila 3 vacía
 
     # -- Fila 4: Cabeceras de tabla --
     encabezados = ['#', 'Tipo Persona', 'NIT / Cédula', 'Nombre / Contacto',
                    'Teléfono', 'Ciudad', 'Estado', 'Fecha Registro']
-    ws.append(encabezados)
-    for celda in ws[4]:
-        celda.font      = Font(bold=True, color='FFFFFF', size=10)
-        celda.fill      = PatternFill(start_color='343A40', fill_type='solid')
-        celda.alignment = al_centro
-        celda.border    = borde
-    ws.row_dimensions[4].height = 20
+    excel.fila(encabezados, 'encabezado', alto=20)
 
     # -- Filas de datos --
-    for idx, p in enumerate(proveedores, start=1):
-        fila = idx + 4  # offset por encabezados
+    for idx, p in enumerate(proveedores.iterator(chunk_size=CHUNK_SIZE), start=1):
         tipo_texto   = 'Natural' if p.tipo_persona == 'natural' else 'Jurídica'
         estado_texto = 'Activo'  if p.estado else 'Inactivo'
         fecha_str    = p.fecha_registro.strftime('%d/%m/%Y') if p.fecha_registro else ''
 
-        ws.append([idx, tipo_texto, p.nit, p.nombre_contacto,
-                   p.telefono, p.ciudad, estado_texto, fecha_str])
-
-        for col_idx, celda in enumerate(ws[fila], 1):
-            celda.border    = borde
-            celda.alignment = al_centro if col_idx in [1, 2, 5, 7, 8] else al_izq
-
         # Color condicional estado
-        celda_estado = ws.cell(row=fila, column=7)
-        if estado_texto == 'Activo':
-            celda_estado.font = Font(color='065F46', bold=True)
-        else:
-            celda_estado.font = Font(color='991B1B', bold=True)
+        excel.fila(
+            [idx, tipo_texto, p.nit, p.nombre_contacto, p.telefono, p.ciudad, estado_texto, fecha_str],
+            ['centro', 'centro', 'izquierda', 'izquierda', 'centro', 'izquierda',
+             'activo' if p.estado else 'inactivo', 'centro'],
+        )
 
     # -- Fila totales --
-    fila_total = proveedores.count() + 5
-    ws.cell(row=fila_total, column=1, value='TOTAL')
-    ws.cell(row=fila_total, column=2, value=proveedores.count())
-    for col in range(1, 9):
-        c = ws.cell(row=fila_total, column=col)
-        c.font   = Font(bold=True, color='0F3976')
-        c.border = borde
-        c.fill   = PatternFill(start_color='E7F1FF', fill_type='solid')
-    ws.cell(row=fila_total, column=1).alignment = al_centro
-    ws.cell(row=fila_total, column=2).alignment = al_centro
-
-    # -- Ancho de columnas --
-    anchos = {'A': 6, 'B': 14, 'C': 18, 'D': 35, 'E': 16, 'F': 18, 'G': 12, 'H': 15}
-    for col, ancho in anchos.items():
-        ws.column_dimensions[col].width = ancho
+    excel.fila(['TOTAL', total_registros] + [None] * 6, ['total_centro', 'total_centro'] + ['total'] * 6)
 
-    wb.save(response)
-    return response
+    return excel
 
 
 # 5. ELIMINAR PROVEEDOR (ELIMINACIÓN DEFINITIVA)
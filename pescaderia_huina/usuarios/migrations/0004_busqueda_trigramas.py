@@ -0,0 +1,46 @@
+# Generated migration - Índices de trigramas para la búsqueda (solo PostgreSQL)
+
+from django.db import migrations
+
+
+# (nombre del índice, tabla, columna): misma expresión que usa core.busqueda.filtrar
+INDICES = [
+    ('usuarios_username_trgm_idx', 'auth_user', 'username'),
+    ('usuarios_nombre_trgm_idx', 'auth_user', 'first_name'),
+    ('usuarios_apellido_trgm_idx', 'auth_user', 'last_name'),
+    ('usuarios_email_trgm_idx', 'auth_user', 'email'),
+    ('usuarios_documento_trgm_idx', 'usuarios_perfilusuario', 'documento'),
+]
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, tabla, columna in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre} ON {tabla} '
+            f'USING gin (f_unaccent(lower({columna})) gin_trgm_ops)'
+        )
+
+
+def eliminar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, _, _ in INDICES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no bloquea la tabla, pero no puede ir en una transacción
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0003_busqueda_trigramas'),
+        ('usuarios', '0003_alter_perfilusuario_foto_perfil'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
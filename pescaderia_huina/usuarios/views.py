@@ -8,8 +8,8 @@ from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_protect
 from django.http import JsonResponse
 from django.utils.http import url_has_allowed_host_and_scheme
-from django.db.models import Q
-from django.core.cache import cache
+from core import busqueda as buscador, correos, limite_intentos
+from core.limite_intentos import Limite, limitar
 from django.utils import timezone
 from .forms import (
     LoginForm,
@@ -22,6 +22,7 @@ from .forms import (
     EditarMiPerfilForm,
 )
 from .models import PerfilUsuario
+import math
 import random
 from django.utils import timezone
 from django.core.mail import send_mail
@@ -46,57 +47,46 @@ def _get_client_ip(request):
     return ip
 
 
-def _get_lock_duration(attempts):
-    """Calcula el tiempo de bloqueo basado en intentos fallidos.
-    4 intentos = 10 min
-    5 intentos = 15 min
-    6 intentos = 20 min, etc.
-    """
-    if attempts < 4:
-        return 0
-    return (attempts - 3) * 5  # En minutos
+def _usuario_login(request):
+    """Usuario escrito en el formulario de login (en minúsculas)."""
+    return request.POST.get('username', '').strip().lower() or None
 
 
-def _check_login_lock(username, ip):
-    """Verifica si el usuario está bloqueado por rate limiting.
-    Retorna (está_bloqueado, minutos_restantes)
-    """
-    cache_key = f"login_lock:{username}:{ip}"
-    lock_time = cache.get(cache_key)
-    if lock_time:
-        minutos_restantes = lock_time - timezone.now().timestamp()
-        if minutos_restantes > 0:
-            return True, int(minutos_restantes / 60)
-    return False, 0
-
-
-def _increment_login_attempts(username, ip):
-    """Incrementa los intentos fallidos de login."""
-    cache_key = f"login_attempts:{username}:{ip}"
-    attempts = cache.get(cache_key, 0)
-    attempts += 1
-    
-    # Mantener el contador por 30 minutos
-    cache.set(cache_key, attempts, 30 * 60)
-    
-    return attempts
+def _usuario_desde_ip(request):
+    usuario = _usuario_login(request)
+    return f"{usuario}|{_get_client_ip(request)}" if usuario else None
 
 
-def _apply_login_lock(username, ip, attempts):
-    """Aplica bloqueo temporal si se alcanza el límite de intentos."""
-    duration_minutes = _get_lock_duration(attempts)
-    if duration_minutes > 0:
-        cache_key = f"login_lock:{username}:{ip}"
-        lock_time = timezone.now().timestamp() + (duration_minutes * 60)
-        cache.set(cache_key, lock_time, duration_minutes * 60 + 60)
-        return True
-    return False
+# Intentos de login (core.limite_intentos). Se gastan ANTES de validar la
+# contraseña, todos en una sola operación atómica (en todos o en ninguno), así
+# que peticiones en paralelo no pueden saltarse el límite. Un intento
+# rechazado no gasta nada: cuando se recupera uno, puede usarlo cualquiera.
+LIMITE_LOGIN_USUARIO_IP = Limite('login_usuario_ip', 4, 10 * 60, _usuario_desde_ip)
+# El mismo usuario desde muchas IP (ataque distribuido a una cuenta). Más
+# holgado que el de usuario+IP y de recuperación rápida (uno cada 3 minutos):
+# quien escriba el usuario de otro no lo deja afuera más que eso por intento.
+LIMITE_LOGIN_USUARIO = Limite('login_usuario', 10, 30 * 60, _usuario_login)
+LIMITES_LOGIN = (
+    LIMITE_LOGIN_USUARIO_IP,
+    LIMITE_LOGIN_USUARIO,
+    # Muchas cuentas desde la misma IP
+    Limite('login_ip', 30, 15 * 60, _get_client_ip),
+)
+
 
+def _minutos(segundos):
+    return max(1, math.ceil(segundos / 60))
 
-def _reset_login_attempts(username, ip):
-    """Limpia los intentos después de login exitoso."""
-    cache_key = f"login_attempts:{username}:{ip}"
-    cache.delete(cache_key)
+
+def _demasiados_intentos(plantilla):
+    """Respuesta de las vistas de recuperación cuando se agotan los intentos."""
+    def responder(request, resultado):
+        messages.error(
+            request,
+            f'Demasiados intentos. Intenta de nuevo en {_minutos(resultado.reintentar_en)} minutos.'
+        )
+        return render(request, plantilla, status=429)
+    return responder
 
 
 def _build_form_error_message(form):
@@ -133,28 +123,30 @@ def _build_form_error_message(form):
 def login_view(request):
     """
     Vista para el inicio de sesión de usuarios
-    Incluye rate limiting: después de 4 intentos fallidos se bloquea 10 min, 15 min, etc.
+    Incluye rate limiting (LIMITES_LOGIN): 4 intentos por usuario e IP cada
+    10 minutos, 10 por usuario cada 30 y 30 por IP cada 15. Agotado
+    cualquiera, responde 429 con Retry-After sin validar la contraseña.
     """
     # Si el usuario ya está autenticado, redirigir al dashboard
     if request.user.is_authenticated:
         return redirect('core:dashboard')
     
-    cliente_ip = _get_client_ip(request)
-    
     if request.method == 'POST':
         username = request.POST.get('username', '').strip()
         password = request.POST.get('password', '')
         
-        # PRIMERO: Verificar si hay bloqueo por rate limiting (ANTES de cualquier otra validación)
-        esta_bloqueado, minutos_restantes = _check_login_lock(username, cliente_ip)
-        if esta_bloqueado:
+        # PRIMERO: Gastar un intento (ANTES de cualquier otra validación); si no quedan, bloquear
+        intento = limite_intentos.consumir(*limite_intentos.claves_de(request, LIMITES_LOGIN))
+        if not intento.permitido:
             messages.error(
                 request, 
-                f' Demasiados intentos fallidos. Intenta de nuevo en {minutos_restantes} minutos.'
+                f' Demasiados intentos fallidos. Intenta de nuevo en {_minutos(intento.reintentar_en)} minutos.'
             )
             form = LoginForm()
             context = {'form': form, 'titulo': 'Iniciar Sesión'}
-            return render(request, 'usuarios/login.html', context)
+            response = render(request, 'usuarios/login.html', context, status=429)
+            response['Retry-After'] = str(max(1, math.ceil(intento.reintentar_en)))
+            return response
         
         # SEGUNDO: Intentar autenticar con credenciales simples (sin validar formulario completo aún)
         if username and password:
@@ -166,7 +158,8 @@ def login_view(request):
                 if form.is_valid():
                     remember_me = form.cleaned_data.get('remember_me')
                     login(request, user)
-                    _reset_login_attempts(username, cliente_ip)
+                    # Login correcto: se devuelven los intentos del usuario (no los de la IP)
+                    limite_intentos.reiniciar(request, LIMITE_LOGIN_USUARIO_IP, LIMITE_LOGIN_USUARIO)
                     
                     # Configurar duración de la sesión
                     if not remember_me:
@@ -186,25 +179,18 @@ def login_view(request):
             elif user is not None and not user.is_active:
                 messages.error(request, 'Esta cuenta ha sido desactivada.')
             else:
-                # Credenciales incorrectas - aplicar rate limiting
-                attempts = _increment_login_attempts(username, cliente_ip)
-                esta_bloqueado_ahora = _apply_login_lock(username, cliente_ip, attempts)
-                
-                if esta_bloqueado_ahora:
-                    duration = _get_lock_duration(attempts)
+                # Credenciales incorrectas - el intento ya se gastó arriba
+                if intento.restantes > 0:
                     messages.error(
                         request,
-                        f' Documento o contraseña incorrectos. Tu cuenta se ha bloqueado por {duration} minutos.'
+                        f' Documento o contraseña incorrectos. Te quedan {intento.restantes} intentos.'
                     )
                 else:
-                    intentos_restantes = 4 - attempts
-                    if intentos_restantes > 0:
-                        messages.error(
-                            request,
-                            f' Documento o contraseña incorrectos. Te quedan {intentos_restantes} intentos.'
-                        )
-                    else:
-                        messages.error(request, 'Tu cuenta ha sido bloqueada temporalmente por seguridad.')
+                    messages.error(
+                        request,
+                        ' Documento o contraseña incorrectos. El acceso se ha bloqueado temporalmente; '
+                        'intenta de nuevo en unos minutos.'
+                    )
         else:
             messages.error(request, 'Por favor ingresa documento y contraseña.')
         
@@ -271,14 +257,9 @@ def lista_usuarios_view(request):
     usuarios = User.objects.select_related('perfil').all()
     
     # Aplicar filtros
-    if busqueda:
-        usuarios = usuarios.filter(
-            Q(username__icontains=busqueda) |
-            Q(first_name__icontains=busqueda) |
-            Q(last_name__icontains=busqueda) |
-            Q(email__icontains=busqueda) |
-            Q(perfil__documento__icontains=busqueda)
-        )
+    usuarios = buscador.filtrar(
+        usuarios, busqueda, ['username', 'first_name', 'last_name', 'email', 'perfil__documento']
+    )
     
     if filtro_activo:
         usuarios = usuarios.filter(is_active=filtro_activo == 'true')
@@ -506,6 +487,11 @@ def editar_perfil_view(request, user_id=None):
         'is_admin_edit': user_id is not None,
     }
     return render(request, 'usuarios/editar_perfil.html', context)
+@limitar(
+    Limite('recuperar_ip', 5, 60 * 60, _get_client_ip),
+    Limite('recuperar_correo', 3, 60 * 60, lambda request: request.POST.get('email', '').strip().lower()),
+    al_limitar=_demasiados_intentos('usuarios/recuperar.html'),
+)
 def solicitar_recuperacion(request):
     if request.method == 'POST':
         email = (request.POST.get('email') or '').strip()
@@ -540,12 +526,19 @@ def solicitar_recuperacion(request):
         )
 
         email_msg.attach_alternative(html_content, "text/html")
-        email_msg.send()
+        # Se envía en segundo plano (procesar_correos); el código vence a los 10 minutos
+        correos.encolar(email_msg, expira=timedelta(minutes=10))
 
         request.session['recovery_user'] = user.id
         return redirect('usuarios:verificar_codigo')
 
     return render(request, 'usuarios/recuperar.html')
+@limitar(
+    # El código tiene 6 dígitos: sin límite se puede adivinar por fuerza bruta
+    Limite('verificar_usuario', 5, 10 * 60, lambda request: request.session.get('recovery_user')),
+    Limite('verificar_ip', 20, 60 * 60, _get_client_ip),
+    al_limitar=_demasiados_intentos('usuarios/verificar_codigo.html'),
+)
 def verificar_codigo(request):
     user_id = request.session.get('recovery_user')
 
@@ -0,0 +1,47 @@
+"""
+Comando para reconstruir el resumen diario de ventas desde cero.
+Compara el resumen con las ventas registradas y corrige diferencias.
+"""
+from django.core.management.base import BaseCommand
+
+from ventas import resumen
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de ventas desde las ventas registradas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo compara el resumen con las ventas, sin escribir cambios.',
+        )
+        parser.add_argument('--desde', help='Primer día a revisar (AAAA-MM-DD).')
+        parser.add_argument('--hasta', help='Último día a revisar (AAAA-MM-DD).')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('\n=== RESUMEN DIARIO DE VENTAS ===\n'))
+
+        desde, hasta = options['desde'], options['hasta']
+        diferencias = resumen.verificar_resumen(desde, hasta)
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('✓ El resumen coincide con las ventas registradas'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'⚠️  {len(diferencias)} filas con diferencias:\n'))
+        for dif in diferencias:
+            clave = ' / '.join(str(parte) for parte in dif['clave'])
+            self.stdout.write(
+                f"  • {dif['tabla']} [{clave}]: "
+                f"resumen={dif['actual'] or 'sin fila'} | ventas={dif['esperado'] or 'sin ventas'}"
+            )
+
+        if options['verificar']:
+            self.stdout.write(self.style.WARNING(
+                '\n💡 Para corregirlas, ejecuta:\n'
+                '   python manage.py reconstruir_resumen_ventas\n'
+            ))
+            return
+
+        escritas = resumen.reconstruir_resumen(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Resumen reconstruido ({escritas} filas actualizadas)'))
@@ -0,0 +1,118 @@
+# Generated migration - Resumen diario de ventas materializado
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def poblar_resumen(apps, schema_editor):
+    """Materializa el resumen diario desde las ventas existentes."""
+    Venta = apps.get_model('ventas', 'Venta')
+    VentaItem = apps.get_model('ventas', 'VentaItem')
+    ResumenVentaDiaria = apps.get_model('ventas', 'ResumenVentaDiaria')
+    ResumenProductoDiario = apps.get_model('ventas', 'ResumenProductoDiario')
+
+    filas = Venta.objects.annotate(fecha=TruncDate('fecha_venta')).values('fecha', 'estado').annotate(
+        n=models.Count('id'),
+        suma_subtotal=models.Sum('subtotal'),
+        suma_iva=models.Sum('iva_monto'),
+        suma_total=models.Sum('total'),
+    ).order_by()
+    ResumenVentaDiaria.objects.bulk_create([
+        ResumenVentaDiaria(
+            fecha=fila['fecha'],
+            estado=fila['estado'],
+            ventas=fila['n'],
+            subtotal=fila['suma_subtotal'] or Decimal('0'),
+            iva=fila['suma_iva'] or Decimal('0'),
+            total=fila['suma_total'] or Decimal('0'),
+        )
+        for fila in filas
+    ], batch_size=500)
+
+    # El IVA por producto se redondea ítem por ítem
+    por_producto = {}
+    items = VentaItem.objects.values(
+        'producto_id', 'tipo_presentacion', 'cantidad', 'subtotal', 'venta__estado', 'venta__fecha_venta',
+    ).order_by()
+    for item in items.iterator(chunk_size=2000):
+        subtotal = Decimal(str(item['subtotal'] or 0))
+        iva = (subtotal * Decimal('0.19')).quantize(Decimal('0.01'))
+        clave = (
+            timezone.localdate(item['venta__fecha_venta']),
+            item['venta__estado'],
+            item['producto_id'],
+            item['tipo_presentacion'],
+        )
+        fila = por_producto.setdefault(clave, [0, Decimal('0'), Decimal('0'), Decimal('0')])
+        fila[0] += 1
+        fila[1] += Decimal(str(item['cantidad'] or 0))
+        fila[2] += subtotal
+        fila[3] += iva
+    ResumenProductoDiario.objects.bulk_create([
+        ResumenProductoDiario(
+            fecha=fecha, estado=estado, producto_id=producto_id, tipo_presentacion=tipo_presentacion,
+            items=n, cantidad=cantidad, subtotal=subtotal, iva=iva, total=subtotal + iva,
+        )
+        for (fecha, estado, producto_id, tipo_presentacion), (n, cantidad, subtotal, iva) in por_producto.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0006_stockproducto'),
+        ('ventas', '0006_alter_ventaitem_producto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenVentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('estado', models.CharField(choices=[('COMPLETADA', 'Completada'), ('CANCELADA', 'Cancelada'), ('PENDIENTE', 'Pendiente')], max_length=20, verbose_name='Estado')),
+                ('ventas', models.IntegerField(default=0, verbose_name='Ventas')),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Subtotal')),
+                ('iva', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='IVA')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Ventas',
+                'verbose_name_plural': 'Resúmenes Diarios de Ventas',
+                'ordering': ['-fecha', 'estado'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenProductoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('estado', models.CharField(choices=[('COMPLETADA', 'Completada'), ('CANCELADA', 'Cancelada'), ('PENDIENTE', 'Pendiente')], max_length=20, verbose_name='Estado')),
+                ('tipo_presentacion', models.CharField(choices=[('EMPACADO_VACIO', 'Empacado al Vacío'), ('POR_LIBRA', 'Por Libra'), ('BANDEJA', 'Bandeja')], max_length=20, verbose_name='Presentación')),
+                ('items', models.IntegerField(default=0, verbose_name='Ítems')),
+                ('cantidad', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Cantidad')),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Subtotal')),
+                ('iva', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='IVA')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_ventas', to='productos.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario por Producto',
+                'verbose_name_plural': 'Resúmenes Diarios por Producto',
+                'ordering': ['-fecha', 'estado', 'producto'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumenventadiaria',
+            constraint=models.UniqueConstraint(fields=('fecha', 'estado'), name='ventas_resumen_dia_estado_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumenproductodiario',
+            constraint=models.UniqueConstraint(fields=('fecha', 'estado', 'producto', 'tipo_presentacion'), name='ventas_resumen_producto_uniq'),
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated migration - Índices compuestos y parciales para listados, reportes y stock
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0007_resumen_diario'),
+    ]
+
+    operations = [
+        # Reemplazado por (estado, -fecha_venta), que también sirve para filtrar solo por estado
+        migrations.RemoveIndex(
+            model_name='venta',
+            name='ventas_estado_idx',
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(
+                fields=['estado', '-fecha_venta'],
+                name='ventas_estado_fecha_idx',
+            ),
+        ),
+        # Índice parcial: solo ventas completadas, por fecha (reportes y resumen diario)
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(
+                fields=['fecha_venta'],
+                include=('total',),
+                condition=models.Q(estado='COMPLETADA'),
+                name='ventas_completadas_fecha_idx',
+            ),
+        ),
+        # Índice para el stock por producto (JOIN con venta.estado y suma de cantidad)
+        migrations.AddIndex(
+            model_name='ventaitem',
+            index=models.Index(
+                fields=['producto', 'venta'],
+                include=('cantidad',),
+                name='ventaitem_producto_venta_idx',
+            ),
+        ),
+    ]
@@ -2,6 +2,11 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.utils import timezone
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from productos import stock
+from productos.stock import ESTADO_VENTA_COMPLETADA
 
 IVA_PORCENTAJE = Decimal('0.19')  # 19% IVA Colombia
 
@@ -53,6 +58,21 @@ class Venta(models.Model):
         verbose_name = 'Venta'
         verbose_name_plural = 'Ventas'
         ordering = ['-fecha_venta']
+        indexes = [
+            # Listado (siempre por -fecha_venta) y filtros por rango de días
+            models.Index(fields=['-fecha_venta'], name='ventas_fecha_venta_desc_idx'),
+            # Filtro por estado con el mismo orden del listado
+            models.Index(fields=['estado', '-fecha_venta'], name='ventas_estado_fecha_idx'),
+            # Parcial: ventas completadas por fecha (reportes, resumen diario);
+            # en PostgreSQL incluye el total para no leer la tabla al sumar
+            models.Index(
+                fields=['fecha_venta'],
+                include=['total'],
+                condition=models.Q(estado='COMPLETADA'),
+                name='ventas_completadas_fecha_idx',
+            ),
+            models.Index(fields=['nombre_cliente'], name='ventas_nombre_cliente_idx'),
+        ]
 
     def __str__(self):
         return f"Venta #{self.id} - {self.nombre_cliente or 'Anónimo'} - ${self.total}"
@@ -69,11 +89,8 @@ class Venta(models.Model):
         self.subtotal = subtotal
         self.iva_monto = (subtotal * IVA_PORCENTAJE).quantize(Decimal('0.01'))
         self.total = (subtotal + self.iva_monto).quantize(Decimal('0.01'))
-        Venta.objects.filter(pk=self.pk).update(
-            subtotal=self.subtotal,
-            iva_monto=self.iva_monto,
-            total=self.total
-        )
+        # save() y no update(): las señales llevan los nuevos totales al resumen diario
+        self.save(update_fields=['subtotal', 'iva_monto', 'total'])
 
     def get_cliente_display(self):
         return self.nombre_cliente or 'Cliente anónimo'
@@ -99,6 +116,11 @@ class VentaItem(models.Model):
     class Meta:
         verbose_name = 'Ítem de Venta'
         verbose_name_plural = 'Ítems de Venta'
+        indexes = [
+            models.Index(fields=['venta', 'producto'], name='ventaitem_venta_producto_idx'),
+            # Stock por producto (JOIN con venta.estado): cubre la suma de cantidad en PostgreSQL
+            models.Index(fields=['producto', 'venta'], include=['cantidad'], name='ventaitem_producto_venta_idx'),
+        ]
 
     def __str__(self):
         return f"{self.producto.nombre} x {self.cantidad}"
@@ -106,4 +128,175 @@ class VentaItem(models.Model):
     def save(self, *args, **kwargs):
         self.subtotal = (Decimal(str(self.cantidad)) * Decimal(str(self.precio_unitario))).quantize(Decimal('0.01'))
         super().save(*args, **kwargs)
-    
\ No newline at end of file
+
+
+# ==================== RESUMEN DIARIO ====================
+# Totales de ventas materializados por día (ver ventas/resumen.py).
+
+class ResumenVentaDiaria(models.Model):
+    """Número de ventas y sus totales por día y estado."""
+    fecha = models.DateField(verbose_name='Fecha')
+    estado = models.CharField(max_length=20, choices=Venta.ESTADOS, verbose_name='Estado')
+    ventas = models.IntegerField(default=0, verbose_name='Ventas')
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Subtotal')
+    iva = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='IVA')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Total')
+
+    class Meta:
+        verbose_name = 'Resumen Diario de Ventas'
+        verbose_name_plural = 'Resúmenes Diarios de Ventas'
+        ordering = ['-fecha', 'estado']
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'estado'], name='ventas_resumen_dia_estado_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.estado}: {self.ventas} ventas, ${self.total}"
+
+
+class ResumenProductoDiario(models.Model):
+    """Ítems vendidos por día, estado, producto y presentación."""
+    fecha = models.DateField(verbose_name='Fecha')
+    estado = models.CharField(max_length=20, choices=Venta.ESTADOS, verbose_name='Estado')
+    producto = models.ForeignKey(
+        'productos.Producto',
+        on_delete=models.CASCADE,
+        related_name='resumen_ventas',
+        verbose_name='Producto',
+    )
+    tipo_presentacion = models.CharField(max_length=20, choices=VentaItem.TIPO_PRESENTACION,
+        verbose_name='Presentación')
+    items = models.IntegerField(default=0, verbose_name='Ítems')
+    cantidad = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Cantidad')
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Subtotal')
+    iva = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='IVA')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Total')
+
+    class Meta:
+        verbose_name = 'Resumen Diario por Producto'
+        verbose_name_plural = 'Resúmenes Diarios por Producto'
+        ordering = ['-fecha', 'estado', 'producto']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'estado', 'producto', 'tipo_presentacion'],
+                name='ventas_resumen_producto_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.estado} #{self.producto_id} {self.tipo_presentacion}: {self.cantidad}"
+
+
+# ==================== LIBRO DE STOCK Y RESUMEN DIARIO ====================
+# Mantienen productos.StockProducto y el resumen diario (ventas/resumen.py)
+# al día cuando cambian las ventas.
+
+def _venta_en_bd(venta_id):
+    return Venta.objects.filter(pk=venta_id).values('fecha_venta', 'estado').first()
+
+
+@receiver(pre_save, sender=Venta)
+def guardar_estado_previo_venta(sender, instance, raw=False, **kwargs):
+    from . import resumen
+
+    instance._venta_previa = None if raw or not instance.pk else (
+        Venta.objects.filter(pk=instance.pk).values(*resumen.CAMPOS_VENTA).first()
+    )
+    instance._estado_previo = instance._venta_previa['estado'] if instance._venta_previa else None
+
+
+@receiver(post_save, sender=Venta)
+def actualizar_resumen_por_venta(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mueve el aporte de la venta (y de sus ítems si cambió de día o estado) en el resumen."""
+    from . import resumen
+
+    if raw:
+        return
+    previa = getattr(instance, '_venta_previa', None)
+    actual = resumen.datos_venta(instance, previa, update_fields)
+    resumen.aplicar_venta(previa, actual)
+    if previa:
+        resumen.mover_items_venta(instance.pk, previa, actual)
+
+
+@receiver(post_save, sender=Venta)
+def actualizar_stock_por_estado_venta(sender, instance, created, raw=False, **kwargs):
+    """Al entrar o salir de COMPLETADA, suma o resta los ítems de la venta."""
+    if raw or created:
+        return
+    era_completada = getattr(instance, '_estado_previo', None) == ESTADO_VENTA_COMPLETADA
+    es_completada = instance.estado == ESTADO_VENTA_COMPLETADA
+    if era_completada == es_completada:
+        return
+
+    signo = 1 if es_completada else -1
+    cantidades = {
+        fila['producto_id']: signo * fila['total']
+        for fila in instance.items.values('producto_id').annotate(total=models.Sum('cantidad')).order_by()
+    }
+    stock.aplicar_movimientos(cantidades, 'vendido')
+
+
+@receiver(pre_delete, sender=Venta)
+def guardar_venta_eliminada(sender, instance, **kwargs):
+    from . import resumen
+
+    instance._venta_previa = Venta.objects.filter(pk=instance.pk).values(*resumen.CAMPOS_VENTA).first()
+
+
+@receiver(post_delete, sender=Venta)
+def actualizar_resumen_por_venta_eliminada(sender, instance, **kwargs):
+    from . import resumen
+
+    resumen.aplicar_venta(getattr(instance, '_venta_previa', None), None)
+
+
+@receiver(pre_save, sender=VentaItem)
+def guardar_item_previo(sender, instance, raw=False, **kwargs):
+    from . import resumen
+
+    instance._item_previo = None
+    if raw or not instance.pk:
+        return
+    instance._item_previo = VentaItem.objects.filter(pk=instance.pk).values(
+        *resumen.CAMPOS_ITEM, estado=models.F('venta__estado'), fecha_venta=models.F('venta__fecha_venta'),
+    ).first()
+
+
+@receiver(post_save, sender=VentaItem)
+def actualizar_stock_por_item(sender, instance, raw=False, **kwargs):
+    from . import resumen
+
+    if raw:
+        return
+    cantidades = {}
+    previo = getattr(instance, '_item_previo', None)
+    if previo and previo['estado'] == ESTADO_VENTA_COMPLETADA:
+        cantidades[previo['producto_id']] = -Decimal(str(previo['cantidad']))
+    venta = _venta_en_bd(instance.venta_id)
+    if venta and venta['estado'] == ESTADO_VENTA_COMPLETADA:
+        cantidades[instance.producto_id] = (
+            cantidades.get(instance.producto_id, Decimal('0')) + Decimal(str(instance.cantidad))
+        )
+    stock.aplicar_movimientos(cantidades, 'vendido')
+
+    actual = dict({campo: getattr(instance, campo) for campo in resumen.CAMPOS_ITEM}, **venta) if venta else None
+    resumen.aplicar_items([previo] if previo else [], [actual] if actual else [])
+
+
+@receiver(pre_delete, sender=VentaItem)
+def guardar_estado_item_eliminado(sender, instance, **kwargs):
+    # En un borrado en cascada la venta todavía existe en pre_delete, no en post_delete.
+    instance._venta = _venta_en_bd(instance.venta_id)
+
+
+@receiver(post_delete, sender=VentaItem)
+def actualizar_stock_por_item_eliminado(sender, instance, **kwargs):
+    from . import resumen
+
+    venta = getattr(instance, '_venta', None)
+    if not venta:
+        return
+    if venta['estado'] == ESTADO_VENTA_COMPLETADA:
+        stock.aplicar_movimiento(instance.producto_id, vendido=-Decimal(str(instance.cantidad)))
+    resumen.aplicar_items([dict({campo: getattr(instance, campo) for campo in resumen.CAMPOS_ITEM}, **venta)], [])
@@ -0,0 +1,336 @@
+"""
+Resumen diario de ventas materializado.
+
+ResumenVentaDiaria guarda por día y estado cuántas ventas hubo y sus
+totales; ResumenProductoDiario lo mismo por producto y presentación. Las
+señales de ventas/models.py aplican cada alta, edición, cancelación o
+borrado como una diferencia (UPDATE ... SET x = x + n), así que los
+encabezados y reportes suman una fila por día en lugar de recorrer toda la
+tabla de ventas.
+
+Todas las ventas de un día actualizan la misma fila. Si la diferencia se
+aplicara dentro de la transacción de la venta, esa fila quedaría bloqueada
+hasta el commit y las cajas se esperarían unas a otras. Por eso se aplica al
+confirmar (on_commit, como core.versiones), en un UPDATE corto aparte: si la
+venta se revierte no se aplica nada. Si el UPDATE falla después del commit
+el resumen queda desfasado; `verificar_resumen` lo detecta y
+`reconstruir_resumen` lo corrige.
+
+El día es la fecha local (TIME_ZONE) de fecha_venta, la misma que usan los
+filtros por rango de días de las vistas. Se puede reconstruir con
+`python manage.py reconstruir_resumen_ventas`.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.fechas import filtro_rango_dias
+from productos.stock import ESTADO_VENTA_COMPLETADA
+
+from .models import IVA_PORCENTAJE, ResumenProductoDiario, ResumenVentaDiaria, Venta, VentaItem
+
+
+ESTADO_VENTA_CANCELADA = 'CANCELADA'
+
+CERO = Decimal('0')
+
+# Campos de Venta que determinan su aporte al resumen
+CAMPOS_VENTA = ('fecha_venta', 'estado', 'subtotal', 'iva_monto', 'total')
+
+# Campos de VentaItem (más estado y fecha_venta de su venta) que determinan su aporte
+CAMPOS_ITEM = ('producto_id', 'tipo_presentacion', 'cantidad', 'subtotal')
+
+
+def _decimal(valor):
+    return Decimal(str(valor or 0))
+
+
+def dia_venta(fecha_venta):
+    """Día local de una fecha de venta."""
+    if timezone.is_aware(fecha_venta):
+        return timezone.localdate(fecha_venta)
+    return fecha_venta.date()
+
+
+def iva_item(subtotal):
+    """IVA de un ítem; el resumen por producto lo calcula ítem por ítem."""
+    return (_decimal(subtotal) * IVA_PORCENTAJE).quantize(Decimal('0.01'))
+
+
+# ==================== ACTUALIZACIÓN INCREMENTAL ====================
+
+def _sumar(modelo, claves, deltas):
+    """Suma `deltas` a la fila de `claves` con un UPDATE atómico; la crea si no existe."""
+    if not any(deltas.values()):
+        return
+    incrementos = {campo: F(campo) + valor for campo, valor in deltas.items()}
+    if modelo.objects.filter(**claves).update(**incrementos):
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**claves, **deltas)
+    except IntegrityError:
+        # Otra transacción creó la fila al mismo tiempo
+        modelo.objects.filter(**claves).update(**incrementos)
+
+
+def _acumular(destino, aporte):
+    for clave, deltas in aporte.items():
+        acumulado = destino.setdefault(clave, dict.fromkeys(deltas, 0))
+        for campo, valor in deltas.items():
+            acumulado[campo] += valor
+
+
+def _combinar(aportes):
+    """Junta una lista de {clave: deltas} sumando los deltas de la misma clave."""
+    resultado = {}
+    for aporte in aportes:
+        _acumular(resultado, aporte)
+    return resultado
+
+
+def _aporte_venta(venta, signo):
+    return {
+        (dia_venta(venta['fecha_venta']), venta['estado']): {
+            'ventas': signo,
+            'subtotal': signo * _decimal(venta['subtotal']),
+            'iva': signo * _decimal(venta['iva_monto']),
+            'total': signo * _decimal(venta['total']),
+        }
+    }
+
+
+def _aporte_item(item, signo):
+    subtotal = _decimal(item['subtotal'])
+    iva = iva_item(subtotal)
+    clave = (dia_venta(item['fecha_venta']), item['estado'], item['producto_id'], item['tipo_presentacion'])
+    return {
+        clave: {
+            'items': signo,
+            'cantidad': signo * _decimal(item['cantidad']),
+            'subtotal': signo * subtotal,
+            'iva': signo * iva,
+            'total': signo * (subtotal + iva),
+        }
+    }
+
+
+def datos_venta(venta, previa=None, update_fields=None):
+    """
+    Valores de CAMPOS_VENTA tal como quedaron en la BD después de un save().
+    Con update_fields, los campos no guardados conservan el valor previo.
+    """
+    datos = {campo: getattr(venta, campo) for campo in CAMPOS_VENTA}
+    if previa is not None and update_fields is not None:
+        datos.update({campo: previa[campo] for campo in CAMPOS_VENTA if campo not in update_fields})
+    return datos
+
+
+def _reconstrucciones():
+    """Rangos (fecha_inicio, fecha_fin) que reconstruir_resumen rehízo en esta conexión."""
+    conexion = transaction.get_connection()
+    if not hasattr(conexion, 'resumen_reconstrucciones'):
+        conexion.resumen_reconstrucciones = []
+    return conexion.resumen_reconstrucciones
+
+
+def _en_rango(fecha, rango):
+    fecha_inicio, fecha_fin = (str(limite) if limite else None for limite in rango)
+    fecha = fecha.isoformat()
+    return (fecha_inicio is None or fecha >= fecha_inicio) and (fecha_fin is None or fecha <= fecha_fin)
+
+
+def _sumar_al_confirmar(modelo, campos_clave, aportes):
+    """
+    Aplica `aportes` ({clave: deltas}, la fecha primero en la clave) cuando
+    la transacción actual confirme. Las filas se actualizan en orden de clave
+    para que dos procesos no se bloqueen en cruz. robust=True: la venta ya
+    quedó guardada; un fallo aquí se registra en el log en vez de hacerle
+    creer al cajero que no se guardó.
+    """
+    aportes = {clave: deltas for clave, deltas in aportes.items() if any(deltas.values())}
+    if not aportes:
+        return
+    previas = len(_reconstrucciones())
+
+    def sumar():
+        # Una reconstrucción posterior en la misma transacción (p. ej. al
+        # restaurar una copia) ya contó este cambio en los días que rehízo
+        rangos = _reconstrucciones()[previas:]
+        with transaction.atomic():
+            for clave, deltas in sorted(aportes.items()):
+                if not any(_en_rango(clave[0], rango) for rango in rangos):
+                    _sumar(modelo, dict(zip(campos_clave, clave)), deltas)
+
+    transaction.on_commit(sumar, robust=True)
+
+
+def aplicar_venta(previa, actual):
+    """
+    Pasa el aporte de una venta de `previa` a `actual` (dicts con
+    CAMPOS_VENTA; None si la venta es nueva o se eliminó).
+    """
+    aportes = _combinar([
+        _aporte_venta(previa, -1) if previa else {},
+        _aporte_venta(actual, 1) if actual else {},
+    ])
+    _sumar_al_confirmar(ResumenVentaDiaria, ('fecha', 'estado'), aportes)
+
+
+def aplicar_items(previos, actuales):
+    """
+    Pasa el aporte de ítems de `previos` a `actuales` (listas de dicts con
+    CAMPOS_ITEM, estado y fecha_venta de la venta).
+    """
+    aportes = _combinar(
+        [_aporte_item(item, -1) for item in previos] + [_aporte_item(item, 1) for item in actuales]
+    )
+    _sumar_al_confirmar(
+        ResumenProductoDiario, ('fecha', 'estado', 'producto_id', 'tipo_presentacion'), aportes
+    )
+
+
+def mover_items_venta(venta_id, previa, actual):
+    """Si la venta cambió de día o de estado, sus ítems pasan a las filas nuevas."""
+    if (dia_venta(previa['fecha_venta']), previa['estado']) == (dia_venta(actual['fecha_venta']), actual['estado']):
+        return
+    items = list(VentaItem.objects.filter(venta_id=venta_id).values(*CAMPOS_ITEM))
+    aplicar_items(
+        [dict(item, estado=previa['estado'], fecha_venta=previa['fecha_venta']) for item in items],
+        [dict(item, estado=actual['estado'], fecha_venta=actual['fecha_venta']) for item in items],
+    )
+
+
+# ==================== CONSULTAS ====================
+
+def _filtrar_fechas(filas, fecha_inicio, fecha_fin):
+    if fecha_inicio:
+        filas = filas.filter(fecha__gte=fecha_inicio)
+    if fecha_fin:
+        filas = filas.filter(fecha__lte=fecha_fin)
+    return filas
+
+
+def resumen_ventas(fecha_inicio=None, fecha_fin=None):
+    """
+    Ventas completadas, ingresos y ventas canceladas entre dos días (ambos
+    incluidos; None = sin límite). Una consulta sobre una fila por día y estado.
+    """
+    completadas = Q(estado=ESTADO_VENTA_COMPLETADA)
+    resumen = _filtrar_fechas(ResumenVentaDiaria.objects.all(), fecha_inicio, fecha_fin).aggregate(
+        total_completadas=Sum('ventas', filter=completadas),
+        total_ingresos=Sum('total', filter=completadas),
+        total_canceladas=Sum('ventas', filter=Q(estado=ESTADO_VENTA_CANCELADA)),
+    )
+    return {
+        'total_completadas': resumen['total_completadas'] or 0,
+        'total_ingresos': resumen['total_ingresos'] or CERO,
+        'total_canceladas': resumen['total_canceladas'] or 0,
+    }
+
+
+# ==================== RECONSTRUCCIÓN ====================
+
+# (modelo, campos de la clave, campos sumados) de cada tabla del resumen
+TABLAS = (
+    (ResumenVentaDiaria, ('fecha', 'estado'), ('ventas', 'subtotal', 'iva', 'total')),
+    (ResumenProductoDiario, ('fecha', 'estado', 'producto_id', 'tipo_presentacion'),
+     ('items', 'cantidad', 'subtotal', 'iva', 'total')),
+)
+
+
+def calcular_resumen_historico(fecha_inicio=None, fecha_fin=None):
+    """
+    Calcula el resumen desde Venta y VentaItem, en el mismo orden que TABLAS:
+    ({(fecha, estado): valores}, {(fecha, estado, producto_id, presentación): valores}).
+    """
+    ventas = Venta.objects.filter(**filtro_rango_dias('fecha_venta', fecha_inicio, fecha_fin))
+    items = VentaItem.objects.filter(**filtro_rango_dias('venta__fecha_venta', fecha_inicio, fecha_fin))
+
+    por_dia = {}
+    filas = ventas.annotate(fecha=TruncDate('fecha_venta')).values('fecha', 'estado').annotate(
+        n=Count('id'), suma_subtotal=Sum('subtotal'), suma_iva=Sum('iva_monto'), suma_total=Sum('total'),
+    ).order_by()
+    for fila in filas:
+        por_dia[(fila['fecha'], fila['estado'])] = {
+            'ventas': fila['n'],
+            'subtotal': _decimal(fila['suma_subtotal']),
+            'iva': _decimal(fila['suma_iva']),
+            'total': _decimal(fila['suma_total']),
+        }
+
+    # El IVA por producto se redondea ítem por ítem, así que se suma en Python
+    por_producto = {}
+    valores = items.values(*CAMPOS_ITEM, estado=F('venta__estado'), fecha_venta=F('venta__fecha_venta'))
+    for item in valores.order_by().iterator(chunk_size=2000):
+        _acumular(por_producto, _aporte_item(item, 1))
+    return por_dia, por_producto
+
+
+def _filas_guardadas(modelo, campos_clave, fecha_inicio, fecha_fin):
+    filas = _filtrar_fechas(modelo.objects.all(), fecha_inicio, fecha_fin).order_by()
+    return {tuple(getattr(fila, campo) for campo in campos_clave): fila for fila in filas}
+
+
+def _es_vacia(valores):
+    return not any(valores.values())
+
+
+def verificar_resumen(fecha_inicio=None, fecha_fin=None):
+    """
+    Compara el resumen guardado con el histórico.
+    Retorna una lista de dicts con las diferencias encontradas.
+    """
+    diferencias = []
+    calculados = calcular_resumen_historico(fecha_inicio, fecha_fin)
+    for (modelo, campos_clave, campos), calculado in zip(TABLAS, calculados):
+        guardadas = _filas_guardadas(modelo, campos_clave, fecha_inicio, fecha_fin)
+        for clave in sorted(set(calculado) | set(guardadas)):
+            esperado = calculado.get(clave)
+            fila = guardadas.get(clave)
+            actual = {campo: getattr(fila, campo) for campo in campos} if fila else None
+            # Una fila en cero equivale a que no exista
+            if (esperado is None or _es_vacia(esperado)) and (actual is None or _es_vacia(actual)):
+                continue
+            if esperado != actual:
+                diferencias.append({
+                    'tabla': modelo._meta.verbose_name_plural,
+                    'clave': clave,
+                    'esperado': esperado,
+                    'actual': actual,
+                })
+    return diferencias
+
+
+@transaction.atomic
+def reconstruir_resumen(fecha_inicio=None, fecha_fin=None):
+    """
+    Reescribe el resumen de un rango de días (sin rango, el resumen completo)
+    desde el histórico. Retorna cuántas filas creó, modificó o eliminó.
+    """
+    escritas = 0
+    _reconstrucciones().append((fecha_inicio, fecha_fin))
+    calculados = calcular_resumen_historico(fecha_inicio, fecha_fin)
+    for (modelo, campos_clave, campos), calculado in zip(TABLAS, calculados):
+        guardadas = _filas_guardadas(modelo, campos_clave, fecha_inicio, fecha_fin)
+        nuevas, modificadas, sobrantes = [], [], []
+        for clave, fila in guardadas.items():
+            valores = calculado.pop(clave, None)
+            if valores is None or _es_vacia(valores):
+                sobrantes.append(fila.pk)
+            elif any(getattr(fila, campo) != valor for campo, valor in valores.items()):
+                for campo, valor in valores.items():
+                    setattr(fila, campo, valor)
+                modificadas.append(fila)
+        for clave, valores in calculado.items():
+            if not _es_vacia(valores):
+                nuevas.append(modelo(**dict(zip(campos_clave, clave)), **valores))
+
+        modelo.objects.filter(pk__in=sobrantes).delete()
+        modelo.objects.bulk_create(nuevas, batch_size=500)
+        modelo.objects.bulk_update(modificadas, list(campos), batch_size=500)
+        escritas += len(nuevas) + len(modificadas) + len(sobrantes)
+    return escritas
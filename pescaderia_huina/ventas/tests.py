@@ -1,4 +1,6 @@
-from django.test import TestCase
+import time
+
+from django.test import TestCase, TransactionTestCase
 from django.utils import timezone
 from decimal import Decimal
 from ventas.models import Venta, VentaItem
@@ -208,4 +210,624 @@ class VentaItemTests(TestCase):
             estado='PENDIENTE'
         )
 
-   
\ No newline at end of file
+   
+
+class VentaStockValidacionTests(TestCase):
+    """Tests para la validación de stock de los formularios de venta"""
+
+    def setUp(self):
+        from pedidos.models import Pedido, DetallePedido
+
+        self.proveedor = Proveedor.objects.create(
+            nit="4444444444",
+            nombre_contacto="Proveedor POS",
+            correo="pos@example.com",
+            telefono="3004444444",
+            ciudad="Bogotá",
+        )
+        self.productos = [
+            Producto.objects.create(
+                proveedor=self.proveedor,
+                tipo_producto='PE',
+                nombre=f'Pescado {i}',
+                precio=Decimal('10000.00'),
+                tipo_presentacion='LIB',
+            )
+            for i in range(15)
+        ]
+        pedido = Pedido.objects.create(proveedor=self.proveedor)
+        for producto in self.productos:
+            DetallePedido.objects.create(
+                pedido=pedido, producto=producto, cantidad=Decimal('5'), precio_unitario=Decimal('1000')
+            )
+        pedido.estado = 'REC'
+        pedido.save()
+
+    def _formset(self, cantidades, instance=None):
+        from ventas.forms import VentaItemFormSet
+
+        data = {
+            'items-TOTAL_FORMS': str(len(cantidades)),
+            'items-INITIAL_FORMS': '0',
+            'items-MIN_NUM_FORMS': '1',
+            'items-MAX_NUM_FORMS': '1000',
+        }
+        for i, (producto, cantidad) in enumerate(cantidades):
+            data.update({
+                f'items-{i}-producto': str(producto.id),
+                f'items-{i}-tipo_presentacion': 'POR_LIBRA',
+                f'items-{i}-cantidad': str(cantidad),
+                f'items-{i}-precio_unitario': '10000',
+            })
+        formset = VentaItemFormSet(data, instance=instance or Venta())
+        self.assertTrue(formset.is_valid(), formset.errors)
+        return formset
+
+    def test_validacion_de_quince_productos_en_una_consulta(self):
+        """El stock de todo el ticket se resuelve con una sola consulta"""
+        from ventas.views import _validar_stock_disponible
+
+        formset = self._formset([(p, 2) for p in self.productos])
+        with self.assertNumQueries(1):
+            self.assertTrue(_validar_stock_disponible(formset))
+
+    def test_stock_insuficiente_agrega_error(self):
+        """Pedir más de lo disponible marca error en la fila"""
+        from ventas.views import _validar_stock_disponible
+
+        formset = self._formset([(self.productos[0], 3), (self.productos[0], 3)])
+        self.assertFalse(_validar_stock_disponible(formset))
+        self.assertIn('Stock insuficiente', str(formset.forms[0].errors))
+
+    def test_producto_inactivo_no_disponible(self):
+        """Un producto desactivado después de cargar el formulario no se puede vender"""
+        from ventas.views import _validar_stock_disponible
+
+        formset = self._formset([(self.productos[1], 1)])
+        Producto.objects.filter(id=self.productos[1].id).update(estado=False)
+        self.assertFalse(_validar_stock_disponible(formset))
+        self.assertIn('no está disponible', str(formset.forms[0].errors))
+
+
+class VentaResumenDiarioTests(TestCase):
+    """El resumen diario sigue a las ventas sin recorrer la tabla de ventas"""
+
+    def setUp(self):
+        proveedor = Proveedor.objects.create(
+            nit="7777777777",
+            nombre_contacto="Proveedor Resumen",
+            correo="resumen@example.com",
+            telefono="3007777777",
+            ciudad="Bogotá",
+        )
+        self.producto = Producto.objects.create(
+            proveedor=proveedor,
+            tipo_producto='PE',
+            nombre='Tilapia',
+            precio=Decimal('12000.00'),
+            tipo_presentacion='LIB',
+        )
+
+    def _crear_venta(self, cantidades, fecha_venta=None):
+        # El resumen se actualiza al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            venta = Venta.objects.create(nombre_cliente='Cliente resumen', fecha_venta=fecha_venta or timezone.now())
+            for cantidad in cantidades:
+                VentaItem.objects.create(
+                    venta=venta, producto=self.producto, tipo_presentacion='POR_LIBRA',
+                    cantidad=Decimal(cantidad), precio_unitario=Decimal('10000'),
+                )
+            venta.recalcular_totales()
+        return venta
+
+    def test_alta_y_cancelacion_actualizan_resumen(self):
+        from ventas import resumen
+        from ventas.models import ResumenProductoDiario
+
+        self._crear_venta(['1', '2'])
+        venta = self._crear_venta(['1.5'])
+
+        totales = resumen.resumen_ventas()
+        self.assertEqual(totales['total_completadas'], 2)
+        self.assertEqual(totales['total_ingresos'], Decimal('53550.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            venta.estado = 'CANCELADA'
+            venta.save(update_fields=['estado'])
+
+        totales = resumen.resumen_ventas()
+        self.assertEqual(totales['total_completadas'], 1)
+        self.assertEqual(totales['total_canceladas'], 1)
+        self.assertEqual(totales['total_ingresos'], Decimal('35700.00'))
+        completados = ResumenProductoDiario.objects.get(estado='COMPLETADA')
+        self.assertEqual((completados.items, completados.cantidad), (2, Decimal('3.00')))
+        self.assertEqual(resumen.verificar_resumen(), [])
+
+    def test_resumen_por_rango_de_dias(self):
+        from ventas import resumen
+
+        hoy = timezone.localdate()
+        self._crear_venta(['1'])
+        self._crear_venta(['2'], fecha_venta=timezone.now() - timezone.timedelta(days=3))
+
+        self.assertEqual(resumen.resumen_ventas(hoy, hoy)['total_completadas'], 1)
+        self.assertEqual(resumen.resumen_ventas(fecha_fin=hoy - timezone.timedelta(days=1))['total_ingresos'],
+                         Decimal('23800.00'))
+
+    def test_editar_y_eliminar_items(self):
+        from ventas import resumen
+
+        venta = self._crear_venta(['1', '2'])
+        with self.captureOnCommitCallbacks(execute=True):
+            item = venta.items.first()
+            item.cantidad = Decimal('4')
+            item.save()
+            venta.items.last().delete()
+            venta.recalcular_totales()
+        self.assertEqual(resumen.verificar_resumen(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            venta.delete()
+        self.assertEqual(resumen.resumen_ventas()['total_completadas'], 0)
+        self.assertEqual(resumen.verificar_resumen(), [])
+
+    def test_resumen_se_aplica_al_confirmar(self):
+        """La fila del día no se toca dentro de la transacción de la venta, y un rollback no aplica nada"""
+        from django.db import transaction
+
+        from ventas import resumen
+        from ventas.models import ResumenVentaDiaria
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Venta.objects.create(nombre_cliente='Cliente resumen', total=Decimal('1000'))
+            self.assertFalse(ResumenVentaDiaria.objects.exists())
+        self.assertEqual(resumen.resumen_ventas()['total_ingresos'], Decimal('1000'))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                Venta.objects.create(nombre_cliente='Revertida', total=Decimal('500'))
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(resumen.resumen_ventas()['total_completadas'], 1)
+
+    def test_reconstruir_resumen_corrige_diferencias(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        from ventas import resumen
+        from ventas.models import ResumenVentaDiaria
+
+        self._crear_venta(['1'])
+        ResumenVentaDiaria.objects.update(ventas=7)
+        self.assertEqual(len(resumen.verificar_resumen()), 1)
+
+        call_command('reconstruir_resumen_ventas', stdout=StringIO())
+        self.assertEqual(resumen.verificar_resumen(), [])
+        self.assertEqual(resumen.resumen_ventas()['total_completadas'], 1)
+
+
+class VentaConcurrenciaStockTests(TransactionTestCase):
+    """Prueba de estrés: cientos de ventas simultáneas sobre el mismo stock"""
+
+    HILOS = 16
+    VENTAS = 320
+    STOCK_INICIAL = Decimal('100')
+
+    def setUp(self):
+        from pedidos.models import Pedido, DetallePedido
+
+        self.proveedor = Proveedor.objects.create(
+            nit="3333333333",
+            nombre_contacto="Proveedor Concurrencia",
+            correo="concurrencia@example.com",
+            telefono="3003333333",
+            ciudad="Bogotá",
+        )
+        self.producto = Producto.objects.create(
+            proveedor=self.proveedor,
+            tipo_producto='PE',
+            nombre='Pargo',
+            precio=Decimal('30000.00'),
+            tipo_presentacion='LIB',
+        )
+        pedido = Pedido.objects.create(proveedor=self.proveedor)
+        DetallePedido.objects.create(
+            pedido=pedido, producto=self.producto,
+            cantidad=self.STOCK_INICIAL, precio_unitario=Decimal('1000'),
+        )
+        pedido.estado = 'REC'
+        pedido.save()
+
+    def _vender_una_libra(self):
+        """Registra una venta como VentaCreateView; reintenta si SQLite reporta bloqueo."""
+        from django.db import OperationalError, transaction
+        from productos import stock
+
+        while True:
+            try:
+                with transaction.atomic(), stock.control_estricto():
+                    venta = Venta.objects.create(nombre_cliente='Cliente concurrente')
+                    VentaItem.objects.create(
+                        venta=venta, producto=self.producto, tipo_presentacion='POR_LIBRA',
+                        cantidad=Decimal('1'), precio_unitario=Decimal('30000'),
+                    )
+                return True
+            except stock.StockInsuficiente:
+                return False
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                time.sleep(0.001)
+
+    def _trabajador(self, ventas):
+        from django.db import connection
+
+        try:
+            return [self._vender_una_libra() for _ in range(ventas)]
+        finally:
+            connection.close()
+
+    def test_ventas_concurrentes_no_dejan_stock_negativo(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from productos import stock
+
+        por_hilo = self.VENTAS // self.HILOS
+        with ThreadPoolExecutor(max_workers=self.HILOS) as pool:
+            resultados = [
+                ok
+                for lote in pool.map(self._trabajador, [por_hilo] * self.HILOS)
+                for ok in lote
+            ]
+
+        exitosas = sum(resultados)
+        fila = stock.obtener_stock_productos([self.producto.id])[self.producto.id]
+        self.assertEqual(exitosas, int(self.STOCK_INICIAL))
+        self.assertEqual(fila.disponible, Decimal('0'))
+        self.assertEqual(
+            Venta.objects.filter(estado='COMPLETADA', items__producto=self.producto).count(),
+            exitosas,
+        )
+        self.assertEqual(stock.verificar_stock(), [])
+
+    def _cajero(self, cliente):
+        """Vende por VentaCreateView de a una libra hasta que la vista rechaza la venta."""
+        from django.db import OperationalError, connection
+        from django.urls import reverse
+
+        datos = {
+            'nombre_cliente': 'Cliente concurrente',
+            'items-TOTAL_FORMS': '1',
+            'items-INITIAL_FORMS': '0',
+            'items-MIN_NUM_FORMS': '1',
+            'items-MAX_NUM_FORMS': '1000',
+            'items-0-producto': str(self.producto.id),
+            'items-0-tipo_presentacion': 'POR_LIBRA',
+            'items-0-cantidad': '1',
+            'items-0-precio_unitario': '30000',
+        }
+        try:
+            while True:
+                try:
+                    response = cliente.post(reverse('ventas:crear_venta'), datos)
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    time.sleep(0.001)
+                    continue
+                if response.status_code != 302:
+                    return response
+        finally:
+            connection.close()
+
+    def test_ventas_concurrentes_por_la_vista(self):
+        """Varios cajeros en VentaCreateView (validación con bloqueo, save y descuento) venden solo lo que hay"""
+        from concurrent.futures import ThreadPoolExecutor
+        from django.contrib.auth.models import User
+        from django.test import Client
+        from core.middleware import CLAVE_RENOVADA
+        from productos import stock
+
+        usuario = User.objects.create_user(username='cajero', password='Clave12345')
+        clientes = []
+        for _ in range(8):
+            cliente = Client()
+            cliente.force_login(usuario)
+            # Sesión recién renovada: durante las ventas no se vuelve a escribir
+            # (un UPDATE de la sesión bloqueado en SQLite respondería 400)
+            sesion = cliente.session
+            sesion[CLAVE_RENOVADA] = int(time.time())
+            sesion.save()
+            clientes.append(cliente)
+
+        with ThreadPoolExecutor(max_workers=len(clientes)) as pool:
+            rechazos = list(pool.map(self._cajero, clientes))
+
+        # Cada cajero terminó porque la vista rechazó la venta por falta de stock
+        for response in rechazos:
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(
+                'No hay stock suficiente para uno o más productos.',
+                [str(mensaje) for mensaje in response.context['messages']],
+            )
+        vendidas = VentaItem.objects.filter(producto=self.producto, venta__estado='COMPLETADA')
+        self.assertEqual(vendidas.count(), int(self.STOCK_INICIAL))
+        self.assertEqual(Venta.objects.filter(estado='COMPLETADA').count(), int(self.STOCK_INICIAL))
+        fila = stock.obtener_stock_productos([self.producto.id])[self.producto.id]
+        self.assertEqual(fila.disponible, Decimal('0'))
+        self.assertEqual(stock.verificar_stock(), [])
+
+
+class VentaExportarExcelTests(TestCase):
+    """Tests para la exportación de ventas a Excel"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        self.user = User.objects.create_user(username='cajero', password='Clave12345')
+        self.proveedor = Proveedor.objects.create(
+            nit="5555555555",
+            nombre_contacto="Proveedor Excel",
+            correo="excel@example.com",
+            telefono="3005555555",
+            ciudad="Bogotá",
+        )
+        self.producto = Producto.objects.create(
+            proveedor=self.proveedor,
+            tipo_producto='PE',
+            nombre='Bagre',
+            precio=Decimal('20000.00'),
+            tipo_presentacion='LIB',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                venta = Venta.objects.create(
+                    nombre_cliente=f'Cliente {i}',
+                    estado='CANCELADA' if i == 0 else 'COMPLETADA',
+                )
+                VentaItem.objects.create(
+                    venta=venta,
+                    producto=self.producto,
+                    tipo_presentacion='POR_LIBRA',
+                    cantidad=Decimal('2'),
+                    precio_unitario=Decimal('20000.00'),
+                )
+
+    def test_excel_conserva_formato(self):
+        """El libro generado en modo write-only conserva el formato del reporte"""
+        from io import BytesIO
+
+        import openpyxl
+        from django.urls import reverse
+
+        self.client.login(username='cajero', password='Clave12345')
+        response = self.client.get(reverse('ventas:exportar_excel'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ventas_pescaderia_huina.xlsx', response['Content-Disposition'])
+
+        ws = openpyxl.load_workbook(BytesIO(response.getvalue())).active
+        self.assertIn('A1:I1', ws.merged_cells)
+        self.assertEqual(ws['A2'].value, 'Ventas Completadas: 2')
+        self.assertEqual(ws.max_row, 6)
+        self.assertEqual(ws.freeze_panes, 'A4')
+        self.assertEqual(ws['D4'].value, 'Bagre x2.00 @ $20000.00')
+        self.assertEqual(ws['E4'].number_format, '$#,##0.00')
+
+
+class VentaReportesConsultasTests(TestCase):
+    """Los reportes de ventas hacen un número fijo de consultas"""
+
+    TOTAL_VENTAS = 500
+
+    def setUp(self):
+        proveedor = Proveedor.objects.create(
+            nit="6666666666",
+            nombre_contacto="Proveedor Reportes",
+            correo="reportes@example.com",
+            telefono="3006666666",
+            ciudad="Bogotá",
+        )
+        productos = [
+            Producto.objects.create(
+                proveedor=proveedor,
+                tipo_producto='PE',
+                nombre=f'Pescado {i}',
+                precio=Decimal('10000.00'),
+                tipo_presentacion='LIB',
+            )
+            for i in range(5)
+        ]
+        # La mitad son ventas heredadas de un solo producto (sin items)
+        ventas = Venta.objects.bulk_create([
+            Venta(
+                nombre_cliente=f'Cliente {i}',
+                producto=productos[i % 5] if i % 2 else None,
+                subtotal=Decimal('10000.00'),
+                iva_monto=Decimal('1900.00'),
+                total=Decimal('11900.00'),
+                estado='CANCELADA' if i % 10 == 0 else 'COMPLETADA',
+            )
+            for i in range(self.TOTAL_VENTAS)
+        ])
+        VentaItem.objects.bulk_create([
+            VentaItem(
+                venta=venta,
+                producto=productos[(i + j) % 5],
+                tipo_presentacion='POR_LIBRA',
+                cantidad=Decimal('1'),
+                precio_unitario=Decimal('5000.00'),
+                subtotal=Decimal('5000.00'),
+            )
+            for i, venta in enumerate(ventas) if i % 2 == 0
+            for j in range(2)
+        ])
+
+    def test_exportar_excel_consultas_constantes(self):
+        """Resumen + ventas + items + productos, sin importar cuántas ventas haya"""
+        from ventas.views import libro_excel_ventas
+
+        with self.assertNumQueries(4):
+            contenido, _, _ = libro_excel_ventas().archivo()
+        self.assertEqual(contenido.read(2), b'PK')
+
+    def test_exportar_pdf_consultas_constantes(self):
+        """La plantilla del PDF no dispara consultas por fila"""
+        from django.template.loader import get_template
+
+        from ventas.views import datos_pdf_ventas
+
+        with self.assertNumQueries(4):
+            plantilla, contexto, _ = datos_pdf_ventas({})
+            html = get_template(plantilla).render(contexto)
+        self.assertIn('Pescado 1', html)
+        self.assertEqual(html.count('class="fila-cancelada"'), self.TOTAL_VENTAS // 10)
+
+
+class CatalogoProductosTests(TestCase):
+    """El autocompletado y el precio del POS salen del catálogo en memoria"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        User.objects.create_user(username='cajero', password='Clave12345')
+        self.client.login(username='cajero', password='Clave12345')
+        proveedor = Proveedor.objects.create(
+            nit="7777777777",
+            nombre_contacto="Proveedor Catálogo",
+            correo="catalogo@example.com",
+            telefono="3007777777",
+            ciudad="Bogotá",
+        )
+        datos = [
+            ('Filete de Salmón', 'PE', True),
+            ('Salmón', 'PE', True),
+            ('Salmón Ahumado', 'PE', False),
+            ('Camarón', 'MA', True),
+        ]
+        self.productos = {
+            nombre: Producto.objects.create(
+                proveedor=proveedor,
+                tipo_producto=tipo,
+                nombre=nombre,
+                precio=Decimal('30000.00'),
+                tipo_presentacion='LIB',
+                estado=activo,
+            )
+            for nombre, tipo, activo in datos
+        }
+
+    def _buscar(self, **params):
+        from django.urls import reverse
+
+        response = self.client.get(reverse('ventas:buscar_productos_api'), params)
+        return [p['nombre'] for p in response.json()['productos']]
+
+    def test_busqueda_sin_consultar_productos(self):
+        """Sin tildes, activos, primero los que empiezan por el texto; solo se lee la versión"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._buscar(q='x')  # construye el catálogo
+        with CaptureQueriesContext(connection) as consultas:
+            nombres = self._buscar(q='SALMON')
+        self.assertFalse([c for c in consultas.captured_queries if 'productos_producto' in c['sql']])
+        self.assertEqual(nombres, ['Salmón', 'Filete de Salmón'])
+        self.assertEqual(self._buscar(q='', tipo='MA'), ['Camarón'])
+
+    def test_guardar_producto_actualiza_catalogo(self):
+        from django.urls import reverse
+
+        producto = self.productos['Camarón']
+        self._buscar(q='camaron')
+        producto.precio = Decimal('45000.00')
+        producto.save()
+        response = self.client.get(reverse('ventas:precio_producto_api', args=[producto.id]))
+        self.assertEqual(response.json()['precio'], '45000.00')
+
+        inactivo = self.productos['Salmón Ahumado']
+        response = self.client.get(reverse('ventas:precio_producto_api', args=[inactivo.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_precio_sin_fila_en_libro_usa_historico(self):
+        """Un producto sin fila en el libro de stock reporta lo recibido, no 0"""
+        from django.urls import reverse
+        from pedidos.models import Pedido, DetallePedido
+        from productos.models import StockProducto
+
+        producto = self.productos['Camarón']
+        pedido = Pedido.objects.create(proveedor=producto.proveedor)
+        DetallePedido.objects.create(
+            pedido=pedido, producto=producto, cantidad=Decimal('7'), precio_unitario=Decimal('1000')
+        )
+        pedido.estado = 'REC'
+        pedido.save()
+        StockProducto.objects.filter(producto=producto).delete()
+
+        response = self.client.get(reverse('ventas:precio_producto_api', args=[producto.id]))
+        self.assertEqual(Decimal(response.json()['stock']), Decimal('7'))
+        self.assertEqual(Decimal(response.json()['stock']), producto.stock)
+
+    def test_catalogo_con_etag(self):
+        from django.urls import reverse
+
+        url = reverse('ventas:catalogo_productos_api')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        self.assertEqual(datos['campos'], ['id', 'nombre', 'tipo', 'precio', 'presentacion'])
+        self.assertEqual(len(datos['productos']), 3)
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        producto = self.productos['Camarón']
+        producto.nombre = 'Camarón Tigre'
+        producto.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class VentaBusquedaListaTests(TestCase):
+    """La búsqueda por producto de la lista de ventas deja una fila por venta"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        User.objects.create_user(username='cajero', password='Clave12345')
+        self.client.login(username='cajero', password='Clave12345')
+        proveedor = Proveedor.objects.create(
+            nit="8888888880",
+            nombre_contacto="Proveedor Búsqueda",
+            correo="busqueda@example.com",
+            telefono="3008888880",
+            ciudad="Bogotá",
+        )
+        productos = [
+            Producto.objects.create(
+                proveedor=proveedor, tipo_producto='PE', nombre=nombre,
+                precio=Decimal('10000.00'), tipo_presentacion='LIB',
+            )
+            for nombre in ('Trucha Arcoíris', 'Trucha Salmonada', 'Bagre')
+        ]
+        for i in range(5):
+            venta = Venta.objects.create(nombre_cliente=f'Cliente {i}')
+            for producto in productos:
+                VentaItem.objects.create(
+                    venta=venta, producto=producto, tipo_presentacion='POR_LIBRA',
+                    cantidad=Decimal('1'), precio_unitario=Decimal('10000.00'),
+                )
+
+    def test_una_fila_por_venta_con_exists(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.urls import reverse
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('ventas:lista_ventas'), {'buscar': 'trucha'})
+        ventas = list(response.context['lista_ventas'])
+        self.assertEqual(len(ventas), 5)
+        self.assertEqual(len({v.id for v in ventas}), 5)
+
+        listado = [c['sql'] for c in consultas.captured_queries if c['sql'].startswith('SELECT "ventas_venta"."id"')]
+        self.assertTrue(listado)
+        self.assertIn('EXISTS', listado[-1].upper())
+        self.assertNotIn('DISTINCT', listado[-1].upper())
@@ -12,5 +12,6 @@ urlpatterns = [
     path('exportar/pdf/', views.exportar_pdf, name='exportar_pdf'),
     path('exportar/excel/', views.exportar_excel, name='exportar_excel'),
     path('api/productos/buscar/', views.buscar_productos_api, name='buscar_productos_api'),
+    path('api/productos/catalogo/', views.catalogo_productos_api, name='catalogo_productos_api'),
     path('api/producto/<int:producto_id>/precio/', views.precio_producto_api, name='precio_producto_api'),
 ]
\ No newline at end of file
@@ -1,21 +1,29 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.views import generic
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q, Sum
+from django.db.models import Sum
 from django.db import transaction
 from django.utils import timezone
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 from decimal import Decimal
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.styles import Font, Alignment
 
 from .models import Venta, VentaItem
+from . import resumen
 from .forms import VentaForm, VentaItemFormSet, CancelarVentaForm, BusquedaVentaForm
-from productos.models import Producto
+from productos import catalogo, stock
+from core import busqueda, reportes
+from core.fechas import filtro_rango_dias
+from core.paginacion import paginar
+from core.excel import (
+    ExportadorExcel, CHUNK_SIZE, AZUL_OSCURO, VERDE, GRIS_CLARO,
+    ALINEACION_CENTRO, ALINEACION_IZQUIERDA, ALINEACION_DERECHA, BORDE_GRIS,
+)
 
 
 def _formatear_numero_alerta(valor):
@@ -52,35 +60,39 @@ def _acumular_cantidades_formset(item_formset):
 
 def _cantidades_actuales_venta(venta):
     """Obtiene cantidades actuales de una venta por producto para recalcular stock al editar."""
-    actuales = {}
-    if not venta:
-        return actuales
+    if not venta or venta.estado != 'COMPLETADA':
+        # Solo los ítems de ventas completadas están descontados del stock
+        return {}
 
-    for item in venta.items.select_related('producto').all():
-        actuales[item.producto_id] = actuales.get(item.producto_id, Decimal('0')) + Decimal(str(item.cantidad))
-
-    return actuales
+    return {
+        fila['producto_id']: Decimal(str(fila['total']))
+        for fila in venta.items.values('producto_id').annotate(total=Sum('cantidad')).order_by()
+    }
 
 
-def _validar_stock_disponible(item_formset, venta_actual=None):
+def _validar_stock_disponible(item_formset, venta_actual=None, bloquear=False):
     """
     Valida que cada producto tenga stock POSITIVO y suficiente.
     No permite vender productos con stock negativo o insuficiente.
+
+    El stock de todos los productos del formset se resuelve en una sola
+    consulta al libro de stock (con FOR UPDATE si `bloquear`).
     """
     solicitadas, formularios_por_producto = _acumular_cantidades_formset(item_formset)
     cantidades_actuales = _cantidades_actuales_venta(venta_actual)
+    stock_por_producto = stock.obtener_stock_productos(solicitadas.keys(), bloquear=bloquear)
     hay_error = False
 
     for producto_id, cantidad_solicitada in solicitadas.items():
-        producto = Producto.objects.filter(id=producto_id, estado=True).first()
-        if not producto:
+        fila_stock = stock_por_producto.get(producto_id)
+        if not fila_stock:
             for item_form in formularios_por_producto.get(producto_id, []):
                 item_form.add_error('producto', 'El producto no está disponible.')
             hay_error = True
             continue
 
-        # Obtener stock disponible usando la propiedad del modelo
-        stock_disponible = producto.stock
+        producto = fila_stock.producto
+        stock_disponible = fila_stock.disponible
         
         # Si es edición, restar las cantidades antiguas para permitir cambios sin penalidad
         cantidad_antigua = cantidades_actuales.get(producto_id, Decimal('0'))
@@ -110,30 +122,63 @@ def _validar_stock_disponible(item_formset, venta_actual=None):
     return not hay_error
 
 
+def _marcar_stock_insuficiente(item_formset, error):
+    """
+    Marca las filas del producto que otra venta simultánea dejó sin stock.
+    La transacción se revirtió, así que los ítems nuevos vuelven a no tener id.
+    """
+    for item_form in item_formset.extra_forms:
+        item_form.instance.pk = None
+        item_form.instance._state.adding = True
+
+    _, formularios_por_producto = _acumular_cantidades_formset(item_formset)
+    for item_form in formularios_por_producto.get(error.producto_id, []):
+        item_form.add_error(
+            'cantidad',
+            '⚠️ El stock de este producto cambió mientras se registraba la venta. '
+            'Verifique la cantidad disponible.'
+        )
+
+
 @login_required
 def buscar_productos_api(request):
     q = request.GET.get('q', '')
     tipo = request.GET.get('tipo', '')   
-    productos = Producto.objects.filter(estado=True).select_related('proveedor')
-    if tipo:
-        productos = productos.filter(tipo_producto=tipo)
-    if q:
-        productos = productos.filter(nombre__icontains=q)
+    # Desde el catálogo en memoria: ninguna consulta por tecla salvo la versión
     data = [
         {'id': p.id, 'nombre': p.nombre, 'precio': str(p.precio)}
-        for p in productos[:20]
+        for p in catalogo.obtener_catalogo().buscar(q, tipo=tipo, limite=20)
     ]
     return JsonResponse({'productos': data})
 
 @login_required
 def precio_producto_api(request, producto_id):
-    producto = get_object_or_404(Producto, id=producto_id, estado=True)
+    producto = catalogo.obtener_catalogo().obtener(producto_id)
+    if producto is None:
+        raise Http404('Producto no encontrado')
+    # El stock cambia con cada venta: se lee del libro de stock, no del catálogo.
+    # Si el producto no tiene fila, obtener_stock_productos la calcula del
+    # histórico; sin fila queda solo un producto desactivado, que no se vende.
+    fila = stock.obtener_stock_productos([producto_id]).get(producto_id)
     return JsonResponse({
         'precio': str(producto.precio), 
         'nombre': producto.nombre, 
-        'stock': str(producto.stock)  # Usar la propiedad stock real
+        'stock': str(fila.disponible if fila else 0)
     })
 
+@login_required
+@condition(etag_func=lambda request: catalogo.obtener_catalogo().etag)
+def catalogo_productos_api(request):
+    """
+    Catálogo completo de productos activos en formato compacto, para que el
+    formulario de ventas busque en el navegador. Con If-None-Match y el
+    mismo ETag responde 304 sin cuerpo.
+    """
+    respuesta = HttpResponse(catalogo.obtener_catalogo().json, content_type='application/json')
+    # El navegador puede guardarlo, pero revalida (ETag) antes de reutilizarlo
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
 
 @login_required
 def ventas(request):
@@ -147,28 +192,19 @@ def ventas(request):
         if estado:
             lista_ventas = lista_ventas.filter(estado=estado)
         if buscar:
-            lista_ventas = lista_ventas.filter(
-                Q(nombre_cliente__icontains=buscar) |
-                Q(documento_cliente__icontains=buscar) |
-                Q(items__producto__nombre__icontains=buscar)
-            ).distinct()
-        if fecha_inicio:
-             lista_ventas = lista_ventas.filter(fecha_venta__date__gte=fecha_inicio)
-        if fecha_fin:
-             lista_ventas = lista_ventas.filter(fecha_venta__date__lte=fecha_fin)
-
-    total_ventas = Venta.objects.filter(estado='COMPLETADA').count()
-    total_ingresos = Venta.objects.filter(estado='COMPLETADA').aggregate(total=Sum('total'))['total'] or 0
-
-    # OPTIMIZACIÓN: Paginación para no cargar todas las ventas
-    paginator = Paginator(lista_ventas, 20)
-    page = request.GET.get('page', 1)
-    try:
-        lista_ventas = paginator.page(page)
-    except PageNotAnInteger:
-        lista_ventas = paginator.page(1)
-    except EmptyPage:
-        lista_ventas = paginator.page(paginator.num_pages)
+            lista_ventas = busqueda.filtrar(
+                lista_ventas, buscar, ['nombre_cliente', 'documento_cliente', 'items__producto__nombre']
+            )
+        # Rango de instantes y no fecha_venta__date: así se usa el índice de fecha_venta
+        lista_ventas = lista_ventas.filter(**filtro_rango_dias('fecha_venta', fecha_inicio, fecha_fin))
+
+    # Totales desde el resumen diario: una fila por día, no una por venta
+    totales = resumen.resumen_ventas()
+    total_ventas = totales['total_completadas']
+    total_ingresos = totales['total_ingresos']
+
+    # OPTIMIZACIÓN: Paginación por cursor sobre (fecha_venta, id) cuando hay muchas ventas
+    lista_ventas = paginar(request, lista_ventas, 20, ('-fecha_venta', '-id'))
 
     context = {
         'lista_ventas': lista_ventas,
@@ -205,19 +241,28 @@ class VentaCreateView(LoginRequiredMixin, generic.CreateView):
         if not item_formset.is_valid():
             messages.error(self.request, 'Corrija los errores en los productos.')
             return self.render_to_response(context)
-        if not _validar_stock_disponible(item_formset):
+        # Validación y descuento en la misma transacción: las filas de stock quedan
+        # bloqueadas y cada descuento es condicional, así dos cajeros no venden lo mismo.
+        try:
+            with transaction.atomic(), stock.control_estricto():
+                if not _validar_stock_disponible(item_formset, bloquear=True):
+                    messages.error(self.request, 'No hay stock suficiente para uno o más productos.')
+                    return self.render_to_response(context)
+                venta = form.save()
+                items = item_formset.save(commit=False)
+                for item in items:
+                    item.venta = venta
+                    item.save()
+                for obj in item_formset.deleted_objects:
+                    obj.delete()
+                venta.recalcular_totales()
+        except stock.StockInsuficiente as error:
+            form.instance.pk = None
+            form.instance._state.adding = True
+            _marcar_stock_insuficiente(item_formset, error)
             messages.error(self.request, 'No hay stock suficiente para uno o más productos.')
             return self.render_to_response(context)
-        with transaction.atomic():
-            venta = form.save()
-            items = item_formset.save(commit=False)
-            for item in items:
-                item.venta = venta
-                item.save()
-            for obj in item_formset.deleted_objects:
-                obj.delete()
-            venta.recalcular_totales()
-            messages.success(self.request, f'Venta {venta.id} registrada. Total: ${venta.total:,.2f}')
+        messages.success(self.request, f'Venta {venta.id} registrada. Total: ${venta.total:,.2f}')
         return redirect(self.success_url)
 
     def form_invalid(self, form):
@@ -253,22 +298,27 @@ class VentaUpdateView(LoginRequiredMixin, generic.UpdateView):
         if not item_formset.is_valid():
             messages.error(self.request, 'Corrija los errores en los productos.')
             return self.render_to_response(context)
-        if not _validar_stock_disponible(item_formset, venta_actual=self.object):
+        try:
+            with transaction.atomic(), stock.control_estricto():
+                if not _validar_stock_disponible(item_formset, venta_actual=self.object, bloquear=True):
+                    messages.error(self.request, 'No hay stock suficiente para guardar los cambios de la venta.')
+                    return self.render_to_response(context)
+
+                venta = form.save()
+                items = item_formset.save(commit=False)
+                for obj in item_formset.deleted_objects:
+                    obj.delete()
+
+                for item in items:
+                    item.venta = venta
+                    item.save()
+
+                venta.recalcular_totales()
+        except stock.StockInsuficiente as error:
+            _marcar_stock_insuficiente(item_formset, error)
             messages.error(self.request, 'No hay stock suficiente para guardar los cambios de la venta.')
             return self.render_to_response(context)
-
-        with transaction.atomic():
-            venta = form.save()
-            items = item_formset.save(commit=False)
-            for obj in item_formset.deleted_objects:
-                obj.delete()
-
-            for item in items:
-                item.venta = venta
-                item.save()
-
-            venta.recalcular_totales()
-            messages.success(self.request, f'Venta {venta.id} actualizada exitosamente.')
+        messages.success(self.request, f'Venta {venta.id} actualizada exitosamente.')
         return redirect(self.success_url)
 
     def form_invalid(self, form):
@@ -307,177 +357,146 @@ class VentaCancelarView(LoginRequiredMixin, generic.FormView):
         return super().form_valid(form)
 
 
+def _ventas_para_reporte(fecha_inicio, fecha_fin, estado):
+    """
+    Ventas para los reportes Excel/PDF con todo lo que muestra cada fila ya
+    cargado: producto heredado (ventas de un solo producto) por JOIN e items
+    con su producto por prefetch. El número de consultas no depende de las filas.
+    """
+    ventas_qs = Venta.objects.select_related('producto').prefetch_related('items__producto').filter(
+        **filtro_rango_dias('fecha_venta', fecha_inicio, fecha_fin)
+    )
+    if estado:
+        ventas_qs = ventas_qs.filter(estado=estado)
+    return ventas_qs
+
+
+def _resumen_ventas_reporte(fecha_inicio, fecha_fin):
+    """Totales del encabezado de los reportes, leídos del resumen diario."""
+    return resumen.resumen_ventas(fecha_inicio, fecha_fin)
+
+
 @login_required
 def exportar_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Ventas"
-
-    azul_oscuro = "0A3D62"
-    verde = "198754"
-    gris_claro = "F2F2F2"
-
-    header_font = Font(bold=True, color="FFFFFF", size=10)
-    header_fill = PatternFill(start_color=azul_oscuro, end_color=azul_oscuro, fill_type="solid")
-    center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    left_align = Alignment(horizontal='left', vertical='center', wrap_text=True)
-    right_align = Alignment(horizontal='right', vertical='center')
-    thin_border = Border(
-        left=Side(style='thin', color='CCCCCC'),
-        right=Side(style='thin', color='CCCCCC'),
-        top=Side(style='thin', color='CCCCCC'),
-        bottom=Side(style='thin', color='CCCCCC'),
+    filtros = {
+        'fecha_inicio': request.GET.get('fecha_inicio'),
+        'fecha_fin':    request.GET.get('fecha_fin'),
+        'estado':       request.GET.get('estado'),
+    }
+    return reportes.respuesta_cacheada(
+        request, 'ventas_excel', filtros, lambda: libro_excel_ventas(**filtros).archivo()
     )
 
+
+def libro_excel_ventas(fecha_inicio=None, fecha_fin=None, estado=None):
+    """Arma el Excel de ventas con los filtros de la lista."""
+    excel = ExportadorExcel('Ventas', 'ventas_pescaderia_huina.xlsx')
+
+    # Estilos con nombre: se crean una vez y las celdas solo los referencian
+    excel.estilo('titulo', fuente=Font(bold=True, color="FFFFFF", size=13), fondo=AZUL_OSCURO,
+                 alineacion=Alignment(horizontal='center', vertical='center'))
+    excel.estilo('resumen', fuente=Font(bold=True, size=10), fondo="E8F4F8", alineacion=ALINEACION_CENTRO)
+    excel.estilo('resumen_verde', fuente=Font(bold=True, size=10, color=VERDE), fondo="E8F4F8",
+                 alineacion=ALINEACION_CENTRO)
+    excel.estilo('encabezado', fuente=Font(bold=True, color="FFFFFF", size=10), fondo=AZUL_OSCURO,
+                 alineacion=ALINEACION_CENTRO, borde=BORDE_GRIS)
+    fondos = {'': None, 'gris': GRIS_CLARO, 'cancelada': "FFE0E0"}
+    fuentes_estado = {
+        'COMPLETADA': Font(bold=True, color=VERDE),
+        'CANCELADA': Font(bold=True, color="DC2626"),
+    }
+    for sufijo, fondo in fondos.items():
+        excel.estilo(f'centro{sufijo}', fondo=fondo, alineacion=ALINEACION_CENTRO, borde=BORDE_GRIS)
+        excel.estilo(f'izquierda{sufijo}', fondo=fondo, alineacion=ALINEACION_IZQUIERDA, borde=BORDE_GRIS)
+        excel.estilo(f'moneda{sufijo}', fondo=fondo, alineacion=ALINEACION_DERECHA, borde=BORDE_GRIS,
+                     formato='$#,##0.00')
+        for nombre_estado, fuente in fuentes_estado.items():
+            excel.estilo(f'estado_{nombre_estado}{sufijo}', fuente=fuente, fondo=fondo,
+                         alineacion=ALINEACION_CENTRO, borde=BORDE_GRIS)
+
+    excel.anchos([7, 25, 18, 45, 14, 14, 14, 20, 14])
+    excel.congelar('A4')
+
     # Título
-    ws.merge_cells('A1:I1')
-    ws['A1'].value = 'REPORTE DE VENTAS — PESCADERÍA HUINA'
-    ws['A1'].font = Font(bold=True, color="FFFFFF", size=13)
-    ws['A1'].fill = PatternFill(start_color=azul_oscuro, end_color=azul_oscuro, fill_type="solid")
-    ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-    ws.row_dimensions[1].height = 28
+    excel.fila(['REPORTE DE VENTAS — PESCADERÍA HUINA'], 'titulo', alto=28, combinar='A:I')
 
     # Estadísticas filtradas por las mismas fechas
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin    = request.GET.get('fecha_fin')
-    estado       = request.GET.get('estado')
-
-    qs_base = Venta.objects.all()
-    if fecha_inicio:
-        qs_base = qs_base.filter(fecha_venta__date__gte=fecha_inicio)
-    if fecha_fin:
-        qs_base = qs_base.filter(fecha_venta__date__lte=fecha_fin)
-
-    total_completadas = qs_base.filter(estado='COMPLETADA').count()
-    total_ingresos = qs_base.filter(estado='COMPLETADA').aggregate(t=Sum('total'))['t'] or Decimal('0')
-    ws.merge_cells('A2:D2')
-    ws['A2'] = f'Ventas Completadas: {total_completadas}'
-    ws['A2'].font = Font(bold=True, size=10)
-    ws['A2'].fill = PatternFill(start_color="E8F4F8", end_color="E8F4F8", fill_type="solid")
-    ws['A2'].alignment = center_align
-    ws.merge_cells('E2:I2')
-    ws['E2'] = f'Ingresos Totales: ${total_ingresos:,.2f}'
-    ws['E2'].font = Font(bold=True, size=10, color=verde)
-    ws['E2'].fill = PatternFill(start_color="E8F4F8", end_color="E8F4F8", fill_type="solid")
-    ws['E2'].alignment = center_align
-    ws.row_dimensions[2].height = 20
+    resumen = _resumen_ventas_reporte(fecha_inicio, fecha_fin)
+    total_completadas = resumen['total_completadas']
+    total_ingresos = resumen['total_ingresos']
+    excel.fila(
+        [f'Ventas Completadas: {total_completadas}', None, None, None,
+         f'Ingresos Totales: ${total_ingresos:,.2f}', None, None, None, None],
+        ['resumen'] * 4 + ['resumen_verde'] * 5,
+        alto=20, combinar=['A:D', 'E:I'],
+    )
 
     # Cabecera
     headers = ['#', 'Cliente', 'Documento', 'Productos', 'Subtotal', 'IVA (19%)', 'Total', 'Fecha', 'Estado']
-    col_widths = [7, 25, 18, 45, 14, 14, 14, 20, 14]
-    for col, (header, width) in enumerate(zip(headers, col_widths), 1):
-        cell = ws.cell(row=3, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center_align
-        cell.border = thin_border
-        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = width
-    ws.row_dimensions[3].height = 18
+    excel.fila(headers, 'encabezado', alto=18)
 
     # Datos
-    ventas_qs = Venta.objects.prefetch_related('items__producto').all()
-    if fecha_inicio:
-        ventas_qs = ventas_qs.filter(fecha_venta__date__gte=fecha_inicio)
-    if fecha_fin:
-        ventas_qs = ventas_qs.filter(fecha_venta__date__lte=fecha_fin)
-    if estado:
-        ventas_qs = ventas_qs.filter(estado=estado)
+    ventas_qs = _ventas_para_reporte(fecha_inicio, fecha_fin, estado)
 
-    for row_num, venta in enumerate(ventas_qs, 4):
+    for venta in ventas_qs.iterator(chunk_size=CHUNK_SIZE):
+        # Lista ya precargada: len() no vuelve a consultar (exists() sí lo haría)
         items = venta.items.all()
         productos_str = '\n'.join(
             f"{item.producto.nombre} x{item.cantidad} @ ${item.precio_unitario}" for item in items
-        ) if items.exists() else (str(venta.producto.nombre) if venta.producto else 'N/A')
-
-        row_data = [
-            venta.id,
-            venta.nombre_cliente or 'Anónimo',
-            venta.documento_cliente or 'N/A',
-            productos_str,
-            float(venta.subtotal or 0),
-            float(venta.iva_monto or 0),
-            float(venta.total or 0),
-            venta.fecha_venta.strftime('%d/%m/%Y %H:%M'),
-            venta.estado,
-        ]
+        ) if len(items) else (str(venta.producto.nombre) if venta.producto else 'N/A')
 
+        row_num = excel.filas_escritas + 1
         if venta.estado == 'CANCELADA':
-            bg = PatternFill(start_color="FFE0E0", end_color="FFE0E0", fill_type="solid")
+            sufijo = 'cancelada'
         elif row_num % 2 == 0:
-            bg = PatternFill(start_color=gris_claro, end_color=gris_claro, fill_type="solid")
+            sufijo = 'gris'
         else:
-            bg = None
-
-        for col, value in enumerate(row_data, 1):
-            cell = ws.cell(row=row_num, column=col, value=value)
-            cell.border = thin_border
-            if bg:
-                cell.fill = bg
-            if col == 1:
-                cell.alignment = center_align
-            elif col in (5, 6, 7):
-                cell.alignment = right_align
-                cell.number_format = '$#,##0.00'
-            elif col == 4:
-                cell.alignment = left_align
-            else:
-                cell.alignment = center_align
-            if col == 9:
-                if venta.estado == 'CANCELADA':
-                    cell.font = Font(bold=True, color="DC2626")
-                elif venta.estado == 'COMPLETADA':
-                    cell.font = Font(bold=True, color=verde)
-
-        ws.row_dimensions[row_num].height = max(15, min(60, 15 * (productos_str.count('\n') + 1)))
-
-    ws.freeze_panes = 'A4'
-
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="ventas_pescaderia_huina.xlsx"'
-    wb.save(response)
-    return response
+            sufijo = ''
+        estilo_estado = f'estado_{venta.estado}' if venta.estado in fuentes_estado else 'centro'
+
+        lineas = productos_str.count('\n') + 1
+        excel.fila(
+            [
+                venta.id,
+                venta.nombre_cliente or 'Anónimo',
+                venta.documento_cliente or 'N/A',
+                productos_str,
+                float(venta.subtotal or 0),
+                float(venta.iva_monto or 0),
+                float(venta.total or 0),
+                venta.fecha_venta.strftime('%d/%m/%Y %H:%M'),
+                venta.estado,
+            ],
+            [f'{nombre}{sufijo}' for nombre in (
+                'centro', 'centro', 'centro', 'izquierda', 'moneda', 'moneda', 'moneda', 'centro', estilo_estado,
+            )],
+            alto=min(60, 15 * lineas) if lineas > 1 else None,
+        )
+
+    return excel
 
 
 @login_required
 def exportar_pdf(request):
-    from xhtml2pdf import pisa
-    from django.template.loader import get_template
-    from django.db.models import Sum
-
-    fecha_inicio  = request.GET.get('fecha_inicio') or None
-    fecha_fin     = request.GET.get('fecha_fin')    or None
-    estado_filtro = request.GET.get('estado')       or None
-
-    ventas_qs = Venta.objects.prefetch_related('items__producto').all()
-    if fecha_inicio:
-        ventas_qs = ventas_qs.filter(fecha_venta__date__gte=fecha_inicio)
-    if fecha_fin:
-        ventas_qs = ventas_qs.filter(fecha_venta__date__lte=fecha_fin)
-    if estado_filtro:
-        ventas_qs = ventas_qs.filter(estado=estado_filtro)
-
-    qs_base = Venta.objects.all()
-    if fecha_inicio:
-        qs_base = qs_base.filter(fecha_venta__date__gte=fecha_inicio)
-    if fecha_fin:
-        qs_base = qs_base.filter(fecha_venta__date__lte=fecha_fin)
-
-    qs_completadas = qs_base.filter(estado='COMPLETADA')
-    qs_canceladas  = qs_base.filter(estado='CANCELADA')
+    parametros = {
+        'fecha_inicio': request.GET.get('fecha_inicio') or None,
+        'fecha_fin':    request.GET.get('fecha_fin')    or None,
+        'estado':       request.GET.get('estado')       or None,
+    }
+    return reportes.respuesta_pdf(request, 'ventas', parametros)
+
+
+def datos_pdf_ventas(parametros):
+    """Plantilla, contexto y nombre del PDF de ventas (lo genera core.reportes)."""
+    fecha_inicio  = parametros.get('fecha_inicio')
+    fecha_fin     = parametros.get('fecha_fin')
+    estado_filtro = parametros.get('estado')
 
     context = {
-        'ventas':             ventas_qs,
-        'total_completadas':  qs_completadas.count(),
-        'total_ingresos':     qs_completadas.aggregate(t=Sum('total'))['t'] or Decimal('0'),
-        'total_canceladas':   qs_canceladas.count(),
+        'ventas':             _ventas_para_reporte(fecha_inicio, fecha_fin, estado_filtro),
+        **_resumen_ventas_reporte(fecha_inicio, fecha_fin),
         'fecha_inicio':       fecha_inicio,
         'fecha_fin':          fecha_fin,
         'estado_filtro':      estado_filtro,
     }
-
-    template  = get_template('reporte_ventas_pdf.html')
-    html      = template.render(context)
-    response  = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="ventas_pescaderia_huina.pdf"'
-    pisa.CreatePDF(html, dest=response)
-    return response
\ No newline at end of file
+    return 'reporte_ventas_pdf.html', context, 'ventas_pescaderia_huina.pdf'
\ No newline at end of file